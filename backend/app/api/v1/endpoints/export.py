@@ -7,9 +7,12 @@ from io import BytesIO
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment
 from app.db.database import get_db
-from app.models import PriceRecord, Node, User, UserRole
+from app.models import Node, User, UserRole
 from app.schemas import ExportRequest, DataType
 from app.api.dependencies import get_current_active_user
+from app.utils.rollups import range_stats
+from app.utils.partitions import price_source
+from app.utils.archive import read_archive, archive_rows
 
 router = APIRouter(prefix="/export", tags=["Export"])
 
@@ -36,11 +39,13 @@ async def export_to_excel(
             detail="No nodes found"
         )
     
+    price_table = price_source(db, export_data.start_date, export_data.end_date)
+    
     # Select data field
     field_map = {
-        DataType.PRICE: PriceRecord.price,
-        DataType.SOLAR_CAPTURE: PriceRecord.solar_capture,
-        DataType.WIND_CAPTURE: PriceRecord.wind_capture
+        DataType.PRICE: price_table.c.price,
+        DataType.SOLAR_CAPTURE: price_table.c.solar_capture,
+        DataType.WIND_CAPTURE: price_table.c.wind_capture
     }
     data_field = field_map[export_data.data_type]
     
@@ -67,25 +72,30 @@ async def export_to_excel(
     # Fetch and add data
     for node in nodes:
         records = (
-            db.query(PriceRecord.timestamp, data_field)
+            db.query(price_table.c.timestamp, data_field)
             .filter(
                 and_(
-                    PriceRecord.node_id == node.id,
-                    PriceRecord.timestamp >= export_data.start_date,
-                    PriceRecord.timestamp <= export_data.end_date,
+                    price_table.c.node_id == node.id,
+                    price_table.c.timestamp >= export_data.start_date,
+                    price_table.c.timestamp <= export_data.end_date,
                     data_field.isnot(None)
                 )
             )
-            .order_by(PriceRecord.timestamp)
+            .order_by(price_table.c.timestamp)
             .all()
         )
         
+        # Archived years precede the database rows
+        archived = read_archive(export_data.start_date, export_data.end_date,
+                                ['timestamp', data_field.name], node_ids=[node.id]).dropna()
+        records = archive_rows(archived.sort_values('timestamp')) + records
+        
         for record in records:
             ws_data.append([
                 record[0].strftime("%Y-%m-%d %H:%M:%S"),
                 node.code,
                 node.name,
-                float(record[1]) if record[1] else None
+                float(record[1]) if record[1] is not None else None
             ])
     
     # Auto-adjust column widths
@@ -112,33 +122,21 @@ async def export_to_excel(
             cell.font = header_font
             cell.alignment = Alignment(horizontal="center", vertical="center")
         
+        # Meses y días completos salen de los rollups; solo los bordes del rango se leen por hora
+        node_stats = range_stats(
+            db, [node.id for node in nodes],
+            export_data.start_date, export_data.end_date, export_data.data_type
+        )
+        
         for node in nodes:
-            from sqlalchemy import func
-            stats = (
-                db.query(
-                    func.avg(data_field).label('avg'),
-                    func.max(data_field).label('max'),
-                    func.min(data_field).label('min'),
-                    func.count(data_field).label('count')
-                )
-                .filter(
-                    and_(
-                        PriceRecord.node_id == node.id,
-                        PriceRecord.timestamp >= export_data.start_date,
-                        PriceRecord.timestamp <= export_data.end_date,
-                        data_field.isnot(None)
-                    )
-                )
-                .first()
-            )
-            
+            stats = node_stats.get(node.id)
             ws_agg.append([
                 node.code,
                 node.name,
-                float(stats[0]) if stats[0] else None,
-                float(stats[1]) if stats[1] else None,
-                float(stats[2]) if stats[2] else None,
-                stats[3]
+                stats['avg'] if stats else None,
+                stats['max'] if stats else None,
+                stats['min'] if stats else None,
+                stats['count'] if stats else 0
             ])
         
         # Auto-adjust column widths
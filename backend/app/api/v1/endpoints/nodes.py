@@ -3,11 +3,18 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Optional
 from app.db.database import get_db
-from app.models import Node, PriceRecord, User
+from app.models import Node, User, DataType
 from app.schemas import (
     NodeCreate, NodeUpdate, NodeResponse, NodeWithLatestPrice
 )
 from app.api.dependencies import get_current_active_user, require_admin
+from app.utils.latest_values import latest_by_node, delete_node_latest_values
+from app.utils.analytics import queue_delete
+from app.utils.cache import invalidate_on_commit
+from app.utils.node_geometry import node_catalog_changed
+from app.utils.rollups import delete_node_rollups
+from app.utils.partitions import delete_node_prices
+from app.utils.hour_matrix import clear_node
 
 router = APIRouter(prefix="/nodes", tags=["Nodes"])
 
@@ -43,7 +50,11 @@ def get_nodes_with_latest_price(
     current_user: User = Depends(get_current_active_user)
 ):
     """Get nodes with their latest price."""
-    query = db.query(Node)
+    latest = latest_by_node(db, DataType.PRICE)
+    query = (
+        db.query(Node, latest.c.value, latest.c.timestamp)
+        .outerjoin(latest, latest.c.node_id == Node.id)
+    )
     
     if active_only:
         query = query.filter(Node.is_active == True)
@@ -51,18 +62,8 @@ def get_nodes_with_latest_price(
     if market:
         query = query.filter(Node.market == market)
     
-    nodes = query.all()
-    
     result = []
-    for node in nodes:
-        # Get latest price record
-        latest_record = (
-            db.query(PriceRecord)
-            .filter(PriceRecord.node_id == node.id)
-            .order_by(PriceRecord.timestamp.desc())
-            .first()
-        )
-        
+    for node, latest_price, latest_timestamp in query.order_by(Node.id).all():
         node_data = NodeWithLatestPrice(
             id=node.id,
             code=node.code,
@@ -73,8 +74,8 @@ def get_nodes_with_latest_price(
             zone=node.zone,
             is_active=node.is_active,
             created_at=node.created_at,
-            latest_price=latest_record.price if latest_record else None,
-            latest_timestamp=latest_record.timestamp if latest_record else None
+            latest_price=latest_price,
+            latest_timestamp=latest_timestamp
         )
         result.append(node_data)
     
@@ -116,6 +117,7 @@ def create_node(
     
     db_node = Node(**node_data.dict())
     db.add(db_node)
+    node_catalog_changed(db.connection())
     db.commit()
     db.refresh(db_node)
     
@@ -143,6 +145,7 @@ def update_node(
     for field, value in update_data.items():
         setattr(node, field, value)
     
+    node_catalog_changed(db.connection())
     db.commit()
     db.refresh(node)
     
@@ -164,7 +167,17 @@ def delete_node(
             detail="Node not found"
         )
     
+    # Tablas derivadas sin cascada del ORM: se borran antes que el nodo (FK a nodes.id)
+    conn = db.connection()
+    delete_node_prices(conn, node_id)
+    delete_node_rollups(conn, node_id)
+    delete_node_latest_values(conn, node_id)
+    clear_node(conn, node_id)
     db.delete(node)
+    node_catalog_changed(conn)
+    # Sus precios desaparecen: cachés y copia analítica se actualizan al confirmar
+    invalidate_on_commit(conn)
+    queue_delete(conn, node_id=node_id)
     db.commit()
     
     return None
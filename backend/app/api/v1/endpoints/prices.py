@@ -1,24 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func, extract, and_, or_
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from app.db.database import get_db
-from app.models import PriceRecord, Node, User
+from app.models import Node, User
 from app.schemas import (
     PriceRecordResponse, PriceRecordWithNode,
-    NodePriceEvolution, TimeSeriesData, NodeYearlyComparison, YearlyComparison,
-    NodeMonthlyComparison, MonthlyComparison,
+    NodePriceEvolution, TimeSeriesData, EvolutionSeries, BatchEvolution, NodeYearlyComparison, YearlyComparison,
+    NodeMonthlyComparison, MonthlyComparison, CalendarComparison, CalendarSeries, CalendarPoint,
     PriceDistribution, NodePricePoint, AllNodesPriceDistribution,
-    CongestionData, AggregatedStats, AvailableYears,
-    DataType, AggregationType
+    CongestionData, CongestionSummary, SpreadMatrix, StatsHour, AggregatedStats, NodeStats, AvailableYears,
+    DataType, ComparisonAxis, EvolutionInterval, DistributionMode, AggregationType
 )
 from app.api.dependencies import get_current_active_user
-from app.utils.voronoi_generator import generate_voronoi_polygons, create_texas_boundary
+from app.utils.node_geometry import voronoi_template, render_geometry
+from app.utils.rollups import monthly_series
+from app.utils.partitions import price_source
+from app.utils.hour_matrix import frame_values
+from app.utils.analytics import DATA_COLUMNS, get_analytics
+from app.utils.cache import price_version
+from app.utils.comparisons import calendar_comparison
+from app.utils.resampling import downsample, shared_axis, aligned
+from app.utils.statistics import DEFAULT_PERCENTILES, MAX_TOP_HOURS, stats_cache, with_negative_share
+from app.utils.distribution import DURATION_POINTS, MAX_HISTOGRAM_BINS, exceedance_levels
+from app.utils.congestion import (
+    with_spreads, congestion_summary, load_price_grid, spread_matrix, spread_matrix_cache, nested, MATRIX_MAX_CELLS
+)
+from app.utils.archive import archived_years, archived_markets, archive_rows
 import os
 
 router = APIRouter(prefix="/prices", tags=["Prices"])
 
+# Query parameters each calendar comparison axis requires
+CALENDAR_AXIS_PARAMS = {
+    ComparisonAxis.MONTH: ('year', 'day'),
+    ComparisonAxis.YEAR: ('month', 'day'),
+    ComparisonAxis.WEEKDAY: ('start_date', 'end_date'),
+}
+
 
 @router.get("/available-years", response_model=AvailableYears)
 def get_available_years(
@@ -26,22 +46,25 @@ def get_available_years(
     current_user: User = Depends(get_current_active_user)
 ):
     """Get available years and markets in the database."""
+    price_table = price_source(db)
     years = (
-        db.query(extract('year', PriceRecord.timestamp).label('year'))
+        db.query(extract('year', price_table.c.timestamp).label('year'))
         .distinct()
         .order_by('year')
         .all()
     )
     
     markets = (
-        db.query(PriceRecord.market)
+        db.query(price_table.c.market)
         .distinct()
         .all()
     )
     
+    # Include years and markets moved to the Parquet archive
+    live_markets = [m[0] for m in markets]
     return {
-        "years": [int(y[0]) for y in years],
-        "markets": [m[0] for m in markets]
+        "years": sorted({int(y[0]) for y in years} | set(archived_years())),
+        "markets": live_markets + [m for m in archived_markets() if m not in live_markets]
     }
 
 
@@ -51,10 +74,17 @@ def get_price_evolution(
     start_date: datetime,
     end_date: datetime,
     data_type: DataType = DataType.PRICE,
+    interval: Optional[EvolutionInterval] = Query(None, description="Bucket size (default: hourly values)"),
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Downsample to at most this many points (LTTB)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get price evolution for a node over time."""
+    """
+    Get price evolution for a node over time.
+    With `interval`, each point is a bucket with its average value and min/max
+    envelope. With `max_points`, the series is downsampled with
+    Largest-Triangle-Three-Buckets, bounding the response by the chart width.
+    """
     node = db.query(Node).filter(Node.id == node_id).first()
     if not node:
         raise HTTPException(
@@ -62,38 +92,82 @@ def get_price_evolution(
             detail="Node not found"
         )
     
-    # Select data field based on type
-    field_map = {
-        DataType.PRICE: PriceRecord.price,
-        DataType.SOLAR_CAPTURE: PriceRecord.solar_capture,
-        DataType.WIND_CAPTURE: PriceRecord.wind_capture
-    }
-    data_field = field_map[data_type]
-    
-    records = (
-        db.query(PriceRecord.timestamp, data_field)
-        .filter(
-            and_(
-                PriceRecord.node_id == node_id,
-                PriceRecord.timestamp >= start_date,
-                PriceRecord.timestamp <= end_date,
-                data_field.isnot(None)
-            )
-        )
-        .order_by(PriceRecord.timestamp)
-        .all()
+    series = get_analytics(db).series(
+        [node_id], start_date, end_date, data_type, interval.value if interval else None
     )
-    
-    time_series = [
-        TimeSeriesData(timestamp=r[0], value=r[1])
-        for r in records
-    ]
+    series = downsample(series, max_points)
     
     return NodePriceEvolution(
         node_id=node.id,
         node_code=node.code,
         node_name=node.name,
-        data=time_series
+        data=_time_series(series)
+    )
+
+
+def _time_series(series) -> List[TimeSeriesData]:
+    """Series rows (resampling.SERIES_COLUMNS) of one node as response points."""
+    rows = archive_rows(series[['timestamp', 'value', 'min_value', 'max_value', 'count']])
+    return [
+        TimeSeriesData(timestamp=timestamp, value=value, min_value=low, max_value=high,
+                       count=int(count) if count is not None else None)
+        for timestamp, value, low, high, count in rows
+    ]
+
+
+@router.get("/evolution", response_model=BatchEvolution)
+def get_batch_evolution(
+    node_ids: List[int] = Query(..., description="Node IDs"),
+    start_date: datetime = Query(..., description="Range start"),
+    end_date: datetime = Query(..., description="Range end"),
+    data_types: List[DataType] = Query([DataType.PRICE], description="Data types"),
+    interval: Optional[EvolutionInterval] = Query(None, description="Bucket size (default: hourly values)"),
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Downsample each series to at most this many points (LTTB)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get the evolution of several nodes and data types in one indexed read.
+    Columnar output: one shared timestamp axis and, per node and data type, a
+    value array aligned to it (null where the series has no point). With
+    `interval`, values are bucket averages plus min/max envelope arrays. With
+    `max_points`, each series contributes at most that many LTTB-selected
+    timestamps to the axis.
+    """
+    nodes = db.query(Node).filter(Node.id.in_(node_ids)).all()
+    if len(nodes) != len(set(node_ids)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="One or more nodes not found"
+        )
+    
+    data_types = list(dict.fromkeys(data_types))
+    frames = get_analytics(db).multi_series(
+        [node.id for node in nodes], start_date, end_date, data_types, interval.value if interval else None
+    )
+    axis = shared_axis(list(frames.values()), max_points)
+    
+    nodes_by_id = {node.id: node for node in nodes}
+    series = [
+        EvolutionSeries(
+            node_id=node_id,
+            node_code=nodes_by_id[node_id].code,
+            node_name=nodes_by_id[node_id].name,
+            data_type=data_type,
+            values=aligned(frames[data_type], node_id, axis),
+            min_values=aligned(frames[data_type], node_id, axis, 'min_value') if interval else None,
+            max_values=aligned(frames[data_type], node_id, axis, 'max_value') if interval else None
+        )
+        for node_id in dict.fromkeys(node_ids)
+        for data_type in data_types
+    ]
+    
+    return BatchEvolution(
+        start_date=start_date,
+        end_date=end_date,
+        interval=interval,
+        timestamps=axis.to_pydatetime().tolist(),
+        series=series
     )
 
 
@@ -115,46 +189,12 @@ def get_monthly_comparison(
             detail="Node not found"
         )
     
-    # Select data field based on type
-    field_map = {
-        DataType.PRICE: PriceRecord.price,
-        DataType.SOLAR_CAPTURE: PriceRecord.solar_capture,
-        DataType.WIND_CAPTURE: PriceRecord.wind_capture
-    }
-    data_field = field_map[data_type]
-    
-    monthly_data = []
-    # Iterate through all 12 months
-    for month in range(1, 13):
-        try:
-            # Create timestamp for specific year/month/day/hour
-            target_datetime = datetime(year, month, day, hour, 0, 0)
-            hour_end = target_datetime + timedelta(hours=1)
-            
-            # Query average price for that specific hour
-            avg_value = (
-                db.query(func.avg(data_field))
-                .filter(
-                    and_(
-                        PriceRecord.node_id == node_id,
-                        PriceRecord.timestamp >= target_datetime,
-                        PriceRecord.timestamp < hour_end,
-                        data_field.isnot(None)
-                    )
-                )
-                .scalar()
-            )
-            
-            # Add data point (None if no data available)
-            monthly_data.append(
-                MonthlyComparison(
-                    month=month,
-                    value=float(avg_value) if avg_value is not None else None
-                )
-            )
-        except ValueError:
-            # Invalid date (e.g., February 30), add None
-            monthly_data.append(MonthlyComparison(month=month, value=None))
+    # All 12 months in one grouped query (None for missing data or invalid dates, e.g. February 30)
+    values = calendar_comparison(
+        get_analytics(db), [node_id], [data_type], 'month', hour, year=year, day=day
+    )[node_id][data_type]
+    
+    monthly_data = [MonthlyComparison(month=month, value=value) for month, value in values.items()]
     
     return NodeMonthlyComparison(
         node_id=node.id,
@@ -185,45 +225,13 @@ def get_yearly_comparison(
             detail="Node not found"
         )
     
-    # Select data field based on type
-    field_map = {
-        DataType.PRICE: PriceRecord.price,
-        DataType.SOLAR_CAPTURE: PriceRecord.solar_capture,
-        DataType.WIND_CAPTURE: PriceRecord.wind_capture
-    }
-    data_field = field_map[data_type]
+    # Every available year in one grouped query; years without data (or without
+    # that date, e.g. February 29) are left out
+    values = calendar_comparison(
+        get_analytics(db), [node_id], [data_type], 'year', hour, month=month, day=day
+    )[node_id][data_type]
     
-    # Get all available years
-    years = (
-        db.query(extract('year', PriceRecord.timestamp).label('year'))
-        .distinct()
-        .order_by('year')
-        .all()
-    )
-    
-    yearly_data = []
-    for (year,) in years:
-        year_int = int(year)
-        # Create timestamp for specific year/month/day/hour
-        target_datetime = datetime(year_int, month, day, hour, 0, 0)
-        hour_end = target_datetime + timedelta(hours=1)
-        
-        # Query average price for that specific hour
-        avg_value = (
-            db.query(func.avg(data_field))
-            .filter(
-                and_(
-                    PriceRecord.node_id == node_id,
-                    PriceRecord.timestamp >= target_datetime,
-                    PriceRecord.timestamp < hour_end,
-                    data_field.isnot(None)
-                )
-            )
-            .scalar()
-        )
-        
-        if avg_value is not None:
-            yearly_data.append(YearlyComparison(year=year_int, value=float(avg_value)))
+    yearly_data = [YearlyComparison(year=year, value=value) for year, value in values.items() if value is not None]
     
     return NodeYearlyComparison(
         node_id=node.id,
@@ -236,6 +244,70 @@ def get_yearly_comparison(
     )
 
 
+@router.get("/calendar-comparison", response_model=CalendarComparison)
+def get_calendar_comparison(
+    node_ids: List[int] = Query(..., description="Node IDs"),
+    axis: ComparisonAxis = Query(..., description="Compare across months of a year, years or weekdays"),
+    hour: int = Query(..., ge=0, le=23, description="Hour (0-23)"),
+    data_types: List[DataType] = Query([DataType.PRICE], description="Data types"),
+    year: Optional[int] = Query(None, ge=2020, le=2030, description="Year (month axis)"),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Month (year axis)"),
+    day: Optional[int] = Query(None, ge=1, le=31, description="Day (month and year axes)"),
+    start_date: Optional[datetime] = Query(None, description="Range start (weekday axis)"),
+    end_date: Optional[datetime] = Query(None, description="Range end (weekday axis)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Compare the same day/hour across the months of a year, across years or
+    across weekdays of a date range (0 = Monday), for several nodes and data
+    types in a single grouped query.
+    """
+    nodes = db.query(Node).filter(Node.id.in_(node_ids)).all()
+    if len(nodes) != len(set(node_ids)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="One or more nodes not found"
+        )
+    
+    params = {'year': year, 'month': month, 'day': day, 'start_date': start_date, 'end_date': end_date}
+    missing = [name for name in CALENDAR_AXIS_PARAMS[axis] if params[name] is None]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Axis '{axis.value}' requires: {', '.join(missing)}"
+        )
+    
+    values = calendar_comparison(
+        get_analytics(db), [node.id for node in nodes], data_types, axis.value, hour,
+        year=year, month=month, day=day, start=start_date, end=end_date
+    )
+    
+    nodes_by_id = {node.id: node for node in nodes}
+    series = [
+        CalendarSeries(
+            node_id=node_id,
+            node_code=nodes_by_id[node_id].code,
+            node_name=nodes_by_id[node_id].name,
+            data_type=data_type,
+            data=[CalendarPoint(key=key, value=value) for key, value in values[node_id][data_type].items()]
+        )
+        for node_id in dict.fromkeys(node_ids)
+        for data_type in data_types
+    ]
+    
+    return CalendarComparison(
+        axis=axis,
+        hour=hour,
+        year=year,
+        month=month,
+        day=day,
+        start_date=start_date,
+        end_date=end_date,
+        series=series
+    )
+
+
 @router.get("/all-nodes-distribution", response_model=AllNodesPriceDistribution)
 def get_all_nodes_distribution(
     timestamp: datetime,
@@ -245,40 +317,56 @@ def get_all_nodes_distribution(
     current_user: User = Depends(get_current_active_user)
 ):
     """Get price distribution across all nodes for a specific hour."""
-    # Select data field
-    field_map = {
-        DataType.PRICE: PriceRecord.price,
-        DataType.SOLAR_CAPTURE: PriceRecord.solar_capture,
-        DataType.WIND_CAPTURE: PriceRecord.wind_capture
-    }
-    data_field = field_map[data_type]
-    
     # Calcular rango de hora
     hour_start = timestamp.replace(minute=0, second=0, microsecond=0)
     hour_end = hour_start + timedelta(hours=1)
     
-    # Consultar precio promedio por nodo para esa hora
-    results = (
-        db.query(
-            Node.id,
-            Node.code,
-            Node.name,
-            func.avg(data_field).label('avg_price')
+    frame = frame_values(db, market, hour_start, data_type)
+    if frame is not None:
+        # Un fotograma de la matriz horaria: todos los nodos en una fila
+        nodes = (
+            db.query(Node.id, Node.code, Node.name)
+            .filter(Node.id.in_(list(frame)), Node.is_active == True)
+            .all()
         )
-        .join(PriceRecord, PriceRecord.node_id == Node.id)
-        .filter(
-            and_(
-                PriceRecord.timestamp >= hour_start,
-                PriceRecord.timestamp < hour_end,
-                PriceRecord.market == market,
-                data_field.isnot(None),
-                Node.is_active == True
+        results = sorted(
+            [(n.id, n.code, n.name, frame[n.id]) for n in nodes],
+            key=lambda r: r[3],
+            reverse=True
+        )
+    else:
+        price_table = price_source(db, hour_start, hour_start)
+        
+        # Select data field
+        field_map = {
+            DataType.PRICE: price_table.c.price,
+            DataType.SOLAR_CAPTURE: price_table.c.solar_capture,
+            DataType.WIND_CAPTURE: price_table.c.wind_capture
+        }
+        data_field = field_map[data_type]
+        
+        # Consultar precio promedio por nodo para esa hora
+        results = (
+            db.query(
+                Node.id,
+                Node.code,
+                Node.name,
+                func.avg(data_field).label('avg_price')
+            )
+            .join(price_table, price_table.c.node_id == Node.id)
+            .filter(
+                and_(
+                    price_table.c.timestamp >= hour_start,
+                    price_table.c.timestamp < hour_end,
+                    price_table.c.market == market,
+                    data_field.isnot(None),
+                    Node.is_active == True
+                )
             )
+            .group_by(Node.id, Node.code, Node.name)
+            .order_by(func.avg(data_field).desc())
+            .all()
         )
-        .group_by(Node.id, Node.code, Node.name)
-        .order_by(func.avg(data_field).desc())
-        .all()
-    )
     
     node_prices = [
         NodePricePoint(
@@ -302,10 +390,20 @@ def get_price_distribution(
     start_date: datetime,
     end_date: datetime,
     data_type: DataType = DataType.PRICE,
+    mode: DistributionMode = DistributionMode.RAW,
+    points: int = Query(DURATION_POINTS, ge=2, le=5000, description="Duration mode: exceedance levels"),
+    bins: Optional[int] = Query(None, ge=1, le=MAX_HISTOGRAM_BINS, description="Histogram mode: bin count (default: auto)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get price distribution (sorted from highest to lowest) for a node."""
+    """
+    Get price distribution for a node.
+    - raw: every value, sorted from highest to lowest
+    - duration: the duration curve downsampled to `points` evenly spaced exceedance levels
+    - histogram: fixed-width bins between the minimum and the maximum
+    Duration and histogram are computed server-side by quantile selection, so their
+    payload does not grow with the range.
+    """
     node = db.query(Node).filter(Node.id == node_id).first()
     if not node:
         raise HTTPException(
@@ -313,35 +411,54 @@ def get_price_distribution(
             detail="Node not found"
         )
     
-    # Select data field
-    field_map = {
-        DataType.PRICE: PriceRecord.price,
-        DataType.SOLAR_CAPTURE: PriceRecord.solar_capture,
-        DataType.WIND_CAPTURE: PriceRecord.wind_capture
-    }
-    data_field = field_map[data_type]
-    
-    prices = (
-        db.query(data_field)
-        .filter(
-            and_(
-                PriceRecord.node_id == node_id,
-                PriceRecord.timestamp >= start_date,
-                PriceRecord.timestamp <= end_date,
-                data_field.isnot(None)
-            )
+    analytics = get_analytics(db)
+    
+    if mode == DistributionMode.DURATION:
+        count, prices = analytics.duration_curve(node_id, start_date, end_date, data_type, points)
+        return PriceDistribution(
+            node_id=node.id,
+            node_code=node.code,
+            prices=prices,
+            mode=mode,
+            count=count,
+            exceedance=exceedance_levels(points).tolist() if count else []
         )
-        .order_by(data_field.desc())
-        .all()
-    )
+    
+    if mode == DistributionMode.HISTOGRAM:
+        count, edges, counts = analytics.histogram(node_id, start_date, end_date, data_type, bins)
+        return PriceDistribution(
+            node_id=node.id,
+            node_code=node.code,
+            mode=mode,
+            count=count,
+            bin_edges=edges,
+            bin_counts=counts
+        )
+    
+    prices = analytics.values(node_id, start_date, end_date, data_type)
     
     return PriceDistribution(
         node_id=node.id,
         node_code=node.code,
-        prices=[p[0] for p in prices]
+        prices=prices,
+        mode=mode,
+        count=len(prices)
     )
 
 
+def _congestion_nodes(db: Session, node1_id: int, node2_id: int):
+    """Load both nodes of a congestion query or raise 404."""
+    node1 = db.query(Node).filter(Node.id == node1_id).first()
+    node2 = db.query(Node).filter(Node.id == node2_id).first()
+    
+    if not node1 or not node2:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="One or both nodes not found"
+        )
+    return node1, node2
+
+
 @router.get("/congestion", response_model=List[CongestionData])
 def get_congestion_pricing(
     node1_id: int,
@@ -351,66 +468,161 @@ def get_congestion_pricing(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get congestion pricing between two nodes."""
-    # Verify nodes exist
-    node1 = db.query(Node).filter(Node.id == node1_id).first()
-    node2 = db.query(Node).filter(Node.id == node2_id).first()
+    """
+    Get congestion pricing between two nodes.
+    Prices are aligned by timestamp in one join bounded to the date range;
+    spreads are computed on arrays.
+    """
+    node1, node2 = _congestion_nodes(db, node1_id, node2_id)
     
-    if not node1 or not node2:
+    pairs = with_spreads(get_analytics(db).pair_prices(node1_id, node2_id, start_date, end_date))
+    rows = archive_rows(pairs[['timestamp', 'price1', 'price2', 'spread', 'congestion_price']])
+    
+    return [
+        {
+            'node1_id': node1_id,
+            'node2_id': node2_id,
+            'node1_code': node1.code,
+            'node2_code': node2.code,
+            'timestamp': timestamp,
+            'node1_price': price1,
+            'node2_price': price2,
+            'spread': spread,
+            'congestion_price': congestion
+        }
+        for timestamp, price1, price2, spread, congestion in rows
+    ]
+
+
+@router.get("/congestion/summary", response_model=CongestionSummary)
+def get_congestion_summary(
+    node1_id: int,
+    node2_id: int,
+    start_date: datetime,
+    end_date: datetime,
+    threshold: float = Query(0.0, ge=0, description="Absolute spread ($/MWh) above which an hour counts as congested"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get summary statistics of the spread between two nodes over a date range."""
+    node1, node2 = _congestion_nodes(db, node1_id, node2_id)
+    
+    pairs = with_spreads(get_analytics(db).pair_prices(node1_id, node2_id, start_date, end_date))
+    
+    return CongestionSummary(
+        node1_id=node1_id,
+        node2_id=node2_id,
+        node1_code=node1.code,
+        node2_code=node2.code,
+        start_date=start_date,
+        end_date=end_date,
+        **congestion_summary(pairs, threshold)
+    )
+
+
+@router.get("/congestion/matrix", response_model=SpreadMatrix)
+def get_spread_matrix(
+    start_date: datetime,
+    end_date: datetime,
+    node_ids: Optional[List[int]] = Query(None, description="Nodes of the matrix (default: every active node)"),
+    market: Optional[str] = None,
+    percentile: float = Query(95.0, ge=0, le=100, description="Percentile of the absolute spread"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get the all-pairs spread matrix (row node price - column node price) of a
+    node set: mean, mean absolute, max absolute and percentile absolute spread.
+    Computed in one pass over a node x hour price array and cached by data
+    version, node set, range, market and percentile. A single hour covers the
+    full catalog.
+    """
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date must not be before start_date"
+        )
+    
+    query = db.query(Node)
+    if node_ids:
+        query = query.filter(Node.id.in_(node_ids))
+    else:
+        query = query.filter(Node.is_active == True)
+        if market:
+            query = query.filter(Node.market == market)
+    nodes = query.order_by(Node.id).all()
+    
+    if node_ids and len(nodes) != len(set(node_ids)):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="One or both nodes not found"
+            detail="One or more nodes not found"
+        )
+    if not nodes:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No nodes found"
         )
     
-    # Get price records for both nodes
-    records1 = (
-        db.query(PriceRecord.timestamp, PriceRecord.price)
-        .filter(
-            and_(
-                PriceRecord.node_id == node1_id,
-                # PriceRecord.timestamp >= start_date,
-                # PriceRecord.timestamp <= end_date
-            )
+    hours = int((end_date - start_date).total_seconds() // 3600) + 1
+    if hours * len(nodes) ** 2 > MATRIX_MAX_CELLS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Too many node pairs for the date range; narrow the node set or the range"
         )
-        .all()
-    )
     
-    records2 = (
-        db.query(PriceRecord.timestamp, PriceRecord.price)
-        .filter(
-            and_(
-                PriceRecord.node_id == node2_id,
-                # PriceRecord.timestamp >= start_date,
-                # PriceRecord.timestamp <= end_date
-            )
+    ids = [node.id for node in nodes]
+    
+    def compute():
+        grid = load_price_grid(db, get_analytics(db), ids, start_date, end_date, market)
+        matrix = spread_matrix(grid, percentile)
+        return SpreadMatrix(
+            start_date=start_date,
+            end_date=end_date,
+            market=market,
+            percentile=percentile,
+            node_ids=ids,
+            node_codes=[node.code for node in nodes],
+            hours=matrix['hours'].tolist(),
+            mean_spread=nested(matrix['mean_spread']),
+            mean_abs_spread=nested(matrix['mean_abs_spread']),
+            max_abs_spread=nested(matrix['max_abs_spread']),
+            percentile_abs_spread=nested(matrix['percentile_abs_spread'])
         )
-        .all()
+    
+    return spread_matrix_cache.get_or_compute(
+        (price_version(db), tuple(ids), start_date, end_date, market, percentile), compute
     )
+
+
+@router.get("/stats", response_model=List[NodeStats])
+def get_batch_stats(
+    node_ids: List[int] = Query(..., description="Node IDs"),
+    start_date: datetime = Query(..., description="Range start"),
+    end_date: datetime = Query(..., description="Range end"),
+    data_type: DataType = DataType.PRICE,
+    detailed: bool = Query(False, description="Also compute stddev, percentiles and top hours (reads hourly values)"),
+    percentiles: List[float] = Query(list(DEFAULT_PERCENTILES), description="Percentiles (0-100) of detailed statistics"),
+    top_n: int = Query(5, ge=0, le=MAX_TOP_HOURS, description="Highest-value hours in detailed statistics"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get aggregated statistics for several nodes in one pass.
+    Nodes without data in the range are returned with count 0.
+    """
+    nodes = db.query(Node).filter(Node.id.in_(node_ids)).all()
+    if len(nodes) != len(set(node_ids)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="One or more nodes not found"
+        )
     
-    # Create dictionaries for easy lookup
-    prices1 = {r[0]: r[1] for r in records1}
-    prices2 = {r[0]: r[1] for r in records2}
-    
-    # Calculate congestion for matching timestamps
-    result = []
-    for timestamp in prices1.keys():
-        if timestamp in prices2:
-            price1 = prices1[timestamp]
-            price2 = prices2[timestamp]
-            congestion = abs(price1 - price2) if price1 and price2 else None
-            
-            result.append(CongestionData(
-                node1_id=node1_id,
-                node2_id=node2_id,
-                node1_code=node1.code,
-                node2_code=node2.code,
-                timestamp=timestamp,
-                node1_price=price1,
-                node2_price=price2,
-                congestion_price=congestion
-            ))
-    
-    return sorted(result, key=lambda x: x.timestamp)
+    node_stats = _node_stats(db, node_ids, start_date, end_date, data_type, detailed, percentiles, top_n)
+    nodes_by_id = {node.id: node for node in nodes}
+    return [
+        _aggregated_stats(node_stats.get(node_id), NodeStats, node_id=node_id, node_code=nodes_by_id[node_id].code)
+        for node_id in dict.fromkeys(node_ids)
+    ]
 
 
 @router.get("/stats/{node_id}", response_model=AggregatedStats)
@@ -419,41 +631,92 @@ def get_aggregated_stats(
     start_date: datetime,
     end_date: datetime,
     data_type: DataType = DataType.PRICE,
+    detailed: bool = Query(False, description="Also compute stddev, percentiles and top hours (reads hourly values)"),
+    percentiles: List[float] = Query(list(DEFAULT_PERCENTILES), description="Percentiles (0-100) of detailed statistics"),
+    top_n: int = Query(5, ge=0, le=MAX_TOP_HOURS, description="Highest-value hours in detailed statistics"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get aggregated statistics for a node."""
-    # Select data field
-    field_map = {
-        DataType.PRICE: PriceRecord.price,
-        DataType.SOLAR_CAPTURE: PriceRecord.solar_capture,
-        DataType.WIND_CAPTURE: PriceRecord.wind_capture
-    }
-    data_field = field_map[data_type]
-    
-    stats = (
-        db.query(
-            func.avg(data_field).label('avg'),
-            func.max(data_field).label('max'),
-            func.min(data_field).label('min'),
-            func.count(data_field).label('count')
-        )
-        .filter(
-            and_(
-                PriceRecord.node_id == node_id,
-                PriceRecord.timestamp >= start_date,
-                PriceRecord.timestamp <= end_date,
-                data_field.isnot(None)
-            )
+    """
+    Get aggregated statistics for a node.
+    With the SQL backend whole months and days are read from the rollup
+    tables and only the partial edges of the range come from hourly records.
+    With `detailed`, the hourly values are read once to also compute the
+    standard deviation, percentiles and the `top_n` highest hours.
+    """
+    stats = _node_stats(db, [node_id], start_date, end_date, data_type, detailed, percentiles, top_n).get(node_id)
+    return _aggregated_stats(stats, AggregatedStats)
+
+
+def _node_stats(db: Session, node_ids: List[int], start_date: datetime, end_date: datetime,
+                data_type: DataType, detailed: bool, percentiles: List[float], top_n: int) -> Dict[int, Dict]:
+    """Basic or detailed statistics per node, cached per (nodes, range, data type, parameters)."""
+    if any(not 0 <= percentile <= 100 for percentile in percentiles):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Percentiles must be between 0 and 100"
         )
-        .first()
+    
+    node_ids = sorted(set(node_ids))
+    percentiles = list(dict.fromkeys(percentiles)) if detailed else []
+    top_n = top_n if detailed else 0
+    
+    def compute():
+        analytics = get_analytics(db)
+        if detailed:
+            return analytics.detailed_stats(node_ids, start_date, end_date, data_type, percentiles, top_n)
+        return {
+            node_id: with_negative_share(stats)
+            for node_id, stats in analytics.stats(node_ids, start_date, end_date, data_type).items()
+        }
+    
+    key = (price_version(db), tuple(node_ids), start_date, end_date, DataType(data_type).value,
+           detailed, tuple(percentiles), top_n)
+    return stats_cache.get_or_compute(key, compute)
+
+
+def _aggregated_stats(stats: Optional[Dict], model, **fields):
+    """Statistics of one node (None = no data in the range) as a response model."""
+    if stats is None:
+        return model(count=0, **fields)
+    return model(
+        avg=stats['avg'],
+        max=stats['max'],
+        min=stats['min'],
+        count=stats['count'],
+        negative_count=stats['negative_count'],
+        negative_share=stats['negative_share'],
+        std=stats.get('std'),
+        percentiles=stats.get('percentiles', {}),
+        top_hours=[StatsHour(timestamp=timestamp, value=value) for timestamp, value in stats.get('top_hours', [])],
+        **fields
     )
+
+
+@router.get("/monthly-averages/{node_id}", response_model=NodePriceEvolution)
+def get_monthly_averages(
+    node_id: int,
+    start_date: datetime,
+    end_date: datetime,
+    data_type: DataType = DataType.PRICE,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the historical monthly average of a node, read from the monthly rollups."""
+    node = db.query(Node).filter(Node.id == node_id).first()
+    if not node:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Node not found"
+        )
+    
+    series = monthly_series(db, node_id, start_date, end_date, data_type)
     
-    return AggregatedStats(
-        avg=float(stats[0]) if stats[0] else None,
-        max=float(stats[1]) if stats[1] else None,
-        min=float(stats[2]) if stats[2] else None,
-        count=stats[3]
+    return NodePriceEvolution(
+        node_id=node.id,
+        node_code=node.code,
+        node_name=node.name,
+        data=[TimeSeriesData(timestamp=month, value=value) for month, value in series]
     )
 
 
@@ -469,29 +732,41 @@ def get_hourly_snapshot(
     hour_start = timestamp.replace(minute=0, second=0, microsecond=0)
     hour_end = hour_start + timedelta(hours=1)
     
-    # Buscar registros dentro de esa hora (entre hour_start y hour_end)
-    # Agrupar por nodo y tomar el promedio si hay múltiples registros
-    records = (
-        db.query(
-            Node.id,
-            Node.code,
-            Node.name,
-            Node.latitude,
-            Node.longitude,
-            func.avg(PriceRecord.price).label('avg_price'),
-            func.max(PriceRecord.timestamp).label('latest_timestamp')
+    frame = frame_values(db, market, hour_start, DataType.PRICE)
+    if frame is not None:
+        # Un fotograma de la matriz horaria: todos los nodos en una fila
+        nodes = (
+            db.query(Node.id, Node.code, Node.name, Node.latitude, Node.longitude)
+            .filter(Node.id.in_(list(frame)))
+            .all()
         )
-        .join(PriceRecord, PriceRecord.node_id == Node.id)
-        .filter(
-            and_(
-                PriceRecord.timestamp >= hour_start,
-                PriceRecord.timestamp < hour_end,
-                PriceRecord.market == market
+        records = [(*n, frame[n.id], hour_start) for n in nodes]
+    else:
+        price_table = price_source(db, hour_start, hour_start)
+        
+        # Buscar registros dentro de esa hora (entre hour_start y hour_end)
+        # Agrupar por nodo y tomar el promedio si hay múltiples registros
+        records = (
+            db.query(
+                Node.id,
+                Node.code,
+                Node.name,
+                Node.latitude,
+                Node.longitude,
+                func.avg(price_table.c.price).label('avg_price'),
+                func.max(price_table.c.timestamp).label('latest_timestamp')
             )
+            .join(price_table, price_table.c.node_id == Node.id)
+            .filter(
+                and_(
+                    price_table.c.timestamp >= hour_start,
+                    price_table.c.timestamp < hour_end,
+                    price_table.c.market == market
+                )
+            )
+            .group_by(Node.id, Node.code, Node.name, Node.latitude, Node.longitude)
+            .all()
         )
-        .group_by(Node.id, Node.code, Node.name, Node.latitude, Node.longitude)
-        .all()
-    )
     
     return [
         {
@@ -518,96 +793,48 @@ def get_voronoi_map(
     """
     Get Voronoi polygons for all nodes with their data at a specific hour.
     Returns GeoJSON FeatureCollection with polygon geometries.
+    The geometry is generated once per node-catalog state and cached as a
+    pre-serialized template; each request only reads the values of the hour.
     """
     try:
-        # Obtener todos los nodos activos de la base de datos
-        nodes = db.query(Node).filter(Node.is_active == True).filter(Node.zone == 'Central').all()
-        print(f"DEBUG: Selected {len(nodes)} nodes")
-        # nodes = nodes.filter(Node.zone ==)
-        
-        if not nodes:
+        template = voronoi_template(db)
+        if template is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No active nodes found in database"
             )
         
-        print(f"DEBUG: Found {len(nodes)} active nodes in database")
-        
-        # Convertir nodos a formato diccionario
-        nodes_dict = [
-            {
-                'code': node.code,
-                'name': node.name,
-                'latitude': float(node.latitude),
-                'longitude': float(node.longitude),
-                'market': node.market,
-                'zone': node.zone
-            }
-            for node in nodes
-        ]
-        
-        # Generar polígonos de Voronoi
-        print("DEBUG: Generating Voronoi polygons...")
-        texas_boundary = create_texas_boundary()
-        geojson = generate_voronoi_polygons(nodes_dict, texas_boundary)
-        print(f"DEBUG: Generated {len(geojson.get('features', []))} polygons")
-        
-        # Si el datatype es NODES, solo devolver información de nodos (sin precios)
+        # Si el datatype es NODES, solo devolver información de nodos (sin valores)
         if datatype == DataType.NODES:
-            print("DEBUG: Datatype is NODES, returning without price data")
-            for feature in geojson['features']:
-                feature['properties']['value'] = None  # No hay valor asociado
-            return geojson
+            return Response(content=render_geometry(template, {}), media_type="application/json")
         
-        # Para otros datatypes, consultar la tabla de precios
         hour_start = timestamp.replace(minute=0, second=0, microsecond=0)
         hour_end = hour_start + timedelta(hours=1)
         
-        print(f"DEBUG: Querying {datatype} data from {hour_start} to {hour_end}")
-        
-        # Seleccionar el campo de datos según el tipo
-        field_map = {
-            DataType.PRICE: PriceRecord.price,
-            DataType.SOLAR_CAPTURE: PriceRecord.solar_capture,
-            DataType.WIND_CAPTURE: PriceRecord.wind_capture,
-            DataType.NEGATIVE_HOURS: PriceRecord.negative_hours
-        }
-        data_field = field_map[datatype]
-        
-        # Consultar datos promedio por nodo
-        data_records = (
-            db.query(
-                Node.code,
-                func.avg(data_field).label('avg_value')
-            )
-            .join(PriceRecord, PriceRecord.node_id == Node.id)
-            .filter(
-                and_(
-                    PriceRecord.timestamp >= hour_start,
-                    PriceRecord.timestamp < hour_end,
-                    PriceRecord.market == market,
-                    data_field.isnot(None)
+        values = frame_values(db, market, hour_start, datatype)
+        if values is None:
+            # Sin fotograma de la matriz horaria: promedio por nodo de las filas de la hora
+            price_table = price_source(db, hour_start, hour_start)
+            data_field = price_table.c[DATA_COLUMNS[DataType(datatype)]]
+            values = dict(
+                db.query(price_table.c.node_id, func.avg(data_field))
+                .filter(
+                    and_(
+                        price_table.c.timestamp >= hour_start,
+                        price_table.c.timestamp < hour_end,
+                        price_table.c.market == market,
+                        data_field.isnot(None)
+                    )
                 )
+                .group_by(price_table.c.node_id)
+                .all()
             )
-            .group_by(Node.code)
-            .all()
-        )
-        
-        print(f"DEBUG: Found data for {len(data_records)} nodes")
-        
-        # Crear diccionario de valores por código de nodo
-        values_by_code = {code: float(value) for code, value in data_records}
         
-        # Agregar valores a las propiedades de cada feature
-        for feature in geojson['features']:
-            node_code = feature['properties']['code']
-            feature['properties']['value'] = values_by_code.get(node_code, None)
-            
-            # Mantener compatibilidad con frontend que espera 'price'
-            if datatype == DataType.PRICE:
-                feature['properties']['price'] = values_by_code.get(node_code, None)
-        
-        return geojson
+        # 'price' se mantiene por compatibilidad con el frontend
+        return Response(
+            content=render_geometry(template, values, with_price=datatype == DataType.PRICE),
+            media_type="application/json"
+        )
     
     except HTTPException:
         raise
@@ -618,4 +845,4 @@ def get_voronoi_map(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating Voronoi map: {str(e)}"
-        )
\ No newline at end of file
+        )
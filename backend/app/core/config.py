@@ -44,6 +44,52 @@ class Settings(BaseSettings):
     DEFAULT_PAGE_SIZE: int = 100
     MAX_PAGE_SIZE: int = 1000
     
+    # Ingesta: zona de aterrizaje Parquet (rutas relativas a backend/)
+    PARQUET_STORE_ENABLED: bool = True
+    PARQUET_STORE_DIR: str = "data/parquet"
+    
+    # Ingesta: rango de precios aceptado ($/MWh); fuera de él la fila va a cuarentena.
+    # Holgado respecto a los topes de ERCOT (piso -250, tope 5000; 9000 antes de 2022)
+    PRICE_MIN: float = -1000.0
+    PRICE_MAX: float = 10000.0
+    
+    # Rollups diarios/mensuales de precios (mantenidos por la ingesta)
+    ROLLUPS_ENABLED: bool = True
+    
+    # Matriz horaria (todos los nodos de una hora en una fila) para los mapas de calor
+    HOUR_MATRIX_ENABLED: bool = True
+    
+    # Último valor de cada nodo, mercado y tipo de dato (mantenido por la ingesta) para /nodes/with-prices
+    LATEST_VALUES_ENABLED: bool = True
+    
+    # Caché en memoria de resultados de lectura (las claves llevan la versión de los datos de la base)
+    CACHE_ENABLED: bool = True
+    CACHE_TTL_SECONDS: int = 300
+    CACHE_MAX_ENTRIES: int = 256
+    
+    # Particionado mensual de price_records (nativo en SQL Server, tablas por mes en SQLite).
+    # Al habilitarlo ejecutar app/migrations/partition_price_records.py
+    PRICE_PARTITIONING: bool = False
+    
+    # Formato de almacenamiento de precios: "standard" (price_records) o "compact"
+    # (price_hours: mercado como tinyint, hora entera, sin id ni created_at por fila).
+    # Al cambiarlo ejecutar app/migrations/compact_price_records.py. El particionado por
+    # tablas de SQLite solo aplica al formato estándar
+    PRICE_LAYOUT: str = "standard"
+    
+    # Motor de las consultas analíticas de precios (distribución, estadísticas, comparaciones,
+    # congestión): "sql" (base principal), "duckdb" (archivo DuckDB) o "parquet" (Parquet por
+    # mercado y mes). "duckdb" y "parquet" requieren el paquete duckdb; la copia se crea con
+    # python -m app.utils.analytics sync y la ingesta la mantiene al día
+    ANALYTICS_BACKEND: str = "sql"
+    ANALYTICS_DUCKDB_PATH: str = "data/analytics.duckdb"
+    ANALYTICS_PARQUET_DIR: str = "data/analytics"
+    
+    # Archivo histórico: los años anteriores a (año actual - ARCHIVE_KEEP_YEARS) se mueven a
+    # Parquet comprimido en ARCHIVE_DIR con python -m app.utils.archive run
+    ARCHIVE_DIR: str = "data/archive"
+    ARCHIVE_KEEP_YEARS: int = 2
+    
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=True,
@@ -1,15 +1,24 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from app.core.config import settings
 
+# Opciones específicas del driver
+engine_options = {"pool_size": 10, "max_overflow": 20}
+if settings.DATABASE_URL.startswith("mssql+pyodbc"):
+    # Envía los executemany de las cargas masivas como un único lote ODBC
+    engine_options["fast_executemany"] = True
+elif settings.DATABASE_URL in ("sqlite://", "sqlite:///:memory:"):
+    # Base en memoria (pruebas): una sola conexión compartida por todos los hilos
+    engine_options = {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+
 # Create SQLAlchemy engine
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
-    echo=settings.DEBUG
+    echo=settings.DEBUG,
+    **engine_options
 )
 
 # Create SessionLocal class
@@ -0,0 +1,41 @@
+"""
+Migración: Crear la tabla hour_matrices y construir la matriz horaria de los
+precios ya cargados.
+Fecha: 2026-10-16
+
+Las cargas posteriores mantienen la matriz automáticamente. Funciona con
+SQL Server y SQLite usando la DATABASE_URL de la aplicación.
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import inspect
+from app.db.database import engine, SessionLocal
+from app.models import HourMatrix
+from app.utils.hour_matrix import rebuild_hour_matrix
+
+
+def run_migration():
+    """Ejecuta la migración para crear y poblar hour_matrices."""
+    if inspect(engine).has_table(HourMatrix.__tablename__):
+        print(f"La tabla '{HourMatrix.__tablename__}' ya existe; se reconstruye la matriz.")
+    else:
+        print(f"Creando tabla '{HourMatrix.__tablename__}'...")
+        HourMatrix.__table__.create(bind=engine)
+        print(f"✓ Tabla '{HourMatrix.__tablename__}' creada.")
+
+    db = SessionLocal()
+    try:
+        print("Construyendo la matriz horaria mes a mes...")
+        months = rebuild_hour_matrix(db)
+        print(f"✓ Matriz horaria construida para {months} meses.")
+    finally:
+        db.close()
+
+    print("✓ Migración completada exitosamente.")
+
+
+if __name__ == "__main__":
+    run_migration()
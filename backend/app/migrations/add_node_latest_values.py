@@ -0,0 +1,41 @@
+"""
+Migración: Crear la tabla node_latest_values y calcular el último valor de
+cada nodo, mercado y tipo de dato de los precios ya cargados.
+Fecha: 2026-10-16
+
+Las cargas posteriores mantienen la tabla automáticamente. Funciona con
+SQL Server y SQLite usando la DATABASE_URL de la aplicación.
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import inspect
+from app.db.database import engine, SessionLocal
+from app.models import NodeLatestValue
+from app.utils.latest_values import rebuild_latest_values
+
+
+def run_migration():
+    """Ejecuta la migración para crear y poblar node_latest_values."""
+    if inspect(engine).has_table(NodeLatestValue.__tablename__):
+        print(f"La tabla '{NodeLatestValue.__tablename__}' ya existe; se recalculan los últimos valores.")
+    else:
+        print(f"Creando tabla '{NodeLatestValue.__tablename__}'...")
+        NodeLatestValue.__table__.create(bind=engine)
+        print(f"✓ Tabla '{NodeLatestValue.__tablename__}' creada.")
+
+    db = SessionLocal()
+    try:
+        print("Calculando el último valor de cada nodo...")
+        count = rebuild_latest_values(db)
+        print(f"✓ {count:,} últimos valores escritos.")
+    finally:
+        db.close()
+
+    print("✓ Migración completada exitosamente.")
+
+
+if __name__ == "__main__":
+    run_migration()
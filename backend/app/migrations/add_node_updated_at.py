@@ -0,0 +1,38 @@
+"""
+Migración: Agregar la columna updated_at a nodes.
+Fecha: 2026-10-17
+
+El mapa de Voronoi identifica el estado del catálogo de nodos por el número
+de nodos activos, su mayor id y su mayor updated_at. Los nodos existentes
+toman updated_at = created_at. Funciona con SQL Server y SQLite usando la
+DATABASE_URL de la aplicación.
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import inspect, text
+from app.db.database import engine
+from app.models import Node
+
+
+def run_migration():
+    """Ejecuta la migración para agregar la columna updated_at."""
+    table = Node.__tablename__
+    print("Verificando si la columna ya existe...")
+    if 'updated_at' in {column['name'] for column in inspect(engine).get_columns(table)}:
+        print("La columna 'updated_at' ya existe. No se requiere migración.")
+        return
+
+    column_type = Node.__table__.c.updated_at.type.compile(dialect=engine.dialect)
+    with engine.begin() as conn:
+        print("Agregando columna 'updated_at'...")
+        conn.execute(text(f"ALTER TABLE {table} ADD updated_at {column_type} NULL"))
+        conn.execute(text(f"UPDATE {table} SET updated_at = created_at"))
+    print("✓ Columna 'updated_at' agregada exitosamente.")
+    print("✓ Migración completada exitosamente.")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,54 @@
+"""
+Migración: Eliminar duplicados de price_records y crear el índice único
+uq_price_node_timestamp_market sobre (node_id, timestamp, market).
+Fecha: 2026-10-16
+
+Se conserva la fila con mayor id (la última cargada) de cada clave repetida.
+Funciona con SQL Server y SQLite usando la DATABASE_URL de la aplicación.
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import inspect, text
+from app.db.database import engine
+
+INDEX_NAME = "uq_price_node_timestamp_market"
+
+DELETE_DUPLICATES_SQL = """
+    DELETE FROM price_records
+    WHERE id NOT IN (
+        SELECT keep_id FROM (
+            SELECT MAX(id) AS keep_id
+            FROM price_records
+            GROUP BY node_id, timestamp, market
+        ) AS keepers
+    )
+"""
+
+
+def run_migration():
+    """Ejecuta la migración para agregar la clave natural única."""
+    existing = {ix['name'] for ix in inspect(engine).get_indexes('price_records')}
+    if INDEX_NAME in existing:
+        print(f"El índice '{INDEX_NAME}' ya existe. No se requiere migración.")
+        return
+
+    with engine.begin() as conn:
+        print("Eliminando registros duplicados...")
+        deleted = conn.execute(text(DELETE_DUPLICATES_SQL)).rowcount
+        print(f"✓ {deleted} registros duplicados eliminados.")
+
+        print(f"Creando índice único '{INDEX_NAME}'...")
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX {INDEX_NAME} "
+            f"ON price_records (node_id, timestamp, market)"
+        ))
+
+    print(f"✓ Índice '{INDEX_NAME}' creado exitosamente.")
+    print("✓ Migración completada exitosamente.")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,41 @@
+"""
+Migración: Crear la tabla price_rollups y calcular los rollups diarios y
+mensuales de los precios ya cargados.
+Fecha: 2026-10-16
+
+Las cargas posteriores mantienen los rollups automáticamente. Funciona con
+SQL Server y SQLite usando la DATABASE_URL de la aplicación.
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import inspect
+from app.db.database import engine, SessionLocal
+from app.models import PriceRollup
+from app.utils.rollups import rebuild_rollups
+
+
+def run_migration():
+    """Ejecuta la migración para crear y poblar price_rollups."""
+    if inspect(engine).has_table(PriceRollup.__tablename__):
+        print(f"La tabla '{PriceRollup.__tablename__}' ya existe; se recalculan los rollups.")
+    else:
+        print(f"Creando tabla '{PriceRollup.__tablename__}'...")
+        PriceRollup.__table__.create(bind=engine)
+        print(f"✓ Tabla '{PriceRollup.__tablename__}' creada.")
+
+    db = SessionLocal()
+    try:
+        print("Calculando rollups mes a mes...")
+        months = rebuild_rollups(db)
+        print(f"✓ Rollups calculados para {months} meses.")
+    finally:
+        db.close()
+
+    print("✓ Migración completada exitosamente.")
+
+
+if __name__ == "__main__":
+    run_migration()
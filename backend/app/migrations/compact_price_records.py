@@ -0,0 +1,67 @@
+"""
+Migración: Pasar los precios al formato compacto (tablas markets y price_hours).
+Fecha: 2026-10-16
+
+Requiere PRICE_LAYOUT=compact en la configuración. Mueve las filas de
+price_records (y de sus tablas mensuales en SQLite, si las hay) a
+price_hours, un mes por transacción: cada mes se escribe en price_hours y
+se borra del origen en la misma transacción, así que la migración se puede
+reanudar si se interrumpe. Los rollups y la matriz horaria no cambian.
+Funciona con SQL Server y SQLite usando la DATABASE_URL de la aplicación.
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pandas as pd
+from sqlalchemy import inspect, select, delete, func
+from app.db.database import engine
+from app.models import PriceRecord, Market, CompactPriceRecord
+from app.utils.bulk_loader import PRICE_COLUMNS, write_compact_prices
+from app.utils.compact_layout import compact_layout_enabled
+from app.utils.partitions import (
+    standard_source, months_between, next_month, partition_name, partition_table
+)
+
+
+def run_migration():
+    """Ejecuta la migración al formato compacto."""
+    if not compact_layout_enabled():
+        print("PRICE_LAYOUT no es 'compact'; configúrelo antes de migrar.")
+        return
+
+    for model in (Market, CompactPriceRecord):
+        if not inspect(engine).has_table(model.__tablename__):
+            print(f"Creando tabla '{model.__tablename__}'...")
+            model.__table__.create(bind=engine)
+            print(f"✓ Tabla '{model.__tablename__}' creada.")
+
+    with engine.connect() as conn:
+        source = standard_source(conn)
+        first, last = conn.execute(select(func.min(source.c.timestamp), func.max(source.c.timestamp))).one()
+    if first is None:
+        print("price_records no tiene filas que migrar.")
+        print("✓ Migración completada exitosamente.")
+        return
+
+    base = PriceRecord.__table__
+    for month in months_between(first, last):
+        end = next_month(month)
+        with engine.begin() as conn:
+            source = standard_source(conn, month, end)
+            rows = conn.execute(
+                select(*[source.c[c] for c in PRICE_COLUMNS])
+                .where(source.c.timestamp >= month, source.c.timestamp < end)
+            ).fetchall()
+            moved = write_compact_prices(conn, pd.DataFrame(rows, columns=PRICE_COLUMNS), 'upsert')
+            conn.execute(delete(base).where(base.c.timestamp >= month, base.c.timestamp < end))
+            if inspect(conn).has_table(partition_name(month)):
+                partition_table(month).drop(conn)
+        print(f"   ✅ {month:%Y-%m}: {moved:,} filas")
+
+    print("✓ Migración completada exitosamente.")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,135 @@
+"""
+Migración: Particionar price_records por mes.
+Fecha: 2026-10-16
+
+Requiere PRICE_PARTITIONING=True en la configuración.
+
+- SQL Server: crea la función pf_price_month (RANGE RIGHT, un límite por mes
+  desde el primer dato hasta unos meses por delante) y el esquema
+  ps_price_month, y reconstruye la tabla sobre él: índice clúster
+  (timestamp, node_id), clave primaria (id, timestamp) y el resto de índices
+  alineados con la partición.
+- SQLite: mueve las filas de price_records a las tablas mensuales
+  price_records_YYYYMM, un mes por transacción.
+"""
+import sys
+import os
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import inspect, text, select, insert, delete, func
+from app.core.config import settings
+from app.db.database import engine
+from app.models import PriceRecord
+from app.utils.partitions import (
+    PARTITION_FUNCTION, PARTITION_SCHEME, NATIVE_MONTHS_AHEAD,
+    month_start, next_month, months_between, ensure_partition, native_boundaries
+)
+
+CLUSTERED_INDEX = "cix_price_records_month"
+PRIMARY_KEY = "pk_price_records"
+
+
+def _month_range(conn):
+    """Meses (inicio) desde el primer dato hasta NATIVE_MONTHS_AHEAD por delante."""
+    first, last = conn.execute(
+        select(func.min(PriceRecord.timestamp), func.max(PriceRecord.timestamp))
+    ).one()
+    first = month_start(first) if first else month_start(datetime.utcnow())
+    last = last or first
+    for _ in range(NATIVE_MONTHS_AHEAD):
+        last = next_month(last)
+    return list(months_between(first, last))
+
+
+def migrate_mssql():
+    """Crea el particionado nativo y reconstruye price_records sobre él."""
+    with engine.begin() as conn:
+        if native_boundaries(conn):
+            print(f"La función de partición '{PARTITION_FUNCTION}' ya existe. No se requiere migración.")
+            return
+
+        months = _month_range(conn)
+        values = ", ".join(f"'{month:%Y-%m-%dT%H:%M:%S}'" for month in months)
+        print(f"Creando función de partición con {len(months)} límites mensuales...")
+        conn.execute(text(
+            f"CREATE PARTITION FUNCTION {PARTITION_FUNCTION} (datetime) AS RANGE RIGHT FOR VALUES ({values})"
+        ))
+        conn.execute(text(
+            f"CREATE PARTITION SCHEME {PARTITION_SCHEME} AS PARTITION {PARTITION_FUNCTION} ALL TO ([PRIMARY])"
+        ))
+
+        indexes = inspect(conn).get_indexes('price_records')
+        pk_name = conn.execute(text(
+            "SELECT name FROM sys.key_constraints "
+            "WHERE parent_object_id = OBJECT_ID('price_records') AND type = 'PK'"
+        )).scalar()
+
+        print("Reconstruyendo price_records sobre el esquema de partición...")
+        if pk_name:
+            conn.execute(text(f"ALTER TABLE price_records DROP CONSTRAINT {pk_name}"))
+        conn.execute(text(
+            f"CREATE CLUSTERED INDEX {CLUSTERED_INDEX} ON price_records (timestamp, node_id) "
+            f"ON {PARTITION_SCHEME}(timestamp)"
+        ))
+        conn.execute(text(
+            f"ALTER TABLE price_records ADD CONSTRAINT {PRIMARY_KEY} "
+            f"PRIMARY KEY NONCLUSTERED (id, timestamp) ON {PARTITION_SCHEME}(timestamp)"
+        ))
+
+        # Índices alineados: las operaciones por partición (TRUNCATE, SWITCH) lo exigen
+        for index in indexes:
+            if index['name'] in (CLUSTERED_INDEX, PRIMARY_KEY, pk_name):
+                continue
+            columns = ", ".join(index['column_names'])
+            unique = "UNIQUE " if index['unique'] else ""
+            conn.execute(text(
+                f"CREATE {unique}INDEX {index['name']} ON price_records ({columns}) "
+                f"WITH (DROP_EXISTING = ON) ON {PARTITION_SCHEME}(timestamp)"
+            ))
+            print(f"   ✅ {index['name']}")
+
+
+def migrate_sqlite():
+    """Mueve las filas de price_records a las tablas mensuales."""
+    with engine.connect() as conn:
+        first, last = conn.execute(
+            select(func.min(PriceRecord.timestamp), func.max(PriceRecord.timestamp))
+        ).one()
+    if first is None:
+        print("price_records no tiene filas que mover.")
+        return
+
+    base = PriceRecord.__table__
+    columns = [c.name for c in base.columns]
+    for month in months_between(first, last):
+        with engine.begin() as conn:
+            in_month = (base.c.timestamp >= month) & (base.c.timestamp < next_month(month))
+            partition = ensure_partition(conn, month)
+            moved = conn.execute(
+                insert(partition).from_select(columns, select(*base.columns).where(in_month))
+            ).rowcount
+            conn.execute(delete(base).where(in_month))
+        print(f"   ✅ {month:%Y-%m}: {moved:,} filas")
+
+
+def run_migration():
+    """Ejecuta la migración de particionado mensual."""
+    if not settings.PRICE_PARTITIONING:
+        print("PRICE_PARTITIONING está deshabilitado; habilítelo antes de particionar.")
+        return
+
+    if engine.dialect.name == 'mssql':
+        migrate_mssql()
+    elif engine.dialect.name == 'sqlite':
+        migrate_sqlite()
+    else:
+        print(f"Particionado no soportado para el dialecto '{engine.dialect.name}'.")
+        return
+
+    print("✓ Migración completada exitosamente.")
+
+
+if __name__ == "__main__":
+    run_migration()
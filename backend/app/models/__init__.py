@@ -1,3 +1,11 @@
-from app.models.models import User, Node, PriceRecord, UserRole, DataType
+from app.models.models import (
+    User, Node, PriceRecord, UserRole, DataType, Market, CompactPriceRecord,
+    PriceRollup, RollupGrain, HourMatrix, NodeLatestValue, PriceVersion,
+    IngestionManifest, IngestionStatus, QuarantineRecord, QuarantineReason
+)
 
-__all__ = ["User", "Node", "PriceRecord", "UserRole", "DataType"]
+__all__ = [
+    "User", "Node", "PriceRecord", "UserRole", "DataType", "Market", "CompactPriceRecord",
+    "PriceRollup", "RollupGrain", "HourMatrix", "NodeLatestValue", "PriceVersion",
+    "IngestionManifest", "IngestionStatus", "QuarantineRecord", "QuarantineReason"
+]
@@ -1,4 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Enum as SQLEnum, ForeignKey, Index
+from sqlalchemy import (
+    Column, Integer, SmallInteger, String, Float, DateTime, Boolean, LargeBinary,
+    Enum as SQLEnum, ForeignKey, Index, PrimaryKeyConstraint
+)
+from sqlalchemy.dialects import mssql
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -19,6 +23,31 @@ class DataType(str, enum.Enum):
     WIND_CAPTURE = "wind_capture"
     NEGATIVE_HOURS = "negative_hours"
 
+
+class IngestionStatus(str, enum.Enum):
+    """Status of a source file in the ingestion manifest."""
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class RollupGrain(str, enum.Enum):
+    """Time bucket size of a price rollup."""
+    DAY = "day"
+    MONTH = "month"
+
+
+class QuarantineReason(str, enum.Enum):
+    """Reason a source row was rejected during ingestion."""
+    UNKNOWN_NODE = "unknown_node"
+    BAD_TIMESTAMP = "bad_timestamp"
+    NON_NUMERIC = "non_numeric"
+    PRICE_OUT_OF_RANGE = "price_out_of_range"
+    DUPLICATE_HOUR = "duplicate_hour"
+    DST_DUPLICATE_HOUR = "dst_duplicate_hour"  # Repeated hour on the DST fall-back day
+    ARCHIVED_PERIOD = "archived_period"  # Year already moved to the Parquet archive
+
+
 class User(Base):
     """User model."""
     __tablename__ = "users"
@@ -50,9 +79,11 @@ class Node(Base):
     zone = Column(String(50))  # Optional zone/region
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Relationship with price records
+    # Relationship with price records (standard and compact layouts)
     price_records = relationship("PriceRecord", back_populates="node", cascade="all, delete-orphan")
+    compact_prices = relationship("CompactPriceRecord", back_populates="node", cascade="all, delete-orphan")
     
     # Index for geospatial queries
     __table_args__ = (
@@ -91,7 +122,173 @@ class PriceRecord(Base):
         Index('idx_price_node_timestamp', 'node_id', 'timestamp'),
         Index('idx_price_timestamp', 'timestamp'),
         Index('idx_price_market_timestamp', 'market', 'timestamp'),
+        # Clave natural: una fila por nodo, hora y mercado (permite upsert idempotente)
+        Index('uq_price_node_timestamp_market', 'node_id', 'timestamp', 'market', unique=True),
     )
     
     def __repr__(self):
         return f"<PriceRecord(node_id={self.node_id}, timestamp='{self.timestamp}', price={self.price})>"
+
+
+class Market(Base):
+    """Market lookup - referenced by a one-byte id from the compact price layout."""
+    __tablename__ = "markets"
+    
+    id = Column(SmallInteger().with_variant(mssql.TINYINT(), 'mssql'), primary_key=True, autoincrement=False)  # Assigned as max + 1
+    name = Column(String(50), unique=True, nullable=False)
+    
+    def __repr__(self):
+        return f"<Market(id={self.id}, name='{self.name}')>"
+
+
+class CompactPriceRecord(Base):
+    """Compact price record - same hourly data as PriceRecord without per-row overhead."""
+    __tablename__ = "price_hours"
+    
+    node_id = Column(Integer, ForeignKey("nodes.id"), nullable=False)
+    hour = Column(Integer, nullable=False)  # Hours since 1970-01-01 00:00
+    market_id = Column(SmallInteger().with_variant(mssql.TINYINT(), 'mssql'), ForeignKey("markets.id"), nullable=False)
+    
+    # Data fields
+    price = Column(Float)
+    solar_capture = Column(Float)
+    wind_capture = Column(Float)
+    negative_hours = Column(Float)
+    
+    # Relationship with node
+    node = relationship("Node", back_populates="compact_prices")
+    
+    __table_args__ = (
+        PrimaryKeyConstraint('node_id', 'hour', 'market_id', name='pk_price_hours', mssql_clustered=True),
+        Index('idx_price_hours_hour', 'hour'),
+        {'sqlite_with_rowid': False},  # Rows stored in primary key order, like a clustered index
+    )
+    
+    def __repr__(self):
+        return f"<CompactPriceRecord(node_id={self.node_id}, hour={self.hour}, market_id={self.market_id})>"
+
+
+class PriceRollup(Base):
+    """Price rollup - per node, market and data type aggregates for a day or month bucket."""
+    __tablename__ = "price_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    grain = Column(SQLEnum(RollupGrain), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)  # Midnight of the day / first day of the month
+    node_id = Column(Integer, ForeignKey("nodes.id"), nullable=False)
+    market = Column(String(50), nullable=False)
+    data_type = Column(SQLEnum(DataType), nullable=False)
+    
+    # Aggregates over the non-null hourly values of the bucket
+    value_sum = Column(Float, nullable=False)
+    value_count = Column(Integer, nullable=False)
+    value_min = Column(Float)
+    value_max = Column(Float)
+    negative_count = Column(Integer, nullable=False)  # Hours with a value below zero
+    
+    __table_args__ = (
+        Index('uq_rollup_bucket', 'grain', 'node_id', 'data_type', 'market', 'bucket_start', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<PriceRollup(grain='{self.grain}', node_id={self.node_id}, bucket_start='{self.bucket_start}')>"
+
+
+class HourMatrix(Base):
+    """Hour matrix - the values of every node for one market, hour and data type in a single row."""
+    __tablename__ = "hour_matrices"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    market = Column(String(50), nullable=False)
+    hour = Column(DateTime, nullable=False)  # Start of the hour
+    data_type = Column(SQLEnum(DataType), nullable=False)
+    
+    # Packed little-endian float64 vector indexed by node: slot i holds node id i + 1, NaN = no data
+    node_count = Column(Integer, nullable=False)
+    node_values = Column(LargeBinary, nullable=False)
+    
+    __table_args__ = (
+        Index('uq_hour_matrix_key', 'market', 'data_type', 'hour', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<HourMatrix(market='{self.market}', hour='{self.hour}', data_type='{self.data_type}')>"
+
+
+class NodeLatestValue(Base):
+    """Latest value - the most recent non-null value of a node for one market and data type."""
+    __tablename__ = "node_latest_values"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    node_id = Column(Integer, ForeignKey("nodes.id"), nullable=False)
+    market = Column(String(50), nullable=False)
+    data_type = Column(SQLEnum(DataType), nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    value = Column(Float, nullable=False)
+    
+    __table_args__ = (
+        Index('uq_node_latest_key', 'node_id', 'market', 'data_type', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<NodeLatestValue(node_id={self.node_id}, market='{self.market}', data_type='{self.data_type}')>"
+
+
+class PriceVersion(Base):
+    """Price data version - one row per committed price write; the highest id is the current version."""
+    __tablename__ = "price_versions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<PriceVersion(id={self.id})>"
+
+
+class IngestionManifest(Base):
+    """Ingestion manifest - one row per source file loaded into price_records."""
+    __tablename__ = "ingestion_manifest"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    file_path = Column(String(450), unique=True, nullable=False)
+    content_hash = Column(String(64), nullable=False)  # SHA-256 of the file contents
+    
+    # Source data rows covered by this load: [row_start, row_end)
+    # row_end is the checkpoint: every row before it is committed
+    row_start = Column(Integer, default=0, nullable=False)
+    row_end = Column(Integer, default=0, nullable=False)
+    rows_loaded = Column(Integer, default=0, nullable=False)
+    
+    status = Column(SQLEnum(IngestionStatus), default=IngestionStatus.IN_PROGRESS, nullable=False)
+    error = Column(String(1000))
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<IngestionManifest(file_path='{self.file_path}', status='{self.status}', row_end={self.row_end})>"
+
+
+class QuarantineRecord(Base):
+    """Quarantined source row - rejected by ingestion validation, kept for review."""
+    __tablename__ = "quarantine_records"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    source_file = Column(String(450), nullable=False)  # Same key as ingestion_manifest.file_path
+    source_row = Column(Integer)  # Row number in the source file (1 = header)
+    reason = Column(SQLEnum(QuarantineReason), nullable=False)
+    
+    # Raw values as read from the file
+    node_code = Column(String(100))
+    node_id = Column(Integer)
+    timestamp = Column(String(50))
+    value = Column(String(100))
+    market = Column(String(50))
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_quarantine_source_reason', 'source_file', 'reason'),
+    )
+    
+    def __repr__(self):
+        return f"<QuarantineRecord(source_row={self.source_row}, reason='{self.reason}')>"
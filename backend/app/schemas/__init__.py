@@ -1,25 +1,25 @@
 from app.schemas.schemas import (
-    UserRole, DataType, AggregationType,
+    UserRole, DataType, ComparisonAxis, EvolutionInterval, DistributionMode, AggregationType,
     UserBase, UserCreate, UserUpdate, UserResponse,
     Token, TokenData, LoginRequest,
     NodeBase, NodeCreate, NodeUpdate, NodeResponse, NodeWithLatestPrice,
     PriceRecordBase, PriceRecordCreate, PriceRecordResponse, PriceRecordWithNode,
-    TimeSeriesData, NodePriceEvolution, YearlyComparison, NodeYearlyComparison,
-    MonthlyComparison, NodeMonthlyComparison,
-    PriceDistribution, NodePricePoint, AllNodesPriceDistribution, CongestionData,
-    AggregatedStats, PriceQueryFilters, AvailableYears,
+    TimeSeriesData, NodePriceEvolution, EvolutionSeries, BatchEvolution, YearlyComparison, NodeYearlyComparison,
+    MonthlyComparison, NodeMonthlyComparison, CalendarPoint, CalendarSeries, CalendarComparison,
+    PriceDistribution, NodePricePoint, AllNodesPriceDistribution, CongestionData, CongestionSummary, SpreadMatrix,
+    StatsHour, AggregatedStats, NodeStats, PriceQueryFilters, AvailableYears,
     PaginatedResponse, ExportRequest
 )
 
 __all__ = [
-    "UserRole", "DataType", "AggregationType",
+    "UserRole", "DataType", "ComparisonAxis", "EvolutionInterval", "DistributionMode", "AggregationType",
     "UserBase", "UserCreate", "UserUpdate", "UserResponse",
     "Token", "TokenData", "LoginRequest",
     "NodeBase", "NodeCreate", "NodeUpdate", "NodeResponse", "NodeWithLatestPrice",
     "PriceRecordBase", "PriceRecordCreate", "PriceRecordResponse", "PriceRecordWithNode",
-    "TimeSeriesData", "NodePriceEvolution", "YearlyComparison", "NodeYearlyComparison",
-    "MonthlyComparison", "NodeMonthlyComparison",
-    "PriceDistribution", "NodePricePoint", "AllNodesPriceDistribution", "CongestionData",
-    "AggregatedStats", "PriceQueryFilters", "AvailableYears",
+    "TimeSeriesData", "NodePriceEvolution", "EvolutionSeries", "BatchEvolution", "YearlyComparison", "NodeYearlyComparison",
+    "MonthlyComparison", "NodeMonthlyComparison", "CalendarPoint", "CalendarSeries", "CalendarComparison",
+    "PriceDistribution", "NodePricePoint", "AllNodesPriceDistribution", "CongestionData", "CongestionSummary", "SpreadMatrix",
+    "StatsHour", "AggregatedStats", "NodeStats", "PriceQueryFilters", "AvailableYears",
     "PaginatedResponse", "ExportRequest"
 ]
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, validator
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
 from enum import Enum
 
 
@@ -17,6 +17,29 @@ class DataType(str, Enum):
     SOLAR_CAPTURE = "solar_capture"
     WIND_CAPTURE = "wind_capture"
     NEGATIVE_HOURS = "negative_hours"
+    NODES = "nodes"  # Voronoi map only: node cells without values
+
+
+class ComparisonAxis(str, Enum):
+    """Calendar axis for same day/hour comparisons."""
+    MONTH = "month"
+    YEAR = "year"
+    WEEKDAY = "weekday"
+
+
+class EvolutionInterval(str, Enum):
+    """Bucket sizes for resampled time series (weeks start on Monday)."""
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class DistributionMode(str, Enum):
+    """Shapes of the price distribution response."""
+    RAW = "raw"  # Every hourly value
+    DURATION = "duration"  # Duration curve at evenly spaced exceedance levels
+    HISTOGRAM = "histogram"  # Fixed-width bins
 
 
 class AggregationType(str, Enum):
@@ -155,6 +178,10 @@ class TimeSeriesData(BaseModel):
     """Time series data point."""
     timestamp: datetime
     value: float
+    # Resampled series: the point is a bucket starting at timestamp, value is its average
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    count: Optional[int] = None
 
 
 class NodePriceEvolution(BaseModel):
@@ -165,6 +192,26 @@ class NodePriceEvolution(BaseModel):
     data: List[TimeSeriesData]
 
 
+class EvolutionSeries(BaseModel):
+    """One node and data type of a batch evolution, aligned to the shared timestamp axis."""
+    node_id: int
+    node_code: str
+    node_name: str
+    data_type: DataType
+    values: List[Optional[float]]  # None where the series has no point
+    min_values: Optional[List[Optional[float]]] = None  # Bucket envelope (with an interval)
+    max_values: Optional[List[Optional[float]]] = None
+
+
+class BatchEvolution(BaseModel):
+    """Evolution of several nodes and data types on a shared timestamp axis."""
+    start_date: datetime
+    end_date: datetime
+    interval: Optional[EvolutionInterval] = None
+    timestamps: List[datetime]
+    series: List[EvolutionSeries]
+
+
 class YearlyComparison(BaseModel):
     """Price data for a specific year."""
     year: int
@@ -199,6 +246,33 @@ class NodeMonthlyComparison(BaseModel):
     data: List[MonthlyComparison]
 
 
+class CalendarPoint(BaseModel):
+    """Average value for one point of the comparison axis."""
+    key: int  # Month (1-12), year or weekday (0 = Monday)
+    value: Optional[float]
+
+
+class CalendarSeries(BaseModel):
+    """Calendar comparison of one node and data type."""
+    node_id: int
+    node_code: str
+    node_name: str
+    data_type: DataType
+    data: List[CalendarPoint]
+
+
+class CalendarComparison(BaseModel):
+    """Same day/hour comparison across months, years or weekdays for several nodes."""
+    axis: ComparisonAxis
+    hour: int
+    year: Optional[int] = None
+    month: Optional[int] = None
+    day: Optional[int] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    series: List[CalendarSeries]
+
+
 class NodePricePoint(BaseModel):
     """Single node price point."""
     node_id: int
@@ -211,7 +285,12 @@ class PriceDistribution(BaseModel):
     """Price distribution data."""
     node_id: int
     node_code: str
-    prices: List[float]  # Sorted from highest to lowest
+    prices: List[float] = []  # Sorted from highest to lowest (raw values or duration curve)
+    mode: DistributionMode = DistributionMode.RAW
+    count: Optional[int] = None  # Hours with a value in the range
+    exceedance: Optional[List[float]] = None  # Duration mode: % of hours at or above each price
+    bin_edges: Optional[List[float]] = None  # Histogram mode: one more edge than bins
+    bin_counts: Optional[List[int]] = None
 
 
 class AllNodesPriceDistribution(BaseModel):
@@ -229,7 +308,50 @@ class CongestionData(BaseModel):
     timestamp: datetime
     node1_price: Optional[float]
     node2_price: Optional[float]
-    congestion_price: Optional[float]
+    spread: Optional[float] = None  # node1_price - node2_price
+    congestion_price: Optional[float]  # Absolute spread
+
+
+class CongestionSummary(BaseModel):
+    """Summary statistics of the spread between two nodes over a date range."""
+    node1_id: int
+    node2_id: int
+    node1_code: str
+    node2_code: str
+    start_date: datetime
+    end_date: datetime
+    hours: int = 0  # Matching hours with a price at both nodes
+    threshold: float = 0.0
+    hours_above_threshold: int = 0  # Hours with an absolute spread above the threshold
+    share_above_threshold: Optional[float] = None
+    mean_spread: Optional[float] = None
+    std_spread: Optional[float] = None
+    min_spread: Optional[float] = None
+    max_spread: Optional[float] = None
+    mean_abs_spread: Optional[float] = None
+    max_abs_spread: Optional[float] = None
+    abs_spread_percentiles: Dict[str, float] = {}  # p50, p90, p95, p99
+
+
+class SpreadMatrix(BaseModel):
+    """All-pairs spread matrix: cell [i][j] describes node_ids[i] price - node_ids[j] price."""
+    start_date: datetime
+    end_date: datetime
+    market: Optional[str] = None
+    percentile: float
+    node_ids: List[int]
+    node_codes: List[str]
+    hours: List[List[int]]  # Matching hours with a price at both nodes
+    mean_spread: List[List[Optional[float]]]
+    mean_abs_spread: List[List[Optional[float]]]
+    max_abs_spread: List[List[Optional[float]]]
+    percentile_abs_spread: List[List[Optional[float]]]
+
+
+class StatsHour(BaseModel):
+    """One of the highest-value hours of a node."""
+    timestamp: datetime
+    value: float
 
 
 class AggregatedStats(BaseModel):
@@ -238,6 +360,18 @@ class AggregatedStats(BaseModel):
     max: Optional[float] = None
     min: Optional[float] = None
     count: int
+    negative_count: Optional[int] = None
+    negative_share: Optional[float] = None
+    # Detailed statistics only
+    std: Optional[float] = None
+    percentiles: Dict[str, float] = {}  # Keys like "p10", "p99.9"
+    top_hours: List[StatsHour] = []
+
+
+class NodeStats(AggregatedStats):
+    """Aggregated statistics of one node in a batch."""
+    node_id: int
+    node_code: str
 
 
 # Filter Schemas
@@ -0,0 +1,1045 @@
+"""
+Motor analítico enchufable para las consultas de lectura de precios.
+
+Las consultas de barrido de prices.py (distribución, estadísticas,
+comparaciones por hora y congestión) se resuelven a través de
+get_analytics(), que según ANALYTICS_BACKEND devuelve:
+
+- "sql": consultas contra la base principal (price_records y rollups).
+- "duckdb": una copia columnar de price_records en un archivo DuckDB local.
+- "parquet": una copia en archivos Parquet particionados por mercado y mes
+  (market=.../month=YYYY-MM/data.parquet), consultados con DuckDB. Cada
+  bloque de la ingesta se añade a su partición como un archivo delta-*.parquet
+  (sin reescribir el mes); las lecturas combinan los deltas con data.parquet
+  y `compact` los funde en data.parquet.
+
+Los tres implementan las mismas consultas lógicas y devuelven lo mismo.
+DuckDB ejecuta en local, vectorizado y en varios núcleos, sin servicios
+externos; es una dependencia opcional (pip install duckdb) que solo se
+importa al usar "duckdb" o "parquet".
+
+La copia se mantiene al día desde la ingesta: write_prices encola cada
+bloque en la conexión (queue_sync) y el bloque se aplica a la copia cuando
+la transacción de la base principal ya está confirmada (commit_hooks); si se
+revierte, se descarta. Los borrados de la base (drop-before de particiones,
+baja de un nodo) se aplican igual con queue_delete. Si un bloque o un
+borrado no se puede aplicar, la copia queda marcada como desactualizada y
+las consultas se resuelven en la base principal hasta reconstruirla. También
+se resuelven allí las consultas que encuentran el archivo DuckDB bloqueado
+por otro proceso.
+
+Para crear o reconstruir la copia completa:
+    python -m app.utils.analytics sync
+Para fundir los deltas de la copia Parquet:
+    python -m app.utils.analytics compact
+"""
+import glob
+import itertools
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, extract, and_, or_
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import DataType
+from app.utils.partitions import price_source, month_start, next_month
+from app.utils.rollups import range_stats
+from app.utils.archive import archived_years, read_archive, archive_rows
+from app.utils.commit_hooks import after_commit, on_commit
+from app.utils.parquet_store import BACKEND_DIR
+from app.utils.resampling import SERIES_COLUMNS, bucket_frame, raw_frame, series_frames
+from app.utils.statistics import frame_stats, percentile_key, clean
+from app.utils.distribution import duration_quantiles, auto_bin_count, bin_edges, histogram as value_histogram
+
+
+ANALYTICS_BACKENDS = ('sql', 'duckdb', 'parquet')
+
+# Columnas de la copia analítica
+ANALYTICS_COLUMNS = [
+    'node_id', 'timestamp', 'market', 'price', 'solar_capture', 'wind_capture', 'negative_hours'
+]
+VALUE_COLUMNS = ['price', 'solar_capture', 'wind_capture', 'negative_hours']
+ANALYTICS_KEY = ['node_id', 'timestamp', 'market']
+
+# Columnas de pair_prices
+PAIR_COLUMNS = ['timestamp', 'price1', 'price2']
+
+# Tipo de dato -> columna
+DATA_COLUMNS = {
+    DataType.PRICE: 'price',
+    DataType.SOLAR_CAPTURE: 'solar_capture',
+    DataType.WIND_CAPTURE: 'wind_capture',
+    DataType.NEGATIVE_HOURS: 'negative_hours',
+}
+
+# Claves de commit_hooks con los bloques y los borrados pendientes de la transacción
+_PENDING_KEY = 'analytics_pending'
+_DELETE_KEY = 'analytics_delete'
+
+# Columnas de la relación 'prices' de la copia Parquet (market y month salen de la ruta)
+PARQUET_VIEW_COLUMNS = ['node_id', 'timestamp', 'market', 'month'] + VALUE_COLUMNS
+
+# Máximo de horas sueltas que se piden como rangos en una consulta SQL
+MAX_HOUR_RANGES = 64
+
+# Reintentos al abrir el archivo DuckDB mientras otro proceso lo tiene bloqueado
+# (las lecturas esperan menos: pueden resolverse en la base principal)
+_LOCK_RETRIES = 20
+_READ_LOCK_RETRIES = 4
+_LOCK_WAIT_SECONDS = 0.25
+
+
+class AnalyticsUnavailable(RuntimeError):
+    """El archivo DuckDB sigue bloqueado por otro proceso tras los reintentos."""
+
+
+def _resolve(path: str) -> str:
+    """Las rutas relativas parten de backend/."""
+    return path if os.path.isabs(path) else os.path.join(BACKEND_DIR, path)
+
+
+def _import_duckdb():
+    """Importa duckdb con un mensaje claro si no está instalado."""
+    try:
+        import duckdb
+    except ImportError as exc:
+        raise RuntimeError(
+            f"ANALYTICS_BACKEND='{settings.ANALYTICS_BACKEND}' requiere el paquete duckdb "
+            "(pip install duckdb)"
+        ) from exc
+    return duckdb
+
+
+# ---------------------------------------------------------------------------
+# Motor SQL (base principal)
+# ---------------------------------------------------------------------------
+
+class SqlAnalytics:
+    """Consultas analíticas contra la base principal."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def time_bounds(self) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """Primer y último timestamp con datos (archivo histórico incluido)."""
+        table = price_source(self.db)
+        first, last = self.db.execute(select(func.min(table.c.timestamp), func.max(table.c.timestamp))).one()
+        years = archived_years()
+        if years:
+            first = datetime(years[0], 1, 1)
+            last = last or datetime(years[-1], 12, 31, 23)
+        return first, last
+
+    def values(self, node_id: int, start: datetime, end: datetime, data_type: DataType) -> List[float]:
+        """Valores no nulos de un nodo en [start, end], de mayor a menor."""
+        table = price_source(self.db, start, end)
+        field = table.c[DATA_COLUMNS[DataType(data_type)]]
+        rows = (
+            self.db.query(field)
+            .filter(
+                and_(
+                    table.c.node_id == node_id,
+                    table.c.timestamp >= start,
+                    table.c.timestamp <= end,
+                    field.isnot(None)
+                )
+            )
+            .order_by(field.desc())
+            .all()
+        )
+        values = [row[0] for row in rows]
+        archived = read_archive(start, end, [field.name], node_ids=[node_id])[field.name].dropna()
+        if archived.empty:
+            return values
+        return sorted(archived.tolist() + values, reverse=True)
+
+    def _value_array(self, node_id: int, start: datetime, end: datetime, data_type: DataType) -> np.ndarray:
+        """Valores no nulos de un nodo en [start, end], sin ordenar."""
+        table = price_source(self.db, start, end)
+        field = table.c[DATA_COLUMNS[DataType(data_type)]]
+        rows = self.db.execute(
+            select(field).where(
+                table.c.node_id == node_id,
+                table.c.timestamp >= start,
+                table.c.timestamp <= end,
+                field.isnot(None)
+            )
+        ).fetchall()
+        archived = read_archive(start, end, [field.name], node_ids=[node_id])[field.name].dropna()
+        return np.concatenate([archived.to_numpy(dtype=float), np.array([row[0] for row in rows], dtype=float)])
+
+    def duration_curve(self, node_id: int, start: datetime, end: datetime, data_type: DataType,
+                       points: int) -> Tuple[int, List[float]]:
+        """
+        Curva de duración de un nodo en [start, end] con points niveles de
+        excedencia (ver distribution), por selección de cuantiles.
+
+        Returns:
+            (horas con valor, valores de mayor a menor)
+        """
+        values = self._value_array(node_id, start, end, data_type)
+        if values.size == 0:
+            return 0, []
+        return int(values.size), np.quantile(values, duration_quantiles(points)).tolist()
+
+    def histogram(self, node_id: int, start: datetime, end: datetime, data_type: DataType,
+                  bins: Optional[int] = None) -> Tuple[int, List[float], List[int]]:
+        """
+        Histograma de un nodo en [start, end] con bins de ancho fijo (None =
+        automáticos).
+
+        Returns:
+            (horas con valor, bordes, conteos por bin)
+        """
+        values = self._value_array(node_id, start, end, data_type)
+        edges, counts = value_histogram(values, bins)
+        return int(values.size), edges, counts
+
+    def stats(self, node_ids: List[int], start: datetime, end: datetime, data_type: DataType,
+              market: Optional[str] = None) -> Dict[int, Dict]:
+        """Estadísticas por nodo en [start, end] (ver rollups.range_stats)."""
+        return range_stats(self.db, node_ids, start, end, data_type, market)
+
+    def detailed_stats(self, node_ids: List[int], start: datetime, end: datetime, data_type: DataType,
+                       percentiles: List[float], top_n: int = 0) -> Dict[int, Dict]:
+        """
+        Estadísticas detalladas por nodo en [start, end] (ver
+        statistics.value_stats) con una lectura por índice de los valores
+        horarios de todos los nodos.
+        """
+        column = DATA_COLUMNS[DataType(data_type)]
+        return frame_stats(self.rows(node_ids, start, end, [column]), column, percentiles, top_n)
+
+    def hour_sums(self, node_ids: List[int], hours: List[datetime], data_types: List[DataType]) -> pd.DataFrame:
+        """
+        Suma y conteo de valores no nulos por nodo en cada hora [h, h + 1)
+        indicada, para varios tipos de dato, en una consulta (ver sum_by_hour).
+        """
+        columns = [DATA_COLUMNS[DataType(data_type)] for data_type in data_types]
+        if not node_ids or not hours:
+            return sum_by_hour(_empty_rows(columns), hours, columns)
+        first, last = min(hours), max(hours) + timedelta(hours=1)
+        table = price_source(self.db, first, last)
+        query = select(table.c.node_id, table.c.timestamp, *[table.c[c] for c in columns]).where(
+            table.c.node_id.in_(node_ids),
+            table.c.timestamp >= first,
+            table.c.timestamp < last,
+        )
+        if len(hours) <= MAX_HOUR_RANGES:
+            query = query.where(or_(*[
+                and_(table.c.timestamp >= hour, table.c.timestamp < hour + timedelta(hours=1))
+                for hour in hours
+            ]))
+        else:
+            # Demasiadas horas para enumerarlas: se filtra por hora del día y el resto en memoria
+            query = query.where(extract('hour', table.c.timestamp).in_(sorted({hour.hour for hour in hours})))
+        frames = [
+            read_archive(first, last, ['node_id', 'timestamp'] + columns, node_ids=node_ids),
+            pd.DataFrame(self.db.execute(query).fetchall(), columns=['node_id', 'timestamp'] + columns),
+        ]
+        frames = [frame for frame in frames if not frame.empty]
+        rows = pd.concat(frames, ignore_index=True) if frames else _empty_rows(columns)
+        return sum_by_hour(rows, hours, columns)
+
+    def rows(self, node_ids: Optional[List[int]], start: datetime, end: datetime, columns: List[str],
+             market: Optional[str] = None) -> pd.DataFrame:
+        """
+        Filas horarias (node_id, timestamp, columnas...) en [start, end] de
+        unos nodos o, con node_ids=None, de todos; sin orden garantizado.
+        """
+        table = price_source(self.db, start, end)
+        query = select(table.c.node_id, table.c.timestamp, *[table.c[c] for c in columns]).where(
+            table.c.timestamp >= start,
+            table.c.timestamp <= end,
+        )
+        if node_ids is not None:
+            query = query.where(table.c.node_id.in_(node_ids))
+        if market:
+            query = query.where(table.c.market == market)
+        frames = [
+            read_archive(start, end, ['node_id', 'timestamp'] + columns, node_ids=node_ids, market=market),
+            pd.DataFrame(self.db.execute(query).fetchall(), columns=['node_id', 'timestamp'] + columns),
+        ]
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else _empty_rows(columns)
+
+    def series(self, node_ids: List[int], start: datetime, end: datetime, data_type: DataType,
+               interval: Optional[str] = None) -> pd.DataFrame:
+        """
+        Serie de cada nodo en [start, end]: filas horarias (interval=None) o
+        buckets con promedio y envolvente (ver resampling).
+
+        Returns:
+            DataFrame con SERIES_COLUMNS, ordenado por nodo y tiempo
+        """
+        column = DATA_COLUMNS[DataType(data_type)]
+        rows = self.rows(node_ids, start, end, [column])
+        return bucket_frame(rows, column, interval) if interval else raw_frame(rows, column)
+
+    def multi_series(self, node_ids: List[int], start: datetime, end: datetime, data_types: List[DataType],
+                     interval: Optional[str] = None) -> Dict[DataType, pd.DataFrame]:
+        """
+        Series de varios tipos de dato de unos nodos en [start, end] con una
+        sola lectura por índice (nodo, timestamp) de todas sus columnas.
+
+        Returns:
+            {tipo de dato: DataFrame con SERIES_COLUMNS, ordenado por nodo y tiempo}
+        """
+        columns = {DataType(data_type): DATA_COLUMNS[DataType(data_type)] for data_type in data_types}
+        frames = series_frames(self.rows(node_ids, start, end, list(dict.fromkeys(columns.values()))),
+                               list(columns.values()), interval)
+        return {data_type: frames[column] for data_type, column in columns.items()}
+
+    def pair_prices(self, node1_id: int, node2_id: int, start: datetime, end: datetime) -> pd.DataFrame:
+        """
+        Precios de dos nodos en los timestamps comunes de [start, end],
+        ordenados por tiempo: una lectura por índice (nodo, timestamp) de los
+        dos nodos, más las filas archivadas del rango, alineadas con align_pairs.
+
+        Returns:
+            DataFrame con timestamp, price1 y price2 (nulos si la fila no tiene precio)
+        """
+        table = price_source(self.db, start, end)
+        query = select(table.c.node_id, table.c.timestamp, table.c.price).where(
+            table.c.node_id.in_([node1_id, node2_id]),
+            table.c.timestamp >= start,
+            table.c.timestamp <= end,
+        )
+        rows = pd.DataFrame(self.db.execute(query).fetchall(), columns=['node_id', 'timestamp', 'price'])
+        archived = read_archive(start, end, ['node_id', 'timestamp', 'price'], node_ids=[node1_id, node2_id])
+        if not archived.empty:
+            rows = pd.concat([archived, rows], ignore_index=True)
+        return align_pairs(rows, node1_id, node2_id)
+
+
+def align_pairs(rows: pd.DataFrame, node1_id: int, node2_id: int) -> pd.DataFrame:
+    """
+    Alinea por timestamp las filas (node_id, timestamp, price) de dos nodos.
+    Un nodo con filas en varios mercados aporta una sola por timestamp (la última).
+
+    Returns:
+        DataFrame con timestamp, price1 y price2, ordenado por tiempo
+    """
+    rows = rows.assign(timestamp=pd.to_datetime(rows['timestamp']),
+                       price=pd.to_numeric(rows['price'], errors='coerce'))
+    first, second = (
+        rows[rows['node_id'] == node_id].drop_duplicates(subset='timestamp', keep='last')[['timestamp', 'price']]
+        for node_id in (node1_id, node2_id)
+    )
+    pairs = pd.merge(first, second, on='timestamp', suffixes=('1', '2'))
+    return pairs.sort_values('timestamp', ignore_index=True)[PAIR_COLUMNS]
+
+
+def _empty_rows(columns: List[str]) -> pd.DataFrame:
+    """DataFrame vacío con las columnas de filas horarias."""
+    return pd.DataFrame(columns=['node_id', 'timestamp'] + columns)
+
+
+def sum_by_hour(rows: pd.DataFrame, hours: List[datetime], columns: List[str]) -> pd.DataFrame:
+    """
+    Agrega filas (node_id, timestamp, columnas...) por nodo y hora de inicio,
+    descartando las horas que no están en hours.
+
+    Returns:
+        DataFrame con node_id, hour y {columna}_sum / {columna}_count
+    """
+    rows = rows.assign(hour=pd.to_datetime(rows['timestamp']).dt.floor('h'))
+    rows = rows[rows['hour'].isin(pd.DatetimeIndex(hours))]
+    aggregations = {}
+    for column in columns:
+        values = pd.to_numeric(rows[column], errors='coerce')
+        rows = rows.assign(**{column: values})
+        aggregations[f"{column}_sum"] = (column, 'sum')
+        aggregations[f"{column}_count"] = (column, 'count')
+    if rows.empty:
+        return pd.DataFrame(columns=['node_id', 'hour'] + list(aggregations))
+    return rows.groupby(['node_id', 'hour'], as_index=False).agg(**aggregations)
+
+
+# ---------------------------------------------------------------------------
+# Motor DuckDB (archivo DuckDB o Parquet particionado)
+# ---------------------------------------------------------------------------
+
+class DuckDBAnalytics:
+    """Consultas analíticas sobre la copia columnar, ejecutadas con DuckDB."""
+
+    def __init__(self, backend: str):
+        self.backend = backend
+
+    # -- conexión ----------------------------------------------------------
+
+    def _connect(self, read_only: bool = True):
+        """
+        Conexión DuckDB con la relación 'prices'. El archivo DuckDB admite un
+        solo proceso escritor: se reintenta mientras otro lo tenga bloqueado
+        y, si sigue bloqueado, se lanza AnalyticsUnavailable.
+        """
+        duckdb = _import_duckdb()
+        if self.backend == 'parquet':
+            conn = duckdb.connect()
+            conn.execute(f"CREATE VIEW prices AS {_parquet_relation(_parquet_partitions())}")
+            return conn
+
+        path = _resolve(settings.ANALYTICS_DUCKDB_PATH)
+        if read_only and not os.path.exists(path):
+            read_only = False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        retries = _READ_LOCK_RETRIES if read_only else _LOCK_RETRIES
+        for attempt in range(retries):
+            try:
+                conn = duckdb.connect(path, read_only=read_only)
+                break
+            except duckdb.IOException as exc:
+                if attempt == retries - 1:
+                    raise AnalyticsUnavailable(f"Copia analítica bloqueada por otro proceso: {exc}") from exc
+                time.sleep(_LOCK_WAIT_SECONDS)
+        if not read_only:
+            conn.execute(_create_table_sql('prices'))
+        return conn
+
+    def _query(self, sql: str, params: list) -> list:
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _frame(self, sql: str, params: list) -> pd.DataFrame:
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).df()
+        finally:
+            conn.close()
+
+    def _range(self, start: Optional[datetime], end: Optional[datetime], alias: str = '') -> Tuple[str, list]:
+        """Filtro de rango [start, end]; en Parquet añade la poda por partición de mes."""
+        prefix = f"{alias}." if alias else ''
+        clauses, params = [], []
+        if start is not None:
+            clauses.append(f"{prefix}timestamp >= ?")
+            params.append(start)
+            if self.backend == 'parquet':
+                clauses.append(f"{prefix}month >= ?")
+                params.append(f"{start:%Y-%m}")
+        if end is not None:
+            clauses.append(f"{prefix}timestamp <= ?")
+            params.append(end)
+            if self.backend == 'parquet':
+                clauses.append(f"{prefix}month <= ?")
+                params.append(f"{end:%Y-%m}")
+        return (' AND '.join(clauses) or 'true'), params
+
+    # -- consultas ---------------------------------------------------------
+
+    def time_bounds(self) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """Primer y último timestamp con datos."""
+        first, last = self._query("SELECT MIN(timestamp), MAX(timestamp) FROM prices", [])[0]
+        return first, last
+
+    def values(self, node_id: int, start: datetime, end: datetime, data_type: DataType) -> List[float]:
+        """Valores no nulos de un nodo en [start, end], de mayor a menor."""
+        column = DATA_COLUMNS[DataType(data_type)]
+        where, params = self._range(start, end)
+        rows = self._query(
+            f"SELECT {column} FROM prices WHERE node_id = ? AND {where} AND {column} IS NOT NULL "
+            f"ORDER BY {column} DESC",
+            [node_id] + params
+        )
+        return [row[0] for row in rows]
+
+    def duration_curve(self, node_id: int, start: datetime, end: datetime, data_type: DataType,
+                       points: int) -> Tuple[int, List[float]]:
+        """Curva de duración de un nodo en [start, end]: (horas con valor, valores de mayor a menor)."""
+        column = DATA_COLUMNS[DataType(data_type)]
+        where, params = self._range(start, end)
+        count, values = self._query(
+            f"SELECT COUNT({column}), quantile_cont({column}, ?::DOUBLE[]) FROM prices "
+            f"WHERE node_id = ? AND {where} AND {column} IS NOT NULL",
+            [duration_quantiles(points), node_id] + params
+        )[0]
+        return (count, list(values)) if count else (0, [])
+
+    def histogram(self, node_id: int, start: datetime, end: datetime, data_type: DataType,
+                  bins: Optional[int] = None) -> Tuple[int, List[float], List[int]]:
+        """Histograma de un nodo en [start, end]: (horas con valor, bordes, conteos por bin)."""
+        column = DATA_COLUMNS[DataType(data_type)]
+        where, params = self._range(start, end)
+        filters = f"WHERE node_id = ? AND {where} AND {column} IS NOT NULL"
+        count, low, high, quartiles = self._query(
+            f"SELECT COUNT({column}), MIN({column}), MAX({column}), quantile_cont({column}, [0.25, 0.75]) "
+            f"FROM prices {filters}",
+            [node_id] + params
+        )[0]
+        if not count:
+            return 0, [], []
+        if bins is None:
+            bins = auto_bin_count(count, low, high, *quartiles)
+        edges = bin_edges(low, high, bins)
+        first, norm = float(edges[0]), bins / float(edges[-1] - edges[0])
+        counts = [0] * bins
+        # Bin estimado como en np.histogram y corregido contra los bordes (listas desde 1)
+        rows = self._query(
+            f"WITH estimated AS (SELECT {column} AS value, "
+            f"LEAST(CAST(FLOOR(({column} - ?) * ?) AS INTEGER), ?) AS bin FROM prices {filters}) "
+            "SELECT CASE WHEN value < (?::DOUBLE[])[bin + 1] THEN bin - 1 "
+            "WHEN bin < ? AND value >= (?::DOUBLE[])[bin + 2] THEN bin + 1 ELSE bin END AS bin, COUNT(*) "
+            "FROM estimated GROUP BY 1",
+            [first, norm, bins - 1, node_id] + params + [edges.tolist(), bins - 1, edges.tolist()]
+        )
+        for index, hours in rows:
+            counts[index] += hours
+        return count, edges.tolist(), counts
+
+    def stats(self, node_ids: List[int], start: datetime, end: datetime, data_type: DataType,
+              market: Optional[str] = None) -> Dict[int, Dict]:
+        """Estadísticas por nodo en [start, end] (mismo formato que rollups.range_stats)."""
+        if not node_ids:
+            return {}
+        column = DATA_COLUMNS[DataType(data_type)]
+        where, params = self._range(start, end)
+        if market:
+            where += " AND market = ?"
+            params.append(market)
+        placeholders = ', '.join('?' for _ in node_ids)
+        rows = self._query(
+            f"SELECT node_id, SUM({column}), COUNT({column}), MIN({column}), MAX({column}), "
+            f"COUNT(*) FILTER (WHERE {column} < 0) "
+            f"FROM prices WHERE node_id IN ({placeholders}) AND {where} AND {column} IS NOT NULL "
+            f"GROUP BY node_id",
+            list(node_ids) + params
+        )
+        return {
+            int(node_id): {
+                'sum': float(total), 'count': int(count), 'avg': float(total) / count,
+                'min': value_min, 'max': value_max, 'negative_count': int(negative),
+            }
+            for node_id, total, count, value_min, value_max, negative in rows if count
+        }
+
+    def detailed_stats(self, node_ids: List[int], start: datetime, end: datetime, data_type: DataType,
+                       percentiles: List[float], top_n: int = 0) -> Dict[int, Dict]:
+        """
+        Estadísticas detalladas por nodo en [start, end]: una agregación con
+        quantile_cont y, con top_n, una consulta con ROW_NUMBER por nodo.
+        """
+        if not node_ids:
+            return {}
+        column = DATA_COLUMNS[DataType(data_type)]
+        where, params = self._range(start, end)
+        filters = f"WHERE node_id IN ({', '.join('?' for _ in node_ids)}) AND {where} AND {column} IS NOT NULL"
+        quantiles = [percentile / 100.0 for percentile in percentiles]
+        rows = self._query(
+            f"SELECT node_id, COUNT({column}), SUM({column}), MIN({column}), MAX({column}), "
+            f"stddev_pop({column}), COUNT(*) FILTER (WHERE {column} < 0), "
+            f"quantile_cont({column}, ?::DOUBLE[]) FROM prices {filters} GROUP BY node_id",
+            [quantiles or [0.5]] + list(node_ids) + params
+        )
+        top = {}
+        if top_n:
+            for node_id, timestamp, value in self._query(
+                f"SELECT node_id, timestamp, {column} FROM prices {filters} "
+                f"QUALIFY ROW_NUMBER() OVER (PARTITION BY node_id ORDER BY {column} DESC, timestamp) <= ? "
+                f"ORDER BY node_id, {column} DESC, timestamp",
+                list(node_ids) + params + [top_n]
+            ):
+                top.setdefault(int(node_id), []).append((timestamp, float(value)))
+        return {
+            int(node_id): {
+                'count': int(count), 'sum': float(total), 'avg': float(total) / count,
+                'min': float(value_min), 'max': float(value_max), 'std': clean(std),
+                'negative_count': int(negative), 'negative_share': int(negative) / count,
+                'percentiles': {
+                    percentile_key(percentile): float(value) for percentile, value in zip(percentiles, values)
+                },
+                'top_hours': top.get(int(node_id), []),
+            }
+            for node_id, count, total, value_min, value_max, std, negative, values in rows if count
+        }
+
+    def hour_sums(self, node_ids: List[int], hours: List[datetime], data_types: List[DataType]) -> pd.DataFrame:
+        """
+        Suma y conteo de valores no nulos por nodo en cada hora [h, h + 1)
+        indicada, para varios tipos de dato, en una consulta (ver sum_by_hour).
+        """
+        columns = [DATA_COLUMNS[DataType(data_type)] for data_type in data_types]
+        if not node_ids or not hours:
+            return sum_by_hour(_empty_rows(columns), hours, columns)
+        where, params = self._range(min(hours), max(hours) + timedelta(hours=1))
+        aggregates = ', '.join(f"SUM({c}) AS {c}_sum, COUNT({c}) AS {c}_count" for c in columns)
+        return self._frame(
+            f"SELECT node_id, date_trunc('hour', timestamp) AS hour, {aggregates} FROM prices "
+            f"WHERE node_id IN ({', '.join('?' for _ in node_ids)}) AND {where} "
+            f"AND date_trunc('hour', timestamp) IN ({', '.join('?' for _ in hours)}) "
+            "GROUP BY node_id, hour",
+            list(node_ids) + params + list(hours)
+        )
+
+    def rows(self, node_ids: Optional[List[int]], start: datetime, end: datetime, columns: List[str],
+             market: Optional[str] = None) -> pd.DataFrame:
+        """
+        Filas horarias (node_id, timestamp, columnas...) en [start, end] de
+        unos nodos o, con node_ids=None, de todos; sin orden garantizado.
+        """
+        where, params = self._range(start, end)
+        if node_ids is not None:
+            if not node_ids:
+                return _empty_rows(columns)
+            where += f" AND node_id IN ({', '.join('?' for _ in node_ids)})"
+            params += list(node_ids)
+        if market:
+            where += " AND market = ?"
+            params.append(market)
+        return self._frame(f"SELECT node_id, timestamp, {', '.join(columns)} FROM prices WHERE {where}", params)
+
+    def series(self, node_ids: List[int], start: datetime, end: datetime, data_type: DataType,
+               interval: Optional[str] = None) -> pd.DataFrame:
+        """Serie de cada nodo en [start, end]; los buckets se agrupan en la consulta (date_trunc)."""
+        column = DATA_COLUMNS[DataType(data_type)]
+        if not interval:
+            return raw_frame(self.rows(node_ids, start, end, [column]), column)
+        if not node_ids:
+            return pd.DataFrame(columns=SERIES_COLUMNS)
+        where, params = self._range(start, end)
+        return self._frame(
+            f"SELECT node_id, date_trunc(?, timestamp) AS timestamp, AVG({column}) AS value, "
+            f"MIN({column}) AS min_value, MAX({column}) AS max_value, COUNT({column}) AS count "
+            f"FROM prices WHERE node_id IN ({', '.join('?' for _ in node_ids)}) AND {where} "
+            f"AND {column} IS NOT NULL GROUP BY ALL ORDER BY node_id, timestamp",
+            [interval] + list(node_ids) + params
+        )
+
+    def multi_series(self, node_ids: List[int], start: datetime, end: datetime, data_types: List[DataType],
+                     interval: Optional[str] = None) -> Dict[DataType, pd.DataFrame]:
+        """Series de varios tipos de dato en una sola consulta (un GROUP BY con agregados por columna)."""
+        columns = {DataType(data_type): DATA_COLUMNS[DataType(data_type)] for data_type in data_types}
+        unique = list(dict.fromkeys(columns.values()))
+        if not interval or not node_ids:
+            frames = series_frames(self.rows(node_ids, start, end, unique), unique, interval)
+            return {data_type: frames[column] for data_type, column in columns.items()}
+        where, params = self._range(start, end)
+        aggregates = ', '.join(
+            f"AVG({c}) AS {c}_value, MIN({c}) AS {c}_min, MAX({c}) AS {c}_max, COUNT({c}) AS {c}_count"
+            for c in unique
+        )
+        grouped = self._frame(
+            f"SELECT node_id, date_trunc(?, timestamp) AS timestamp, {aggregates} "
+            f"FROM prices WHERE node_id IN ({', '.join('?' for _ in node_ids)}) AND {where} "
+            f"GROUP BY ALL ORDER BY node_id, timestamp",
+            [interval] + list(node_ids) + params
+        )
+        frames = {}
+        for column in unique:
+            part = grouped[grouped[f"{column}_count"] > 0]
+            frames[column] = pd.DataFrame({
+                'node_id': part['node_id'],
+                'timestamp': part['timestamp'],
+                'value': part[f"{column}_value"],
+                'min_value': part[f"{column}_min"],
+                'max_value': part[f"{column}_max"],
+                'count': part[f"{column}_count"],
+            }, columns=SERIES_COLUMNS).reset_index(drop=True)
+        return {data_type: frames[column] for data_type, column in columns.items()}
+
+    def pair_prices(self, node1_id: int, node2_id: int, start: datetime, end: datetime) -> pd.DataFrame:
+        """Precios de dos nodos en los timestamps comunes de [start, end], ordenados por tiempo."""
+        where_a, params_a = self._range(start, end, alias='a')
+        where_b, params_b = self._range(start, end, alias='b')
+        return self._frame(
+            "SELECT a.timestamp, arg_max(a.price, a.market) AS price1, arg_max(b.price, b.market) AS price2 "
+            "FROM prices a JOIN prices b ON a.timestamp = b.timestamp "
+            f"WHERE a.node_id = ? AND b.node_id = ? AND {where_a} AND {where_b} "
+            "GROUP BY a.timestamp ORDER BY a.timestamp",
+            [node1_id, node2_id] + params_a + params_b
+        )
+
+    # -- sincronización ----------------------------------------------------
+
+    def apply(self, df: pd.DataFrame):
+        """Inserta o actualiza un bloque en la copia (los nulos no sobrescriben)."""
+        df = df[ANALYTICS_COLUMNS].drop_duplicates(subset=ANALYTICS_KEY, keep='last')
+        if self.backend == 'parquet':
+            for (market, month), part in _by_market_month(df):
+                _write_partition(market, month, part, _delta_name())
+            return
+        conn = self._connect(read_only=False)
+        try:
+            conn.register('chunk', df)
+            updates = ', '.join(f"{c} = COALESCE(excluded.{c}, {c})" for c in VALUE_COLUMNS)
+            conn.execute(
+                f"INSERT INTO prices SELECT {', '.join(ANALYTICS_COLUMNS)} FROM chunk "
+                f"ON CONFLICT ({', '.join(ANALYTICS_KEY)}) DO UPDATE SET {updates}"
+            )
+        finally:
+            conn.close()
+
+    def reset(self):
+        """Vacía la copia."""
+        if self.backend == 'parquet':
+            shutil.rmtree(_resolve(settings.ANALYTICS_PARQUET_DIR), ignore_errors=True)
+            return
+        conn = self._connect(read_only=False)
+        try:
+            conn.execute("DELETE FROM prices")
+        finally:
+            conn.close()
+
+    def replace_month(self, month: datetime, df: pd.DataFrame):
+        """Sustituye en la copia todos los datos de un mes."""
+        if self.backend == 'parquet':
+            for directory in glob.glob(os.path.join(_resolve(settings.ANALYTICS_PARQUET_DIR), '*', f"month={month:%Y-%m}")):
+                for path in glob.glob(os.path.join(directory, '*.parquet')):
+                    os.remove(path)
+            for (market, part_month), part in _by_market_month(df):
+                _write_partition(market, part_month, part, 'data.parquet')
+            return
+        conn = self._connect(read_only=False)
+        try:
+            conn.execute("DELETE FROM prices WHERE timestamp >= ? AND timestamp < ?", [month, next_month(month)])
+            if not df.empty:
+                conn.register('chunk', df[ANALYTICS_COLUMNS])
+                conn.execute(f"INSERT INTO prices SELECT {', '.join(ANALYTICS_COLUMNS)} FROM chunk")
+        finally:
+            conn.close()
+
+    def delete(self, node_id: Optional[int] = None, before: Optional[datetime] = None):
+        """
+        Borra de la copia las filas de un nodo o las de los meses anteriores a
+        before (un inicio de mes), igual que se borraron de la base.
+        """
+        if self.backend != 'parquet':
+            clauses, params = [], []
+            if node_id is not None:
+                clauses.append("node_id = ?")
+                params.append(int(node_id))
+            if before is not None:
+                clauses.append("timestamp < ?")
+                params.append(before)
+            if not clauses:
+                return
+            conn = self._connect(read_only=False)
+            try:
+                conn.execute(f"DELETE FROM prices WHERE {' OR '.join(clauses)}", params)
+            finally:
+                conn.close()
+            return
+
+        conn = _import_duckdb().connect()
+        try:
+            for directory in sorted(glob.glob(os.path.join(_resolve(settings.ANALYTICS_PARQUET_DIR), 'market=*', 'month=*'))):
+                if before is not None and os.path.basename(directory)[len('month='):] < f"{before:%Y-%m}":
+                    shutil.rmtree(directory)
+                    continue
+                if node_id is None:
+                    continue
+                files = sorted(glob.glob(os.path.join(directory, '*.parquet')))
+                if not files or not conn.execute(
+                    f"SELECT count(*) FROM {_read_parquet_sql(files)} WHERE node_id = ?", [int(node_id)]
+                ).fetchone()[0]:
+                    continue
+                # La partición se reescribe sin el nodo (fundiendo sus deltas, como compact)
+                data = conn.execute(f"SELECT * FROM ({_merged_sql(files)}) WHERE node_id <> ?", [int(node_id)]).df()
+                _write_parquet(data, os.path.join(directory, 'data.parquet'))
+                for file_path in files:
+                    if os.path.basename(file_path).startswith('delta-'):
+                        os.remove(file_path)
+        finally:
+            conn.close()
+
+    def compact(self) -> int:
+        """
+        Funde los deltas de cada partición Parquet en su data.parquet (el
+        archivo DuckDB no tiene deltas). Los deltas escritos mientras tanto
+        se conservan.
+
+        Returns:
+            Número de particiones compactadas
+        """
+        if self.backend != 'parquet':
+            return 0
+        _, merged = _parquet_partitions()
+        if not merged:
+            return 0
+        conn = _import_duckdb().connect()
+        try:
+            for directory, files in merged.items():
+                data = conn.execute(_merged_sql(files)).df()
+                path = os.path.join(directory, 'data.parquet')
+                _write_parquet(data, path)
+                for file_path in files:
+                    if os.path.basename(file_path).startswith('delta-'):
+                        os.remove(file_path)
+        finally:
+            conn.close()
+        return len(merged)
+
+
+def _create_table_sql(name: str, temporary: bool = False) -> str:
+    """DDL de la relación de precios en DuckDB."""
+    return (
+        f"CREATE {'TEMPORARY ' if temporary else ''}TABLE IF NOT EXISTS {name} ("
+        "node_id INTEGER, timestamp TIMESTAMP, market VARCHAR, price DOUBLE, solar_capture DOUBLE, "
+        "wind_capture DOUBLE, negative_hours DOUBLE, PRIMARY KEY (node_id, timestamp, market))"
+    )
+
+
+# ---------------------------------------------------------------------------
+# Copia Parquet: particiones, deltas y lectura combinada
+# ---------------------------------------------------------------------------
+
+_delta_sequence = itertools.count()
+
+
+def _delta_name() -> str:
+    """Nombre de un archivo delta; el orden alfabético es el orden de escritura (data.parquet va antes)."""
+    return f"delta-{time.time_ns():020d}-{os.getpid():08d}-{next(_delta_sequence):08d}.parquet"
+
+
+def _by_market_month(df: pd.DataFrame):
+    """Agrupa un bloque por mercado y mes ('YYYY-MM')."""
+    months = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m')
+    return df.groupby([df['market'].astype(str), months], sort=True)
+
+
+def _write_parquet(df: pd.DataFrame, path: str):
+    """Escribe filas (node_id, timestamp, valores) ordenadas; atómico (archivo temporal + rename)."""
+    tmp_path = f"{path}.tmp"
+    df.sort_values(['node_id', 'timestamp'])[['node_id', 'timestamp'] + VALUE_COLUMNS].to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _write_partition(market: str, month: str, df: pd.DataFrame, file_name: str):
+    """Escribe un archivo (data.parquet o un delta) en la partición de un mercado y mes."""
+    directory = os.path.join(_resolve(settings.ANALYTICS_PARQUET_DIR), f"market={market}", f"month={month}")
+    os.makedirs(directory, exist_ok=True)
+    _write_parquet(df, os.path.join(directory, file_name))
+
+
+def _parquet_partitions() -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    Archivos de la copia Parquet.
+
+    Returns:
+        (archivos de las particiones sin deltas,
+         {partición con deltas: sus archivos, data.parquet primero})
+    """
+    clean, merged = [], {}
+    for directory in sorted(glob.glob(os.path.join(_resolve(settings.ANALYTICS_PARQUET_DIR), 'market=*', 'month=*'))):
+        files = sorted(glob.glob(os.path.join(directory, '*.parquet')))
+        if any(os.path.basename(f).startswith('delta-') for f in files):
+            merged[directory] = files
+        else:
+            clean.extend(files)
+    return clean, merged
+
+
+def _read_parquet_sql(files: List[str], filename: bool = False) -> str:
+    paths = ', '.join("'" + f.replace("'", "''") + "'" for f in files)
+    return (
+        f"read_parquet([{paths}], hive_partitioning = true, "
+        f"hive_types = {{'market': VARCHAR, 'month': VARCHAR}}{', filename = true' if filename else ''})"
+    )
+
+
+def _merged_sql(files: List[str]) -> str:
+    """
+    Filas de particiones con deltas: por clave, el último valor no nulo de
+    cada columna según el orden de los archivos (como el upsert de la base).
+    """
+    values = ', '.join(f"arg_max({c}, filename) FILTER (WHERE {c} IS NOT NULL) AS {c}" for c in VALUE_COLUMNS)
+    return (
+        f"SELECT node_id, timestamp, market, month, {values} FROM {_read_parquet_sql(files, filename=True)} "
+        "GROUP BY node_id, timestamp, market, month"
+    )
+
+
+def _parquet_relation(partitions: Tuple[List[str], Dict[str, List[str]]]) -> str:
+    """SELECT de la relación 'prices': particiones sin deltas tal cual y el resto combinadas."""
+    clean, merged = partitions
+    columns = ', '.join(PARQUET_VIEW_COLUMNS)
+    parts = [f"SELECT {columns} FROM {_read_parquet_sql(clean)}"] if clean else []
+    if merged:
+        parts.append(f"SELECT {columns} FROM ({_merged_sql([f for files in merged.values() for f in files])})")
+    if not parts:
+        types = ['INTEGER', 'TIMESTAMP', 'VARCHAR', 'VARCHAR'] + ['DOUBLE'] * len(VALUE_COLUMNS)
+        return 'SELECT ' + ', '.join(f"NULL::{t} AS {c}" for c, t in zip(PARQUET_VIEW_COLUMNS, types)) + ' WHERE false'
+    return ' UNION ALL '.join(parts)
+
+
+# ---------------------------------------------------------------------------
+# Selección del motor y sincronización con la ingesta
+# ---------------------------------------------------------------------------
+
+class FallbackAnalytics:
+    """
+    Motor DuckDB que resuelve en la base principal las consultas que
+    encuentran el archivo DuckDB bloqueado por otro proceso.
+    """
+
+    def __init__(self, primary: DuckDBAnalytics, fallback: SqlAnalytics):
+        self.primary = primary
+        self.fallback = fallback
+
+    def __getattr__(self, name: str):
+        method = getattr(self.primary, name)
+        if not callable(method):
+            return method
+
+        def call(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            except AnalyticsUnavailable as e:
+                print(f"⚠️  {e}; consulta '{name}' resuelta en la base principal")
+                return getattr(self.fallback, name)(*args, **kwargs)
+        return call
+
+
+def _stale_path(backend: str) -> str:
+    """Marca de copia desactualizada, junto a la copia (no la borra reset)."""
+    path = settings.ANALYTICS_PARQUET_DIR if backend == 'parquet' else settings.ANALYTICS_DUCKDB_PATH
+    return f"{_resolve(path).rstrip(os.sep)}.stale"
+
+
+def mark_stale(backend: str, reason: str):
+    """Marca la copia como desactualizada: las consultas pasan a la base principal hasta `sync`."""
+    path = _stale_path(backend)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"{datetime.utcnow():%Y-%m-%d %H:%M:%S} {reason}\n")
+
+
+def stale_reason(backend: str) -> Optional[str]:
+    """Motivo por el que la copia está marcada como desactualizada (None si está al día)."""
+    try:
+        with open(_stale_path(backend), encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def get_analytics(db: Session):
+    """
+    Motor analítico configurado en ANALYTICS_BACKEND. Con la copia marcada
+    como desactualizada se usa la base principal.
+    """
+    backend = settings.ANALYTICS_BACKEND
+    if backend not in ANALYTICS_BACKENDS:
+        raise ValueError(f"ANALYTICS_BACKEND desconocido: {backend}")
+    if backend == 'sql' or os.path.exists(_stale_path(backend)):
+        return SqlAnalytics(db)
+    return FallbackAnalytics(DuckDBAnalytics(backend), SqlAnalytics(db))
+
+
+def queue_sync(conn: Connection, df: pd.DataFrame):
+    """
+    Encola un bloque recién escrito para aplicarlo a la copia analítica
+    cuando la transacción de la conexión haya confirmado.
+    """
+    if settings.ANALYTICS_BACKEND == 'sql' or df.empty:
+        return
+    after_commit(conn, _PENDING_KEY, df[ANALYTICS_COLUMNS].copy())
+
+
+def queue_delete(conn: Connection, node_id: Optional[int] = None, before: Optional[datetime] = None):
+    """
+    Encola un borrado de la copia analítica (filas de un nodo o meses
+    anteriores a before) para cuando la transacción de la conexión confirme.
+    """
+    if settings.ANALYTICS_BACKEND == 'sql':
+        return
+    after_commit(conn, _DELETE_KEY, (node_id, before))
+
+
+def _copy_failed(backend: str, error: Exception):
+    """La base principal ya confirmó: la copia queda marcada hasta reconstruirla."""
+    reason = f"{type(error).__name__}: {error}"
+    mark_stale(backend, reason)
+    print(f"⚠️  Copia analítica desactualizada ({reason}); las consultas usan la base principal "
+          "hasta ejecutar: python -m app.utils.analytics sync")
+
+
+@on_commit(_PENDING_KEY)
+def _apply_pending(pending: List[pd.DataFrame]):
+    """Aplica a la copia analítica los bloques de una transacción ya confirmada."""
+    backend = settings.ANALYTICS_BACKEND
+    try:
+        DuckDBAnalytics(backend).apply(pd.concat(pending, ignore_index=True))
+    except Exception as e:
+        _copy_failed(backend, e)
+
+
+@on_commit(_DELETE_KEY)
+def _apply_deletes(deletes: List[Tuple[Optional[int], Optional[datetime]]]):
+    """Aplica a la copia analítica los borrados de una transacción ya confirmada."""
+    backend = settings.ANALYTICS_BACKEND
+    try:
+        analytics = DuckDBAnalytics(backend)
+        for node_id, before in deletes:
+            analytics.delete(node_id, before)
+    except Exception as e:
+        _copy_failed(backend, e)
+
+
+def rebuild_analytics(db: Session) -> int:
+    """
+    Reconstruye la copia analítica desde el archivo histórico y la base
+    principal, mes a mes. Mientras tanto la copia queda marcada como
+    desactualizada; al terminar se retira la marca.
+    """
+    backend = settings.ANALYTICS_BACKEND
+    if backend == 'sql':
+        raise ValueError("ANALYTICS_BACKEND='sql' no usa copia analítica")
+    mark_stale(backend, 'reconstrucción en curso')
+    analytics = DuckDBAnalytics(backend)
+    analytics.reset()
+    source = price_source(db)
+    first, last = db.execute(select(func.min(source.c.timestamp), func.max(source.c.timestamp))).one()
+    years = archived_years()
+    if years:
+        # El archivo histórico precede a la base
+        first = datetime(years[0], 1, 1)
+        last = last or datetime(years[-1], 12, 1)
+    months = 0
+    month = month_start(first) if first is not None else None
+    while month is not None and month <= last:
+        end = next_month(month)
+        source = price_source(db, month, end)
+        rows = db.execute(
+            select(*[source.c[c] for c in ANALYTICS_COLUMNS])
+            .where(source.c.timestamp >= month, source.c.timestamp < end)
+        ).fetchall()
+        archived = read_archive(month, end, ANALYTICS_COLUMNS)
+        rows = archive_rows(archived[archived['timestamp'] < end]) + list(rows)
+        analytics.replace_month(month, pd.DataFrame(rows, columns=ANALYTICS_COLUMNS))
+        months += 1
+        print(f"   ✅ {month:%Y-%m}: {len(rows):,} filas")
+        month = end
+    os.remove(_stale_path(backend))
+    return months
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal, init_db
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('sync', 'compact'):
+        print("Uso: python -m app.utils.analytics sync|compact")
+        sys.exit(1)
+    if sys.argv[1] == 'compact':
+        count = DuckDBAnalytics(settings.ANALYTICS_BACKEND).compact()
+        print(f"✓ {count} particiones compactadas.")
+        sys.exit(0)
+    init_db()
+    session = SessionLocal()
+    try:
+        print(f"Reconstruyendo la copia analítica ({settings.ANALYTICS_BACKEND})...")
+        count = rebuild_analytics(session)
+        print(f"✓ Copia analítica reconstruida para {count} meses.")
+    finally:
+        session.close()
@@ -0,0 +1,264 @@
+"""
+Archivo histórico de precios en Parquet.
+
+Los años anteriores a un corte salen de la base principal y se guardan
+comprimidos (zstd) en ARCHIVE_DIR, un archivo por año y mercado:
+
+    {ARCHIVE_DIR}/2021/ERCOT.parquet
+
+Dentro de cada archivo las filas van ordenadas por mes, nodo y hora en grupos
+de filas pequeños, así que una lectura con filtro de nodo y rango solo
+descomprime los grupos que le tocan. Los años archivados son siempre
+anteriores a todos los de la base (archive_boundary()).
+
+Los rollups y la matriz horaria de los años archivados se conservan en la
+base: estadísticas, promedios mensuales y mapas de calor no cambian. Las
+series, distribuciones, comparaciones y exportaciones unen las filas del
+archivo (read_archive) con las de price_source.
+
+La ingesta no admite filas de años ya archivados: la validación las envía a
+cuarentena (ARCHIVED_PERIOD) y write_prices las rechaza.
+
+Uso directo:
+    python -m app.utils.archive status
+    python -m app.utils.archive run                     # años < año actual - ARCHIVE_KEEP_YEARS
+    python -m app.utils.archive run --before-year 2022
+"""
+import argparse
+import glob
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.utils.parquet_store import BACKEND_DIR
+from app.utils.partitions import price_source, delete_prices_before, months_between, next_month
+
+
+ARCHIVE_COLUMNS = [
+    'node_id', 'timestamp', 'market', 'price', 'solar_capture', 'wind_capture', 'negative_hours'
+]
+
+ARCHIVE_SCHEMA = pa.schema([
+    ('node_id', pa.int32()),
+    ('timestamp', pa.timestamp('us')),
+    ('market', pa.string()),
+    ('price', pa.float64()),
+    ('solar_capture', pa.float64()),
+    ('wind_capture', pa.float64()),
+    ('negative_hours', pa.float64()),
+])
+
+ARCHIVE_COMPRESSION = 'zstd'
+
+# Filas por grupo: unidad mínima de lectura al filtrar por nodo y rango
+ARCHIVE_ROW_GROUP_SIZE = 20_000
+
+_YEAR_PATTERN = re.compile(r"^\d{4}$")
+
+
+def archive_dir() -> str:
+    """Directorio del archivo (las rutas relativas parten de backend/)."""
+    if os.path.isabs(settings.ARCHIVE_DIR):
+        return settings.ARCHIVE_DIR
+    return os.path.join(BACKEND_DIR, settings.ARCHIVE_DIR)
+
+
+def archive_path(year: int, market: str) -> str:
+    """Archivo de un año y mercado."""
+    return os.path.join(archive_dir(), str(year), f"{market}.parquet")
+
+
+def archived_years() -> List[int]:
+    """Años con archivos en el archivo histórico, en orden."""
+    root = archive_dir()
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        int(name) for name in os.listdir(root)
+        if _YEAR_PATTERN.match(name) and glob.glob(os.path.join(root, name, '*.parquet'))
+    )
+
+
+def archived_markets() -> List[str]:
+    """Mercados presentes en el archivo histórico."""
+    files = glob.glob(os.path.join(archive_dir(), '*', '*.parquet'))
+    return sorted({os.path.splitext(os.path.basename(path))[0] for path in files})
+
+
+def archive_boundary() -> Optional[datetime]:
+    """Primer instante no archivado (None si el archivo está vacío)."""
+    years = archived_years()
+    return datetime(years[-1] + 1, 1, 1) if years else None
+
+
+def archived_mask(timestamps: pd.Series) -> np.ndarray:
+    """True en los timestamps que caen en años archivados."""
+    boundary = archive_boundary()
+    if boundary is None:
+        return np.zeros(len(timestamps), dtype=bool)
+    return (pd.to_datetime(timestamps) < boundary).to_numpy()
+
+
+def reject_archived(df: pd.DataFrame):
+    """
+    Raises:
+        ValueError: Si el bloque tiene filas de años archivados
+    """
+    if df.empty:
+        return
+    boundary = archive_boundary()
+    if boundary is not None and pd.to_datetime(df['timestamp']).min() < boundary:
+        raise ValueError(
+            f"El bloque contiene filas anteriores a {boundary:%Y-%m-%d}, años ya archivados en {archive_dir()}"
+        )
+
+
+def read_archive(start: datetime = None, end: datetime = None, columns: List[str] = None,
+                 node_ids: List[int] = None, market: Optional[str] = None) -> pd.DataFrame:
+    """
+    Filas archivadas en [start, end] (ambos incluidos), opcionalmente
+    limitadas a unos nodos y un mercado. Sin orden garantizado.
+
+    Args:
+        columns: Columnas a devolver (por defecto, todas)
+    """
+    columns = columns or ARCHIVE_COLUMNS
+    years = [
+        year for year in archived_years()
+        if (start is None or year >= start.year) and (end is None or year <= end.year)
+    ]
+    files = [
+        path for year in years
+        for path in sorted(glob.glob(os.path.join(archive_dir(), str(year), '*.parquet')))
+        if market is None or os.path.basename(path) == f"{market}.parquet"
+    ]
+    if not files:
+        return pd.DataFrame({column: pd.Series(dtype=ARCHIVE_SCHEMA.field(column).type.to_pandas_dtype())
+                             for column in columns})
+
+    filters = []
+    if node_ids is not None:
+        filters.append(('node_id', 'in', [int(node_id) for node_id in node_ids]))
+    if start is not None:
+        filters.append(('timestamp', '>=', pd.Timestamp(start)))
+    if end is not None:
+        filters.append(('timestamp', '<=', pd.Timestamp(end)))
+    tables = [pq.read_table(path, columns=columns, filters=filters or None) for path in files]
+    return pa.concat_tables(tables).to_pandas()
+
+
+def archive_rows(df: pd.DataFrame) -> List[tuple]:
+    """Filas de read_archive como tuplas de Python (datetime, None en los nulos)."""
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            columns.append(series.to_numpy().astype('datetime64[us]').astype(object).tolist())
+        else:
+            columns.append(series.astype(object).where(series.notna(), None).tolist())
+    return list(zip(*columns))
+
+
+def archive_before(db: Session, year: int) -> Dict[int, int]:
+    """
+    Archiva los años de la base anteriores a year, uno a uno: escribe los
+    archivos del año (temporal + rename) y después borra sus filas de la base
+    en una transacción. Si se interrumpe, se puede repetir: el año en curso
+    de copia se vuelve a escribir desde la base.
+
+    Returns:
+        {año: filas archivadas}
+    """
+    cutoff = datetime(year, 1, 1)
+    source = price_source(db)
+    first = db.execute(select(func.min(source.c.timestamp))).scalar()
+    archived = {}
+    while first is not None and first < cutoff:
+        current = first.year
+        archived[current] = _write_year(db, current)
+        delete_prices_before(db.connection(), datetime(current + 1, 1, 1))
+        db.commit()
+        print(f"   ✅ {current}: {archived[current]:,} filas archivadas")
+        source = price_source(db)
+        first = db.execute(select(func.min(source.c.timestamp))).scalar()
+    return archived
+
+
+def _write_year(db: Session, year: int) -> int:
+    """Escribe los archivos de un año (uno por mercado) desde la base, mes a mes."""
+    os.makedirs(os.path.join(archive_dir(), str(year)), exist_ok=True)
+    writers: Dict[str, pq.ParquetWriter] = {}
+    rows = 0
+    try:
+        for month in months_between(datetime(year, 1, 1), datetime(year, 12, 1)):
+            end = next_month(month)
+            source = price_source(db, month, end)
+            df = pd.DataFrame(
+                db.execute(
+                    select(*[source.c[c] for c in ARCHIVE_COLUMNS])
+                    .where(source.c.timestamp >= month, source.c.timestamp < end)
+                ).fetchall(),
+                columns=ARCHIVE_COLUMNS
+            )
+            for market, part in df.groupby(df['market'].astype(str), sort=True):
+                if market not in writers:
+                    writers[market] = pq.ParquetWriter(
+                        f"{archive_path(year, market)}.tmp", ARCHIVE_SCHEMA, compression=ARCHIVE_COMPRESSION
+                    )
+                part = part.sort_values(['node_id', 'timestamp'])
+                table = pa.Table.from_pandas(part, schema=ARCHIVE_SCHEMA, preserve_index=False)
+                writers[market].write_table(table, row_group_size=ARCHIVE_ROW_GROUP_SIZE)
+                rows += len(part)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    for market in writers:
+        os.replace(f"{archive_path(year, market)}.tmp", archive_path(year, market))
+    return rows
+
+
+def _print_status():
+    """Muestra los años archivados con sus filas y tamaño."""
+    years = archived_years()
+    if not years:
+        print(f"Archivo histórico vacío ({archive_dir()})")
+        return
+    print(f"Archivo histórico: {archive_dir()}")
+    for year in years:
+        files = sorted(glob.glob(os.path.join(archive_dir(), str(year), '*.parquet')))
+        rows = sum(pq.ParquetFile(path).metadata.num_rows for path in files)
+        size = sum(os.path.getsize(path) for path in files)
+        markets = ', '.join(os.path.splitext(os.path.basename(path))[0] for path in files)
+        print(f"  {year}: {rows:,} filas, {size / 1024 / 1024:.1f} MB ({markets})")
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Archivo histórico de precios en Parquet")
+    parser.add_argument('command', choices=['status', 'run'])
+    parser.add_argument('--before-year', type=int,
+                        help="Archivar los años anteriores a este (por defecto: año actual - ARCHIVE_KEEP_YEARS)")
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        _print_status()
+    else:
+        before_year = args.before_year or datetime.now().year - settings.ARCHIVE_KEEP_YEARS
+        init_db()
+        session = SessionLocal()
+        try:
+            print(f"Archivando años anteriores a {before_year}...")
+            result = archive_before(session, before_year)
+            print(f"✓ {len(result)} años archivados, {sum(result.values()):,} filas.")
+        finally:
+            session.close()
@@ -0,0 +1,544 @@
+"""
+Utilidades de carga masiva de registros de precios.
+Lee los archivos fuente por bloques, prepara cada bloque de forma vectorizada
+con pandas y lo inserta con executemany a nivel Core (sin objetos ORM).
+"""
+import time
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, text, MetaData, Table, Column, Integer, String, Float, DateTime
+from sqlalchemy.engine import Connection
+
+from app.models import PriceRecord, CompactPriceRecord, QuarantineRecord, QuarantineReason
+from app.utils.parquet_store import resolve_source, iter_parquet_chunks, iter_excel_rows
+from app.utils.partitions import partitioning_mode, prepare_partitions, split_by_month, ensure_partition
+from app.utils.compact_layout import COMPACT_COLUMNS, COMPACT_KEY, compact_layout_enabled, to_compact_frame
+from app.utils.rollups import refresh_rollups
+from app.utils.hour_matrix import refresh_hour_matrix
+from app.utils.latest_values import refresh_latest_values
+from app.utils.analytics import queue_sync
+from app.utils.cache import invalidate_on_commit
+from app.utils.archive import archived_mask, reject_archived
+from app.utils.validation import (
+    FIRST_DATA_ROW, assign_reason, build_rejected, duplicate_hours, out_of_range, raw_text
+)
+
+
+# Columnas de price_records que escriben los importadores
+PRICE_COLUMNS = [
+    'node_id', 'timestamp', 'price', 'solar_capture',
+    'wind_capture', 'negative_hours', 'market'
+]
+
+# Columnas numéricas opcionales del archivo de precios
+VALUE_COLUMNS = ['price', 'solar_capture', 'wind_capture', 'negative_hours']
+
+# Clave natural de price_records (índice único uq_price_node_timestamp_market)
+PRICE_KEY = ['node_id', 'timestamp', 'market']
+
+# Modos de escritura soportados por los importadores
+WRITE_MODES = ('insert', 'upsert')
+
+
+def is_excel(file_path: str) -> bool:
+    """Indica si la ruta corresponde a un libro de Excel."""
+    return file_path.lower().endswith(('.xlsx', '.xls'))
+
+
+def read_in_chunks(file_path: str, chunk_size: int, skip_rows: int = 0,
+                   content_hash: str = None) -> Iterator[pd.DataFrame]:
+    """
+    Lee un archivo CSV o Excel en DataFrames de como máximo chunk_size filas.
+    La memoria queda acotada por el tamaño del bloque, no por el del archivo.
+
+    Si el almacén Parquet está habilitado, el archivo se convierte una vez y
+    los bloques se leen del Parquet.
+
+    Args:
+        file_path: Ruta al archivo
+        chunk_size: Filas por bloque
+        skip_rows: Filas de datos a saltar tras el encabezado (para reanudar)
+        content_hash: Hash del archivo si ya se calculó (evita releerlo)
+    """
+    source = resolve_source(file_path, content_hash)
+    if source.lower().endswith('.parquet'):
+        yield from iter_parquet_chunks(source, chunk_size, skip_rows)
+    elif is_excel(source):
+        for headers, rows in iter_excel_rows(source, chunk_size, min_row=2 + skip_rows):
+            columns = [str(h).strip() if h is not None else '' for h in headers]
+            width = len(columns)
+            yield pd.DataFrame.from_records(
+                [tuple(row[:width]) + (None,) * (width - len(row)) for row in rows],
+                columns=columns
+            )
+    else:
+        skip = range(1, skip_rows + 1) if skip_rows else None
+        yield from pd.read_csv(source, chunksize=chunk_size, skiprows=skip)
+
+
+def iter_wide_blocks(file_path: str, block_size: int, skip_rows: int = 0,
+                     content_hash: str = None) -> Iterator[Tuple[list, pd.DataFrame]]:
+    """
+    Recorre el libro ancho (Year, Month, Hour + una columna por nodo) por bloques.
+
+    Yields:
+        Tuplas (encabezados, bloque) con el bloque como DataFrame de columnas
+        posicionales; los encabezados vacíos se entregan como None
+    """
+    source = resolve_source(file_path, content_hash)
+    if source.lower().endswith('.parquet'):
+        for block in iter_parquet_chunks(source, block_size, skip_rows):
+            headers = [None if str(col).startswith('Unnamed:') else col for col in block.columns]
+            block.columns = range(len(headers))
+            yield headers, block
+    else:
+        for headers, rows in iter_excel_rows(source, block_size, min_row=2 + skip_rows):
+            width = len(headers)
+            block = pd.DataFrame.from_records(
+                [tuple(row[:width]) + (None,) * (width - len(row)) for row in rows]
+            )
+            yield headers, block
+
+
+def prepare_price_chunk(df: pd.DataFrame, node_map: Dict[str, int],
+                        first_row: int = FIRST_DATA_ROW) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Convierte un bloque del archivo de precios al formato de price_records.
+
+    El mapeo node_code -> node_id, el parseo de timestamps, la conversión
+    numérica y la validación se hacen sobre columnas completas. Se rechazan
+    nodos desconocidos, timestamps inválidos, celdas no numéricas, precios
+    fuera de rango, horas de años ya archivados y horas repetidas (clave
+    node_id, timestamp, market) dentro del bloque, incluida la hora repetida
+    del cambio de horario de otoño.
+
+    Args:
+        df: Bloque con columnas node_code, timestamp, price, market (y opcionales)
+        node_map: Diccionario código de nodo -> ID en BD
+        first_row: Número de fila en el archivo de la primera fila del bloque
+
+    Returns:
+        Tupla (DataFrame listo para insertar, DataFrame de cuarentena)
+    """
+    source_rows = np.arange(first_row, first_row + len(df))
+    node_codes = df['node_code'].astype(str).str.strip()
+    node_ids = node_codes.map(node_map)
+    timestamps = pd.to_datetime(df['timestamp'], errors='coerce')
+    markets = df['market'].astype(str).str.strip()
+
+    values = {}
+    non_numeric = np.zeros(len(df), dtype=bool)
+    for column in VALUE_COLUMNS:
+        if column in df.columns:
+            values[column] = pd.to_numeric(df[column], errors='coerce')
+            non_numeric |= (df[column].notna() & values[column].isna()).to_numpy()
+        else:
+            values[column] = pd.Series(np.nan, index=df.index)
+
+    reasons = np.full(len(df), None, dtype=object)
+    assign_reason(reasons, node_ids.isna(), QuarantineReason.UNKNOWN_NODE)
+    assign_reason(reasons, timestamps.isna(), QuarantineReason.BAD_TIMESTAMP)
+    assign_reason(reasons, non_numeric, QuarantineReason.NON_NUMERIC)
+    assign_reason(reasons, out_of_range(values['price'].to_numpy(dtype=float)), QuarantineReason.PRICE_OUT_OF_RANGE)
+    assign_reason(reasons, archived_mask(timestamps), QuarantineReason.ARCHIVED_PERIOD)
+    keys = pd.DataFrame({'node_id': node_ids, 'timestamp': timestamps, 'market': markets})
+    duplicates = duplicate_hours(keys, timestamps, pd.isna(reasons))
+    reasons = np.where(pd.isna(reasons), duplicates, reasons)
+
+    valid = pd.isna(reasons)
+    prepared = pd.DataFrame({
+        'node_id': node_ids[valid].astype('int64'),
+        'timestamp': timestamps[valid],
+    })
+    for column in VALUE_COLUMNS:
+        prepared[column] = values[column][valid] if column in df.columns else None
+    prepared['market'] = markets[valid]
+
+    rejected = build_rejected(
+        ~valid, reasons, source_rows,
+        node_code=raw_text(df['node_code'], 100),
+        node_id=node_ids.astype(object).where(node_ids.notna(), None),
+        timestamp=raw_text(df['timestamp']),
+        value=raw_text(df['price'], 100),
+        market=raw_text(df['market']),
+    )
+    return prepared[PRICE_COLUMNS], rejected
+
+
+def node_number(value) -> Optional[int]:
+    """Extrae el número de nodo de un código o encabezado ("Node #12" -> 12, 12 -> 12)."""
+    if value is None:
+        return None
+    text_value = str(value).strip()
+    if '#' in text_value:
+        text_value = text_value.split('#')[1].strip()
+    try:
+        return int(float(text_value))
+    except ValueError:
+        return None
+
+
+def resolve_node_columns(headers: list, nodes_by_code: Dict[str, int],
+                         nodes_by_number: Dict[int, int], first_col: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Asocia cada columna de nodo del libro ancho con un node_id usando el encabezado.
+
+    El encabezado se compara primero con el código del nodo y después con su
+    número ("Node #12", 12). Si la celda está vacía se usa la posición de la
+    columna (columna D = nodo 1), como en el formato original de 150 nodos.
+
+    Returns:
+        Tupla (índices de columna, node_ids) solo para columnas con nodo conocido
+    """
+    columns, ids = [], []
+    for col_idx in range(first_col, len(headers)):
+        header = headers[col_idx]
+        if header is not None and str(header).strip() in nodes_by_code:
+            node_id = nodes_by_code[str(header).strip()]
+        else:
+            number = node_number(header) if header is not None else col_idx - first_col + 1
+            node_id = nodes_by_number.get(number)
+        if node_id is not None:
+            columns.append(col_idx)
+            ids.append(node_id)
+    return np.array(columns, dtype=np.intp), np.array(ids, dtype=np.int64)
+
+
+def melt_wide_block(block: pd.DataFrame, node_columns: np.ndarray, node_ids: np.ndarray,
+                    market: str = 'MDA', first_row: int = FIRST_DATA_ROW) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Convierte un bloque del libro ancho (Year, Month, Hour + una columna por nodo)
+    a formato largo (node_id, timestamp, price) con operaciones sobre arrays.
+
+    Las celdas vacías o en cero se descartan con máscaras. Se rechazan a
+    cuarentena las celdas de filas con calendario inválido, las no numéricas,
+    los precios fuera de rango y las de filas con una hora ya vista en el bloque.
+
+    Args:
+        block: Bloque con columnas posicionales (0 = Year, 1 = Month, 2 = Hour)
+        node_columns: Índices de las columnas de nodo
+        node_ids: node_id de cada columna de node_columns
+        market: Mercado asignado a los registros
+        first_row: Número de fila en el archivo de la primera fila del bloque
+
+    Returns:
+        Tupla (DataFrame con PRICE_COLUMNS, DataFrame de cuarentena)
+    """
+    calendar = pd.DataFrame({
+        'year': pd.to_numeric(block.iloc[:, 0], errors='coerce'),
+        'month': pd.to_numeric(block.iloc[:, 1], errors='coerce'),
+        'day': 1,  # Día 1 por defecto
+        'hour': pd.to_numeric(block.iloc[:, 2], errors='coerce'),
+    })
+    timestamps = pd.to_datetime(calendar, errors='coerce')
+    valid_rows = timestamps.notna().to_numpy()
+
+    cells = block.iloc[:, node_columns]
+    present = cells.notna().to_numpy()
+    prices = cells.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    numeric = np.isfinite(prices) & (prices != 0)
+
+    # Horas repetidas en el bloque: se conserva la primera fila con cada timestamp
+    row_reasons = np.full(len(block), None, dtype=object)
+    assign_reason(row_reasons, ~valid_rows, QuarantineReason.BAD_TIMESTAMP)
+    duplicates = duplicate_hours(timestamps.to_frame(), timestamps, valid_rows)
+    row_reasons = np.where(pd.isna(row_reasons), duplicates, row_reasons)
+
+    # Motivo por celda: el de su fila o el de la propia celda
+    reasons = np.repeat(row_reasons[:, None], len(node_columns), axis=1)
+    assign_reason(reasons, present & ~np.isfinite(prices), QuarantineReason.NON_NUMERIC)
+    assign_reason(reasons, out_of_range(prices), QuarantineReason.PRICE_OUT_OF_RANGE)
+    reasons[~present] = None
+
+    mask = numeric & pd.isna(reasons)
+    row_idx, col_idx = np.nonzero(mask)
+
+    melted = pd.DataFrame({
+        'node_id': node_ids[col_idx],
+        'timestamp': timestamps.to_numpy()[row_idx],
+        'price': prices[mask],
+        'solar_capture': None,
+        'wind_capture': None,
+        'negative_hours': None,
+        'market': market,
+    })
+
+    bad_row, bad_col = np.nonzero(~pd.isna(reasons))
+    raw_calendar = raw_text(
+        block.iloc[:, 0].astype(str) + '-' + block.iloc[:, 1].astype(str) + ' h' + block.iloc[:, 2].astype(str)
+    )
+    rejected = build_rejected(
+        np.ones(len(bad_row), dtype=bool), reasons[bad_row, bad_col], first_row + bad_row,
+        node_id=node_ids[bad_col],
+        timestamp=raw_calendar[bad_row],
+        value=raw_text(cells.to_numpy()[bad_row, bad_col], 100),
+        market=np.full(len(bad_row), market, dtype=object),
+    )
+    return melted[PRICE_COLUMNS], rejected
+
+
+def frame_to_records(df: pd.DataFrame) -> list:
+    """Convierte un DataFrame en lista de diccionarios con tipos nativos de Python (NaN -> None)."""
+    records = df.astype(object).where(df.notna(), None)
+    if 'timestamp' in records.columns:
+        records['timestamp'] = [
+            ts.to_pydatetime() if isinstance(ts, pd.Timestamp) else ts
+            for ts in records['timestamp']
+        ]
+    return records.to_dict('records')
+
+
+def insert_prices(conn: Connection, df: pd.DataFrame, table: Table = None) -> int:
+    """
+    Inserta un bloque en price_records (o en la partición indicada) con un
+    único executemany. En SQL Server el engine usa fast_executemany de pyodbc.
+
+    Returns:
+        Número de filas insertadas
+    """
+    if df.empty:
+        return 0
+    conn.execute(insert(table if table is not None else PriceRecord.__table__), frame_to_records(df))
+    return len(df)
+
+
+def write_quarantine(conn: Connection, rejected: pd.DataFrame, source_file: str) -> int:
+    """
+    Inserta en bloque las filas rechazadas en quarantine_records.
+    Se llama en la misma transacción que el bloque de precios, de modo que
+    un reintento desde el checkpoint no duplica la cuarentena.
+
+    Args:
+        conn: Conexión (la de la sesión del importador)
+        rejected: DataFrame de cuarentena (QUARANTINE_COLUMNS)
+        source_file: Clave del archivo en el manifiesto
+
+    Returns:
+        Número de filas en cuarentena
+    """
+    if rejected is None or rejected.empty:
+        return 0
+    records = frame_to_records(rejected)
+    created_at = datetime.utcnow()
+    for record in records:
+        record['source_row'] = int(record['source_row'])
+        if record['node_id'] is not None:
+            record['node_id'] = int(record['node_id'])
+        record['source_file'] = source_file
+        record['created_at'] = created_at
+    conn.execute(insert(QuarantineRecord.__table__), records)
+    return len(records)
+
+
+def _staging_table(dialect_name: str) -> Table:
+    """Tabla temporal de staging con las columnas de carga de price_records."""
+    columns = [
+        Column('node_id', Integer, nullable=False),
+        Column('timestamp', DateTime, nullable=False),
+        Column('price', Float),
+        Column('solar_capture', Float),
+        Column('wind_capture', Float),
+        Column('negative_hours', Float),
+        Column('market', String(50), nullable=False),
+    ]
+    if dialect_name == 'mssql':
+        # En SQL Server las tablas temporales de sesión empiezan por '#'
+        return Table('#price_staging', MetaData(), *columns)
+    return Table('price_staging', MetaData(), *columns, prefixes=['TEMPORARY'])
+
+
+_MERGE_SQL = {
+    'mssql': """
+        MERGE {target} WITH (HOLDLOCK) AS t
+        USING #price_staging AS s
+            ON t.node_id = s.node_id AND t.timestamp = s.timestamp AND t.market = s.market
+        WHEN MATCHED THEN UPDATE SET
+            price = COALESCE(s.price, t.price),
+            solar_capture = COALESCE(s.solar_capture, t.solar_capture),
+            wind_capture = COALESCE(s.wind_capture, t.wind_capture),
+            negative_hours = COALESCE(s.negative_hours, t.negative_hours)
+        WHEN NOT MATCHED THEN
+            INSERT (node_id, timestamp, price, solar_capture, wind_capture, negative_hours, market, created_at)
+            VALUES (s.node_id, s.timestamp, s.price, s.solar_capture, s.wind_capture,
+                    s.negative_hours, s.market, :created_at);
+    """,
+    'sqlite': """
+        INSERT INTO {target}
+            (node_id, timestamp, price, solar_capture, wind_capture, negative_hours, market, created_at)
+        SELECT node_id, timestamp, price, solar_capture, wind_capture, negative_hours, market, :created_at
+        FROM price_staging WHERE true
+        ON CONFLICT (node_id, timestamp, market) DO UPDATE SET
+            price = COALESCE(excluded.price, price),
+            solar_capture = COALESCE(excluded.solar_capture, solar_capture),
+            wind_capture = COALESCE(excluded.wind_capture, wind_capture),
+            negative_hours = COALESCE(excluded.negative_hours, negative_hours)
+    """,
+}
+
+
+def upsert_prices(conn: Connection, df: pd.DataFrame, table: Table = None) -> int:
+    """
+    Inserta o actualiza un bloque en price_records (o en la partición
+    indicada) usando la clave natural (node_id, timestamp, market).
+
+    El bloque se carga en una tabla temporal de staging con executemany y se
+    aplica con una sola operación de conjunto: MERGE en SQL Server e
+    INSERT ... ON CONFLICT en SQLite. Los valores nulos del bloque no
+    sobrescriben valores existentes.
+
+    Returns:
+        Número de filas del bloque aplicadas
+    """
+    if df.empty:
+        return 0
+
+    dialect_name = conn.dialect.name
+    if dialect_name not in _MERGE_SQL:
+        raise ValueError(f"Upsert no soportado para el dialecto '{dialect_name}'")
+
+    # MERGE no admite claves repetidas en el origen: gana la última aparición
+    df = df.drop_duplicates(subset=PRICE_KEY, keep='last')
+
+    staging = _staging_table(dialect_name)
+    staging.create(conn, checkfirst=True)
+    conn.execute(staging.delete())
+    conn.execute(insert(staging), frame_to_records(df[PRICE_COLUMNS]))
+    target = table.name if table is not None else PriceRecord.__tablename__
+    conn.execute(text(_MERGE_SQL[dialect_name].format(target=target)), {'created_at': datetime.utcnow()})
+    conn.execute(staging.delete())
+    return len(df)
+
+
+def _compact_staging_table(dialect_name: str) -> Table:
+    """Tabla temporal de staging con las columnas de price_hours."""
+    columns = [
+        Column('node_id', Integer, nullable=False),
+        Column('hour', Integer, nullable=False),
+        Column('market_id', Integer, nullable=False),
+        Column('price', Float),
+        Column('solar_capture', Float),
+        Column('wind_capture', Float),
+        Column('negative_hours', Float),
+    ]
+    if dialect_name == 'mssql':
+        return Table('#price_hours_staging', MetaData(), *columns)
+    return Table('price_hours_staging', MetaData(), *columns, prefixes=['TEMPORARY'])
+
+
+_COMPACT_MERGE_SQL = {
+    'mssql': """
+        MERGE price_hours WITH (HOLDLOCK) AS t
+        USING #price_hours_staging AS s
+            ON t.node_id = s.node_id AND t.hour = s.hour AND t.market_id = s.market_id
+        WHEN MATCHED THEN UPDATE SET
+            price = COALESCE(s.price, t.price),
+            solar_capture = COALESCE(s.solar_capture, t.solar_capture),
+            wind_capture = COALESCE(s.wind_capture, t.wind_capture),
+            negative_hours = COALESCE(s.negative_hours, t.negative_hours)
+        WHEN NOT MATCHED THEN
+            INSERT (node_id, hour, market_id, price, solar_capture, wind_capture, negative_hours)
+            VALUES (s.node_id, s.hour, s.market_id, s.price, s.solar_capture, s.wind_capture, s.negative_hours);
+    """,
+    'sqlite': """
+        INSERT INTO price_hours
+            (node_id, hour, market_id, price, solar_capture, wind_capture, negative_hours)
+        SELECT node_id, hour, market_id, price, solar_capture, wind_capture, negative_hours
+        FROM price_hours_staging WHERE true
+        ON CONFLICT (node_id, hour, market_id) DO UPDATE SET
+            price = COALESCE(excluded.price, price),
+            solar_capture = COALESCE(excluded.solar_capture, solar_capture),
+            wind_capture = COALESCE(excluded.wind_capture, wind_capture),
+            negative_hours = COALESCE(excluded.negative_hours, negative_hours)
+    """,
+}
+
+
+def write_compact_prices(conn: Connection, df: pd.DataFrame, mode: str = 'upsert') -> int:
+    """
+    Escribe un bloque con las columnas de price_records en price_hours
+    (formato compacto). El upsert usa la clave primaria (node_id, hour,
+    market_id) con la misma semántica que upsert_prices.
+
+    Returns:
+        Número de filas del bloque aplicadas
+    """
+    if df.empty:
+        return 0
+    compact = to_compact_frame(conn, df)
+    if mode == 'insert':
+        conn.execute(insert(CompactPriceRecord.__table__), frame_to_records(compact))
+        return len(compact)
+
+    dialect_name = conn.dialect.name
+    if dialect_name not in _COMPACT_MERGE_SQL:
+        raise ValueError(f"Upsert no soportado para el dialecto '{dialect_name}'")
+
+    compact = compact.drop_duplicates(subset=COMPACT_KEY, keep='last')
+    staging = _compact_staging_table(dialect_name)
+    staging.create(conn, checkfirst=True)
+    conn.execute(staging.delete())
+    conn.execute(insert(staging), frame_to_records(compact[COMPACT_COLUMNS]))
+    conn.execute(text(_COMPACT_MERGE_SQL[dialect_name]))
+    conn.execute(staging.delete())
+    return len(compact)
+
+
+def write_prices(conn: Connection, df: pd.DataFrame, mode: str = 'upsert') -> int:
+    """
+    Escribe un bloque en price_records con el modo indicado ('insert' o 'upsert')
+    y actualiza, en la misma transacción, los rollups de los buckets tocados,
+    la matriz horaria de sus horas y los últimos valores por nodo. El bloque
+    se encola para la copia analítica, que se actualiza al confirmar la
+    transacción, igual que se vacían las cachés de lectura.
+
+    Con el formato compacto el bloque se escribe en price_hours. Con
+    particionado por tablas (SQLite) el bloque se reparte entre las tablas
+    de sus meses; con particionado nativo se crean antes las particiones de
+    los meses nuevos.
+
+    Raises:
+        ValueError: Si el modo no existe o el bloque tiene filas de años archivados
+    """
+    if mode not in WRITE_MODES:
+        raise ValueError(f"Modo de escritura desconocido: {mode}")
+    reject_archived(df)
+    write = insert_prices if mode == 'insert' else upsert_prices
+
+    if compact_layout_enabled():
+        written = write_compact_prices(conn, df, mode)
+    elif partitioning_mode(conn) == 'tables':
+        written = sum(write(conn, part, ensure_partition(conn, month)) for month, part in split_by_month(df))
+    else:
+        prepare_partitions(conn, df)
+        written = write(conn, df)
+    refresh_rollups(conn, df)
+    refresh_hour_matrix(conn, df)
+    refresh_latest_values(conn, df)
+    queue_sync(conn, df)
+    invalidate_on_commit(conn)
+    return written
+
+
+class ThroughputMeter:
+    """Mide filas por segundo de cada bloque y del total de la carga."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.chunk_started = self.started
+        self.total_rows = 0
+
+    def chunk_done(self, rows: int) -> float:
+        """Registra un bloque terminado y devuelve sus filas/segundo."""
+        now = time.perf_counter()
+        elapsed = max(now - self.chunk_started, 1e-9)
+        self.chunk_started = now
+        self.total_rows += rows
+        return rows / elapsed
+
+    @property
+    def overall_rate(self) -> float:
+        """Filas/segundo desde el inicio de la carga."""
+        return self.total_rows / max(time.perf_counter() - self.started, 1e-9)
@@ -0,0 +1,119 @@
+"""
+Caché en memoria (por proceso) para resultados de consultas de lectura.
+
+Cada caché es un LRU con caducidad (CACHE_TTL_SECONDS) y un máximo de
+entradas (CACHE_MAX_ENTRIES). Las claves deben ser hashables y describir por
+completo la consulta (nodos, rango, mercado, parámetros) e incluir la versión
+de los datos de precios (price_version).
+
+La versión vive en la base (tabla price_versions): cada transacción que
+escribe precios (write_prices marca la conexión con invalidate_on_commit)
+añade una fila cuando ya está confirmada, también desde los scripts de carga
+que corren en otros procesos. Las claves con la versión anterior no se
+vuelven a pedir, así que la API ve los datos nuevos en la siguiente petición
+sin esperar a que caduquen las entradas. En el proceso que escribe, además,
+las cachés se vacían al confirmar.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import PriceVersion
+from app.utils.commit_hooks import after_commit, on_commit
+
+
+# Clave de commit_hooks que marca una transacción con escrituras de precios
+_INVALIDATE_KEY = 'cache_invalidate'
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU con caducidad, seguro entre hilos."""
+
+    def __init__(self, name: str, max_entries: int = None, ttl_seconds: float = None):
+        self.name = name
+        self.max_entries = max_entries or settings.CACHE_MAX_ENTRIES
+        self.ttl_seconds = settings.CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Valor vigente de key, o default si no está o ha caducado."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """Guarda value en key, expulsando la entrada menos usada si la caché está llena."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Valor de key; si no está, lo calcula con compute() y lo guarda."""
+        if not settings.CACHE_ENABLED:
+            return compute()
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_CACHES: List[TTLCache] = []
+
+
+def create_cache(name: str, max_entries: int = None, ttl_seconds: float = None) -> TTLCache:
+    """Crea una caché registrada (la vacían clear_caches y las escrituras de precios)."""
+    cache = TTLCache(name, max_entries, ttl_seconds)
+    _CACHES.append(cache)
+    return cache
+
+
+def clear_caches():
+    """Vacía todas las cachés registradas del proceso."""
+    for cache in _CACHES:
+        cache.clear()
+
+
+def price_version(db: Session) -> int:
+    """Versión actual de los datos de precios (MAX(id) de price_versions; 0 sin escrituras)."""
+    return db.execute(select(func.max(PriceVersion.id))).scalar() or 0
+
+
+def invalidate_on_commit(conn: Connection):
+    """Registra una versión nueva de los datos y vacía las cachés cuando confirme la transacción."""
+    after_commit(conn, _INVALIDATE_KEY, conn.engine)
+
+
+@on_commit(_INVALIDATE_KEY)
+def _new_version(engines: List[Engine]):
+    clear_caches()
+    # Transacción propia y corta: dentro de la carga, la fila nueva quedaría
+    # bloqueada hasta su commit y las lecturas de la versión esperarían
+    for engine in set(engines):
+        with engine.begin() as conn:
+            conn.execute(insert(PriceVersion.__table__))
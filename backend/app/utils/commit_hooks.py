@@ -0,0 +1,86 @@
+"""
+Tareas que se ejecutan cuando una transacción ya está confirmada.
+
+Los módulos que reaccionan a las escrituras (vaciar cachés, actualizar la
+copia analítica, cambiar la versión de los datos) anotan la conexión con
+after_commit(conn, key, item) y registran con on_commit(key) el manejador
+que recibe los elementos anotados.
+
+El evento 'commit' de Engine llega antes del COMMIT de la base de datos:
+aquí solo pasa las anotaciones de la conexión al hilo, y los manejadores se
+ejecutan en el evento after_commit de la Session, con los datos ya
+confirmados. Si la transacción se revierte, las anotaciones se descartan.
+Solo las transacciones de una Session ejecutan manejadores (la aplicación y
+los scripts escriben siempre con Session).
+
+Un manejador que falla no puede revertir nada (la transacción ya está
+confirmada) ni lanzar la excepción (la sesión quedaría inutilizable): debe
+registrar él mismo el fallo. Las anotaciones son del proceso que escribe; los
+demás procesos no las ven.
+"""
+import threading
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+
+# Clave de conn.info con las anotaciones de la transacción en curso: {key: [item, ...]}
+_PENDING_KEY = 'after_commit'
+
+# Manejador de cada clave
+_HANDLERS: Dict[str, Callable[[List[Any]], None]] = {}
+
+# Anotaciones de la transacción que está confirmando cada hilo
+_staged = threading.local()
+
+
+def on_commit(key: str):
+    """Decorador: registra el manejador de key, que recibe la lista de elementos anotados."""
+    def register(handler: Callable[[List[Any]], None]):
+        _HANDLERS[key] = handler
+        return handler
+    return register
+
+
+def after_commit(conn: Connection, key: str, item: Any = True):
+    """Anota item para el manejador de key cuando confirme la transacción de la conexión."""
+    conn.info.setdefault(_PENDING_KEY, {}).setdefault(key, []).append(item)
+
+
+def _take_staged() -> Dict[str, List[Any]]:
+    staged = getattr(_staged, 'pending', None) or {}
+    _staged.pending = {}
+    return staged
+
+
+@event.listens_for(Engine, 'commit')
+def _stage(conn: Connection):
+    pending = conn.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    staged = getattr(_staged, 'pending', None) or {}
+    for key, items in pending.items():
+        staged.setdefault(key, []).extend(items)
+    _staged.pending = staged
+
+
+@event.listens_for(Engine, 'rollback')
+def _discard(conn: Connection):
+    conn.info.pop(_PENDING_KEY, None)
+    _staged.pending = {}
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_session(session: Session, previous_transaction):
+    _staged.pending = {}
+
+
+@event.listens_for(Session, 'after_commit')
+def _run(session: Session):
+    for key, items in _take_staged().items():
+        try:
+            _HANDLERS[key](items)
+        except Exception as e:
+            print(f"⚠️  Tarea posterior al commit '{key}' fallida ({type(e).__name__}: {e})")
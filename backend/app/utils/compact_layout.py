@@ -0,0 +1,117 @@
+"""
+Formato compacto de almacenamiento de precios (PRICE_LAYOUT = "compact").
+
+En lugar de price_records, los precios se guardan en price_hours:
+
+- el mercado es un id de un byte que referencia la tabla markets,
+- el instante es un entero de horas desde 1970-01-01 (epoch-hour),
+- la clave primaria (clúster en SQL Server) es (node_id, hour, market_id),
+- no hay id sustituto ni created_at por fila.
+
+compact_source() expone price_hours con las mismas columnas que
+price_records (timestamp y market reconstruidos), de modo que las consultas
+y la salida de la API no cambian. El filtro por rango se aplica sobre la
+columna entera hour para que use la clave primaria.
+"""
+from datetime import datetime
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert, func, null, type_coerce, cast, literal, literal_column
+from sqlalchemy import Integer, DateTime
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import FromClause
+
+from app.core.config import settings
+from app.models import Market, CompactPriceRecord
+
+
+# Columnas de price_hours que escriben los importadores
+COMPACT_COLUMNS = [
+    'node_id', 'hour', 'market_id', 'price', 'solar_capture', 'wind_capture', 'negative_hours'
+]
+
+# Clave primaria de price_hours
+COMPACT_KEY = ['node_id', 'hour', 'market_id']
+
+# Un id de mercado ocupa un byte (TINYINT en SQL Server)
+MAX_MARKET_ID = 255
+
+
+def compact_layout_enabled() -> bool:
+    """True si los precios se almacenan en el formato compacto."""
+    return settings.PRICE_LAYOUT == 'compact'
+
+
+def epoch_hour(value: datetime) -> int:
+    """Horas completas desde 1970-01-01 hasta value (truncando minutos)."""
+    return int(np.datetime64(value, 'h').astype(np.int64))
+
+
+def epoch_hours(timestamps: pd.Series) -> np.ndarray:
+    """Versión vectorizada de epoch_hour."""
+    return pd.to_datetime(timestamps).to_numpy().astype('datetime64[h]').astype(np.int64)
+
+
+def market_ids(conn: Connection, names: Iterable[str]) -> Dict[str, int]:
+    """
+    Ids de los mercados indicados, creando los que falten.
+
+    Raises:
+        ValueError: Si se supera el máximo de mercados de un byte
+    """
+    table = Market.__table__
+    names = sorted({str(name) for name in names})
+    existing = dict(conn.execute(select(table.c.name, table.c.id).where(table.c.name.in_(names))).all())
+    missing = [name for name in names if name not in existing]
+    if missing:
+        next_id = (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+        if next_id + len(missing) - 1 > MAX_MARKET_ID:
+            raise ValueError(f"Se superó el máximo de {MAX_MARKET_ID} mercados del formato compacto")
+        new = {name: next_id + i for i, name in enumerate(missing)}
+        conn.execute(insert(table), [{'id': market_id, 'name': name} for name, market_id in new.items()])
+        existing.update(new)
+    return existing
+
+
+def to_compact_frame(conn: Connection, df: pd.DataFrame) -> pd.DataFrame:
+    """Convierte un bloque con las columnas de price_records al formato de price_hours."""
+    ids = market_ids(conn, pd.unique(df['market']))
+    compact = df[['node_id', 'price', 'solar_capture', 'wind_capture', 'negative_hours']].copy()
+    compact['hour'] = epoch_hours(df['timestamp'])
+    compact['market_id'] = df['market'].astype(str).map(ids).astype(int)
+    return compact[COMPACT_COLUMNS]
+
+
+def _timestamp_expression(dialect_name: str, hour):
+    """Expresión SQL que reconstruye el timestamp de price_records desde hour."""
+    if dialect_name == 'mssql':
+        return func.dateadd(literal_column('hour'), hour, cast(literal('1970-01-01'), DateTime))
+    # SQLite: mismo formato de texto con el que SQLAlchemy guarda y compara DateTime
+    return type_coerce(func.strftime('%Y-%m-%d %H:%M:%S.000000', hour * 3600, 'unixepoch'), DateTime)
+
+
+def compact_source(bind, start: datetime = None, end: datetime = None) -> FromClause:
+    """
+    price_hours con las columnas de price_records (id y created_at nulos),
+    limitado a las horas de [start, end] (ambos incluidos).
+    """
+    table = CompactPriceRecord.__table__
+    markets = Market.__table__
+    query = select(
+        type_coerce(null(), Integer).label('id'),
+        table.c.node_id,
+        _timestamp_expression(bind.dialect.name, table.c.hour).label('timestamp'),
+        table.c.price,
+        table.c.solar_capture,
+        table.c.wind_capture,
+        table.c.negative_hours,
+        markets.c.name.label('market'),
+        type_coerce(null(), DateTime).label('created_at'),
+    ).join_from(table, markets, table.c.market_id == markets.c.id)
+    if start is not None:
+        query = query.where(table.c.hour >= epoch_hour(start))
+    if end is not None:
+        query = query.where(table.c.hour <= epoch_hour(end))
+    return query.subquery('price_records')
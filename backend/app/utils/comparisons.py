@@ -0,0 +1,105 @@
+"""
+Comparaciones de calendario: el mismo día y hora a lo largo de los meses de
+un año, de los años disponibles o de los días de la semana de un rango.
+
+Cada comparación se traduce a un conjunto de horas objetivo, cada una con su
+valor del eje (mes 1-12, año o día de la semana 0 = lunes). Los valores de
+todas las horas, nodos y tipos de dato salen de una sola consulta agrupada
+(hour_sums del motor analítico) y se promedian por valor del eje en memoria.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.models import DataType
+from app.utils.analytics import DATA_COLUMNS
+
+
+COMPARISON_AXES = ('month', 'year', 'weekday')
+
+WEEKDAYS = list(range(7))  # 0 = lunes ... 6 = domingo (datetime.weekday)
+
+
+def target_hours(axis: str, hour: int, year: int = None, month: int = None, day: int = None,
+                 start: datetime = None, end: datetime = None, years: List[int] = None) -> Dict[datetime, int]:
+    """
+    Horas objetivo de una comparación y su valor del eje. Las fechas que no
+    existen (p. ej. 30 de febrero) se omiten.
+
+    - month: day/hour de cada mes de year
+    - year: month/day/hour de cada año de years
+    - weekday: hour de cada día de [start, end]
+
+    Raises:
+        ValueError: Si el eje no existe o faltan los parámetros que requiere
+    """
+    targets = {}
+    if axis == 'month':
+        if year is None or day is None:
+            raise ValueError("La comparación por mes requiere year y day")
+        for value in range(1, 13):
+            _add_target(targets, value, year, value, day, hour)
+    elif axis == 'year':
+        if month is None or day is None:
+            raise ValueError("La comparación por año requiere month y day")
+        for value in years or []:
+            _add_target(targets, value, value, month, day, hour)
+    elif axis == 'weekday':
+        if start is None or end is None:
+            raise ValueError("La comparación por día de la semana requiere start_date y end_date")
+        current = datetime(start.year, start.month, start.day, hour)
+        if current < start:
+            current += timedelta(days=1)
+        while current <= end:
+            targets[current] = current.weekday()
+            current += timedelta(days=1)
+    else:
+        raise ValueError(f"Eje de comparación desconocido: {axis}")
+    return targets
+
+
+def _add_target(targets: Dict[datetime, int], value: int, year: int, month: int, day: int, hour: int):
+    try:
+        targets[datetime(year, month, day, hour)] = value
+    except ValueError:
+        pass
+
+
+def calendar_comparison(analytics, node_ids: List[int], data_types: List[DataType], axis: str, hour: int,
+                        year: int = None, month: int = None, day: int = None,
+                        start: datetime = None, end: datetime = None) -> Dict[int, Dict[DataType, Dict[int, Optional[float]]]]:
+    """
+    Promedio por valor del eje para cada nodo y tipo de dato.
+
+    Args:
+        analytics: Motor analítico (get_analytics)
+
+    Returns:
+        {node_id: {data_type: {valor del eje: promedio o None}}} con todos los
+        valores del eje: los 12 meses, los años con datos en la base o los 7
+        días de la semana
+
+    Raises:
+        ValueError: Si el eje no existe o faltan los parámetros que requiere
+    """
+    years = None
+    if axis == 'year':
+        first, last = analytics.time_bounds()
+        years = list(range(first.year, last.year + 1)) if first is not None else []
+    targets = target_hours(axis, hour, year=year, month=month, day=day, start=start, end=end, years=years)
+    keys = {'month': list(range(1, 13)), 'year': years, 'weekday': WEEKDAYS}[axis]
+
+    sums = analytics.hour_sums(node_ids, list(targets), data_types)
+    sums['key'] = sums['hour'].map(lambda value: targets[value.to_pydatetime()])
+    totals = sums.drop(columns=['hour']).groupby(['node_id', 'key']).sum()
+
+    result = {}
+    for node_id in node_ids:
+        result[node_id] = {}
+        for data_type in data_types:
+            column = DATA_COLUMNS[DataType(data_type)]
+            values = {}
+            for key in keys:
+                count = totals[f"{column}_count"].get((node_id, key), 0) if not totals.empty else 0
+                values[key] = float(totals[f"{column}_sum"][(node_id, key)] / count) if count else None
+            result[node_id][data_type] = values
+    return result
@@ -0,0 +1,189 @@
+"""
+Congestión entre dos nodos: diferencial de precio hora a hora.
+
+El motor analítico devuelve los precios de los dos nodos alineados por
+timestamp dentro del rango pedido (pair_prices: lectura acotada por índice
+o join en DuckDB); los diferenciales y el resumen se calculan sobre arrays
+de NumPy, sin bucles por hora. El coste depende del rango pedido, no del
+histórico total.
+
+- spread: precio del nodo 1 - precio del nodo 2 (con signo)
+- congestion_price: |spread|
+
+La matriz de diferenciales de un conjunto de nodos (spread_matrix) se
+calcula en una pasada sobre un array horas x nodos: cada bloque de filas de
+la matriz se obtiene por broadcasting (horas x bloque x nodos), sin bucles
+por par. Para una sola hora, el array sale de la matriz horaria (todo el
+catálogo en una fila).
+"""
+import math
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.models import DataType
+from app.utils.cache import create_cache
+from app.utils.hour_matrix import frame_values
+
+
+# Percentiles del diferencial absoluto incluidos en el resumen
+SUMMARY_PERCENTILES = (50, 90, 95, 99)
+
+# Estadísticas por par de la matriz de diferenciales
+MATRIX_STATS = ('mean_spread', 'mean_abs_spread', 'max_abs_spread', 'percentile_abs_spread')
+
+# Tamaño máximo de una matriz: horas x nodos x nodos
+MATRIX_MAX_CELLS = 200_000_000
+
+# Elementos por bloque de broadcasting (~40 MB en float64)
+MATRIX_BLOCK_ELEMENTS = 5_000_000
+
+# Por encima de este número de nodos no se filtra por nodo en SQL (límite de
+# parámetros de SQL Server); se lee el mercado y se filtra al pivotar
+MATRIX_NODE_FILTER_MAX = 1000
+
+# Matrices calculadas, por (versión de los datos, nodos, inicio, fin, mercado, percentil)
+spread_matrix_cache = create_cache('spread_matrix')
+
+
+def with_spreads(pairs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Añade a los pares de precios (timestamp, price1, price2) las columnas
+    spread y congestion_price; son nulas si falta alguno de los dos precios
+    (un precio de 0 es un precio válido).
+    """
+    price1 = pd.to_numeric(pairs['price1'], errors='coerce').to_numpy(dtype=float)
+    price2 = pd.to_numeric(pairs['price2'], errors='coerce').to_numpy(dtype=float)
+    spread = price1 - price2
+    return pairs.assign(price1=price1, price2=price2, spread=spread, congestion_price=np.abs(spread))
+
+
+def congestion_summary(pairs: pd.DataFrame, threshold: float = 0.0) -> Dict[str, Optional[float]]:
+    """
+    Estadísticas del diferencial en las horas con precio en ambos nodos.
+
+    Args:
+        pairs: Salida de with_spreads
+        threshold: Umbral ($/MWh) del diferencial absoluto para contar horas congestionadas
+
+    Returns:
+        Diccionario con hours, medias, extremos, desviación, percentiles del
+        diferencial absoluto y horas por encima del umbral (None sin horas)
+    """
+    spread = pairs['spread'].to_numpy(dtype=float)
+    spread = spread[~np.isnan(spread)]
+    hours = int(spread.size)
+    summary = {
+        'hours': hours,
+        'threshold': float(threshold),
+        'hours_above_threshold': 0,
+        'share_above_threshold': None,
+        'mean_spread': None,
+        'std_spread': None,
+        'min_spread': None,
+        'max_spread': None,
+        'mean_abs_spread': None,
+        'max_abs_spread': None,
+        'abs_spread_percentiles': {},
+    }
+    if not hours:
+        return summary
+
+    absolute = np.abs(spread)
+    above = int(np.count_nonzero(absolute > threshold))
+    percentiles = np.percentile(absolute, SUMMARY_PERCENTILES)
+    summary.update({
+        'hours_above_threshold': above,
+        'share_above_threshold': above / hours,
+        'mean_spread': float(spread.mean()),
+        'std_spread': float(spread.std()),
+        'min_spread': float(spread.min()),
+        'max_spread': float(spread.max()),
+        'mean_abs_spread': float(absolute.mean()),
+        'max_abs_spread': float(absolute.max()),
+        'abs_spread_percentiles': {
+            f"p{percentile}": float(value) for percentile, value in zip(SUMMARY_PERCENTILES, percentiles)
+        },
+    })
+    return summary
+
+
+def price_grid(rows: pd.DataFrame, node_ids: List[int]) -> np.ndarray:
+    """
+    Pivota filas (node_id, timestamp, price) a un array horas x nodos en el
+    orden de node_ids (NaN = sin dato; varias filas de una hora se promedian).
+    """
+    if rows.empty:
+        return np.empty((0, len(node_ids)))
+    grid = rows.assign(
+        timestamp=pd.to_datetime(rows['timestamp']),
+        price=pd.to_numeric(rows['price'], errors='coerce'),
+    ).pivot_table(index='timestamp', columns='node_id', values='price', aggfunc='mean')
+    return grid.reindex(columns=node_ids).to_numpy(dtype=float)
+
+
+def load_price_grid(db: Session, analytics, node_ids: List[int], start: datetime, end: datetime,
+                    market: Optional[str] = None) -> np.ndarray:
+    """
+    Array horas x nodos de precios en [start, end]. Una sola hora en punto
+    con mercado se lee de la matriz horaria; el resto, del motor analítico.
+    """
+    if start == end and market and start == start.replace(minute=0, second=0, microsecond=0):
+        values = frame_values(db, market, start, DataType.PRICE)
+        if values is not None:
+            return np.array([[values.get(node_id, np.nan) for node_id in node_ids]], dtype=float)
+    node_filter = node_ids if len(node_ids) <= MATRIX_NODE_FILTER_MAX else None
+    return price_grid(analytics.rows(node_filter, start, end, ['price'], market), node_ids)
+
+
+def _sorted_percentile(ordered: np.ndarray, count: np.ndarray, percentile: float) -> np.ndarray:
+    """
+    Percentil (interpolación lineal, como np.percentile) a lo largo del eje 0
+    de valores ordenados con los NaN al final; count = valores no nulos.
+    """
+    position = np.maximum(count - 1, 0) * (percentile / 100.0)
+    lower = np.floor(position).astype(int)
+    upper = np.ceil(position).astype(int)
+    low = np.take_along_axis(ordered, lower[None], axis=0)[0]
+    high = np.take_along_axis(ordered, upper[None], axis=0)[0]
+    return np.where(count > 0, low + (high - low) * (position - lower), np.nan)
+
+
+def spread_matrix(grid: np.ndarray, percentile: float = 95.0) -> Dict[str, np.ndarray]:
+    """
+    Estadísticas del diferencial (fila - columna) de todos los pares de nodos
+    sobre un array horas x nodos, en las horas con precio en ambos nodos.
+
+    Returns:
+        {'hours': matriz de horas comunes, y una matriz nodos x nodos por
+        estadística de MATRIX_STATS (NaN si el par no tiene horas comunes)}
+    """
+    hours, size = grid.shape
+    result = {name: np.full((size, size), np.nan) for name in MATRIX_STATS}
+    result['hours'] = np.zeros((size, size), dtype=int)
+    if hours == 0 or size == 0:
+        return result
+
+    block = max(1, MATRIX_BLOCK_ELEMENTS // (hours * size))
+    for first in range(0, size, block):
+        rows = slice(first, min(first + block, size))
+        spread = grid[:, rows, None] - grid[:, None, :]  # horas x bloque x nodos
+        absolute = np.abs(spread)
+        present = ~np.isnan(spread)
+        count = present.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result['mean_spread'][rows] = np.where(present, spread, 0.0).sum(axis=0) / count
+            result['mean_abs_spread'][rows] = np.where(present, absolute, 0.0).sum(axis=0) / count
+        ordered = np.sort(absolute, axis=0)  # NaN al final
+        result['max_abs_spread'][rows] = _sorted_percentile(ordered, count, 100.0)
+        result['percentile_abs_spread'][rows] = _sorted_percentile(ordered, count, percentile)
+        result['hours'][rows] = count
+    return result
+
+
+def nested(matrix: np.ndarray) -> List[List[Optional[float]]]:
+    """Matriz como listas anidadas con None en los NaN."""
+    return [[None if math.isnan(value) else value for value in row] for row in matrix.tolist()]
@@ -0,0 +1,77 @@
+"""
+Distribución de los valores de un nodo en un rango, reducida en el servidor:
+
+- Curva de duración: el valor superado en cada nivel de excedencia (0 % =
+  máximo, 100 % = mínimo) para un número fijo de puntos equiespaciados.
+- Histograma: bins de ancho fijo entre el mínimo y el máximo, en número
+  indicado o automático (regla 'auto' de NumPy: Freedman-Diaconis o Sturges).
+
+Ambas se resuelven con selección de cuantiles (np.quantile / quantile_cont de
+DuckDB, sin ordenar todos los valores); la respuesta tiene el mismo tamaño sea
+cual sea el rango.
+"""
+import math
+from typing import List, Optional
+
+import numpy as np
+
+
+# Puntos por defecto de la curva de duración
+DURATION_POINTS = 200
+
+# Máximo de bins de un histograma pedido explícitamente
+MAX_HISTOGRAM_BINS = 1000
+
+# Máximo de bins automáticos (las colas largas de precios disparan Freedman-Diaconis)
+AUTO_HISTOGRAM_BINS = 200
+
+
+def exceedance_levels(points: int) -> np.ndarray:
+    """Niveles de excedencia (%) equiespaciados de 0 a 100."""
+    return np.linspace(0.0, 100.0, points)
+
+
+def duration_quantiles(points: int) -> List[float]:
+    """Cuantiles (0-1) cuyo valor se supera en cada nivel de excedencia, en el mismo orden."""
+    return (1.0 - exceedance_levels(points) / 100.0).tolist()
+
+
+def auto_bin_count(count: int, low: float, high: float, q25: float, q75: float) -> int:
+    """
+    Número de bins con la regla 'auto' de NumPy: el menor ancho entre
+    Freedman-Diaconis (2 * IQR / n^(1/3)) y Sturges (rango / (log2(n) + 1)),
+    hasta AUTO_HISTOGRAM_BINS.
+    """
+    span = high - low
+    if count == 0 or span <= 0:
+        return 1
+    width = span / (math.log2(count) + 1.0)
+    fd_width = 2.0 * (q75 - q25) * count ** (-1.0 / 3.0)
+    if fd_width > 0:
+        width = min(width, fd_width)
+    return max(1, min(AUTO_HISTOGRAM_BINS, int(math.ceil(span / width))))
+
+
+def bin_edges(low: float, high: float, bins: int) -> np.ndarray:
+    """Bordes de bins equiespaciados; un rango vacío se abre a ±0.5 como en np.histogram."""
+    if high <= low:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+
+def histogram(values: np.ndarray, bins: Optional[int] = None):
+    """
+    Histograma de un array de valores no nulos.
+
+    Returns:
+        (bordes, conteos); sin valores, ([], [])
+    """
+    if values.size == 0:
+        return [], []
+    low, high = float(values.min()), float(values.max())
+    if bins is None:
+        q25, q75 = np.percentile(values, [25, 75])
+        bins = auto_bin_count(values.size, low, high, float(q25), float(q75))
+    edges = bin_edges(low, high, bins)
+    counts, _ = np.histogram(values, bins=edges)
+    return edges.tolist(), counts.tolist()
@@ -0,0 +1,250 @@
+"""
+Matriz horaria de precios: una fila por (mercado, hora, tipo de dato).
+
+Cada fila de hour_matrices guarda los valores de todos los nodos de esa hora
+como un vector float64 empaquetado (little-endian) en el que la posición i
+corresponde al nodo con id i + 1 (NaN = sin dato). float64 guarda los mismos
+valores que price_records: float32 solo conserva ~7 cifras significativas y
+alteraría los precios de escasez (4999.99 -> 4999.9902). Las filas escritas
+antes en float32 se siguen leyendo (unpack) y pasan a float64 al
+actualizarse o al reconstruir la matriz. Un fotograma del mapa de
+calor cuesta así una búsqueda por clave y la decodificación de un buffer, en
+lugar de recorrer las filas de todos los nodos en price_records.
+
+La ingesta mantiene la matriz al día: write_prices llama a
+refresh_hour_matrix, que parchea solo las horas del bloque. Igual que en el
+upsert, los valores nulos del bloque no sobrescriben los existentes.
+
+Uso directo (reconstruir la matriz desde price_records):
+    python -m app.utils.hour_matrix
+"""
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert, update, delete, func, bindparam
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import HourMatrix, DataType
+from app.utils.partitions import price_source, month_start, next_month
+
+
+# Tipo de dato -> columna de price_records
+MATRIX_COLUMNS = {
+    DataType.PRICE: 'price',
+    DataType.SOLAR_CAPTURE: 'solar_capture',
+    DataType.WIND_CAPTURE: 'wind_capture',
+    DataType.NEGATIVE_HOURS: 'negative_hours',
+}
+
+# Formato del vector: float64 little-endian
+VALUE_DTYPE = np.dtype('<f8')
+
+# Formato de las filas escritas antes de pasar a float64, y decimales con los
+# que se leen (como antes; float32 solo conserva ~7 cifras significativas)
+LEGACY_DTYPE = np.dtype('<f4')
+LEGACY_DECIMALS = 4
+
+# Filas leídas por consulta al borrar un nodo de la matriz
+CLEAR_BATCH_SIZE = 2000
+
+
+def pack(values: np.ndarray) -> bytes:
+    """Empaqueta un vector de valores por nodo."""
+    return np.asarray(values, dtype=VALUE_DTYPE).tobytes()
+
+
+def unpack(blob: bytes, node_count: int) -> np.ndarray:
+    """Desempaqueta un vector de node_count valores por nodo (solo lectura), también en float32."""
+    if node_count and len(blob) == node_count * LEGACY_DTYPE.itemsize:
+        return np.round(np.frombuffer(blob, dtype=LEGACY_DTYPE).astype(VALUE_DTYPE), LEGACY_DECIMALS)
+    return np.frombuffer(blob, dtype=VALUE_DTYPE)
+
+
+def merge_vectors(current: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """Superpone new sobre current; las posiciones NaN de new conservan el valor actual."""
+    merged = np.full(max(len(current), len(new)), np.nan, dtype=VALUE_DTYPE)
+    merged[:len(current)] = current
+    present = ~np.isnan(new)
+    merged[:len(new)][present] = new[present]
+    return merged
+
+
+def build_frames(df: pd.DataFrame) -> Iterator[Tuple[str, DataType, pd.DatetimeIndex, np.ndarray]]:
+    """
+    Pivota filas de price_records a matrices hora x nodo.
+
+    Yields:
+        (mercado, tipo de dato, horas, matriz float64 de len(horas) x max(node_id))
+        por cada mercado y tipo de dato con algún valor
+    """
+    if df.empty:
+        return
+    hours = pd.to_datetime(df['timestamp']).dt.floor('h')
+    width = int(df['node_id'].max())
+    for market, part in df.groupby('market', sort=False):
+        for data_type, column in MATRIX_COLUMNS.items():
+            values = pd.to_numeric(part[column], errors='coerce')
+            present = values.notna()
+            if not present.any():
+                continue
+            grid = pd.DataFrame({
+                'hour': hours.loc[part.index][present],
+                'node_id': part['node_id'][present].astype(int),
+                'value': values[present],
+            }).pivot_table(index='hour', columns='node_id', values='value', aggfunc='mean')
+            matrix = np.full((len(grid), width), np.nan, dtype=VALUE_DTYPE)
+            matrix[:, grid.columns.to_numpy(dtype=int) - 1] = grid.to_numpy()
+            yield str(market), data_type, grid.index, matrix
+
+
+def _read_rows(conn: Connection, market: str, data_type: DataType,
+               start: datetime, end: datetime) -> Dict[datetime, Tuple[int, np.ndarray]]:
+    """Filas existentes de la matriz en [start, end] para un mercado y tipo de dato."""
+    table = HourMatrix.__table__
+    rows = conn.execute(
+        select(table.c.id, table.c.hour, table.c.node_count, table.c.node_values).where(
+            table.c.market == market,
+            table.c.data_type == data_type,
+            table.c.hour >= start,
+            table.c.hour <= end,
+        )
+    )
+    return {hour: (row_id, unpack(blob, count)) for row_id, hour, count, blob in rows}
+
+
+def refresh_hour_matrix(conn: Connection, df: pd.DataFrame):
+    """
+    Actualiza la matriz horaria con un bloque recién escrito en price_records,
+    dentro de la transacción del llamador.
+    """
+    if not settings.HOUR_MATRIX_ENABLED or df.empty:
+        return
+    table = HourMatrix.__table__
+    for market, data_type, hours, matrix in build_frames(df):
+        existing = _read_rows(conn, market, data_type,
+                              hours.min().to_pydatetime(), hours.max().to_pydatetime())
+        inserts, updates = [], []
+        for hour, vector in zip(hours, matrix):
+            hour = hour.to_pydatetime()
+            current = existing.get(hour)
+            if current is None:
+                inserts.append({
+                    'market': market, 'hour': hour, 'data_type': data_type,
+                    'node_count': len(vector), 'node_values': pack(vector),
+                })
+            else:
+                merged = merge_vectors(current[1], vector)
+                updates.append({'row_id': current[0], 'new_count': len(merged), 'new_values': pack(merged)})
+        if inserts:
+            conn.execute(insert(table), inserts)
+        if updates:
+            conn.execute(
+                update(table)
+                .where(table.c.id == bindparam('row_id'))
+                .values(node_count=bindparam('new_count'), node_values=bindparam('new_values')),
+                updates
+            )
+
+
+def clear_node(conn: Connection, node_id: int):
+    """Borra el valor de un nodo (su posición pasa a NaN) en todas las filas de la matriz."""
+    table = HourMatrix.__table__
+    slot = node_id - 1
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.node_count, table.c.node_values)
+            .where(table.c.id > last_id, table.c.node_count > slot)
+            .order_by(table.c.id)
+            .limit(CLEAR_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            return
+        updates = []
+        for row_id, count, blob in rows:
+            vector = unpack(blob, count).copy()
+            if not np.isnan(vector[slot]):
+                vector[slot] = np.nan
+                updates.append({'row_id': row_id, 'new_values': pack(vector)})
+        if updates:
+            conn.execute(
+                update(table).where(table.c.id == bindparam('row_id')).values(node_values=bindparam('new_values')),
+                updates
+            )
+        last_id = rows[-1][0]
+
+
+def rebuild_hour_matrix(db: Session) -> int:
+    """Reconstruye la matriz horaria desde price_records, mes a mes (una transacción por mes)."""
+    source = price_source(db)
+    first, last = db.execute(select(func.min(source.c.timestamp), func.max(source.c.timestamp))).one()
+    if first is None:
+        return 0
+    table = HourMatrix.__table__
+    columns = ['node_id', 'market', 'timestamp'] + list(MATRIX_COLUMNS.values())
+    month = month_start(first)
+    months = 0
+    while month <= last:
+        end = next_month(month)
+        conn = db.connection()
+        source = price_source(conn, month, end)
+        rows = conn.execute(
+            select(*[source.c[c] for c in columns])
+            .where(source.c.timestamp >= month, source.c.timestamp < end)
+        ).fetchall()
+        conn.execute(delete(table).where(table.c.hour >= month, table.c.hour < end))
+        refresh_hour_matrix(conn, pd.DataFrame(rows, columns=columns))
+        db.commit()
+        months += 1
+        print(f"   ✅ {month:%Y-%m}")
+        month = end
+    return months
+
+
+# ---------------------------------------------------------------------------
+# Consultas
+# ---------------------------------------------------------------------------
+
+def read_frame(db: Session, market: str, hour: datetime, data_type: DataType) -> Optional[np.ndarray]:
+    """
+    Vector de valores por nodo (posición i = nodo i + 1) de una hora, o None si
+    la matriz está deshabilitada o no tiene esa hora.
+    """
+    if not settings.HOUR_MATRIX_ENABLED:
+        return None
+    row = db.execute(
+        select(HourMatrix.node_count, HourMatrix.node_values).where(
+            HourMatrix.market == market,
+            HourMatrix.data_type == DataType(data_type),
+            HourMatrix.hour == hour,
+        )
+    ).first()
+    if row is None:
+        return None
+    return unpack(row.node_values, row.node_count)
+
+
+def frame_values(db: Session, market: str, hour: datetime, data_type: DataType) -> Optional[Dict[int, float]]:
+    """Valores de una hora como {node_id: valor} (solo nodos con dato), o None si no hay fotograma."""
+    frame = read_frame(db, market, hour, data_type)
+    if frame is None:
+        return None
+    slots = np.flatnonzero(~np.isnan(frame))
+    return {int(slot) + 1: float(frame[slot]) for slot in slots}
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal, init_db
+
+    init_db()
+    session = SessionLocal()
+    try:
+        print("Reconstruyendo matriz horaria...")
+        count = rebuild_hour_matrix(session)
+        print(f"✓ Matriz horaria reconstruida para {count} meses.")
+    finally:
+        session.close()
@@ -0,0 +1,143 @@
+"""
+Gestión de índices de precios durante cargas masivas.
+
+Durante una carga de millones de filas cada índice secundario se mantiene
+fila a fila. En modo de carga masiva los índices no únicos se desactivan
+(SQL Server: ALTER INDEX ... DISABLE) o se eliminan (SQLite), se cargan los
+datos y se reconstruyen al final en una sola pasada ordenada. El índice
+único de la clave natural se conserva porque lo usa el modo upsert.
+
+Los índices son los de las tablas que reciben los registros en el
+almacenamiento activo: price_hours con PRICE_LAYOUT=compact, las tablas
+mensuales con particionado en SQLite (las de los meses que se creen durante
+la carga nacen ya indexadas) o price_records en el resto de casos.
+
+Uso directo (reconstruir índices tras una carga interrumpida):
+    python -m app.utils.index_management
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+from sqlalchemy import Table, inspect, text
+from sqlalchemy.engine import Engine
+
+from app.db.database import engine as default_engine
+from app.models import PriceRecord, CompactPriceRecord
+from app.utils.compact_layout import compact_layout_enabled
+from app.utils.partitions import partitioning_mode, existing_partitions, partition_table
+
+
+def price_tables(bind) -> List[Table]:
+    """Tablas que reciben los registros de precios en el almacenamiento activo."""
+    if compact_layout_enabled():
+        return [CompactPriceRecord.__table__]
+    if partitioning_mode(bind) == 'tables':
+        return [partition_table(month) for month in existing_partitions(bind)]
+    return [PriceRecord.__table__]
+
+
+def secondary_price_indexes(table: Table = None) -> List:
+    """Índices de una tabla de precios (price_records por defecto) que se pueden suspender (todos menos los únicos)."""
+    table = PriceRecord.__table__ if table is None else table
+    return sorted((ix for ix in table.indexes if not ix.unique), key=lambda ix: ix.name)
+
+
+def _disabled_mssql_indexes(conn, table_name: str) -> set:
+    """Nombres de los índices de una tabla desactivados en SQL Server."""
+    rows = conn.execute(text(
+        "SELECT name FROM sys.indexes "
+        "WHERE object_id = OBJECT_ID(:table_name) AND is_disabled = 1"
+    ), {'table_name': table_name})
+    return {row[0] for row in rows}
+
+
+def suspend_price_indexes(engine: Engine = None) -> List[str]:
+    """
+    Desactiva (SQL Server) o elimina (resto) los índices secundarios de las
+    tablas de precios activas.
+
+    Returns:
+        Nombres de los índices suspendidos
+    """
+    engine = engine or default_engine
+    suspended = []
+    with engine.begin() as conn:
+        for table in price_tables(conn):
+            existing = {ix['name'] for ix in inspect(conn).get_indexes(table.name)}
+            for index in secondary_price_indexes(table):
+                if index.name not in existing:
+                    continue
+                if engine.dialect.name == 'mssql':
+                    conn.execute(text(f"ALTER INDEX {index.name} ON {table.name} DISABLE"))
+                else:
+                    index.drop(conn)
+                suspended.append(index.name)
+    return suspended
+
+
+def rebuild_price_indexes(engine: Engine = None) -> List[str]:
+    """
+    Reconstruye los índices secundarios de las tablas de precios activas que
+    estén desactivados o ausentes. Es idempotente: sirve también para reparar
+    una carga masiva interrumpida.
+
+    Returns:
+        Nombres de los índices reconstruidos
+    """
+    engine = engine or default_engine
+    rebuilt = []
+    with engine.begin() as conn:
+        for table in price_tables(conn):
+            existing = {ix['name'] for ix in inspect(conn).get_indexes(table.name)}
+            disabled = _disabled_mssql_indexes(conn, table.name) if engine.dialect.name == 'mssql' else set()
+            for index in secondary_price_indexes(table):
+                if index.name in disabled:
+                    conn.execute(text(
+                        f"ALTER INDEX {index.name} ON {table.name} REBUILD WITH (SORT_IN_TEMPDB = ON)"
+                    ))
+                    rebuilt.append(index.name)
+                elif index.name not in existing:
+                    index.create(conn)
+                    rebuilt.append(index.name)
+    return rebuilt
+
+
+@contextmanager
+def bulk_load_indexes(enabled: bool = True, engine: Engine = None) -> Iterator[Dict]:
+    """
+    Suspende los índices secundarios mientras dura el bloque y los
+    reconstruye al salir, aunque la carga falle.
+
+    Yields:
+        Diccionario de tiempos que se completa al salir: load_seconds,
+        rebuild_seconds e indexes (nombres suspendidos)
+    """
+    timings = {'load_seconds': 0.0, 'rebuild_seconds': 0.0, 'indexes': []}
+    if enabled:
+        timings['indexes'] = suspend_price_indexes(engine)
+    started = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings['load_seconds'] = time.perf_counter() - started
+        if enabled:
+            rebuild_started = time.perf_counter()
+            rebuild_price_indexes(engine)
+            timings['rebuild_seconds'] = time.perf_counter() - rebuild_started
+
+
+def print_index_report(timings: Dict):
+    """Muestra el reparto de tiempo entre carga y reconstrucción de índices."""
+    if not timings['indexes']:
+        return
+    total = timings['load_seconds'] + timings['rebuild_seconds']
+    print(f"   - Índices suspendidos: {', '.join(timings['indexes'])}")
+    print(f"   - Tiempo de carga: {timings['load_seconds']:.1f}s")
+    print(f"   - Tiempo de reconstrucción de índices: {timings['rebuild_seconds']:.1f}s")
+    print(f"   - Tiempo total: {total:.1f}s")
+
+
+if __name__ == "__main__":
+    names = rebuild_price_indexes()
+    print(f"Índices reconstruidos: {', '.join(names) if names else 'ninguno (todos activos)'}")
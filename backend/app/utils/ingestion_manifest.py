@@ -0,0 +1,106 @@
+"""
+Manifiesto de ingesta: registra qué archivos fuente se cargaron, con qué
+contenido (hash SHA-256) y hasta qué fila quedó confirmada la carga.
+
+Permite saltar archivos ya cargados, reanudar desde el último checkpoint
+tras un fallo y reprocesar solo los archivos cuyo contenido cambió.
+"""
+import hashlib
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import IngestionManifest, IngestionStatus
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """Calcula el hash SHA-256 del contenido de un archivo leyendo por bloques."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_key(file_path: str) -> str:
+    """Ruta normalizada con la que se identifica el archivo en el manifiesto."""
+    return os.path.normcase(os.path.abspath(file_path))
+
+
+def start_file(db: Session, file_path: str, force: bool = False,
+               content_hash: str = None) -> Optional[IngestionManifest]:
+    """
+    Abre (o reanuda) la entrada del manifiesto para un archivo.
+
+    - Mismo contenido y estado completado: devuelve None (nada que cargar).
+    - Mismo contenido con carga incompleta: reanuda desde entry.row_end.
+    - Archivo nuevo, contenido distinto o force=True: empieza desde la fila 0.
+
+    Args:
+        db: Sesión de base de datos
+        file_path: Ruta del archivo fuente
+        force: Recargar aunque el archivo ya esté completado
+        content_hash: Hash ya calculado (si no, se calcula aquí)
+
+    Returns:
+        Entrada del manifiesto en estado in_progress, o None si se salta
+    """
+    content_hash = content_hash or file_sha256(file_path)
+    key = manifest_key(file_path)
+    entry = db.query(IngestionManifest).filter(IngestionManifest.file_path == key).first()
+
+    if entry and entry.content_hash == content_hash and not force:
+        if entry.status == IngestionStatus.COMPLETED:
+            return None
+        # Reanudar desde el último checkpoint confirmado
+        entry.status = IngestionStatus.IN_PROGRESS
+        entry.error = None
+        db.commit()
+        return entry
+
+    if entry is None:
+        entry = IngestionManifest(file_path=key)
+        db.add(entry)
+
+    entry.content_hash = content_hash
+    entry.row_start = 0
+    entry.row_end = 0
+    entry.rows_loaded = 0
+    entry.status = IngestionStatus.IN_PROGRESS
+    entry.error = None
+    entry.started_at = datetime.utcnow()
+    entry.finished_at = None
+    db.commit()
+    return entry
+
+
+def checkpoint(entry: IngestionManifest, row_end: int, rows_loaded: int):
+    """
+    Avanza el checkpoint de la entrada. No confirma: el llamador hace commit
+    en la misma transacción que los datos del bloque, de modo que datos y
+    checkpoint quedan confirmados juntos.
+
+    Args:
+        entry: Entrada del manifiesto
+        row_end: Primera fila fuente aún no cargada
+        rows_loaded: Registros escritos en este bloque
+    """
+    entry.row_end = row_end
+    entry.rows_loaded += rows_loaded
+
+
+def finish_file(db: Session, entry: IngestionManifest):
+    """Marca la entrada como completada y confirma."""
+    entry.status = IngestionStatus.COMPLETED
+    entry.finished_at = datetime.utcnow()
+    db.commit()
+
+
+def fail_file(db: Session, entry: IngestionManifest, error: Exception):
+    """Revierte el bloque en curso y deja la entrada como fallida (el checkpoint se conserva)."""
+    db.rollback()
+    entry.status = IngestionStatus.FAILED
+    entry.error = str(error)[:1000]
+    db.commit()
@@ -0,0 +1,221 @@
+"""
+Último valor por nodo: una fila por (nodo, mercado, tipo de dato) con el
+timestamp y el valor no nulo más recientes.
+
+/nodes/with-prices resuelve así el último precio de todos los nodos con un
+solo join contra node_latest_values, en lugar de una consulta ordenada por
+nodo sobre price_records.
+
+La ingesta mantiene la tabla al día: write_prices llama a
+refresh_latest_values, que solo avanza una fila si el bloque trae un valor
+igual o más reciente (igual: el upsert corrigió la última hora). Los valores
+nulos del bloque no cuentan, igual que en el upsert.
+
+La reconstrucción usa una función de ventana (ROW_NUMBER por nodo y mercado)
+sobre price_source y completa con el archivo histórico los nodos que ya no
+tienen filas en la base.
+
+Uso directo (reconstruir la tabla):
+    python -m app.utils.latest_values
+"""
+from datetime import datetime
+from typing import Dict, Tuple
+
+import pandas as pd
+from sqlalchemy import select, insert, update, delete, func, bindparam
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select, Subquery
+
+from app.core.config import settings
+from app.models import NodeLatestValue, DataType
+from app.utils.partitions import price_source
+from app.utils.archive import archived_years, read_archive
+
+
+# Tipo de dato -> columna de price_records
+LATEST_COLUMNS = {
+    DataType.PRICE: 'price',
+    DataType.SOLAR_CAPTURE: 'solar_capture',
+    DataType.WIND_CAPTURE: 'wind_capture',
+    DataType.NEGATIVE_HOURS: 'negative_hours',
+}
+
+# Nodos por consulta al leer claves existentes (SQL Server admite ~2100 parámetros)
+KEY_BATCH_SIZE = 1000
+
+LatestKey = Tuple[int, str, DataType]
+
+
+def latest_from_frame(df: pd.DataFrame) -> Dict[LatestKey, Tuple[datetime, float]]:
+    """
+    Último valor no nulo de cada nodo, mercado y tipo de dato de un bloque de
+    filas de price_records.
+
+    Returns:
+        {(node_id, mercado, tipo de dato): (timestamp, valor)}
+    """
+    latest = {}
+    if df.empty:
+        return latest
+    timestamps = pd.to_datetime(df['timestamp'])
+    for data_type, column in LATEST_COLUMNS.items():
+        values = pd.to_numeric(df[column], errors='coerce')
+        present = values.notna()
+        if not present.any():
+            continue
+        part = pd.DataFrame({
+            'node_id': df['node_id'][present].astype(int),
+            'market': df['market'][present].astype(str),
+            'timestamp': timestamps[present],
+            'value': values[present],
+        })
+        rows = part.loc[part.groupby(['node_id', 'market'], sort=False)['timestamp'].idxmax()]
+        for node_id, market, timestamp, value in rows.itertuples(index=False):
+            latest[(int(node_id), market, data_type)] = (timestamp.to_pydatetime(), float(value))
+    return latest
+
+
+def _read_keys(conn: Connection, node_ids) -> Dict[LatestKey, Tuple[int, datetime]]:
+    """Filas existentes de los nodos: {clave: (id, timestamp)}."""
+    table = NodeLatestValue.__table__
+    node_ids = sorted(int(node_id) for node_id in node_ids)
+    existing = {}
+    for offset in range(0, len(node_ids), KEY_BATCH_SIZE):
+        rows = conn.execute(
+            select(table.c.id, table.c.node_id, table.c.market, table.c.data_type, table.c.timestamp)
+            .where(table.c.node_id.in_(node_ids[offset:offset + KEY_BATCH_SIZE]))
+        )
+        for row_id, node_id, market, data_type, timestamp in rows:
+            existing[(node_id, market, DataType(data_type))] = (row_id, timestamp)
+    return existing
+
+
+def _write_latest(conn: Connection, latest: Dict[LatestKey, Tuple[datetime, float]]):
+    """Inserta o avanza las claves de latest cuyo timestamp no es anterior al guardado."""
+    if not latest:
+        return
+    table = NodeLatestValue.__table__
+    existing = _read_keys(conn, {key[0] for key in latest})
+    inserts, updates = [], []
+    for (node_id, market, data_type), (timestamp, value) in latest.items():
+        current = existing.get((node_id, market, data_type))
+        if current is None:
+            inserts.append({
+                'node_id': node_id, 'market': market, 'data_type': data_type,
+                'timestamp': timestamp, 'value': value,
+            })
+        elif timestamp >= current[1]:
+            updates.append({'row_id': current[0], 'new_timestamp': timestamp, 'new_value': value})
+    if inserts:
+        conn.execute(insert(table), inserts)
+    if updates:
+        conn.execute(
+            update(table)
+            .where(table.c.id == bindparam('row_id'))
+            .values(timestamp=bindparam('new_timestamp'), value=bindparam('new_value')),
+            updates
+        )
+
+
+def refresh_latest_values(conn: Connection, df: pd.DataFrame):
+    """
+    Actualiza los últimos valores con un bloque recién escrito en
+    price_records, dentro de la transacción del llamador.
+    """
+    if not settings.LATEST_VALUES_ENABLED or df.empty:
+        return
+    _write_latest(conn, latest_from_frame(df))
+
+
+def delete_node_latest_values(conn: Connection, node_id: int):
+    """Borra los últimos valores de un nodo (al darlo de baja)."""
+    conn.execute(delete(NodeLatestValue.__table__).where(NodeLatestValue.node_id == node_id))
+
+
+def latest_query(source, column: str, per_market: bool = True) -> Select:
+    """
+    Último valor no nulo de una columna con ROW_NUMBER() sobre una fuente de
+    precios (price_source).
+
+    Args:
+        per_market: Una fila por nodo y mercado; si es False, una por nodo
+
+    Returns:
+        SELECT con node_id, market, timestamp, value
+    """
+    partition = (source.c.node_id, source.c.market) if per_market else (source.c.node_id,)
+    ranked = (
+        select(
+            source.c.node_id, source.c.market, source.c.timestamp, source.c[column].label('value'),
+            func.row_number().over(partition_by=partition, order_by=source.c.timestamp.desc()).label('rn'),
+        )
+        .where(source.c[column].isnot(None))
+        .subquery()
+    )
+    return select(ranked.c.node_id, ranked.c.market, ranked.c.timestamp, ranked.c.value).where(ranked.c.rn == 1)
+
+
+def latest_by_node(db: Session, data_type: DataType) -> Subquery:
+    """
+    Último valor de cada nodo entre todos sus mercados, como subconsulta con
+    node_id, timestamp y value. Sale de node_latest_values o, si la tabla está
+    deshabilitada, de la función de ventana sobre price_source.
+    """
+    data_type = DataType(data_type)
+    if not settings.LATEST_VALUES_ENABLED:
+        return latest_query(price_source(db), LATEST_COLUMNS[data_type], per_market=False).subquery()
+    table = NodeLatestValue.__table__
+    ranked = (
+        select(
+            table.c.node_id, table.c.market, table.c.timestamp, table.c.value,
+            func.row_number().over(partition_by=table.c.node_id, order_by=table.c.timestamp.desc()).label('rn'),
+        )
+        .where(table.c.data_type == data_type)
+        .subquery()
+    )
+    return (
+        select(ranked.c.node_id, ranked.c.market, ranked.c.timestamp, ranked.c.value)
+        .where(ranked.c.rn == 1)
+        .subquery()
+    )
+
+
+def rebuild_latest_values(db: Session) -> int:
+    """
+    Reconstruye node_latest_values desde price_source con la función de
+    ventana; las claves sin filas en la base salen del archivo histórico
+    (del año más reciente hacia atrás).
+
+    Returns:
+        Filas escritas
+    """
+    conn = db.connection()
+    source = price_source(conn)
+    latest = {}
+    for data_type, column in LATEST_COLUMNS.items():
+        for node_id, market, timestamp, value in conn.execute(latest_query(source, column)):
+            latest[(node_id, market, data_type)] = (timestamp, value)
+
+    for year in reversed(archived_years()):
+        archived = latest_from_frame(read_archive(datetime(year, 1, 1), datetime(year, 12, 31, 23, 59, 59)))
+        for key, entry in archived.items():
+            latest.setdefault(key, entry)
+
+    conn.execute(delete(NodeLatestValue.__table__))
+    _write_latest(conn, latest)
+    db.commit()
+    return len(latest)
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal, init_db
+
+    init_db()
+    session = SessionLocal()
+    try:
+        print("Reconstruyendo últimos valores por nodo...")
+        count = rebuild_latest_values(session)
+        print(f"✓ {count:,} últimos valores escritos.")
+    finally:
+        session.close()
@@ -0,0 +1,141 @@
+"""
+Geometría del mapa de Voronoi precalculada por estado del catálogo de nodos.
+
+Los polígonos solo dependen de los nodos activos de la zona, no de la hora
+pedida: se generan una vez (shapely) y se guardan como una plantilla de
+features ya serializadas a JSON. Cada petición solo consulta los valores de
+la hora y los inserta en la plantilla (render_geometry).
+
+La plantilla se guarda por huella del catálogo de la zona, leída de la base
+en cada petición (catalog_fingerprint: nodos activos, mayor id y mayor
+updated_at). Las altas, bajas y modificaciones hechas desde cualquier
+proceso (API, sync_nodes, populate_db) cambian la huella, y la siguiente
+petición genera la plantilla nueva. Las hechas desde este proceso marcan
+además la conexión con node_catalog_changed para vaciar la caché al
+confirmar.
+"""
+import json
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models import Node
+from app.utils.cache import TTLCache
+from app.utils.commit_hooks import after_commit, on_commit
+
+
+# Zona cuyos nodos se dibujan en el mapa
+VORONOI_ZONE = 'Central'
+
+# Clave de commit_hooks que marca una transacción con cambios en el catálogo de nodos
+_CATALOG_KEY = 'node_catalog_changed'
+
+# Plantillas por (huella del catálogo, zona); no la vacían las escrituras de precios
+geometry_cache = TTLCache('voronoi_geometry', max_entries=8)
+
+
+class GeometryTemplate(NamedTuple):
+    """
+    Features serializadas en dos trozos, con el id del nodo de cada una: el
+    prefijo acaba dentro de properties, tras su último miembro, y el sufijo
+    empieza con el cierre de properties. Los valores van entre ambos.
+    """
+    node_ids: List[int]
+    prefixes: List[str]
+    suffixes: List[str]
+
+
+def catalog_fingerprint(db: Session, zone: str) -> Tuple[int, Optional[int], Optional[datetime]]:
+    """Número de nodos activos de la zona, su mayor id y su mayor updated_at."""
+    return tuple(db.execute(
+        select(func.count(Node.id), func.max(Node.id), func.max(Node.updated_at))
+        .where(Node.is_active == True, Node.zone == zone)
+    ).one())
+
+
+def node_catalog_changed(conn: Connection):
+    """Vacía las plantillas del proceso cuando confirme la transacción de la conexión."""
+    after_commit(conn, _CATALOG_KEY)
+
+
+@on_commit(_CATALOG_KEY)
+def _clear_templates(items: List[bool]):
+    geometry_cache.clear()
+
+
+def _dumps(value) -> str:
+    """JSON con la codificación de JSONResponse (compacto y sin escapar UTF-8)."""
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+
+
+def _member(key: str, value) -> str:
+    return f"{_dumps(key)}:{_dumps(value)}"
+
+
+def split_feature(feature: Dict) -> Tuple[str, str]:
+    """
+    Prefijo y sufijo de un feature, en el orden de sus claves: el prefijo
+    lleva los miembros anteriores a properties y los de properties (cada uno
+    seguido de coma); el sufijo, el cierre de properties y los posteriores.
+    """
+    keys = list(feature)
+    position = keys.index('properties')
+    prefix = (
+        '{' + ''.join(_member(key, feature[key]) + ',' for key in keys[:position])
+        + '"properties":{' + ''.join(_member(key, value) + ',' for key, value in feature['properties'].items())
+    )
+    suffix = '}' + ''.join(',' + _member(key, feature[key]) for key in keys[position + 1:]) + '}'
+    return prefix, suffix
+
+
+def build_template(nodes: List[Node]) -> GeometryTemplate:
+    """Genera los polígonos de los nodos y serializa cada feature sin sus valores."""
+    # scipy/shapely solo se importan al generar: la sincronización de nodos no los necesita
+    from app.utils.voronoi_generator import generate_voronoi_polygons, create_texas_boundary
+
+    geojson = generate_voronoi_polygons([
+        {
+            'code': node.code,
+            'name': node.name,
+            'latitude': float(node.latitude),
+            'longitude': float(node.longitude),
+            'market': node.market,
+            'zone': node.zone
+        }
+        for node in nodes
+    ], create_texas_boundary())
+    ids_by_code = {node.code: node.id for node in nodes}
+    features = geojson['features']
+    parts = [split_feature(feature) for feature in features]
+    return GeometryTemplate(
+        node_ids=[ids_by_code[feature['properties']['code']] for feature in features],
+        prefixes=[prefix for prefix, _ in parts],
+        suffixes=[suffix for _, suffix in parts],
+    )
+
+
+def voronoi_template(db: Session, zone: str = VORONOI_ZONE) -> Optional[GeometryTemplate]:
+    """Plantilla del estado actual del catálogo (None si la zona no tiene nodos activos)."""
+    def compute():
+        nodes = db.query(Node).filter(Node.is_active == True).filter(Node.zone == zone).all()
+        return build_template(nodes) if nodes else None
+
+    return geometry_cache.get_or_compute((catalog_fingerprint(db, zone), zone), compute)
+
+
+def render_geometry(template: GeometryTemplate, values: Dict[int, float], with_price: bool = False) -> str:
+    """
+    FeatureCollection en JSON con el valor de cada nodo en properties.value
+    (null sin dato) y, con with_price, también en properties.price. Mismos
+    bytes que devolver el GeoJSON como diccionario con JSONResponse.
+    """
+    features = []
+    for node_id, prefix, suffix in zip(template.node_ids, template.prefixes, template.suffixes):
+        value = values.get(node_id)
+        value = _dumps(None if value is None else float(value))
+        price = f',"price":{value}' if with_price else ''
+        features.append(f'{prefix}"value":{value}{price}{suffix}')
+    return '{"type":"FeatureCollection","features":[' + ','.join(features) + ']}'
@@ -0,0 +1,151 @@
+"""
+Sincronización masiva del catálogo de nodos.
+
+Carga el catálogo existente una sola vez, calcula altas, modificaciones y
+bajas como diferencia de conjuntos por código de nodo y las aplica con
+sentencias masivas dentro de una única transacción.
+"""
+from datetime import datetime
+from typing import Dict, List, Union
+
+import pandas as pd
+from sqlalchemy import select, insert, update, bindparam
+from sqlalchemy.orm import Session
+
+from app.models import Node
+from app.utils.node_geometry import node_catalog_changed
+
+
+NODE_FIELDS = ['name', 'latitude', 'longitude', 'market', 'zone']
+REQUIRED_NODE_COLUMNS = ['code', 'name', 'latitude', 'longitude', 'market']
+
+# SQL Server admite como máximo 2100 parámetros por sentencia
+_ID_BATCH = 1000
+
+
+def prepare_nodes(nodes: Union[pd.DataFrame, List[Dict]]) -> tuple:
+    """
+    Normaliza y valida el catálogo entrante de forma vectorizada.
+
+    Returns:
+        Tupla (DataFrame limpio indexado por code, filas inválidas descartadas)
+    """
+    df = pd.DataFrame(nodes).copy()
+    missing = [col for col in REQUIRED_NODE_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Columnas faltantes: {missing}")
+    if 'zone' not in df.columns:
+        df['zone'] = None
+
+    for col in ['code', 'name', 'market', 'zone']:
+        df[col] = df[col].map(lambda value: None if pd.isna(value) else str(value).strip() or None)
+    df['latitude'] = pd.to_numeric(df['latitude'], errors='coerce')
+    df['longitude'] = pd.to_numeric(df['longitude'], errors='coerce')
+
+    valid = (df['code'].notna() & df['name'].notna() & df['market'].notna()
+             & df['latitude'].notna() & df['longitude'].notna())
+    df = df[valid].drop_duplicates('code', keep='last').set_index('code')
+    return df[NODE_FIELDS], int((~valid).sum())
+
+
+def _changed(current: Dict, incoming: Dict) -> bool:
+    """Indica si algún campo del nodo difiere del catálogo entrante."""
+    for field in NODE_FIELDS:
+        old, new = current[field], incoming[field]
+        if isinstance(new, float):
+            if old is None or abs(old - new) > 1e-9:
+                return True
+        elif old != new:
+            return True
+    return not current['is_active']
+
+
+def sync_nodes(db: Session, nodes: Union[pd.DataFrame, List[Dict]],
+               deactivate_missing: bool = False) -> Dict:
+    """
+    Sincroniza la tabla de nodos con un catálogo completo.
+
+    - Códigos nuevos: se insertan activos.
+    - Códigos existentes con datos distintos (o inactivos): se actualizan y reactivan.
+    - Códigos existentes que no están en el catálogo: se desactivan si
+      deactivate_missing=True (nunca se borran: conservan sus precios).
+
+    Args:
+        db: Sesión de base de datos
+        nodes: DataFrame o lista de diccionarios con code, name, latitude,
+               longitude, market y zone (opcional)
+        deactivate_missing: Desactivar los nodos ausentes del catálogo
+
+    Returns:
+        Informe con contadores created, updated, unchanged, deactivated,
+        invalid y los códigos afectados en cada caso
+    """
+    incoming, invalid = prepare_nodes(nodes)
+
+    node_table = Node.__table__
+    columns = [node_table.c.id, node_table.c.code, node_table.c.is_active] + [node_table.c[f] for f in NODE_FIELDS]
+    existing = {row.code: row._asdict() for row in db.execute(select(*columns))}
+
+    records = incoming.astype(object).where(incoming.notna(), None).to_dict('index')
+    new_codes = sorted(set(records) - set(existing))
+    common_codes = sorted(set(records) & set(existing))
+    updated_codes = [code for code in common_codes if _changed(existing[code], records[code])]
+    missing_codes = sorted(code for code in set(existing) - set(records) if existing[code]['is_active'])
+    deactivated_codes = missing_codes if deactivate_missing else []
+
+    try:
+        if new_codes:
+            now = datetime.utcnow()
+            db.execute(insert(node_table), [
+                {'code': code, **records[code], 'is_active': True, 'created_at': now}
+                for code in new_codes
+            ])
+        if updated_codes:
+            statement = (
+                update(node_table)
+                .where(node_table.c.id == bindparam('node_id'))
+                .values({field: bindparam(f'new_{field}') for field in NODE_FIELDS})
+                .values(is_active=True)
+            )
+            db.connection().execute(statement, [
+                {'node_id': existing[code]['id'], **{f'new_{k}': v for k, v in records[code].items()}}
+                for code in updated_codes
+            ])
+        ids = [existing[code]['id'] for code in deactivated_codes]
+        for start in range(0, len(ids), _ID_BATCH):
+            db.execute(
+                update(node_table)
+                .where(node_table.c.id.in_(ids[start:start + _ID_BATCH]))
+                .values(is_active=False)
+            )
+        if new_codes or updated_codes or deactivated_codes:
+            node_catalog_changed(db.connection())
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        'created': len(new_codes),
+        'updated': len(updated_codes),
+        'unchanged': len(common_codes) - len(updated_codes),
+        'deactivated': len(deactivated_codes),
+        'missing': len(missing_codes),
+        'invalid': invalid,
+        'created_codes': new_codes,
+        'updated_codes': updated_codes,
+        'deactivated_codes': deactivated_codes,
+    }
+
+
+def print_sync_report(report: Dict):
+    """Muestra el resultado de una sincronización."""
+    print(f"   - Creados: {report['created']}")
+    print(f"   - Actualizados: {report['updated']}")
+    print(f"   - Sin cambios: {report['unchanged']}")
+    if report['deactivated']:
+        print(f"   - Desactivados: {report['deactivated']}")
+    elif report['missing']:
+        print(f"   - Ausentes del catálogo (siguen activos): {report['missing']}")
+    if report['invalid']:
+        print(f"   - Filas inválidas descartadas: {report['invalid']}")
@@ -0,0 +1,171 @@
+"""
+Importación en paralelo de múltiples archivos de precios.
+Un pool de procesos lee y valida los archivos (CSV/Excel) usando todos los
+núcleos; un único escritor, dueño de la conexión a la base de datos, aplica
+los lotes en orden y con una transacción por archivo.
+"""
+import glob
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.utils.bulk_loader import (
+    read_in_chunks, prepare_price_chunk, write_prices, write_quarantine, PRICE_COLUMNS
+)
+from app.utils.ingestion_manifest import start_file, checkpoint, finish_file, fail_file
+from app.utils.validation import FIRST_DATA_ROW, QUARANTINE_COLUMNS, reason_counts, merge_counts
+
+
+REQUIRED_PRICE_COLUMNS = ['node_code', 'timestamp', 'price', 'market']
+
+
+def find_price_files(directory: str, pattern: str = None) -> List[str]:
+    """
+    Lista los archivos de precios de un directorio, ordenados por nombre.
+
+    Args:
+        directory: Carpeta con los archivos mensuales
+        pattern: Patrón glob opcional (por defecto *.csv, *.xlsx y *.xls)
+    """
+    patterns = [pattern] if pattern else ['*.csv', '*.xlsx', '*.xls']
+    files = set()
+    for item in patterns:
+        files.update(glob.glob(os.path.join(directory, item)))
+    return sorted(files)
+
+
+def parse_price_file(file_path: str, node_map: Dict[str, int], chunk_size: int,
+                     skip_rows: int = 0, content_hash: str = None) -> Dict:
+    """
+    Lee y valida un archivo de precios en un proceso del pool.
+
+    Devuelve lotes columnares compactos (un array de NumPy por columna) que
+    se transfieren al escritor sin objetos por fila. skip_rows permite
+    reanudar un archivo cargado parcialmente. La conversión al almacén
+    Parquet, si hace falta, también ocurre aquí, en paralelo.
+
+    Returns:
+        Diccionario con file_path, batches, rows, source_rows, rejected (filas
+        en cuarentena), quarantined (contadores por motivo), parse_seconds y
+        error (mensaje si el archivo no es válido)
+    """
+    started = time.perf_counter()
+    result = {'file_path': file_path, 'batches': [], 'rows': 0, 'source_rows': 0,
+              'rejected': [], 'quarantined': {}, 'parse_seconds': 0.0, 'error': None}
+    try:
+        for chunk in read_in_chunks(file_path, chunk_size, skip_rows=skip_rows, content_hash=content_hash):
+            first_row = FIRST_DATA_ROW + skip_rows + result['source_rows']
+            result['source_rows'] += len(chunk)
+            missing = [col for col in REQUIRED_PRICE_COLUMNS if col not in chunk.columns]
+            if missing:
+                raise ValueError(f"Columnas faltantes: {missing}")
+
+            records, rejected = prepare_price_chunk(chunk, node_map, first_row=first_row)
+            if not rejected.empty:
+                result['rejected'].append({col: rejected[col].to_numpy() for col in QUARANTINE_COLUMNS})
+                merge_counts(result['quarantined'], reason_counts(rejected))
+            if not records.empty:
+                result['batches'].append({col: records[col].to_numpy() for col in PRICE_COLUMNS})
+                result['rows'] += len(records)
+    except Exception as e:
+        result['batches'] = []
+        result['rejected'] = []
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['parse_seconds'] = time.perf_counter() - started
+    return result
+
+
+def _parsed_files(files: List[tuple], node_map: Dict[str, int],
+                  chunk_size: int, workers: int) -> Iterator[Dict]:
+    """
+    Entrega los archivos parseados en el orden de entrada.
+    Mantiene como máximo 2 * workers archivos en vuelo para acotar la memoria.
+
+    Args:
+        files: Tuplas (ruta, filas a saltar, hash del contenido)
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        remaining = iter(files)
+        for file_path, skip_rows, content_hash in remaining:
+            pending.append(executor.submit(parse_price_file, file_path, node_map, chunk_size,
+                                           skip_rows, content_hash))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            yield pending.popleft().result()
+            next_file = next(remaining, None)
+            if next_file is not None:
+                file_path, skip_rows, content_hash = next_file
+                pending.append(executor.submit(parse_price_file, file_path, node_map, chunk_size,
+                                               skip_rows, content_hash))
+
+
+def import_price_files(file_paths: List[str], db: Session, node_map: Dict[str, int],
+                       chunk_size: int = 50000, workers: int = None, mode: str = 'upsert',
+                       force: bool = False) -> Dict:
+    """
+    Importa varios archivos de precios: parseo en paralelo, escritura única.
+
+    Los archivos ya cargados con el mismo contenido (según el manifiesto de
+    ingesta) se saltan antes de parsearlos. Cada archivo se escribe en su
+    propia transacción, junto con su entrada del manifiesto: si falla, se
+    revierte completo y se continúa con el siguiente.
+
+    Returns:
+        Resumen con archivos cargados, saltados, fallidos, filas importadas
+        y filas en cuarentena por motivo
+    """
+    workers = workers or os.cpu_count() or 1
+    summary = {'loaded': 0, 'unchanged': 0, 'failed': 0, 'rows': 0, 'quarantined': {}}
+    started = time.perf_counter()
+
+    entries = {}
+    for file_path in file_paths:
+        entry = start_file(db, file_path, force=force)
+        if entry is None:
+            summary['unchanged'] += 1
+        else:
+            entries[file_path] = entry
+    pending_files = [(path, entries[path].row_end, entries[path].content_hash)
+                     for path in file_paths if path in entries]
+
+    for parsed in _parsed_files(pending_files, node_map, chunk_size, workers):
+        name = os.path.basename(parsed['file_path'])
+        entry = entries[parsed['file_path']]
+        if parsed['error']:
+            print(f"   ❌ {name}: {parsed['error']}")
+            fail_file(db, entry, parsed['error'])
+            summary['failed'] += 1
+            continue
+
+        write_started = time.perf_counter()
+        try:
+            for batch in parsed['batches']:
+                write_prices(db.connection(), pd.DataFrame(batch, columns=PRICE_COLUMNS), mode)
+            for rejected in parsed['rejected']:
+                write_quarantine(db.connection(), pd.DataFrame(rejected, columns=QUARANTINE_COLUMNS),
+                                 entry.file_path)
+            checkpoint(entry, entry.row_end + parsed['source_rows'], parsed['rows'])
+            finish_file(db, entry)
+        except Exception as e:
+            fail_file(db, entry, e)
+            print(f"   ❌ {name}: error escribiendo, archivo revertido ({e})")
+            summary['failed'] += 1
+            continue
+
+        write_seconds = time.perf_counter() - write_started
+        summary['loaded'] += 1
+        summary['rows'] += parsed['rows']
+        merge_counts(summary['quarantined'], parsed['quarantined'])
+        print(f"   ✅ {name}: {parsed['rows']:,} registros, "
+              f"{sum(parsed['quarantined'].values()):,} en cuarentena (parseo {parsed['parse_seconds']:.1f}s, escritura {write_seconds:.1f}s, "
+              f"{parsed['rows'] / max(write_seconds, 1e-9):,.0f} filas/s)")
+
+    summary['seconds'] = time.perf_counter() - started
+    return summary
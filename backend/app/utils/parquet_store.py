@@ -0,0 +1,318 @@
+"""
+Zona de aterrizaje Parquet para los archivos fuente de ERCOT.
+
+Cada libro Excel o CSV se convierte una sola vez a un archivo Parquet tipado
+y comprimido, identificado por el hash SHA-256 de su contenido. Los
+importadores leen después desde ese Parquet por lotes columnares, sin volver
+a pasar por openpyxl.
+
+La conversión es por bloques de LANDING_CHUNK_ROWS filas (memoria acotada
+por el bloque, no por el archivo): cada bloque se guarda como una parte con
+sus propios tipos y, al final, las partes se escriben en un único Parquet
+con un esquema común. Una columna con tipos distintos entre bloques (p. ej.
+números y textos como 'n/a') queda como texto; enteros y decimales, como
+decimal.
+
+Uso directo (conversión anticipada):
+    python -m app.utils.parquet_store LPMs.xlsx prices_2023.csv
+"""
+import os
+import shutil
+import sys
+from typing import Iterator, List, Tuple
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.core.config import settings
+from app.utils.ingestion_manifest import file_sha256
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Filas por bloque al convertir un archivo fuente
+LANDING_CHUNK_ROWS = 100_000
+
+# Solo las celdas vacías son nulas: textos como 'NA' o 'n/a' se conservan tal
+# cual (pueden ser códigos de nodo o valores a rechazar)
+_NA_OPTIONS = {'keep_default_na': False, 'na_values': ['']}
+
+
+def store_dir() -> str:
+    """Directorio del almacén Parquet (las rutas relativas parten de backend/)."""
+    if os.path.isabs(settings.PARQUET_STORE_DIR):
+        return settings.PARQUET_STORE_DIR
+    return os.path.join(BACKEND_DIR, settings.PARQUET_STORE_DIR)
+
+
+def landed_path(content_hash: str) -> str:
+    """Ruta del Parquet correspondiente a un contenido."""
+    return os.path.join(store_dir(), f"{content_hash}.parquet")
+
+
+def _read_source(file_path: str) -> pd.DataFrame:
+    """Lee el archivo fuente completo con pandas (solo con el almacén deshabilitado)."""
+    if file_path.lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(file_path, **_NA_OPTIONS)
+    else:
+        df = pd.read_csv(file_path, **_NA_OPTIONS)
+    df.columns = [str(col).strip() for col in df.columns]
+    return df
+
+
+def iter_excel_rows(file_path: str, block_size: int, min_row: int = 2) -> Iterator[Tuple[list, list]]:
+    """
+    Recorre la hoja activa de un Excel en modo solo lectura, por bloques de filas.
+
+    Args:
+        file_path: Ruta al archivo Excel
+        block_size: Número máximo de filas por bloque
+        min_row: Primera fila de datos (1 = encabezado)
+
+    Yields:
+        Tuplas (encabezados, filas) donde filas es una lista de tuplas de valores
+    """
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        headers = list(next(ws.iter_rows(min_row=1, max_row=1, values_only=True)))
+        block = []
+        for row in ws.iter_rows(min_row=min_row, values_only=True):
+            block.append(row)
+            if len(block) >= block_size:
+                yield headers, block
+                block = []
+        if block:
+            yield headers, block
+    finally:
+        wb.close()
+
+
+def _excel_cell(value):
+    """Valor de una celda como lo entrega pandas.read_excel (decimales enteros como int, '' nulo)."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if value == '':
+        return None
+    return value
+
+
+def _excel_columns(headers: list) -> List[str]:
+    """Nombres de columna como pandas.read_excel: 'Unnamed: i' si están vacíos y 'X.1' si se repiten."""
+    names, seen = [], set()
+    for index, header in enumerate(headers):
+        header = _excel_cell(header)
+        name = f"Unnamed: {index}" if header is None else str(header).strip()
+        base, count = name, 0
+        while name in seen:
+            count += 1
+            name = f"{base}.{count}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def _iter_excel_frames(file_path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """
+    Bloques de un libro Excel con las mismas filas y columnas que pandas.read_excel
+    (las filas vacías del final se descartan; las intermedias se conservan).
+    """
+    pending, block, columns = [], [], None
+    for headers, rows in iter_excel_rows(file_path, chunk_rows):
+        columns = columns or _excel_columns(headers)
+        width = len(columns)
+        for row in rows:
+            row = tuple(_excel_cell(value) for value in row[:width]) + (None,) * (width - len(row))
+            if all(value is None for value in row):
+                pending.append(row)
+                continue
+            block.extend(pending)
+            pending = []
+            block.append(row)
+            if len(block) >= chunk_rows:
+                yield pd.DataFrame.from_records(block, columns=columns)
+                block = []
+    if block:
+        yield pd.DataFrame.from_records(block, columns=columns)
+
+
+def _excel_header(file_path: str) -> List[str]:
+    """Nombres de columna de un libro Excel (para los libros sin filas de datos)."""
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        return _excel_columns(list(next(wb.active.iter_rows(min_row=1, max_row=1, values_only=True), ())))
+    finally:
+        wb.close()
+
+
+def _iter_source_frames(file_path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Bloques de un archivo fuente (Excel o CSV) de como máximo chunk_rows filas."""
+    if file_path.lower().endswith(('.xlsx', '.xls')):
+        yield from _iter_excel_frames(file_path, chunk_rows)
+        return
+    for chunk in pd.read_csv(file_path, chunksize=chunk_rows, **_NA_OPTIONS):
+        chunk.columns = [str(col).strip() for col in chunk.columns]
+        yield chunk
+
+
+def _source_columns(file_path: str) -> List[str]:
+    """Nombres de columna de un archivo fuente sin filas de datos."""
+    if file_path.lower().endswith(('.xlsx', '.xls')):
+        return _excel_header(file_path)
+    return [str(col).strip() for col in pd.read_csv(file_path, nrows=0).columns]
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Convierte el DataFrame a una tabla Arrow tipada.
+    Las columnas con tipos mezclados (p. ej. números y textos como 'n/a')
+    se guardan como texto para no perder el valor original.
+    """
+    arrays = []
+    for column in df.columns:
+        values = df[column]
+        try:
+            arrays.append(pa.array(values, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(pa.array(
+                [None if pd.isna(v) else str(v) for v in values],
+                type=pa.string()
+            ))
+    return pa.Table.from_arrays(arrays, names=list(df.columns))
+
+
+def _merge_type(current: pa.DataType, new: pa.DataType) -> pa.DataType:
+    """Tipo común de una columna entre dos bloques (ver el docstring del módulo)."""
+    if pa.types.is_null(new) or current == new:
+        return current
+    if pa.types.is_null(current):
+        return new
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in (current, new)):
+        return pa.float64()
+    return pa.string()
+
+
+def _conform(column: pa.ChunkedArray, target: pa.DataType, excel: bool = False) -> pa.ChunkedArray:
+    """
+    Convierte la columna de un bloque al tipo común (los textos, con str() de
+    cada valor). En Excel los decimales enteros se escriben como enteros, que
+    es como los entrega read_excel.
+    """
+    if column.type == target:
+        return column
+    if pa.types.is_string(target) and not pa.types.is_null(column.type):
+        values = column.to_pylist()
+        if excel and pa.types.is_floating(column.type):
+            values = [_excel_cell(v) if v is not None else None for v in values]
+        return pa.chunked_array([pa.array([None if v is None else str(v) for v in values], type=pa.string())])
+    return column.cast(target)
+
+
+def _write_landed(file_path: str, target: str, chunk_rows: int = LANDING_CHUNK_ROWS):
+    """
+    Convierte un archivo fuente en el Parquet target por bloques: primero cada
+    bloque a una parte temporal y después todas las partes a target con el
+    esquema común.
+    """
+    excel = file_path.lower().endswith(('.xlsx', '.xls'))
+    parts_dir = f"{target}.{os.getpid()}.parts"
+    os.makedirs(parts_dir, exist_ok=True)
+    try:
+        parts, types, rows = [], {}, 0
+        for index, frame in enumerate(_iter_source_frames(file_path, chunk_rows)):
+            table = _to_arrow(frame)
+            for name, column in zip(table.column_names, table.columns):
+                chunk_type = pa.null() if column.null_count == len(column) else column.type
+                types[name] = _merge_type(types.get(name, pa.null()), chunk_type)
+            part = os.path.join(parts_dir, f"part-{index:05d}.parquet")
+            pq.write_table(table, part)
+            parts.append(part)
+            rows += table.num_rows
+
+        columns = list(types) if parts else _source_columns(file_path)
+        # Una columna sin ningún valor queda como decimal, igual que en pandas
+        schema = pa.schema([
+            (name, pa.float64() if rows and pa.types.is_null(types.get(name, pa.null())) else types.get(name, pa.null()))
+            for name in columns
+        ])
+        # Escritura atómica: varios procesos pueden convertir archivos a la vez
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+            if not parts:
+                writer.write_table(schema.empty_table())
+            for part in parts:
+                table = pq.read_table(part)
+                writer.write_table(pa.Table.from_arrays(
+                    [_conform(table.column(field.name), field.type, excel) for field in schema], schema=schema
+                ))
+        os.replace(tmp_path, target)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+
+def land_file(file_path: str, content_hash: str = None) -> str:
+    """
+    Devuelve el Parquet de un archivo fuente, convirtiéndolo si aún no existe.
+
+    Args:
+        file_path: Ruta del CSV o Excel original
+        content_hash: Hash SHA-256 ya calculado (si no, se calcula aquí)
+
+    Returns:
+        Ruta del archivo Parquet en el almacén
+    """
+    if file_path.lower().endswith('.parquet'):
+        return file_path
+
+    content_hash = content_hash or file_sha256(file_path)
+    target = landed_path(content_hash)
+    if os.path.exists(target):
+        return target
+
+    os.makedirs(store_dir(), exist_ok=True)
+    _write_landed(file_path, target)
+    return target
+
+
+def resolve_source(file_path: str, content_hash: str = None) -> str:
+    """Ruta desde la que leer un archivo: su Parquet si el almacén está habilitado, si no el original."""
+    if settings.PARQUET_STORE_ENABLED:
+        return land_file(file_path, content_hash)
+    return file_path
+
+
+def iter_parquet_chunks(parquet_path: str, chunk_size: int, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Lee un Parquet en DataFrames de como máximo chunk_size filas.
+
+    Args:
+        parquet_path: Ruta del archivo Parquet
+        chunk_size: Filas por bloque
+        skip_rows: Filas a saltar desde el inicio (para reanudar)
+    """
+    parquet_file = pq.ParquetFile(parquet_path)
+    to_skip = skip_rows
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        if to_skip >= batch.num_rows:
+            to_skip -= batch.num_rows
+            continue
+        if to_skip:
+            batch = batch.slice(to_skip)
+            to_skip = 0
+        yield batch.to_pandas()
+
+
+def read_table(file_path: str, content_hash: str = None) -> pd.DataFrame:
+    """Lee un archivo fuente completo como DataFrame, desde el almacén Parquet si está habilitado."""
+    source = resolve_source(file_path, content_hash)
+    if source.lower().endswith('.parquet'):
+        return pq.read_table(source).to_pandas()
+    return _read_source(source)
+
+
+if __name__ == "__main__":
+    for source_path in sys.argv[1:]:
+        landed = land_file(source_path)
+        print(f"{source_path} -> {landed} ({pq.ParquetFile(landed).metadata.num_rows:,} filas)")
@@ -0,0 +1,377 @@
+"""
+Almacenamiento de price_records particionado por mes.
+
+Con PRICE_PARTITIONING habilitado:
+
+- SQL Server: particionado nativo. La migración partition_price_records.py
+  crea la función y el esquema de partición mensual (pf_price_month /
+  ps_price_month) y reconstruye la tabla sobre ellos; el optimizador poda
+  las particiones por rango de timestamp. La ingesta crea por adelantado
+  las particiones de los meses que llegan (SPLIT RANGE).
+- SQLite: una tabla por mes (price_records_YYYYMM) con el mismo esquema e
+  índices. write_prices enruta cada bloque a las tablas de sus meses y las
+  consultas leen de price_source(), que une solo las tablas del rango.
+
+En ambos casos los meses antiguos se pueden compactar o eliminar sin tocar
+los recientes (compact_before / drop_before).
+
+Uso directo:
+    python -m app.utils.partitions status
+    python -m app.utils.partitions drop-before 2020-01
+    python -m app.utils.partitions compact-before 2024-01
+"""
+import re
+import sys
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, Index, select, union_all, inspect, text, delete, func
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import FromClause
+
+from app.core.config import settings
+from app.models import PriceRecord, CompactPriceRecord, PriceRollup, HourMatrix, NodeLatestValue
+from app.utils.cache import invalidate_on_commit
+from app.utils.compact_layout import compact_layout_enabled, compact_source, epoch_hour
+
+
+PARTITION_PREFIX = "price_records_"
+PARTITION_FUNCTION = "pf_price_month"
+PARTITION_SCHEME = "ps_price_month"
+
+# Meses de particiones vacías que se mantienen por delante en SQL Server
+NATIVE_MONTHS_AHEAD = 3
+
+_PARTITION_PATTERN = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+_partition_metadata = MetaData()
+
+
+def month_start(value: datetime) -> datetime:
+    """Primer instante del mes de value."""
+    return datetime(value.year, value.month, 1)
+
+
+def next_month(value: datetime) -> datetime:
+    """Primer instante del mes siguiente al de value."""
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def months_between(start: datetime, end: datetime) -> Iterator[datetime]:
+    """Meses que solapan [start, end] (ambos incluidos)."""
+    month = month_start(start)
+    while month <= end:
+        yield month
+        month = next_month(month)
+
+
+def partitioning_mode(bind) -> Optional[str]:
+    """
+    Modo de particionado activo para una conexión o engine:
+    'native' (SQL Server), 'tables' (SQLite) o None (tabla única).
+    """
+    if not settings.PRICE_PARTITIONING:
+        return None
+    if bind.dialect.name == 'mssql':
+        return 'native'
+    if bind.dialect.name == 'sqlite':
+        return 'tables'
+    return None
+
+
+# ---------------------------------------------------------------------------
+# SQLite: una tabla por mes
+# ---------------------------------------------------------------------------
+
+def partition_name(month: datetime) -> str:
+    """Nombre de la tabla de un mes (price_records_202401)."""
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def partition_table(month: datetime) -> Table:
+    """Tabla de un mes con las columnas e índices de price_records."""
+    name = partition_name(month)
+    if name in _partition_metadata.tables:
+        return _partition_metadata.tables[name]
+    base = PriceRecord.__table__
+    columns = [
+        Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable,
+               default=c.default.arg if c.default is not None else None)
+        for c in base.columns
+    ]
+    suffix = f"{month:%Y%m}"
+    indexes = [
+        Index(f"{index.name}_{suffix}", *[c.name for c in index.columns], unique=index.unique)
+        for index in base.indexes
+    ]
+    return Table(name, _partition_metadata, *columns, *indexes)
+
+
+def existing_partitions(bind) -> List[datetime]:
+    """Meses con tabla de partición creada, en orden."""
+    months = []
+    for name in inspect(bind).get_table_names():
+        match = _PARTITION_PATTERN.match(name)
+        if match:
+            months.append(datetime(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def ensure_partition(conn: Connection, month: datetime) -> Table:
+    """Devuelve la tabla del mes, creándola si no existe."""
+    table = partition_table(month)
+    table.create(conn, checkfirst=True)
+    return table
+
+
+def split_by_month(df: pd.DataFrame) -> Iterator[Tuple[datetime, pd.DataFrame]]:
+    """Divide un bloque de registros por mes de su timestamp."""
+    months = pd.to_datetime(df['timestamp']).dt.to_period('M')
+    for period, part in df.groupby(months, sort=True):
+        yield period.to_timestamp().to_pydatetime(), part
+
+
+# ---------------------------------------------------------------------------
+# Capa de consulta
+# ---------------------------------------------------------------------------
+
+def price_source(bind, start: datetime = None, end: datetime = None) -> FromClause:
+    """
+    Origen de los registros de precios para consultas en [start, end].
+
+    Con el formato compacto devuelve price_hours expuesto con las columnas de
+    price_records (ver compact_layout). Sin particionado por tablas devuelve
+    price_records. En SQLite con particionado devuelve un UNION ALL (con las
+    columnas de price_records) de las tablas de los meses del rango más la
+    tabla base, que conserva las filas aún no migradas. Los filtros del
+    llamador siguen siendo necesarios: la poda solo descarta meses completos.
+
+    Args:
+        bind: Sesión, conexión o engine
+        start: Inicio del rango (None = sin límite)
+        end: Fin del rango, incluido (None = sin límite)
+    """
+    # Las sesiones consultan el catálogo en su propia conexión
+    connection = bind.connection() if isinstance(bind, Session) else bind
+    if compact_layout_enabled():
+        return compact_source(connection, start, end)
+    return standard_source(connection, start, end)
+
+
+def standard_source(connection, start: datetime = None, end: datetime = None) -> FromClause:
+    """price_records (y sus tablas mensuales, si las hay) para [start, end]."""
+    base = PriceRecord.__table__
+    if partitioning_mode(connection) != 'tables':
+        return base
+
+    months = [
+        month for month in existing_partitions(connection)
+        if (start is None or next_month(month) > start) and (end is None or month <= end)
+    ]
+    selects = [select(*base.columns)]
+    selects += [select(*partition_table(month).columns) for month in months]
+    return union_all(*selects).subquery('price_records')
+
+
+# ---------------------------------------------------------------------------
+# SQL Server: particionado nativo
+# ---------------------------------------------------------------------------
+
+def native_boundaries(conn: Connection) -> List[datetime]:
+    """Límites (inicio de mes) de la función de partición mensual."""
+    rows = conn.execute(text(
+        "SELECT v.value FROM sys.partition_range_values v "
+        "JOIN sys.partition_functions f ON f.function_id = v.function_id "
+        "WHERE f.name = :name ORDER BY v.boundary_id"
+    ), {'name': PARTITION_FUNCTION})
+    return [row[0] for row in rows]
+
+
+def ensure_native_partitions(conn: Connection, through: datetime):
+    """
+    Divide la partición final para que existan particiones mensuales hasta
+    el mes de through (más NATIVE_MONTHS_AHEAD). Dividir la partición vacía
+    del final no mueve datos.
+    """
+    boundaries = native_boundaries(conn)
+    if not boundaries:
+        return
+    target = month_start(through)
+    for _ in range(NATIVE_MONTHS_AHEAD):
+        target = next_month(target)
+    month = next_month(boundaries[-1])
+    while month <= target:
+        conn.execute(text(f"ALTER PARTITION SCHEME {PARTITION_SCHEME} NEXT USED [PRIMARY]"))
+        conn.execute(text(f"ALTER PARTITION FUNCTION {PARTITION_FUNCTION}() SPLIT RANGE (:boundary)"),
+                     {'boundary': month})
+        month = next_month(month)
+
+
+def prepare_partitions(conn: Connection, df: pd.DataFrame):
+    """Crea las particiones que necesita un bloque antes de escribirlo (solo SQL Server)."""
+    if partitioning_mode(conn) == 'native' and not df.empty:
+        ensure_native_partitions(conn, pd.to_datetime(df['timestamp']).max().to_pydatetime())
+
+
+def _native_partition_number(conn: Connection, month: datetime) -> int:
+    """Número de partición que contiene un mes."""
+    return conn.execute(
+        text(f"SELECT $PARTITION.{PARTITION_FUNCTION}(:value)"), {'value': month}
+    ).scalar()
+
+
+# ---------------------------------------------------------------------------
+# Mantenimiento
+# ---------------------------------------------------------------------------
+
+def delete_prices_before(conn: Connection, month: datetime) -> int:
+    """
+    Elimina los registros de precios anteriores a month del almacenamiento
+    activo (formato compacto, tablas mensuales, particiones nativas o tabla
+    única). Los rollups y la matriz horaria no se tocan.
+
+    Returns:
+        Particiones eliminadas o vaciadas
+    """
+    month = month_start(month)
+    if compact_layout_enabled():
+        table = CompactPriceRecord.__table__
+        conn.execute(delete(table).where(table.c.hour < epoch_hour(month)))
+        return 0
+
+    mode = partitioning_mode(conn)
+    removed = 0
+    if mode == 'tables':
+        for partition in existing_partitions(conn):
+            if partition < month:
+                partition_table(partition).drop(conn)
+                removed += 1
+    elif mode == 'native':
+        last = _native_partition_number(conn, month) - 1
+        if last >= 1:
+            conn.execute(text(f"TRUNCATE TABLE price_records WITH (PARTITIONS (1 TO {last}))"))
+            # Fusionar los límites vacíos para no acumular particiones
+            for boundary in native_boundaries(conn):
+                if boundary < month:
+                    conn.execute(text(f"ALTER PARTITION FUNCTION {PARTITION_FUNCTION}() MERGE RANGE (:boundary)"),
+                                 {'boundary': boundary})
+            removed = last
+
+    conn.execute(delete(PriceRecord.__table__).where(PriceRecord.timestamp < month))
+    return removed
+
+
+def delete_node_prices(conn: Connection, node_id: int):
+    """
+    Borra los registros de precios de un nodo (al darlo de baja) de price_records,
+    de las tablas mensuales y de price_hours con una sola sentencia por tabla:
+    la cascada del ORM cargaría cada fila antes de borrarla y no llega a las
+    tablas mensuales (creadas sin clave foránea).
+    """
+    conn.execute(delete(PriceRecord.__table__).where(PriceRecord.node_id == node_id))
+    for partition in existing_partitions(conn):
+        table = partition_table(partition)
+        conn.execute(delete(table).where(table.c.node_id == node_id))
+    conn.execute(delete(CompactPriceRecord.__table__).where(CompactPriceRecord.node_id == node_id))
+
+
+def drop_before(conn: Connection, month: datetime) -> int:
+    """
+    Elimina los datos de los meses anteriores a month sin tocar los
+    posteriores (y sus rollups, matriz horaria y últimos valores, para que
+    las consultas sigan coherentes). Al confirmar la transacción (de una
+    Session) se vacían las cachés y se borran los mismos meses de la copia
+    analítica.
+
+    Returns:
+        Particiones eliminadas o vaciadas
+    """
+    # analytics importa este módulo
+    from app.utils.analytics import queue_delete
+
+    month = month_start(month)
+    if partitioning_mode(conn) is None:
+        raise ValueError("El particionado de precios no está habilitado (PRICE_PARTITIONING)")
+    removed = delete_prices_before(conn, month)
+    conn.execute(delete(PriceRollup.__table__).where(PriceRollup.bucket_start < month))
+    conn.execute(delete(HourMatrix.__table__).where(HourMatrix.hour < month))
+    conn.execute(delete(NodeLatestValue.__table__).where(NodeLatestValue.timestamp < month))
+    queue_delete(conn, before=month)
+    invalidate_on_commit(conn)
+    return removed
+
+
+def compact_before(conn: Connection, month: datetime) -> int:
+    """
+    Compacta los meses anteriores a month: compresión PAGE por partición en
+    SQL Server; en SQLite, ANALYZE de las tablas antiguas (el espacio libre
+    se recupera con VACUUM fuera de la transacción).
+
+    Returns:
+        Particiones compactadas
+    """
+    month = month_start(month)
+    mode = partitioning_mode(conn)
+    compacted = 0
+    if mode == 'native':
+        last = _native_partition_number(conn, month) - 1
+        for number in range(1, last + 1):
+            conn.execute(text(
+                f"ALTER TABLE price_records REBUILD PARTITION = {number} WITH (DATA_COMPRESSION = PAGE)"
+            ))
+            compacted += 1
+    elif mode == 'tables':
+        for partition in existing_partitions(conn):
+            if partition < month:
+                conn.execute(text(f"ANALYZE {partition_name(partition)}"))
+                compacted += 1
+    else:
+        raise ValueError("El particionado de precios no está habilitado (PRICE_PARTITIONING)")
+    return compacted
+
+
+def _print_status(conn: Connection):
+    """Muestra las particiones existentes y sus filas."""
+    mode = partitioning_mode(conn)
+    print(f"Modo de particionado: {mode or 'deshabilitado'}")
+    if mode == 'tables':
+        for partition in existing_partitions(conn):
+            rows = conn.execute(select(func.count()).select_from(partition_table(partition))).scalar()
+            print(f"  {partition:%Y-%m}: {rows:,} filas")
+    elif mode == 'native':
+        rows = conn.execute(text(
+            "SELECT p.partition_number, p.rows FROM sys.partitions p "
+            "WHERE p.object_id = OBJECT_ID('price_records') AND p.index_id IN (0, 1) "
+            "ORDER BY p.partition_number"
+        ))
+        boundaries = native_boundaries(conn)
+        for number, count in rows:
+            start = boundaries[number - 2] if number > 1 else None
+            print(f"  {start:%Y-%m} : {count:,} filas" if start else f"  (anterior) : {count:,} filas")
+
+
+if __name__ == "__main__":
+    from app.db.database import engine, SessionLocal
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    if command == 'status':
+        with engine.connect() as connection:
+            _print_status(connection)
+    elif command in ('drop-before', 'compact-before') and len(sys.argv) > 2:
+        limit = datetime.strptime(sys.argv[2], '%Y-%m')
+        # Con Session: el commit vacía las cachés y actualiza la copia analítica (commit_hooks)
+        session = SessionLocal()
+        try:
+            if command == 'drop-before':
+                print(f"Particiones eliminadas: {drop_before(session.connection(), limit)}")
+            else:
+                print(f"Particiones compactadas: {compact_before(session.connection(), limit)}")
+            session.commit()
+        finally:
+            session.close()
+        if command == 'drop-before' and engine.dialect.name == 'sqlite':
+            with engine.connect() as connection:
+                connection.execute(text("VACUUM"))
+    else:
+        print("Uso: python -m app.utils.partitions [status | drop-before YYYY-MM | compact-before YYYY-MM]")
@@ -0,0 +1,148 @@
+"""
+Series temporales para gráficos: agregación por intervalo y reducción visual.
+
+- Intervalos (hour, day, week, month): cada punto es un bucket con el
+  promedio y la envolvente mínimo/máximo de sus valores. Las semanas empiezan
+  en lunes. El motor analítico agrupa en la consulta (DuckDB) o sobre arrays
+  (bucket_frame).
+- max_points: la serie se reduce con Largest-Triangle-Three-Buckets (LTTB),
+  que conserva la forma visual (picos y valles) con un número fijo de
+  puntos; el tamaño de la respuesta depende del ancho del gráfico y no del
+  rango.
+
+Varias series (nodos x tipos de dato) se pueden devolver sobre un eje de
+tiempo común (shared_axis): cada serie es un array alineado con el eje, con
+nulos donde no tiene punto.
+"""
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+EVOLUTION_INTERVALS = ('hour', 'day', 'week', 'month')
+
+# Columnas de una serie: un punto por nodo y timestamp (inicio del bucket)
+SERIES_COLUMNS = ['node_id', 'timestamp', 'value', 'min_value', 'max_value', 'count']
+
+
+def bucket_start(timestamps: pd.Series, interval: str) -> pd.Series:
+    """Inicio del bucket de cada timestamp (semanas desde el lunes)."""
+    timestamps = pd.to_datetime(timestamps)
+    if interval == 'hour':
+        return timestamps.dt.floor('h')
+    if interval == 'day':
+        return timestamps.dt.floor('D')
+    if interval == 'week':
+        days = timestamps.dt.floor('D')
+        return days - pd.to_timedelta(days.dt.weekday, unit='D')
+    if interval == 'month':
+        return timestamps.dt.to_period('M').dt.start_time
+    raise ValueError(f"Intervalo desconocido: {interval}")
+
+
+def bucket_frame(rows: pd.DataFrame, column: str, interval: str) -> pd.DataFrame:
+    """
+    Agrega filas (node_id, timestamp, column) por nodo y bucket.
+
+    Returns:
+        DataFrame con SERIES_COLUMNS (value = promedio), ordenado por nodo y tiempo
+    """
+    values = pd.to_numeric(rows[column], errors='coerce')
+    present = values.notna()
+    if not present.any():
+        return pd.DataFrame(columns=SERIES_COLUMNS)
+    frame = pd.DataFrame({
+        'node_id': rows['node_id'][present].astype(int),
+        'timestamp': bucket_start(rows['timestamp'][present], interval),
+        'value': values[present],
+    })
+    return (
+        frame.groupby(['node_id', 'timestamp'], sort=True)['value']
+        .agg(value='mean', min_value='min', max_value='max', count='count')
+        .reset_index()[SERIES_COLUMNS]
+    )
+
+
+def raw_frame(rows: pd.DataFrame, column: str) -> pd.DataFrame:
+    """Filas (node_id, timestamp, column) como serie horaria sin agregar, ordenada por nodo y tiempo."""
+    values = pd.to_numeric(rows[column], errors='coerce')
+    present = values.notna()
+    frame = pd.DataFrame({
+        'node_id': rows['node_id'][present].astype(int),
+        'timestamp': pd.to_datetime(rows['timestamp'][present]),
+        'value': values[present],
+        'min_value': np.nan,
+        'max_value': np.nan,
+        'count': np.nan,
+    })
+    return frame.sort_values(['node_id', 'timestamp'], kind='mergesort', ignore_index=True)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: índices de threshold puntos de (x, y)
+    que conservan la forma de la serie. Conserva el primero y el último; de
+    cada bucket intermedio elige el punto que forma el triángulo de mayor
+    área con el punto elegido antes y el promedio del bucket siguiente.
+    """
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+    every = (size - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, size - 1
+    previous = 0
+    for index in range(threshold - 2):
+        start = int(math.floor(index * every)) + 1
+        end = int(math.floor((index + 1) * every)) + 1
+        following = slice(end, min(int(math.floor((index + 2) * every)) + 1, size))
+        average_x, average_y = x[following].mean(), y[following].mean()
+        area = np.abs(
+            (x[previous] - average_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[index + 1] = previous
+    return selected
+
+
+def downsample(series: pd.DataFrame, max_points: Optional[int]) -> pd.DataFrame:
+    """Reduce la serie de cada nodo a max_points puntos con LTTB (None = sin reducir)."""
+    if not max_points or series.empty:
+        return series
+    parts = []
+    for _, part in series.groupby('node_id', sort=True):
+        if len(part) > max_points:
+            x = part['timestamp'].to_numpy().astype('datetime64[s]').astype(np.float64)
+            part = part.iloc[lttb(x, part['value'].to_numpy(dtype=float), max_points)]
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+def series_frames(rows: pd.DataFrame, columns: List[str], interval: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+    """Serie de cada columna (todos los nodos) a partir de unas mismas filas horarias."""
+    return {
+        column: bucket_frame(rows, column, interval) if interval else raw_frame(rows, column)
+        for column in columns
+    }
+
+
+def shared_axis(frames: List[pd.DataFrame], max_points: Optional[int] = None) -> pd.DatetimeIndex:
+    """
+    Eje de tiempo común de varias series: la unión ordenada de sus timestamps.
+    Con max_points, cada serie de cada nodo aporta solo los puntos que elige
+    LTTB (el eje tiene como mucho series x max_points puntos).
+    """
+    stamps = [downsample(frame, max_points)['timestamp'] for frame in frames if not frame.empty]
+    if not stamps:
+        return pd.DatetimeIndex([])
+    return pd.DatetimeIndex(pd.concat(stamps, ignore_index=True).unique()).sort_values()
+
+
+def aligned(frame: pd.DataFrame, node_id: int, axis: pd.DatetimeIndex, field: str = 'value') -> List[Optional[float]]:
+    """Valores de field de un nodo en cada timestamp del eje (None donde no tiene punto)."""
+    part = frame[frame['node_id'] == node_id]
+    values = pd.to_numeric(part[field], errors='coerce').groupby(part['timestamp']).mean().reindex(axis)
+    return [None if math.isnan(value) else value for value in values.to_numpy(dtype=float).tolist()]
@@ -0,0 +1,444 @@
+"""
+Agregados (rollups) diarios y mensuales de price_records.
+
+Para cada nodo, mercado y tipo de dato se guardan suma, conteo, mínimo,
+máximo y horas negativas por día y por mes en price_rollups. La ingesta los
+recalcula solo para los buckets que tocó cada bloque (write_prices llama a
+refresh_rollups), y las consultas de estadísticas combinan el rollup más
+grueso que cabe en el rango pedido con filas horarias solo en los bordes.
+
+Uso directo (reconstruir todos los rollups, p. ej. en una base existente):
+    python -m app.utils.rollups
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import select, insert, delete, func, case, and_
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import PriceRollup, RollupGrain, DataType
+from app.utils.partitions import price_source
+from app.utils.archive import read_archive
+
+
+# Tipo de dato -> columna de price_records
+ROLLUP_COLUMNS = {
+    DataType.PRICE: 'price',
+    DataType.SOLAR_CAPTURE: 'solar_capture',
+    DataType.WIND_CAPTURE: 'wind_capture',
+    DataType.NEGATIVE_HOURS: 'negative_hours',
+}
+
+AGGREGATE_COLUMNS = ['value_sum', 'value_count', 'value_min', 'value_max', 'negative_count']
+ROLLUP_KEY = ['node_id', 'market', 'data_type', 'bucket_start']
+
+# SQL Server admite como máximo 2100 parámetros por sentencia
+_ID_BATCH = 1000
+
+
+def floor_day(value: datetime) -> datetime:
+    """Medianoche del día de value."""
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil_day(value: datetime) -> datetime:
+    """Primera medianoche en o después de value."""
+    day = floor_day(value)
+    return day if day == value else day + timedelta(days=1)
+
+
+def floor_month(value: datetime) -> datetime:
+    """Primer día del mes de value."""
+    return floor_day(value).replace(day=1)
+
+
+def ceil_month(value: datetime) -> datetime:
+    """Primer inicio de mes en o después de value."""
+    month = floor_month(value)
+    if month == value:
+        return month
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _batches(ids: Optional[List[int]]) -> Iterable[Optional[List[int]]]:
+    """Divide una lista de IDs en lotes (None significa sin filtro de nodo)."""
+    if ids is None:
+        yield None
+        return
+    for start in range(0, len(ids), _ID_BATCH):
+        yield ids[start:start + _ID_BATCH]
+
+
+def _read_raw(conn: Connection, node_ids, markets, start: datetime, end: datetime) -> pd.DataFrame:
+    """Filas horarias de [start, end) (base y archivo histórico) para los nodos y mercados indicados."""
+    table = price_source(conn, start, end)
+    columns = [table.c.node_id, table.c.market, table.c.timestamp] + [table.c[c] for c in ROLLUP_COLUMNS.values()]
+    frames = []
+    archived = read_archive(start, end, [c.name for c in columns], node_ids=node_ids)
+    archived = archived[archived['timestamp'] < end]
+    if markets is not None:
+        archived = archived[archived['market'].isin(list(markets))]
+    if not archived.empty:
+        frames.append(archived)
+    for batch in _batches(node_ids):
+        query = select(*columns).where(table.c.timestamp >= start, table.c.timestamp < end)
+        if batch is not None:
+            query = query.where(table.c.node_id.in_(batch))
+        if markets is not None:
+            query = query.where(table.c.market.in_(markets))
+        frames.append(pd.DataFrame(conn.execute(query).fetchall(), columns=[c.name for c in columns]))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=[c.name for c in columns])
+
+
+def aggregate_hours(raw: pd.DataFrame, grain: RollupGrain) -> pd.DataFrame:
+    """
+    Agrega filas horarias a buckets de día o mes, un registro por tipo de dato.
+
+    Returns:
+        DataFrame con ROLLUP_KEY + AGGREGATE_COLUMNS
+    """
+    timestamps = pd.to_datetime(raw['timestamp'])
+    buckets = timestamps.dt.floor('D') if grain == RollupGrain.DAY else timestamps.dt.to_period('M').dt.to_timestamp()
+    frames = []
+    for data_type, column in ROLLUP_COLUMNS.items():
+        values = pd.to_numeric(raw[column], errors='coerce')
+        present = values.notna()
+        if not present.any():
+            continue
+        long = pd.DataFrame({
+            'node_id': raw['node_id'][present],
+            'market': raw['market'][present],
+            'bucket_start': buckets[present],
+            'value': values[present],
+            'negative': (values[present] < 0).astype(int),
+        })
+        grouped = long.groupby(['node_id', 'market', 'bucket_start'], sort=False).agg(
+            value_sum=('value', 'sum'), value_count=('value', 'count'),
+            value_min=('value', 'min'), value_max=('value', 'max'),
+            negative_count=('negative', 'sum'),
+        ).reset_index()
+        grouped['data_type'] = data_type
+        frames.append(grouped)
+    if not frames:
+        return pd.DataFrame(columns=ROLLUP_KEY + AGGREGATE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[ROLLUP_KEY + AGGREGATE_COLUMNS]
+
+
+def _aggregate_days_to_months(days: pd.DataFrame) -> pd.DataFrame:
+    """Agrega rollups diarios a mensuales."""
+    if days.empty:
+        return pd.DataFrame(columns=ROLLUP_KEY + AGGREGATE_COLUMNS)
+    days = days.assign(bucket_start=pd.to_datetime(days['bucket_start']).dt.to_period('M').dt.to_timestamp())
+    return days.groupby(ROLLUP_KEY, sort=False).agg(
+        value_sum=('value_sum', 'sum'), value_count=('value_count', 'sum'),
+        value_min=('value_min', 'min'), value_max=('value_max', 'max'),
+        negative_count=('negative_count', 'sum'),
+    ).reset_index()[ROLLUP_KEY + AGGREGATE_COLUMNS]
+
+
+def _read_day_rollups(conn: Connection, node_ids, markets, start: datetime, end: datetime) -> pd.DataFrame:
+    """Rollups diarios de [start, end) para los nodos y mercados indicados."""
+    table = PriceRollup.__table__
+    columns = [table.c[c] for c in ROLLUP_KEY + AGGREGATE_COLUMNS]
+    frames = []
+    for batch in _batches(node_ids):
+        query = select(*columns).where(
+            table.c.grain == RollupGrain.DAY,
+            table.c.bucket_start >= start, table.c.bucket_start < end
+        )
+        if batch is not None:
+            query = query.where(table.c.node_id.in_(batch))
+        if markets is not None:
+            query = query.where(table.c.market.in_(markets))
+        frames.append(pd.DataFrame(conn.execute(query).fetchall(), columns=ROLLUP_KEY + AGGREGATE_COLUMNS))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ROLLUP_KEY + AGGREGATE_COLUMNS)
+
+
+def _replace_rollups(conn: Connection, grain: RollupGrain, rollups: pd.DataFrame,
+                     node_ids, markets, start: datetime, end: datetime):
+    """Sustituye los rollups de un grano en [start, end) para los nodos y mercados indicados."""
+    table = PriceRollup.__table__
+    for batch in _batches(node_ids):
+        statement = delete(table).where(
+            table.c.grain == grain,
+            table.c.bucket_start >= start, table.c.bucket_start < end
+        )
+        if batch is not None:
+            statement = statement.where(table.c.node_id.in_(batch))
+        if markets is not None:
+            statement = statement.where(table.c.market.in_(markets))
+        conn.execute(statement)
+
+    if rollups.empty:
+        return
+    records = [
+        {
+            'grain': grain,
+            'node_id': int(row.node_id),
+            'market': row.market,
+            'data_type': row.data_type,
+            'bucket_start': pd.Timestamp(row.bucket_start).to_pydatetime(),
+            'value_sum': float(row.value_sum),
+            'value_count': int(row.value_count),
+            'value_min': None if pd.isna(row.value_min) else float(row.value_min),
+            'value_max': None if pd.isna(row.value_max) else float(row.value_max),
+            'negative_count': int(row.negative_count),
+        }
+        for row in rollups.itertuples(index=False)
+    ]
+    conn.execute(insert(table), records)
+
+
+def refresh_range(conn: Connection, start: datetime, end: datetime,
+                  node_ids: Optional[List[int]] = None, markets: Optional[List[str]] = None):
+    """
+    Recalcula desde las filas horarias los rollups diarios de los días que
+    cubren [start, end) y los mensuales de sus meses.
+
+    Args:
+        conn: Conexión (dentro de la transacción del llamador)
+        start: Inicio del rango tocado
+        end: Fin del rango tocado (excluido)
+        node_ids: Nodos afectados (None = todos)
+        markets: Mercados afectados (None = todos)
+    """
+    day_start, day_end = floor_day(start), ceil_day(end)
+    raw = _read_raw(conn, node_ids, markets, day_start, day_end)
+    _replace_rollups(conn, RollupGrain.DAY, aggregate_hours(raw, RollupGrain.DAY),
+                     node_ids, markets, day_start, day_end)
+
+    month_start, month_end = floor_month(day_start), ceil_month(day_end)
+    days = _read_day_rollups(conn, node_ids, markets, month_start, month_end)
+    _replace_rollups(conn, RollupGrain.MONTH, _aggregate_days_to_months(days),
+                     node_ids, markets, month_start, month_end)
+
+
+def refresh_rollups(conn: Connection, df: pd.DataFrame):
+    """
+    Actualiza los rollups de los buckets tocados por un bloque recién escrito.
+    Se recalculan desde price_records (no se suman), así que el resultado es
+    correcto también cuando el bloque sobrescribe filas existentes (upsert).
+    """
+    if not settings.ROLLUPS_ENABLED or df.empty:
+        return
+    timestamps = pd.to_datetime(df['timestamp'])
+    node_ids = sorted(int(n) for n in pd.unique(df['node_id']))
+    markets = sorted(str(m) for m in pd.unique(df['market']))
+    refresh_range(conn, timestamps.min().to_pydatetime(),
+                  timestamps.max().to_pydatetime() + timedelta(hours=1), node_ids, markets)
+
+
+def rebuild_rollups(db: Session):
+    """Reconstruye todos los rollups mes a mes (una transacción por mes)."""
+    source = price_source(db)
+    first, last = db.execute(select(func.min(source.c.timestamp), func.max(source.c.timestamp))).one()
+    if first is None:
+        return 0
+    month = floor_month(first)
+    months = 0
+    while month <= last:
+        next_month = ceil_month(month + timedelta(days=1))
+        refresh_range(db.connection(), month, next_month)
+        db.commit()
+        months += 1
+        print(f"   ✅ {month:%Y-%m}")
+        month = next_month
+    return months
+
+
+def delete_node_rollups(conn: Connection, node_id: int):
+    """Borra los rollups de un nodo (al darlo de baja)."""
+    conn.execute(delete(PriceRollup.__table__).where(PriceRollup.node_id == node_id))
+
+
+# ---------------------------------------------------------------------------
+# Consultas
+# ---------------------------------------------------------------------------
+
+def plan_segments(start: datetime, end: datetime) -> Dict[str, List[Tuple[datetime, datetime]]]:
+    """
+    Descompone el rango [start, end] (ambos incluidos) en tramos semiabiertos:
+    meses completos, días completos y bordes horarios.
+
+    Returns:
+        Diccionario {'month': [...], 'day': [...], 'raw': [...]} con tuplas (inicio, fin)
+    """
+    end_excl = end + timedelta(microseconds=1)
+    segments = {'month': [], 'day': [], 'raw': []}
+    if not settings.ROLLUPS_ENABLED:
+        segments['raw'].append((start, end_excl))
+        return segments
+
+    day_start, day_end = ceil_day(start), floor_day(end_excl)
+    if day_start >= day_end:
+        segments['raw'].append((start, end_excl))
+        return segments
+
+    for edge in [(start, day_start), (day_end, end_excl)]:
+        if edge[0] < edge[1]:
+            segments['raw'].append(edge)
+
+    month_start, month_end = ceil_month(day_start), floor_month(day_end)
+    if month_start < month_end:
+        segments['month'].append((month_start, month_end))
+        for edge in [(day_start, month_start), (month_end, day_end)]:
+            if edge[0] < edge[1]:
+                segments['day'].append(edge)
+    else:
+        segments['day'].append((day_start, day_end))
+    return segments
+
+
+def _merge(totals: Dict[int, Dict], rows):
+    """Acumula filas (node_id, sum, count, min, max, negativos) en totals."""
+    for node_id, value_sum, value_count, value_min, value_max, negative_count in rows:
+        if not value_count:
+            continue
+        current = totals.setdefault(node_id, {
+            'sum': 0.0, 'count': 0, 'min': None, 'max': None, 'negative_count': 0
+        })
+        current['sum'] += float(value_sum)
+        current['count'] += int(value_count)
+        current['negative_count'] += int(negative_count or 0)
+        if value_min is not None:
+            current['min'] = value_min if current['min'] is None else min(current['min'], value_min)
+        if value_max is not None:
+            current['max'] = value_max if current['max'] is None else max(current['max'], value_max)
+
+
+def _archived_stats(node_ids: List[int], start: datetime, end: datetime, column: str,
+                    market: Optional[str] = None) -> List[Tuple]:
+    """Filas (node_id, sum, count, min, max, negativos) del archivo histórico en [start, end)."""
+    archived = read_archive(start, end, ['node_id', 'timestamp', column], node_ids=node_ids, market=market)
+    archived = archived[(archived['timestamp'] < end) & archived[column].notna()]
+    if archived.empty:
+        return []
+    archived = archived.assign(negative=archived[column] < 0)
+    grouped = archived.groupby('node_id').agg(
+        value_sum=(column, 'sum'), value_count=(column, 'count'), value_min=(column, 'min'),
+        value_max=(column, 'max'), negative_count=('negative', 'sum'),
+    )
+    return [
+        (int(node_id), float(row.value_sum), int(row.value_count), float(row.value_min),
+         float(row.value_max), int(row.negative_count))
+        for node_id, row in grouped.iterrows()
+    ]
+
+
+def range_stats(db: Session, node_ids: List[int], start: datetime, end: datetime,
+                data_type: DataType = DataType.PRICE, market: Optional[str] = None) -> Dict[int, Dict]:
+    """
+    Estadísticas por nodo en [start, end] combinando rollups mensuales,
+    diarios y filas horarias en los bordes.
+
+    Returns:
+        {node_id: {'sum', 'count', 'avg', 'min', 'max', 'negative_count'}}
+        (solo nodos con datos)
+    """
+    data_type = DataType(data_type)
+    column = ROLLUP_COLUMNS[data_type]
+    segments = plan_segments(start, end)
+    totals: Dict[int, Dict] = {}
+
+    for grain, key in [(RollupGrain.MONTH, 'month'), (RollupGrain.DAY, 'day')]:
+        for seg_start, seg_end in segments[key]:
+            query = (
+                db.query(
+                    PriceRollup.node_id,
+                    func.sum(PriceRollup.value_sum),
+                    func.sum(PriceRollup.value_count),
+                    func.min(PriceRollup.value_min),
+                    func.max(PriceRollup.value_max),
+                    func.sum(PriceRollup.negative_count),
+                )
+                .filter(
+                    PriceRollup.grain == grain,
+                    PriceRollup.data_type == data_type,
+                    PriceRollup.node_id.in_(node_ids),
+                    PriceRollup.bucket_start >= seg_start,
+                    PriceRollup.bucket_start < seg_end,
+                )
+            )
+            if market:
+                query = query.filter(PriceRollup.market == market)
+            _merge(totals, query.group_by(PriceRollup.node_id).all())
+
+    for seg_start, seg_end in segments['raw']:
+        source = price_source(db, seg_start, seg_end)
+        field = source.c[column]
+        query = (
+            db.query(
+                source.c.node_id,
+                func.sum(field),
+                func.count(field),
+                func.min(field),
+                func.max(field),
+                func.sum(case((field < 0, 1), else_=0)),
+            )
+            .filter(
+                and_(
+                    source.c.node_id.in_(node_ids),
+                    source.c.timestamp >= seg_start,
+                    source.c.timestamp < seg_end,
+                    field.isnot(None),
+                )
+            )
+        )
+        if market:
+            query = query.filter(source.c.market == market)
+        _merge(totals, query.group_by(source.c.node_id).all())
+        _merge(totals, _archived_stats(node_ids, seg_start, seg_end, column, market))
+
+    for stats in totals.values():
+        stats['avg'] = stats['sum'] / stats['count']
+    return totals
+
+
+def monthly_series(db: Session, node_id: int, start: datetime, end: datetime,
+                   data_type: DataType = DataType.PRICE, market: Optional[str] = None) -> List[Tuple[datetime, float]]:
+    """Promedio mensual de un nodo leído de los rollups mensuales (meses que empiezan en [start, end])."""
+    data_type = DataType(data_type)
+    if not settings.ROLLUPS_ENABLED:
+        raw = _read_raw(db.connection(), [node_id], [market] if market else None,
+                        floor_month(start), ceil_month(end + timedelta(microseconds=1)))
+        months = aggregate_hours(raw, RollupGrain.MONTH)
+        months = months[months['data_type'] == data_type].groupby('bucket_start')[['value_sum', 'value_count']].sum()
+        return [(bucket.to_pydatetime(), row.value_sum / row.value_count)
+                for bucket, row in months.sort_index().iterrows()]
+
+    query = (
+        db.query(
+            PriceRollup.bucket_start,
+            func.sum(PriceRollup.value_sum) / func.sum(PriceRollup.value_count),
+        )
+        .filter(
+            PriceRollup.grain == RollupGrain.MONTH,
+            PriceRollup.data_type == data_type,
+            PriceRollup.node_id == node_id,
+            PriceRollup.bucket_start >= floor_month(start),
+            PriceRollup.bucket_start <= end,
+            PriceRollup.value_count > 0,
+        )
+    )
+    if market:
+        query = query.filter(PriceRollup.market == market)
+    return [
+        (bucket, float(avg))
+        for bucket, avg in query.group_by(PriceRollup.bucket_start).order_by(PriceRollup.bucket_start).all()
+    ]
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal, init_db
+
+    init_db()
+    session = SessionLocal()
+    try:
+        print("Reconstruyendo rollups...")
+        count = rebuild_rollups(session)
+        print(f"✓ Rollups reconstruidos para {count} meses.")
+    finally:
+        session.close()
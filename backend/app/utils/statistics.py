@@ -0,0 +1,101 @@
+"""
+Estadísticas de los valores de uno o varios nodos en un rango.
+
+- Básicas (media, mínimo, máximo, conteo y horas negativas): salen de los
+  rollups (SQL) o de una agregación en DuckDB, sin leer todas las horas.
+- Detalladas (además desviación típica, percentiles y las N horas de mayor
+  valor): una pasada sobre los valores horarios de todos los nodos pedidos;
+  los percentiles se obtienen por selección (np.percentile / quantile_cont),
+  sin ordenar la serie, y las N mayores con np.argpartition.
+
+Los resultados se guardan en stats_cache por (versión de los datos, nodos,
+rango, tipo de dato y parámetros).
+"""
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.utils.cache import create_cache
+
+
+# Percentiles por defecto de las estadísticas detalladas
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+# Máximo de horas en el ranking de mayores valores
+MAX_TOP_HOURS = 100
+
+# Estadísticas calculadas, por (versión, nodos, inicio, fin, tipo de dato, detalladas, percentiles, N)
+stats_cache = create_cache('stats')
+
+
+def percentile_key(percentile: float) -> str:
+    """Clave de un percentil en la respuesta (p10, p99.9)."""
+    return f"p{percentile:g}"
+
+
+def with_negative_share(stats: Dict) -> Dict:
+    """Añade negative_share (horas negativas / horas con valor) a unas estadísticas básicas."""
+    count = stats['count']
+    return {**stats, 'negative_share': stats['negative_count'] / count if count else None}
+
+
+def value_stats(timestamps: np.ndarray, values: np.ndarray, percentiles: List[float], top_n: int) -> Dict:
+    """
+    Estadísticas detalladas de un array de valores no nulos.
+
+    Returns:
+        Diccionario con count, sum, avg, min, max, std (poblacional),
+        negative_count, negative_share, percentiles ({pXX: valor}) y
+        top_hours ([(timestamp, valor)] de mayor a menor; empates, el más antiguo)
+    """
+    count = int(values.size)
+    negative = int(np.count_nonzero(values < 0))
+    if 0 < top_n < count:
+        # Candidatas: las que igualan o superan el N-ésimo mayor (con todos sus empates)
+        nth = values[np.argpartition(-values, top_n - 1)[top_n - 1]]
+        top = np.flatnonzero(values >= nth)
+    else:
+        top = np.arange(count if top_n else 0)
+    top = top[np.lexsort((timestamps[top], -values[top]))][:top_n]
+    return {
+        'count': count,
+        'sum': float(values.sum()),
+        'avg': float(values.mean()),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'std': float(values.std()),
+        'negative_count': negative,
+        'negative_share': negative / count,
+        'percentiles': {
+            percentile_key(percentile): float(value)
+            for percentile, value in zip(percentiles, np.percentile(values, percentiles))
+        } if percentiles else {},
+        'top_hours': [
+            (pd.Timestamp(timestamp).to_pydatetime(), float(value))
+            for timestamp, value in zip(timestamps[top], values[top])
+        ],
+    }
+
+
+def frame_stats(rows: pd.DataFrame, column: str, percentiles: List[float], top_n: int) -> Dict[int, Dict]:
+    """
+    Estadísticas detalladas por nodo de filas (node_id, timestamp, column).
+
+    Returns:
+        {node_id: value_stats(...)} (solo nodos con valores)
+    """
+    values = pd.to_numeric(rows[column], errors='coerce')
+    present = rows[values.notna()].assign(**{column: values[values.notna()]})
+    return {
+        int(node_id): value_stats(
+            pd.to_datetime(part['timestamp']).to_numpy(), part[column].to_numpy(dtype=float), percentiles, top_n
+        )
+        for node_id, part in present.groupby('node_id', sort=False)
+    }
+
+
+def clean(value: Optional[float]) -> Optional[float]:
+    """NaN como None (p. ej. la desviación de DuckDB sin valores)."""
+    return None if value is None or math.isnan(value) else float(value)
@@ -0,0 +1,129 @@
+"""
+Validación vectorizada de los bloques de ingesta.
+
+Cada comprobación se evalúa una vez por bloque sobre columnas completas y
+produce una máscara booleana. Las filas rechazadas no interrumpen la carga:
+se devuelven como un DataFrame de cuarentena (QUARANTINE_COLUMNS) con su
+código de motivo, que el importador escribe en bloque en quarantine_records
+para revisarlas después.
+
+Cada fila rechazada recibe un único motivo, el primero que falla en este
+orden: nodo desconocido, timestamp inválido, celda no numérica, precio fuera
+de rango y hora duplicada.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.models import QuarantineReason
+
+
+# Columnas del DataFrame de filas rechazadas (las de quarantine_records sin source_file)
+QUARANTINE_COLUMNS = ['source_row', 'reason', 'node_code', 'node_id', 'timestamp', 'value', 'market']
+
+# Filas de encabezado antes de los datos: la primera fila de datos es la 2 del archivo
+FIRST_DATA_ROW = 2
+
+
+def raw_text(values, max_length: int = 50) -> np.ndarray:
+    """Valores originales como texto para la cuarentena (None si están vacíos)."""
+    return np.array([None if pd.isna(v) else str(v)[:max_length] for v in values], dtype=object)
+
+
+def out_of_range(prices: np.ndarray) -> np.ndarray:
+    """Máscara de precios numéricos fuera de [PRICE_MIN, PRICE_MAX]."""
+    with np.errstate(invalid='ignore'):
+        return np.isfinite(prices) & ((prices < settings.PRICE_MIN) | (prices > settings.PRICE_MAX))
+
+
+def fall_back_hours(timestamps: pd.Series) -> np.ndarray:
+    """
+    Máscara de la hora que se repite al terminar el horario de verano en EE. UU.
+    (01:00-01:59 del primer domingo de noviembre, hora local).
+    """
+    ts = pd.DatetimeIndex(timestamps)
+    return np.asarray(
+        (ts.month == 11) & (ts.dayofweek == 6) & (ts.day <= 7) & (ts.hour == 1),
+        dtype=bool
+    )
+
+
+def duplicate_hours(keys: pd.DataFrame, timestamps: pd.Series, candidates: np.ndarray) -> np.ndarray:
+    """
+    Motivo de duplicado para las repeticiones de una clave dentro del bloque.
+    La primera aparición se conserva; las siguientes se rechazan.
+
+    Args:
+        keys: Columnas que forman la clave natural
+        timestamps: Timestamp de cada fila
+        candidates: Filas que siguen siendo válidas
+
+    Returns:
+        Array de motivos (None donde no hay duplicado)
+    """
+    reasons = np.full(len(keys), None, dtype=object)
+    duplicated = np.zeros(len(keys), dtype=bool)
+    duplicated[candidates] = keys[candidates].duplicated(keep='first').to_numpy()
+    if duplicated.any():
+        dst = fall_back_hours(timestamps)
+        reasons[duplicated & dst] = QuarantineReason.DST_DUPLICATE_HOUR
+        reasons[duplicated & ~dst] = QuarantineReason.DUPLICATE_HOUR
+    return reasons
+
+
+def assign_reason(reasons: np.ndarray, mask: np.ndarray, reason: QuarantineReason):
+    """Asigna un motivo a las filas de la máscara que aún no tienen uno."""
+    reasons[np.asarray(mask, dtype=bool) & pd.isna(reasons)] = reason
+
+
+def build_rejected(mask: np.ndarray, reasons: np.ndarray, source_rows: np.ndarray,
+                   node_code=None, node_id=None, timestamp=None, value=None,
+                   market=None) -> pd.DataFrame:
+    """
+    Construye el DataFrame de cuarentena con las filas de la máscara.
+    Las columnas opcionales pueden ser arrays alineados con la máscara o None.
+    """
+    def pick(values):
+        if values is None:
+            return None
+        return np.asarray(values, dtype=object)[mask]
+
+    return pd.DataFrame({
+        'source_row': source_rows[mask],
+        'reason': reasons[mask],
+        'node_code': pick(node_code),
+        'node_id': pick(node_id),
+        'timestamp': pick(timestamp),
+        'value': pick(value),
+        'market': pick(market),
+    }, columns=QUARANTINE_COLUMNS)
+
+
+def empty_rejected() -> pd.DataFrame:
+    """DataFrame de cuarentena sin filas."""
+    return pd.DataFrame(columns=QUARANTINE_COLUMNS)
+
+
+def reason_counts(rejected: Optional[pd.DataFrame]) -> Dict[str, int]:
+    """Cuenta las filas rechazadas por motivo ({'unknown_node': 3, ...})."""
+    if rejected is None or rejected.empty:
+        return {}
+    return {QuarantineReason(reason).value: int(count)
+            for reason, count in rejected['reason'].value_counts().items()}
+
+
+def merge_counts(total: Dict[str, int], counts: Dict[str, int]) -> Dict[str, int]:
+    """Acumula contadores por motivo en total (y lo devuelve)."""
+    for reason, count in counts.items():
+        total[reason] = total.get(reason, 0) + count
+    return total
+
+
+def print_quarantine_summary(counts: Dict[str, int], indent: str = "   "):
+    """Muestra cuántas filas fueron a cuarentena y por qué motivo."""
+    total = sum(counts.values())
+    print(f"{indent}- En cuarentena: {total:,}")
+    for reason, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"{indent}    · {reason}: {count:,}")
@@ -8,7 +8,8 @@ import numpy as np
 from scipy.spatial import Voronoi
 from shapely.geometry import Polygon, Point, MultiPolygon, box
 from shapely.ops import unary_union
-import openpyxl
+import pandas as pd
+from app.utils.parquet_store import read_table
 
 
 # Límites aproximados de Texas (bounding box)
@@ -23,24 +24,25 @@ TEXAS_BOUNDS = {
 def load_nodes_from_excel(excel_path: str) -> List[Dict]:
     """
     Carga los nodos desde el archivo Excel.
+    La lectura pasa por el almacén Parquet, así que el libro solo se
+    procesa con openpyxl la primera vez.
     
     Returns:
         Lista de diccionarios con datos de nodos
     """
-    wb = openpyxl.load_workbook(excel_path)
-    ws = wb.active
+    df = read_table(excel_path)
     
     nodes = []
-    for row in ws.iter_rows(min_row=2, values_only=True):
+    for row in df.itertuples(index=False):
         code, name, lat, lng, market, zone, is_active, created_at = row
-        if is_active:
+        if pd.notna(is_active) and is_active:
             nodes.append({
                 'code': code,
                 'name': name,
                 'latitude': float(lat),
                 'longitude': float(lng),
                 'market': market,
-                'zone': zone
+                'zone': zone if pd.notna(zone) else None
             })
     
     return nodes
@@ -0,0 +1,125 @@
+"""
+Script para generar bases de datos de benchmark con datos sintéticos.
+Tamaño definido por nodos x años; reproducible a partir de una semilla.
+
+USO:
+python generate_benchmark_data.py --nodes 1000 --years 3
+python generate_benchmark_data.py --nodes 5000 --years 5 --seed 7 --output parquet --parquet-path data/bench.parquet
+
+Con --output db los datos se escriben en la base de DATABASE_URL (SQLite o
+SQL Server) por inserción masiva. Con --output parquet se genera un archivo
+con columnas node_code, timestamp, price, ... que puede importarse después
+con import_real_data.py --prices.
+"""
+import os
+import sys
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import insert
+
+sys.path.append('.')
+
+from app.db.database import SessionLocal, init_db
+from app.models import Node
+from app.utils.bulk_loader import write_prices, ThroughputMeter, WRITE_MODES
+from app.utils.index_management import bulk_load_indexes, print_index_report
+from app.utils.synthetic_data import generate_nodes, iter_synthetic_prices
+
+
+def ensure_benchmark_nodes(db, nodes_df):
+    """Crear los nodos sintéticos que falten y devolver sus IDs en orden."""
+    existing = dict(db.query(Node.code, Node.id).filter(Node.code.in_(nodes_df['code'].tolist())).all())
+    missing = nodes_df[~nodes_df['code'].isin(existing.keys())]
+    if not missing.empty:
+        db.execute(insert(Node.__table__), [
+            {**row, 'is_active': True, 'created_at': datetime.utcnow()}
+            for row in missing.to_dict('records')
+        ])
+        db.commit()
+        existing = dict(db.query(Node.code, Node.id).filter(Node.code.in_(nodes_df['code'].tolist())).all())
+    print(f"   Nodos de benchmark: {len(existing)} ({len(missing)} creados)")
+    return [existing[code] for code in nodes_df['code']]
+
+
+def generate_to_database(args, nodes_df, start, end):
+    """Generar y escribir los registros en la base de datos."""
+    init_db()
+    db = SessionLocal()
+    try:
+        node_ids = ensure_benchmark_nodes(db, nodes_df)
+        with bulk_load_indexes(args.bulk_load) as timings:
+            meter = ThroughputMeter()
+            for block_number, frame in enumerate(iter_synthetic_prices(node_ids, start, end, args.seed, args.market), start=1):
+                write_prices(db.connection(), frame, args.mode)
+                db.commit()
+                rate = meter.chunk_done(len(frame))
+                print(f"   ✅ Bloque {block_number}: {frame['timestamp'].iloc[0]:%Y-%m-%d} "
+                      f"{len(frame):,} registros (Total: {meter.total_rows:,}) - {rate:,.0f} filas/s")
+        print_index_report(timings)
+        return meter
+    finally:
+        db.close()
+
+
+def generate_to_parquet(args, nodes_df, start, end):
+    """Generar los registros en un archivo Parquet importable."""
+    os.makedirs(os.path.dirname(os.path.abspath(args.parquet_path)), exist_ok=True)
+    node_ids = np.arange(1, len(nodes_df) + 1)
+    codes = nodes_df['code'].to_numpy()
+    meter = ThroughputMeter()
+    writer = None
+    try:
+        for block_number, frame in enumerate(iter_synthetic_prices(node_ids, start, end, args.seed, args.market), start=1):
+            frame.insert(0, 'node_code', codes[frame.pop('node_id').to_numpy() - 1])
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(args.parquet_path, table.schema, compression='zstd')
+            writer.write_table(table)
+            rate = meter.chunk_done(len(frame))
+            print(f"   ✅ Bloque {block_number}: {len(frame):,} registros "
+                  f"(Total: {meter.total_rows:,}) - {rate:,.0f} filas/s")
+    finally:
+        if writer is not None:
+            writer.close()
+    nodes_path = os.path.splitext(args.parquet_path)[0] + '_nodes.csv'
+    nodes_df.to_csv(nodes_path, index=False)
+    print(f"   Nodos guardados en {nodes_path}")
+    return meter
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar datos sintéticos de benchmark')
+    parser.add_argument('--nodes', type=int, default=150, help='Número de nodos')
+    parser.add_argument('--years', type=int, default=1, help='Años de historia horaria')
+    parser.add_argument('--start-year', type=int, default=2023, help='Primer año')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla (mismos argumentos = mismos datos)')
+    parser.add_argument('--market', default='ERCOT', help='Mercado de los registros')
+    parser.add_argument('--output', choices=['db', 'parquet'], default='db', help='Destino de los datos')
+    parser.add_argument('--parquet-path', default='data/benchmark/prices.parquet', help='Archivo de salida para --output parquet')
+    parser.add_argument('--mode', choices=WRITE_MODES, default='insert', help='Modo de escritura en BD')
+    parser.add_argument('--bulk-load', action='store_true',
+                        help='Suspender los índices secundarios durante la carga en BD y reconstruirlos al final')
+    args = parser.parse_args()
+
+    start = datetime(args.start_year, 1, 1)
+    end = datetime(args.start_year + args.years, 1, 1)
+    nodes_df = generate_nodes(args.nodes, args.seed, args.market)
+
+    print(f"🔧 Generando {args.nodes:,} nodos x {args.years} años "
+          f"({start:%Y-%m-%d} a {end:%Y-%m-%d}), semilla {args.seed}...")
+
+    if args.output == 'db':
+        meter = generate_to_database(args, nodes_df, start, end)
+    else:
+        meter = generate_to_parquet(args, nodes_df, start, end)
+
+    print(f"\n✅ Generación completada: {meter.total_rows:,} registros, "
+          f"{meter.overall_rate:,.0f} filas/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ Soporta archivos CSV y Excel
 
 USO:
 python import_real_data.py --nodes data/nodes.csv --prices data/prices_2023.csv
+python import_real_data.py --prices data/prices_2023.csv --mode insert   # carga inicial
+python import_real_data.py --prices-dir data/mensuales --workers 8         # varios archivos en paralelo
 
 ESTRUCTURA CSV ESPERADA:
 
@@ -16,158 +18,153 @@ prices.csv:
 
 import sys
 import argparse
-import pandas as pd
-from datetime import datetime
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 sys.path.append('.')
 
 from app.db.database import SessionLocal, init_db
-from app.models import Node, PriceRecord
-
-
-def import_nodes(file_path: str, db: Session):
-    """Importar nodos desde CSV o Excel."""
+from app.models import Node
+from app.utils.bulk_loader import (
+    read_in_chunks, prepare_price_chunk, write_prices, write_quarantine, ThroughputMeter, WRITE_MODES
+)
+from app.utils.parallel_ingest import find_price_files, import_price_files
+from app.utils.ingestion_manifest import start_file, checkpoint, finish_file, fail_file
+from app.utils.index_management import bulk_load_indexes, print_index_report
+from app.utils.node_sync import sync_nodes, print_sync_report
+from app.utils.parquet_store import read_table
+from app.utils.partitions import price_source
+from app.utils.validation import FIRST_DATA_ROW, reason_counts, merge_counts, print_quarantine_summary
+
+
+def import_nodes(file_path: str, db: Session, deactivate_missing: bool = False):
+    """
+    Sincronizar el catálogo de nodos desde CSV o Excel.
+    
+    Crea los nodos nuevos, actualiza los que cambiaron y, con
+    deactivate_missing=True, desactiva los que ya no aparecen en el archivo.
+    Todo se aplica en bloque dentro de una única transacción.
+    """
     print(f"\n📍 Importando nodos desde {file_path}...")
     
-    # Detectar formato
-    if file_path.endswith('.xlsx') or file_path.endswith('.xls'):
-        df = pd.read_excel(file_path)
-    else:
-        df = pd.read_csv(file_path)
-    
-    # Validar columnas requeridas
-    required = ['code', 'name', 'latitude', 'longitude', 'market']
-    missing = [col for col in required if col not in df.columns]
-    if missing:
-        raise ValueError(f"Columnas faltantes: {missing}")
-    
-    # Importar
-    imported = 0
-    skipped = 0
+    df = read_table(file_path)
+    report = sync_nodes(db, df, deactivate_missing=deactivate_missing)
     
-    for idx, row in df.iterrows():
-        try:
-            # Verificar si ya existe
-            existing = db.query(Node).filter(Node.code == row['code']).first()
-            if existing:
-                print(f"⚠️  Nodo {row['code']} ya existe, saltando...")
-                skipped += 1
-                continue
-            
-            node = Node(
-                code=str(row['code']).strip(),
-                name=str(row['name']).strip(),
-                latitude=float(row['latitude']),
-                longitude=float(row['longitude']),
-                market=str(row['market']).strip(),
-                zone=str(row['zone']).strip() if 'zone' in row and pd.notna(row['zone']) else None
-            )
-            
-            db.add(node)
-            imported += 1
-            
-            # Commit cada 100 registros
-            if imported % 100 == 0:
-                db.commit()
-                print(f"   Importados {imported} nodos...")
-        
-        except Exception as e:
-            print(f"❌ Error en fila {idx}: {e}")
-            continue
-    
-    db.commit()
-    print(f"✅ Importación completada: {imported} nodos importados, {skipped} saltados")
-    return imported
+    print(f"✅ Sincronización completada:")
+    print_sync_report(report)
+    return report['created'] + report['updated']
 
 
-def import_prices(file_path: str, db: Session, batch_size: int = 5000):
-    """Importar registros de precios desde CSV o Excel."""
-    print(f"\n💰 Importando precios desde {file_path}...")
+def import_prices(file_path: str, db: Session, batch_size: int = 5000, mode: str = 'upsert',
+                  force: bool = False, bulk_load: bool = False):
+    """
+    Importar registros de precios desde CSV o Excel, por bloques.
     
-    # Detectar formato
-    if file_path.endswith('.xlsx') or file_path.endswith('.xls'):
-        df = pd.read_excel(file_path)
-    else:
-        df = pd.read_csv(file_path)
+    mode='upsert' es idempotente: volver a cargar un archivo actualiza las
+    filas existentes (clave node_id, timestamp, market) en lugar de duplicarlas.
+    mode='insert' solo inserta y es más rápido para cargas iniciales.
     
-    print(f"   Total de registros: {len(df):,}")
+    El avance queda registrado en el manifiesto de ingesta: si el archivo ya
+    se cargó con el mismo contenido se salta, y si una carga anterior falló
+    se reanuda desde el último bloque confirmado (force=True recarga todo).
     
-    # Validar columnas
-    required = ['node_code', 'timestamp', 'price', 'market']
-    missing = [col for col in required if col not in df.columns]
-    if missing:
-        raise ValueError(f"Columnas faltantes: {missing}")
+    bulk_load=True suspende los índices secundarios durante la carga y los
+    reconstruye al final en una sola pasada.
+    """
+    print(f"\n💰 Importando precios desde {file_path} (modo {mode})...")
+    
+    entry = start_file(db, file_path, force=force)
+    if entry is None:
+        print("   ⏭️  Archivo ya cargado con el mismo contenido, saltando (use --force para recargar)")
+        return 0
+    if entry.row_end:
+        print(f"   ↩️  Reanudando desde la fila {entry.row_end:,} ({entry.rows_loaded:,} registros ya cargados)")
     
     # Obtener mapeo de códigos de nodo a IDs
-    nodes = {n.code: n.id for n in db.query(Node).all()}
+    nodes = {n.code: n.id for n in db.query(Node.code, Node.id).all()}
     print(f"   Nodos encontrados en BD: {len(nodes)}")
     
     if not nodes:
         raise ValueError("❌ No hay nodos en la base de datos. Importa nodos primero.")
     
-    # Procesar en batches
+    # Procesar en bloques: la memoria queda acotada por batch_size
     imported = 0
-    skipped = 0
-    errors = 0
+    quarantined = {}
+    row_end = entry.row_end
     
-    for batch_start in range(0, len(df), batch_size):
-        batch_end = min(batch_start + batch_size, len(df))
-        batch = df.iloc[batch_start:batch_end]
-        records = []
-        
-        for idx, row in batch.iterrows():
-            try:
-                node_code = str(row['node_code']).strip()
-                node_id = nodes.get(node_code)
-                
-                if not node_id:
-                    if skipped < 10:  # Solo mostrar primeros 10
-                        print(f"⚠️  Nodo {node_code} no encontrado en BD")
-                    skipped += 1
-                    continue
-                
-                # Parsear timestamp
-                try:
-                    timestamp = pd.to_datetime(row['timestamp'])
-                except:
-                    print(f"❌ Timestamp inválido en fila {idx}: {row['timestamp']}")
-                    errors += 1
-                    continue
+    with bulk_load_indexes(bulk_load) as timings:
+        meter = ThroughputMeter()
+        try:
+            chunks = read_in_chunks(file_path, batch_size, skip_rows=row_end, content_hash=entry.content_hash)
+            for chunk_number, chunk in enumerate(chunks, start=1):
+                # Validar columnas
+                required = ['node_code', 'timestamp', 'price', 'market']
+                missing = [col for col in required if col not in chunk.columns]
+                if missing:
+                    raise ValueError(f"Columnas faltantes: {missing}")
                 
-                # Crear registro
-                record = PriceRecord(
-                    node_id=node_id,
-                    timestamp=timestamp,
-                    price=float(row['price']) if pd.notna(row['price']) else None,
-                    solar_capture=float(row['solar_capture']) if 'solar_capture' in row and pd.notna(row['solar_capture']) else None,
-                    wind_capture=float(row['wind_capture']) if 'wind_capture' in row and pd.notna(row['wind_capture']) else None,
-                    market=str(row['market']).strip()
-                )
-                records.append(record)
+                records, rejected = prepare_price_chunk(chunk, nodes, first_row=FIRST_DATA_ROW + row_end)
+                merge_counts(quarantined, reason_counts(rejected))
                 
-            except Exception as e:
-                if errors < 10:  # Solo mostrar primeros 10
-                    print(f"❌ Error en fila {idx}: {e}")
-                errors += 1
-                continue
-        
-        # Guardar batch
-        if records:
-            db.bulk_save_objects(records)
-            db.commit()
-            imported += len(records)
-            print(f"   ✅ Batch {batch_start//batch_size + 1}: {len(records):,} registros guardados (Total: {imported:,})")
+                # Guardar bloque, cuarentena y checkpoint en la misma transacción
+                inserted = write_prices(db.connection(), records, mode)
+                write_quarantine(db.connection(), rejected, entry.file_path)
+                row_end += len(chunk)
+                checkpoint(entry, row_end, inserted)
+                db.commit()
+                imported += inserted
+                rate = meter.chunk_done(len(chunk))
+                print(f"   ✅ Bloque {chunk_number}: {inserted:,} registros guardados "
+                      f"(Total: {imported:,}) - {rate:,.0f} filas/s")
+        except Exception as e:
+            fail_file(db, entry, e)
+            raise
+    
+    finish_file(db, entry)
     
     print(f"\n✅ Importación completada:")
     print(f"   - Importados: {imported:,}")
-    print(f"   - Saltados: {skipped:,}")
-    print(f"   - Errores: {errors:,}")
+    print_quarantine_summary(quarantined)
+    print(f"   - Velocidad media: {meter.overall_rate:,.0f} filas/s")
+    print_index_report(timings)
     
     return imported
 
 
+def import_prices_dir(directory: str, db: Session, pattern: str = None, workers: int = None,
+                      batch_size: int = 5000, mode: str = 'upsert', force: bool = False,
+                      bulk_load: bool = False):
+    """Importar todos los archivos de precios de un directorio en paralelo."""
+    files = find_price_files(directory, pattern)
+    print(f"\n💰 Importando {len(files)} archivos de precios desde {directory} (modo {mode})...")
+    
+    if not files:
+        print("⚠️  No se encontraron archivos")
+        return 0
+    
+    # Obtener mapeo de códigos de nodo a IDs (se envía a cada proceso)
+    nodes = {n.code: n.id for n in db.query(Node.code, Node.id).all()}
+    print(f"   Nodos encontrados en BD: {len(nodes)}")
+    
+    if not nodes:
+        raise ValueError("❌ No hay nodos en la base de datos. Importa nodos primero.")
+    
+    with bulk_load_indexes(bulk_load) as timings:
+        summary = import_price_files(files, db, nodes, chunk_size=batch_size, workers=workers,
+                                     mode=mode, force=force)
+    
+    print(f"\n✅ Importación completada:")
+    print(f"   - Archivos cargados: {summary['loaded']}")
+    print(f"   - Archivos sin cambios (saltados): {summary['unchanged']}")
+    print(f"   - Archivos fallidos: {summary['failed']}")
+    print(f"   - Importados: {summary['rows']:,}")
+    print_quarantine_summary(summary['quarantined'])
+    print(f"   - Velocidad media: {summary['rows'] / max(summary['seconds'], 1e-9):,.0f} filas/s")
+    print_index_report(timings)
+    
+    return summary['rows']
+
+
 def show_statistics(db: Session):
     """Mostrar estadísticas de la base de datos."""
     print("\n📊 Estadísticas de la Base de Datos:")
@@ -178,13 +175,14 @@ def show_statistics(db: Session):
     print(f"Nodos: {node_count}")
     
     # Registros de precios
-    price_count = db.query(func.count(PriceRecord.id)).scalar()
+    price_table = price_source(db)
+    price_count = db.query(func.count()).select_from(price_table).scalar()
     print(f"Registros de precios: {price_count:,}")
     
     # Rango de fechas
     if price_count > 0:
-        min_date = db.query(func.min(PriceRecord.timestamp)).scalar()
-        max_date = db.query(func.max(PriceRecord.timestamp)).scalar()
+        min_date = db.query(func.min(price_table.c.timestamp)).scalar()
+        max_date = db.query(func.max(price_table.c.timestamp)).scalar()
         print(f"Rango de fechas: {min_date} a {max_date}")
     
     # Mercados
@@ -198,7 +196,17 @@ def main():
     parser = argparse.ArgumentParser(description='Importar datos reales de ERCOT')
     parser.add_argument('--nodes', help='Archivo CSV/Excel con nodos', required=False)
     parser.add_argument('--prices', help='Archivo CSV/Excel con precios', required=False)
-    parser.add_argument('--batch-size', type=int, default=5000, help='Tamaño de batch para precios')
+    parser.add_argument('--prices-dir', help='Directorio con varios archivos CSV/Excel de precios', required=False)
+    parser.add_argument('--pattern', help='Patrón glob dentro de --prices-dir (ej: "prices_2024_*.csv")')
+    parser.add_argument('--workers', type=int, help='Procesos para parsear archivos en paralelo (por defecto: núcleos)')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Filas por bloque al leer e insertar precios')
+    parser.add_argument('--mode', choices=WRITE_MODES, default='upsert',
+                        help='upsert (idempotente, por defecto) o insert (solo para tablas vacías)')
+    parser.add_argument('--force', action='store_true', help='Recargar archivos aunque el manifiesto los marque como cargados')
+    parser.add_argument('--bulk-load', action='store_true',
+                        help='Suspender los índices secundarios durante la carga y reconstruirlos al final')
+    parser.add_argument('--deactivate-missing', action='store_true',
+                        help='Con --nodes, desactivar los nodos que no aparecen en el archivo')
     parser.add_argument('--stats', action='store_true', help='Mostrar estadísticas')
     
     args = parser.parse_args()
@@ -212,17 +220,22 @@ def main():
     try:
         # Importar nodos
         if args.nodes:
-            import_nodes(args.nodes, db)
+            import_nodes(args.nodes, db, args.deactivate_missing)
         
         # Importar precios
         if args.prices:
-            import_prices(args.prices, db, args.batch_size)
+            import_prices(args.prices, db, args.batch_size, args.mode, args.force, args.bulk_load)
+        
+        # Importar directorio de precios en paralelo
+        if args.prices_dir:
+            import_prices_dir(args.prices_dir, db, args.pattern, args.workers, args.batch_size,
+                              args.mode, args.force, args.bulk_load)
         
         # Mostrar estadísticas
-        if args.stats or args.nodes or args.prices:
+        if args.stats or args.nodes or args.prices or args.prices_dir:
             show_statistics(db)
         
-        if not args.nodes and not args.prices and not args.stats:
+        if not args.nodes and not args.prices and not args.prices_dir and not args.stats:
             parser.print_help()
     
     except Exception as e:
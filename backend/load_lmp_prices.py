@@ -4,160 +4,140 @@ Lee el archivo LPMs.xlsx y carga los precios en la base de datos.
 """
 import sys
 import os
-from datetime import datetime
 from sqlalchemy.orm import Session
-import openpyxl
 
 # Agregar el directorio raíz al path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.db.database import SessionLocal, engine, Base
-from app.models import Node, PriceRecord
+from app.models import Node
+from app.utils.bulk_loader import (
+    iter_wide_blocks, resolve_node_columns, melt_wide_block, node_number,
+    write_prices, write_quarantine, ThroughputMeter, WRITE_MODES
+)
+from app.utils.index_management import bulk_load_indexes
+from app.utils.ingestion_manifest import start_file, checkpoint, finish_file, fail_file
+from app.utils.validation import FIRST_DATA_ROW, reason_counts, merge_counts, print_quarantine_summary
 
 # Crear tablas si no existen
 Base.metadata.create_all(bind=engine)
 
 
-def load_prices_from_excel(excel_path: str, db: Session):
+def load_prices_from_excel(excel_path: str, db: Session, mode: str = 'upsert', block_size: int = 2000,
+                           force: bool = False, bulk_load: bool = False):
     """
     Carga los precios desde el archivo Excel a la base de datos.
     
+    Las filas se leen por bloques de block_size; cada bloque se convierte a
+    arrays, se pasa a formato largo (node_id, timestamp, price) con máscaras
+    y se escribe con una sola operación masiva.
+    
+    Con mode='upsert' (por defecto) volver a cargar el mismo archivo actualiza
+    las filas existentes en lugar de duplicarlas.
+    
+    Cada bloque se confirma junto con su checkpoint en el manifiesto de
+    ingesta: un archivo sin cambios se salta y una carga interrumpida se
+    reanuda desde el último bloque confirmado (force=True recarga todo).
+    
+    Con bulk_load=True los índices secundarios se suspenden durante la carga
+    y se reconstruyen al final en una sola pasada.
+    
     Formato esperado:
     - Columna A: Year
     - Columna B: Month  
     - Columna C: Hour
-    - Columnas D-FF: Precios para nodos 1-150
+    - Columnas D en adelante: Precios por nodo. El encabezado identifica el
+      nodo (código o "Node #N"); sin encabezado se usa la posición (D = nodo 1)
     """
     print(f"Cargando archivo: {excel_path}")
-    wb = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
-    ws = wb.active
-    
-    print(f"Total de filas: {ws.max_row}")
-    print(f"Total de columnas: {ws.max_column}")
-    
-    # Leer encabezados (primera fila)
-    headers = [cell.value for cell in ws[1]]
-    print(f"Encabezados: {headers[:10]}...")
     
-    # Obtener mapeo de códigos de nodo a IDs de la base de datos
-    nodes = db.query(Node).filter(Node.is_active == True).all()
-    node_map = {}  # Mapea código de nodo (Node #1, Node #2, etc.) a ID de BD
+    entry = start_file(db, excel_path, force=force)
+    if entry is None:
+        print("Archivo ya cargado con el mismo contenido, nada que hacer (use --force para recargar).")
+        return
+    if entry.row_end:
+        print(f"Reanudando desde la fila de datos {entry.row_end} ({entry.rows_loaded} registros ya cargados)")
     
-    for node in nodes:
-        # Extraer número del código (ej: "Node #1" -> 1)
-        if node.code and '#' in node.code:
-            try:
-                node_num = int(node.code.split('#')[1].strip())
-                node_map[node_num] = node.id
-            except:
-                pass
+    # Obtener mapeo de nodos a IDs de la base de datos
+    nodes = db.query(Node.id, Node.code).filter(Node.is_active == True).all()
+    nodes_by_code = {code.strip(): node_id for node_id, code in nodes if code}
+    nodes_by_number = {}  # Mapea número de nodo (Node #1 -> 1) a ID de BD
+    for node_id, code in nodes:
+        if code and '#' in code:
+            number = node_number(code)
+            if number is not None:
+                nodes_by_number[number] = node_id
     
-    print(f"Nodos encontrados en BD: {len(node_map)}")
+    print(f"Nodos encontrados en BD: {len(nodes_by_code)}")
     
-    if not node_map:
+    if not nodes_by_code:
         print("ERROR: No se encontraron nodos en la base de datos.")
         print("Ejecute primero load_real_nodes.py")
+        fail_file(db, entry, "No hay nodos en la base de datos")
         return
     
     # Contadores
     records_created = 0
-    records_skipped = 0
-    errors = 0
+    quarantined = {}
+    node_columns = None
+    row_end = entry.row_end
     
-    # Procesar cada fila de datos (saltando el encabezado)
+    # Procesar los datos por bloques (saltando el encabezado y lo ya cargado)
     print("\nProcesando datos...")
-    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-        if row_idx % 50 == 0:
-            print(f"Procesando fila {row_idx}/{ws.max_row}...")
-        
+    with bulk_load_indexes(bulk_load) as timings:
+        meter = ThroughputMeter()
         try:
-            year = row[0]
-            month = row[1]
-            hour = row[2]
-            
-            # Validar datos básicos
-            if not year or not month or hour is None:
-                records_skipped += 1
-                continue
+            blocks = iter_wide_blocks(excel_path, block_size, skip_rows=row_end, content_hash=entry.content_hash)
+            for block_number, (headers, block) in enumerate(blocks, start=1):
+                if node_columns is None:
+                    print(f"Encabezados: {headers[:10]}...")
+                    node_columns, node_ids = resolve_node_columns(headers, nodes_by_code, nodes_by_number)
+                    print(f"Columnas de nodo: {len(headers) - 3}, asociadas a nodos en BD: {len(node_columns)}")
             
-            # Crear timestamp
-            try:
-                timestamp = datetime(
-                    year=int(year),
-                    month=int(month),
-                    day=1,  # Día 1 por defecto
-                    hour=int(hour)
-                )
-            except (ValueError, TypeError) as e:
-                print(f"  Error en fila {row_idx}: timestamp inválido ({year}-{month} {hour}:00) - {e}")
-                errors += 1
-                continue
+                records, rejected = melt_wide_block(block, node_columns, node_ids,
+                                                    first_row=FIRST_DATA_ROW + row_end)
+                merge_counts(quarantined, reason_counts(rejected))
             
-            # Procesar precios para cada nodo (columnas 4 en adelante)
-            for node_num in range(1, 151):  # Nodos 1-150
-                col_idx = 3 + node_num - 1  # Columna en Excel (0-indexed)
-                
-                if col_idx >= len(row):
-                    break
-                
-                price_value = row[col_idx]
-                
-                # Saltar si no hay precio o es 0
-                if price_value is None or price_value == 0:
-                    continue
-                
-                # Verificar que el nodo existe en BD
-                if node_num not in node_map:
-                    continue
-                
-                node_id = node_map[node_num]
-                
-                # Crear registro de precio
-                try:
-                    price_record = PriceRecord(
-                        node_id=node_id,
-                        timestamp=timestamp,
-                        price=float(price_value),
-                        market='MDA',  # Day-Ahead Market
-                        solar_capture=None,
-                        wind_capture=None
-                    )
-                    db.add(price_record)
-                    records_created += 1
-                    
-                    # Commit cada 1000 registros para evitar problemas de memoria
-                    if records_created % 1000 == 0:
-                        db.commit()
-                        print(f"  Guardados {records_created} registros...")
-                        
-                except Exception as e:
-                    print(f"  Error creando registro para nodo {node_num} en {timestamp}: {e}")
-                    errors += 1
-        
+                written = write_prices(db.connection(), records, mode)
+                write_quarantine(db.connection(), rejected, entry.file_path)
+                row_end += len(block)
+                checkpoint(entry, row_end, written)
+                db.commit()
+                records_created += written
+                rate = meter.chunk_done(len(records))
+                print(f"  Bloque {block_number}: {len(block)} filas, {len(records)} registros "
+                      f"(Total: {records_created}) - {rate:,.0f} registros/s")
         except Exception as e:
-            print(f"  Error procesando fila {row_idx}: {e}")
-            errors += 1
-            continue
+            print(f"\n✗ Error escribiendo bloque: {e}")
+            fail_file(db, entry, e)
+            print(f"  Checkpoint conservado en la fila de datos {entry.row_end}; vuelva a ejecutar para reanudar.")
+            return
     
-    # Commit final
-    try:
-        db.commit()
-        print("\n✓ Commit final exitoso")
-    except Exception as e:
-        print(f"\n✗ Error en commit final: {e}")
-        db.rollback()
-        return
+    finish_file(db, entry)
     
     print(f"\n{'='*60}")
     print(f"Resumen de importación:")
     print(f"  Registros creados: {records_created}")
-    print(f"  Registros saltados: {records_skipped}")
-    print(f"  Errores: {errors}")
+    print_quarantine_summary(quarantined, indent="  ")
+    print(f"  Velocidad media: {meter.overall_rate:,.0f} registros/s")
+    if timings['indexes']:
+        print(f"  Tiempo de carga: {timings['load_seconds']:.1f}s, "
+              f"reconstrucción de índices: {timings['rebuild_seconds']:.1f}s")
     print(f"{'='*60}")
 
 
 def main():
     excel_path = r'c:\Desarrollo\EMI\ERCOT_Priceing_Dashboard\Fuentes\LPMs.xlsx'
+    mode = 'upsert'
+    
+    # Uso: python load_lmp_prices.py [ruta.xlsx] [insert|upsert] [--force] [--bulk-load]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    force = '--force' in sys.argv
+    bulk_load = '--bulk-load' in sys.argv
+    if len(args) > 0:
+        excel_path = args[0]
+    if len(args) > 1 and args[1] in WRITE_MODES:
+        mode = args[1]
     
     if not os.path.exists(excel_path):
         print(f"ERROR: Archivo no encontrado: {excel_path}")
@@ -168,7 +148,7 @@ def main():
     
     db = SessionLocal()
     try:
-        load_prices_from_excel(excel_path, db)
+        load_prices_from_excel(excel_path, db, mode, force=force, bulk_load=bulk_load)
     except Exception as e:
         print(f"\nError fatal: {e}")
         import traceback
@@ -4,15 +4,16 @@ Ejecutar después de crear las tablas.
 """
 import sys
 from datetime import datetime, timedelta
-from random import uniform, choice
 from sqlalchemy.orm import Session
 
 # Añadir la ruta del proyecto al path
 sys.path.append('.')
 
 from app.db.database import SessionLocal, init_db
-from app.models import User, Node, PriceRecord
+from app.models import User, Node
 from app.core.security import get_password_hash
+from app.utils.bulk_loader import write_prices
+from app.utils.synthetic_data import iter_synthetic_prices
 
 def create_sample_users(db: Session):
     """Crear usuarios de ejemplo."""
@@ -87,66 +88,24 @@ def create_sample_nodes(db: Session):
     
     db.commit()
 
-def create_sample_price_records(db: Session):
-    """Crear registros de precios de ejemplo."""
-    nodes = db.query(Node).all()
+def create_sample_price_records(db: Session, days: int = 30, seed: int = 42):
+    """Crear registros de precios de ejemplo (generador sintético vectorizado)."""
+    node_ids = [node_id for (node_id,) in db.query(Node.id).order_by(Node.id).all()]
     
-    if not nodes:
+    if not node_ids:
         print("No nodes found. Create nodes first.")
         return
     
-    # Generar datos para los últimos 30 días
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
-    
-    current_date = start_date
-    batch_size = 1000
-    records = []
+    # Generar datos horarios para los últimos `days` días
+    end_date = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    start_date = end_date - timedelta(days=days)
     
     print("Generating price records...")
     
-    while current_date <= end_date:
-        for node in nodes:
-            # Generar precio base con variación por nodo
-            base_price = uniform(20, 80)
-            
-            # Simular variación horaria (más caro en horas pico)
-            hour = current_date.hour
-            if 6 <= hour <= 9 or 17 <= hour <= 21:
-                base_price *= uniform(1.2, 1.8)
-            
-            # Agregar algo de aleatoriedad
-            price = base_price + uniform(-10, 10)
-            price = max(5, price)  # Precio mínimo de $5/MWh
-            
-            # Generar datos de capturas (solar y eólica)
-            solar_capture = uniform(0, 500) if 7 <= hour <= 19 else 0
-            wind_capture = uniform(100, 800)
-            
-            record = PriceRecord(
-                node_id=node.id,
-                timestamp=current_date,
-                price=round(price, 2),
-                solar_capture=round(solar_capture, 2),
-                wind_capture=round(wind_capture, 2),
-                market="ERCOT",
-            )
-            records.append(record)
-            
-            # Insertar en lotes para mejor rendimiento
-            if len(records) >= batch_size:
-                db.bulk_save_objects(records)
-                db.commit()
-                print(f"Inserted {len(records)} records...")
-                records = []
-        
-        current_date += timedelta(hours=1)
-    
-    # Insertar registros restantes
-    if records:
-        db.bulk_save_objects(records)
+    for frame in iter_synthetic_prices(node_ids, start_date, end_date, seed=seed, market="ERCOT"):
+        write_prices(db.connection(), frame, mode='upsert')
         db.commit()
-        print(f"Inserted {len(records)} records...")
+        print(f"Inserted {len(frame)} records...")
     
     print("Price records created successfully!")
 
@@ -5,33 +5,14 @@ import sys
 import os
 from datetime import datetime, timedelta
 from random import uniform
-import openpyxl
 
 sys.path.append('.')
 
 from app.db.database import SessionLocal, init_db
 from app.models import User, Node, PriceRecord
 from app.core.security import get_password_hash
-
-def load_nodes_from_excel(excel_path: str):
-    """Cargar nodos desde el archivo Excel."""
-    wb = openpyxl.load_workbook(excel_path)
-    ws = wb.active
-    
-    nodes = []
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        code, name, lat, lng, market, zone, is_active, created_at = row
-        if is_active:
-            nodes.append({
-                'code': code,
-                'name': name,
-                'latitude': float(lat),
-                'longitude': float(lng),
-                'market': market,
-                'zone': zone
-            })
-    
-    return nodes
+from app.utils.voronoi_generator import load_nodes_from_excel
+from app.utils.node_sync import sync_nodes
 
 def create_real_nodes(db):
     """Crear los 150 nodos reales de Texas."""
@@ -44,35 +25,10 @@ def create_real_nodes(db):
     nodes_data = load_nodes_from_excel(excel_path)
     print(f"Cargando {len(nodes_data)} nodos desde Excel...")
     
-    created_count = 0
-    updated_count = 0
-    
-    for node_data in nodes_data:
-        existing = db.query(Node).filter(Node.code == node_data['code']).first()
-        if existing:
-            # Actualizar nodo existente
-            existing.name = node_data['name']
-            existing.latitude = node_data['latitude']
-            existing.longitude = node_data['longitude']
-            existing.market = node_data['market']
-            existing.zone = node_data['zone']
-            updated_count += 1
-        else:
-            # Crear nuevo nodo
-            node = Node(
-                code=node_data['code'],
-                name=node_data['name'],
-                latitude=node_data['latitude'],
-                longitude=node_data['longitude'],
-                market=node_data['market'],
-                zone=node_data['zone'],
-                is_active=True
-            )
-            db.add(node)
-            created_count += 1
-    
-    db.commit()
-    print(f"Nodos creados: {created_count}, actualizados: {updated_count}")
+    # Sincronización masiva: un solo SELECT del catálogo y sentencias en bloque
+    report = sync_nodes(db, nodes_data)
+    print(f"Nodos creados: {report['created']}, actualizados: {report['updated']}, "
+          f"sin cambios: {report['unchanged']}")
 
 def create_sample_users(db):
     """Crear usuarios de ejemplo."""
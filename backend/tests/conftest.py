@@ -0,0 +1,88 @@
+"""
+Configuración común de las pruebas: base SQLite en memoria (vacía en cada
+prueba), directorios temporales para los archivos de datos y datos
+sintéticos de app.utils.synthetic_data.
+"""
+import os
+
+# La configuración se lee al importar la aplicación
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['DEBUG'] = 'false'
+
+from datetime import datetime
+from typing import List
+
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.database import engine, init_db, SessionLocal
+from app.models import Node
+from app.utils.bulk_loader import write_prices, PRICE_COLUMNS
+from app.utils.cache import clear_caches
+from app.utils.partitions import price_source
+from app.utils.synthetic_data import generate_nodes, iter_synthetic_prices
+
+
+@pytest.fixture(autouse=True)
+def data_dirs(tmp_path, monkeypatch):
+    """Archivos de datos en un directorio temporal y funcionalidades opcionales por defecto."""
+    monkeypatch.setattr(settings, 'PARQUET_STORE_DIR', str(tmp_path / 'parquet'))
+    monkeypatch.setattr(settings, 'ARCHIVE_DIR', str(tmp_path / 'archive'))
+    monkeypatch.setattr(settings, 'ANALYTICS_DUCKDB_PATH', str(tmp_path / 'analytics.duckdb'))
+    monkeypatch.setattr(settings, 'ANALYTICS_PARQUET_DIR', str(tmp_path / 'analytics'))
+    monkeypatch.setattr(settings, 'ANALYTICS_BACKEND', 'sql')
+    monkeypatch.setattr(settings, 'PRICE_PARTITIONING', False)
+    monkeypatch.setattr(settings, 'PRICE_LAYOUT', 'standard')
+    return tmp_path
+
+
+@pytest.fixture
+def db():
+    """Sesión sobre una base en memoria nueva con todas las tablas."""
+    # StaticPool: al descartar su conexión, la siguiente abre una base vacía
+    engine.dispose()
+    init_db()
+    clear_caches()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def node_ids(db) -> List[int]:
+    """IDs de 4 nodos sintéticos."""
+    db.add_all(Node(**record) for record in generate_nodes(4).to_dict('records'))
+    db.commit()
+    return [node_id for node_id, in db.execute(select(Node.id).order_by(Node.id))]
+
+
+def synthetic_prices(node_ids: List[int], start: datetime, end: datetime, seed: int = 42,
+                     market: str = 'ERCOT') -> pd.DataFrame:
+    """Registros horarios sintéticos de [start, end) en un solo DataFrame."""
+    return pd.concat(list(iter_synthetic_prices(node_ids, start, end, seed, market)), ignore_index=True)
+
+
+def write(db, df: pd.DataFrame, mode: str = 'upsert') -> int:
+    """Escribe un bloque con write_prices y confirma."""
+    written = write_prices(db.connection(), df, mode)
+    db.commit()
+    return written
+
+
+def stored_prices(db) -> pd.DataFrame:
+    """Registros guardados (con las columnas de PRICE_COLUMNS), ordenados por clave."""
+    source = price_source(db)
+    rows = db.execute(select(*[source.c[c] for c in PRICE_COLUMNS])).fetchall()
+    frame = pd.DataFrame(rows, columns=PRICE_COLUMNS)
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+    return frame.sort_values(['node_id', 'timestamp', 'market']).reset_index(drop=True)
+
+
+def sorted_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Un DataFrame de precios con el orden y los tipos de stored_prices."""
+    frame = df[PRICE_COLUMNS].copy()
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+    frame['node_id'] = frame['node_id'].astype(int)
+    return frame.sort_values(['node_id', 'timestamp', 'market']).reset_index(drop=True)
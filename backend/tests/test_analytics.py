@@ -0,0 +1,126 @@
+"""Copia analítica (DuckDB y Parquet): sincronizada tras cada commit y con las mismas respuestas que SQL."""
+import glob
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from app.models import DataType
+from app.utils.bulk_loader import write_prices
+from app.utils.analytics import (
+    VALUE_COLUMNS, DuckDBAnalytics, SqlAnalytics, get_analytics, rebuild_analytics, stale_reason
+)
+from conftest import synthetic_prices, write, stored_prices
+
+pytest.importorskip('duckdb')
+
+
+START, END = datetime(2024, 1, 25), datetime(2024, 3, 5)
+MARKETS = ['ERCOT', 'DAM']
+
+
+@pytest.fixture(params=['duckdb', 'parquet'])
+def backend(request, monkeypatch) -> str:
+    monkeypatch.setattr(settings, 'ANALYTICS_BACKEND', request.param)
+    return request.param
+
+
+@pytest.fixture
+def prices(db, node_ids, backend) -> pd.DataFrame:
+    prices = pd.concat([
+        synthetic_prices(node_ids, START, END),
+        synthetic_prices(node_ids[:2], START, END, seed=6, market='DAM'),
+    ], ignore_index=True)
+    for month, part in prices.groupby(prices['timestamp'].dt.month):
+        write(db, part)
+    return prices
+
+
+def copy_rows(backend: str) -> pd.DataFrame:
+    """Filas de la copia analítica, con el orden y las columnas de stored_prices."""
+    analytics = DuckDBAnalytics(backend)
+    frames = [
+        analytics.rows(None, datetime(2000, 1, 1), datetime(2100, 1, 1), VALUE_COLUMNS, market).assign(market=market)
+        for market in MARKETS
+    ]
+    frame = pd.concat(frames, ignore_index=True)
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+    return frame.sort_values(['node_id', 'timestamp', 'market']).reset_index(drop=True)
+
+
+def assert_copy_matches_database(db, backend):
+    expected = stored_prices(db)
+    actual = copy_rows(backend)[expected.columns]
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_blocks_are_applied_after_commit(db, backend, prices):
+    assert_copy_matches_database(db, backend)
+
+    update = prices.sample(frac=0.3, random_state=5).copy()
+    update['price'] += 7
+    update[['solar_capture', 'wind_capture']] = np.nan
+    write(db, update)
+    assert_copy_matches_database(db, backend)
+
+
+def test_rolled_back_blocks_are_discarded(db, backend, prices):
+    update = prices.sample(frac=0.2, random_state=6).copy()
+    update['price'] = 9999.0
+    write_prices(db.connection(), update, 'upsert')
+    db.rollback()
+
+    assert_copy_matches_database(db, backend)
+    assert stale_reason(backend) is None
+
+
+def test_queries_match_the_sql_engine(db, node_ids, backend, prices):
+    sql, copy = SqlAnalytics(db), DuckDBAnalytics(backend)
+    start, end = datetime(2024, 2, 3, 7), datetime(2024, 3, 1, 19)
+    for data_type in [DataType.PRICE, DataType.WIND_CAPTURE]:
+        expected, actual = sql.stats(node_ids, start, end, data_type), copy.stats(node_ids, start, end, data_type)
+        assert actual.keys() == expected.keys()
+        for node_id in expected:
+            for key in ['count', 'negative_count']:
+                assert actual[node_id][key] == expected[node_id][key]
+            for key in ['avg', 'min', 'max']:
+                assert actual[node_id][key] == pytest.approx(expected[node_id][key])
+        pd.testing.assert_frame_equal(copy.series(node_ids, start, end, data_type, 'day'),
+                                      sql.series(node_ids, start, end, data_type, 'day'), check_dtype=False)
+
+
+def test_compact_folds_deltas_without_changing_rows(db, backend, prices):
+    if backend != 'parquet':
+        assert DuckDBAnalytics(backend).compact() == 0
+        return
+    write(db, prices.sample(frac=0.1, random_state=8).assign(price=1.0))
+    deltas = glob.glob(os.path.join(settings.ANALYTICS_PARQUET_DIR, '*', '*', 'delta-*.parquet'))
+    assert deltas
+
+    assert DuckDBAnalytics(backend).compact() > 0
+    assert not glob.glob(os.path.join(settings.ANALYTICS_PARQUET_DIR, '*', '*', 'delta-*.parquet'))
+    assert_copy_matches_database(db, backend)
+
+
+def test_failed_apply_marks_the_copy_stale_until_rebuilt(db, backend, prices, monkeypatch):
+    def fail(self, df):
+        raise OSError("disco lleno")
+
+    apply = DuckDBAnalytics.apply
+    monkeypatch.setattr(DuckDBAnalytics, 'apply', fail)
+    update = prices.sample(frac=0.2, random_state=9).assign(price=-10.0)
+    write(db, update)
+
+    # La sesión sigue usable y las consultas pasan a la base principal
+    assert 'disco lleno' in stale_reason(backend)
+    assert isinstance(get_analytics(db), SqlAnalytics)
+    assert len(stored_prices(db)) == len(prices)
+
+    monkeypatch.setattr(DuckDBAnalytics, 'apply', apply)
+    rebuild_analytics(db)
+    assert stale_reason(backend) is None
+    assert not isinstance(get_analytics(db), SqlAnalytics)
+    assert_copy_matches_database(db, backend)
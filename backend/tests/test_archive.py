@@ -0,0 +1,125 @@
+"""Archivo histórico: los años archivados se siguen leyendo igual desde Parquet."""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from app.api.v1.endpoints import prices as endpoints
+from app.models import DataType
+from app.schemas import EvolutionInterval
+from app.utils.archive import archive_before, archived_years, read_archive, ARCHIVE_COLUMNS
+from app.utils.cache import clear_caches
+from conftest import synthetic_prices, write, stored_prices, sorted_frame
+
+
+START, END = datetime(2023, 11, 15), datetime(2024, 2, 15)
+CUTOFF = datetime(2024, 1, 1)
+
+# Rangos que caen en el archivo, en la base o a ambos lados del corte
+RANGES = [
+    (datetime(2023, 11, 20, 7), datetime(2023, 12, 3, 18)),
+    (datetime(2023, 12, 10, 5), datetime(2024, 1, 20, 12)),
+    (datetime(2024, 1, 2), datetime(2024, 2, 10, 23)),
+]
+
+
+@pytest.fixture
+def prices(db, node_ids) -> pd.DataFrame:
+    prices = pd.concat([
+        synthetic_prices(node_ids, START, END),
+        synthetic_prices(node_ids[:2], START, END, seed=3, market='DAM'),
+    ], ignore_index=True)
+    write(db, prices)
+    return prices
+
+
+def responses(db, node_id: int, start: datetime, end: datetime) -> dict:
+    """Respuestas de los endpoints que leen series y estadísticas, como diccionarios."""
+    clear_caches()
+    evolution = {
+        interval: endpoints.get_price_evolution(
+            node_id=node_id, start_date=start, end_date=end, data_type=DataType.PRICE,
+            interval=interval, max_points=None, db=db, current_user=None,
+        ).model_dump()
+        for interval in [None, EvolutionInterval.DAY]
+    }
+    stats = {
+        detailed: endpoints.get_aggregated_stats(
+            node_id=node_id, start_date=start, end_date=end, data_type=DataType.PRICE,
+            detailed=detailed, percentiles=[10.0, 50.0, 90.0], top_n=3, db=db, current_user=None,
+        ).model_dump()
+        for detailed in [False, True]
+    }
+    monthly = endpoints.get_monthly_averages(
+        node_id=node_id, start_date=start, end_date=end, data_type=DataType.PRICE, db=db, current_user=None,
+    ).model_dump()
+    return {'evolution': evolution, 'stats': stats, 'monthly': monthly}
+
+
+def test_archive_moves_old_years_out_of_the_database(db, prices):
+    assert archive_before(db, CUTOFF.year) == {2023: int((prices['timestamp'] < CUTOFF).sum())}
+    assert archived_years() == [2023]
+
+    kept = prices[prices['timestamp'] >= CUTOFF]
+    pd.testing.assert_frame_equal(stored_prices(db), sorted_frame(kept), check_dtype=False)
+    archived = read_archive()[ARCHIVE_COLUMNS]
+    pd.testing.assert_frame_equal(sorted_frame(archived), sorted_frame(prices[prices['timestamp'] < CUTOFF]),
+                                  check_dtype=False)
+
+
+@pytest.mark.parametrize('start, end', RANGES)
+def test_read_archive_filters_like_pandas(db, node_ids, prices, start, end):
+    archive_before(db, CUTOFF.year)
+    subset = node_ids[1:3]
+
+    actual = read_archive(start, end, ARCHIVE_COLUMNS, node_ids=subset, market='DAM')
+    expected = prices[
+        prices['timestamp'].between(start, min(end, CUTOFF))
+        & (prices['timestamp'] < CUTOFF) & prices['node_id'].isin(subset) & (prices['market'] == 'DAM')
+    ]
+    pd.testing.assert_frame_equal(sorted_frame(actual), sorted_frame(expected), check_dtype=False)
+
+
+@pytest.mark.parametrize('start, end', RANGES)
+def test_endpoints_answer_the_same_after_archiving(db, node_ids, prices, start, end):
+    # Nodo de un solo mercado: la serie horaria de varios mercados no fija el orden de una misma hora
+    node_id = node_ids[-1]
+    before = responses(db, node_id, start, end)
+    archive_before(db, CUTOFF.year)
+    after = responses(db, node_id, start, end)
+    for key in before:
+        assert after[key] == before[key] or _close(after[key], before[key]), key
+
+    # Y con pandas: promedio diario de todos los mercados del nodo
+    rows = prices[(prices['node_id'] == node_id) & prices['timestamp'].between(start, end)]
+    daily = rows.set_index('timestamp')['price'].resample('D').mean().dropna()
+    points = after['evolution'][EvolutionInterval.DAY]['data']
+    assert [p['timestamp'] for p in points] == list(daily.index.to_pydatetime())
+    assert [p['value'] for p in points] == pytest.approx(daily.tolist())
+    assert after['stats'][False]['count'] == rows['price'].count()
+    assert after['stats'][False]['avg'] == pytest.approx(rows['price'].mean())
+
+
+def _close(a, b) -> bool:
+    """Igualdad de estructuras anidadas con tolerancia en los float (el orden de suma cambia)."""
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_close(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_close(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float):
+        return a == pytest.approx(b, rel=1e-9)
+    return a == b
+
+
+def test_ingest_rejects_archived_years(db, node_ids, prices):
+    archive_before(db, CUTOFF.year)
+    with pytest.raises(ValueError):
+        write(db, synthetic_prices(node_ids, datetime(2023, 12, 1), datetime(2023, 12, 2)))
+    db.rollback()
+
+
+def test_available_years_include_the_archive(db, prices):
+    archive_before(db, CUTOFF.year)
+    years = endpoints.get_available_years(db=db, current_user=None)
+    assert years['years'] == [2023, 2024]
+    assert sorted(years['markets']) == ['DAM', 'ERCOT']
@@ -0,0 +1,94 @@
+"""Evolución de varios nodos y tipos de dato sobre un eje de tiempo común."""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints import prices as endpoints
+from app.models import DataType
+from app.schemas import EvolutionInterval
+from app.utils.rollups import ROLLUP_COLUMNS
+from conftest import synthetic_prices, write
+
+
+START, END = datetime(2024, 5, 1), datetime(2024, 5, 15)
+DATA_TYPES = [DataType.PRICE, DataType.WIND_CAPTURE]
+
+
+@pytest.fixture
+def prices(db, node_ids) -> pd.DataFrame:
+    # El último nodo empieza más tarde: el eje común tiene horas sin dato para él
+    prices = pd.concat([
+        synthetic_prices(node_ids[:-1], START, END),
+        synthetic_prices(node_ids[-1:], datetime(2024, 5, 8), END, seed=4),
+    ], ignore_index=True)
+    write(db, prices)
+    return prices
+
+
+def batch(db, node_ids, interval=None, max_points=None, data_types=DATA_TYPES):
+    return endpoints.get_batch_evolution(
+        node_ids=node_ids, start_date=START, end_date=END, data_types=data_types,
+        interval=interval, max_points=max_points, db=db, current_user=None,
+    )
+
+
+def single(db, node_id, data_type, interval=None, max_points=None) -> pd.Series:
+    """Serie del endpoint de un nodo como {timestamp: valor}."""
+    response = endpoints.get_price_evolution(
+        node_id=node_id, start_date=START, end_date=END, data_type=data_type,
+        interval=interval, max_points=max_points, db=db, current_user=None,
+    )
+    return pd.Series({point.timestamp: point.value for point in response.data}, dtype=float)
+
+
+@pytest.mark.parametrize('interval', [None, EvolutionInterval.DAY])
+def test_series_are_aligned_to_the_shared_axis(db, node_ids, prices, interval):
+    response = batch(db, node_ids, interval)
+
+    rule = {None: 'h', EvolutionInterval.DAY: 'D'}[interval]
+    assert response.timestamps == list(prices['timestamp'].dt.floor(rule).drop_duplicates().sort_values())
+    assert [(s.node_id, s.data_type) for s in response.series] == \
+        [(node_id, data_type) for node_id in node_ids for data_type in DATA_TYPES]
+
+    for series in response.series:
+        column = ROLLUP_COLUMNS[series.data_type]
+        rows = prices[prices['node_id'] == series.node_id]
+        expected = rows.groupby(rows['timestamp'].dt.floor(rule))[column].mean().reindex(response.timestamps)
+        assert [v is None for v in series.values] == expected.isna().tolist()
+        assert [v for v in series.values if v is not None] == pytest.approx(expected.dropna().tolist())
+        assert (series.min_values is None) == (interval is None)
+
+
+def test_values_match_the_single_node_endpoint(db, node_ids, prices):
+    response = batch(db, node_ids, EvolutionInterval.DAY)
+    for series in response.series:
+        values = pd.Series(series.values, index=response.timestamps, dtype=float).dropna()
+        expected = single(db, series.node_id, series.data_type, EvolutionInterval.DAY)
+        assert values.to_dict() == pytest.approx(expected.to_dict())
+
+
+def test_max_points_axis_is_the_union_of_lttb_points(db, node_ids, prices):
+    max_points = 20
+    response = batch(db, node_ids, max_points=max_points)
+
+    assert len(response.timestamps) <= len(node_ids) * len(DATA_TYPES) * max_points
+    expected_axis = set()
+    for node_id in node_ids:
+        for data_type in DATA_TYPES:
+            reduced = single(db, node_id, data_type, max_points=max_points)
+            assert len(reduced) == max_points
+            expected_axis |= set(reduced.index)
+    assert response.timestamps == sorted(expected_axis)
+
+
+def test_repeated_nodes_and_types_are_returned_once(db, node_ids, prices):
+    response = batch(db, [node_ids[0], node_ids[0]], data_types=[DataType.PRICE, DataType.PRICE])
+    assert [(s.node_id, s.data_type) for s in response.series] == [(node_ids[0], DataType.PRICE)]
+
+
+def test_unknown_node_is_404(db, node_ids, prices):
+    with pytest.raises(HTTPException) as error:
+        batch(db, [node_ids[0], 999])
+    assert error.value.status_code == 404
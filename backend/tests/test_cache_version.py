@@ -0,0 +1,66 @@
+"""Caché de resultados: las claves llevan la versión de los datos guardada en la base."""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, update
+
+from app.api.v1.endpoints import prices as endpoints
+from app.db.database import engine
+from app.models import DataType, PriceRecord, PriceVersion
+from app.utils.bulk_loader import write_prices
+from app.utils.cache import price_version
+from conftest import synthetic_prices, write
+
+
+START, END = datetime(2024, 9, 1), datetime(2024, 9, 8)
+
+
+@pytest.fixture
+def prices(db, node_ids):
+    prices = synthetic_prices(node_ids, START, END)
+    write(db, prices)
+    return prices
+
+
+def average(db, node_id: int, start: datetime = START, end: datetime = END) -> float:
+    return endpoints.get_aggregated_stats(
+        node_id=node_id, start_date=start, end_date=end, data_type=DataType.PRICE,
+        detailed=False, percentiles=[50.0], top_n=0, db=db, current_user=None,
+    ).avg
+
+
+def test_each_committed_write_is_a_new_version(db, node_ids, prices):
+    version = price_version(db)
+    assert version > 0
+
+    write(db, prices.head(10))
+    assert price_version(db) == version + 1
+
+    write_prices(db.connection(), prices.head(10), 'upsert')
+    db.rollback()
+    assert price_version(db) == version + 1
+
+
+def test_writes_in_this_process_are_seen_by_the_next_request(db, node_ids, prices):
+    node_id = node_ids[0]
+    before = average(db, node_id)
+    write(db, prices[prices['node_id'] == node_id].assign(price=lambda df: df['price'] + 100))
+    assert average(db, node_id) == pytest.approx(before + 100)
+
+
+def test_writes_from_another_process_are_seen_through_the_version(db, node_ids, prices):
+    node_id = node_ids[1]
+    # Rango de unas horas: se lee de las filas horarias, no de los rollups
+    start, end = datetime(2024, 9, 3, 6), datetime(2024, 9, 3, 18)
+    before = average(db, node_id, start, end)
+
+    # Otro proceso cambia los datos: las cachés de este proceso no se enteran del commit
+    with engine.begin() as conn:
+        conn.execute(update(PriceRecord.__table__).where(PriceRecord.node_id == node_id)
+                     .values(price=PriceRecord.price - 40))
+    assert average(db, node_id, start, end) == pytest.approx(before)
+
+    # ...hasta que registra su versión, como hace write_prices al confirmar
+    with engine.begin() as conn:
+        conn.execute(insert(PriceVersion.__table__))
+    assert average(db, node_id, start, end) == pytest.approx(before - 40)
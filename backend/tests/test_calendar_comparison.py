@@ -0,0 +1,122 @@
+"""Comparación de calendario: promedios por mes, año y día de la semana iguales a pandas."""
+from datetime import datetime, timedelta
+from typing import Dict
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints import prices as endpoints
+from app.core.config import settings
+from app.models import DataType
+from app.schemas import ComparisonAxis
+from conftest import synthetic_prices, write
+
+
+HOUR = 13
+DATA_TYPES = [DataType.PRICE, DataType.SOLAR_CAPTURE]
+
+
+@pytest.fixture(params=['sql', 'duckdb'])
+def prices(request, db, node_ids, monkeypatch) -> pd.DataFrame:
+    """
+    Para dos nodos: los días 14-16 y del 28 a fin de mes de cada mes de 2024,
+    mayo completo, un segundo mercado en marzo y finales de febrero de 2022 y 2023.
+    """
+    if request.param != 'sql':
+        pytest.importorskip('duckdb')
+    monkeypatch.setattr(settings, 'ANALYTICS_BACKEND', request.param)
+    nodes = node_ids[:2]
+    blocks = [
+        synthetic_prices(nodes, datetime(2022, 2, 20), datetime(2022, 3, 5), seed=1),
+        synthetic_prices(nodes, datetime(2023, 2, 20), datetime(2023, 3, 5), seed=2),
+        synthetic_prices(nodes, datetime(2024, 5, 1), datetime(2024, 5, 28), seed=4),
+        synthetic_prices(nodes[:1], datetime(2024, 3, 1), datetime(2024, 4, 1), seed=3, market='DAM'),
+    ]
+    for month in range(1, 13):
+        month_end = datetime(2024 + month // 12, month % 12 + 1, 1)
+        if month != 5:
+            blocks.append(synthetic_prices(nodes, datetime(2024, month, 14), datetime(2024, month, 17), seed=month))
+        blocks.append(synthetic_prices(nodes, datetime(2024, month, 28), month_end, seed=20 + month))
+    prices = pd.concat(blocks, ignore_index=True)
+    write(db, prices)
+    return prices
+
+
+def comparison(db, node_ids, axis: ComparisonAxis, **params) -> Dict:
+    """{(node_id, data_type): {clave: valor}} de la respuesta."""
+    fields = {'year': None, 'month': None, 'day': None, 'start_date': None, 'end_date': None, **params}
+    result = endpoints.get_calendar_comparison(
+        node_ids=node_ids, axis=axis, hour=HOUR, data_types=DATA_TYPES, db=db, current_user=None, **fields
+    )
+    return {(series.node_id, series.data_type): {point.key: point.value for point in series.data}
+            for series in result.series}
+
+
+def expected(prices: pd.DataFrame, node_ids, targets: Dict[datetime, int], keys) -> Dict:
+    """Promedio con pandas de las filas de cada hora objetivo, por clave (None sin filas)."""
+    rows = prices[prices['timestamp'].isin(list(targets))]
+    rows = rows.assign(key=rows['timestamp'].map(lambda value: targets[value.to_pydatetime()]))
+    result = {}
+    for node_id in node_ids:
+        for data_type in DATA_TYPES:
+            column = DataType(data_type).value
+            means = rows[rows['node_id'] == node_id].groupby('key')[column].mean()
+            result[(node_id, data_type)] = {key: means.get(key) for key in keys}
+    return result
+
+
+def assert_same(actual: Dict, expected: Dict):
+    assert set(actual) == set(expected)
+    for series, values in expected.items():
+        assert list(actual[series]) == list(values)
+        for key, value in values.items():
+            if value is None or pd.isna(value):
+                assert actual[series][key] is None, (series, key)
+            else:
+                assert actual[series][key] == pytest.approx(value), (series, key)
+
+
+@pytest.mark.parametrize('day, missing_months', [(15, []), (30, [2]), (31, [2, 4, 6, 9, 11])])
+def test_month_axis_skips_nonexistent_dates(db, node_ids, prices, day, missing_months):
+    actual = comparison(db, node_ids[:2], ComparisonAxis.MONTH, year=2024, day=day)
+    targets = {}
+    for month in range(1, 13):
+        if month not in missing_months:
+            targets[datetime(2024, month, day, HOUR)] = month
+
+    assert_same(actual, expected(prices, node_ids[:2], targets, range(1, 13)))
+    for values in actual.values():
+        assert all(values[month] is None for month in missing_months)
+        assert all(values[month] is not None for month in range(1, 13) if month not in missing_months)
+
+
+@pytest.mark.parametrize('day, years_with_date', [(28, [2022, 2023, 2024]), (29, [2024])])
+def test_year_axis_covers_the_stored_years(db, node_ids, prices, day, years_with_date):
+    actual = comparison(db, node_ids[:2], ComparisonAxis.YEAR, month=2, day=day)
+    targets = {datetime(year, 2, day, HOUR): year for year in years_with_date}
+
+    assert_same(actual, expected(prices, node_ids[:2], targets, [2022, 2023, 2024]))
+    assert all(values[year] is None for values in actual.values() for year in {2022, 2023} - set(years_with_date))
+
+
+@pytest.mark.parametrize('start, end, first_day, last_day', [
+    # Bordes exactamente en la hora pedida: ambos días incluidos
+    (datetime(2024, 5, 6, HOUR), datetime(2024, 5, 20, HOUR), 6, 20),
+    # Un minuto después del inicio y antes del fin: ambos días fuera
+    (datetime(2024, 5, 6, HOUR, 1), datetime(2024, 5, 20, HOUR - 1, 59), 7, 19),
+    # Rango de menos de una semana: solo algunos días de la semana
+    (datetime(2024, 5, 7), datetime(2024, 5, 10, 23), 7, 10),
+])
+def test_weekday_axis_respects_the_range_edges(db, node_ids, prices, start, end, first_day, last_day):
+    actual = comparison(db, node_ids[:2], ComparisonAxis.WEEKDAY, start_date=start, end_date=end)
+    days = pd.date_range(datetime(2024, 5, first_day), datetime(2024, 5, last_day), freq='D')
+    targets = {(day + timedelta(hours=HOUR)).to_pydatetime(): day.weekday() for day in days}
+
+    assert_same(actual, expected(prices, node_ids[:2], targets, range(7)))
+
+
+def test_axis_parameters_are_required(db, node_ids, prices):
+    with pytest.raises(HTTPException) as error:
+        comparison(db, node_ids[:2], ComparisonAxis.MONTH, year=2024)
+    assert error.value.status_code == 400 and 'day' in error.value.detail
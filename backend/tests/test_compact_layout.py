@@ -0,0 +1,85 @@
+"""Formato compacto (price_hours): escritura, lectura con price_source y migración."""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import select, func
+
+from app.core.config import settings
+from app.models import CompactPriceRecord, Market, PriceRecord
+from app.migrations.compact_price_records import run_migration
+from app.utils.partitions import price_source
+from app.utils.rollups import range_stats
+from conftest import synthetic_prices, write, stored_prices, sorted_frame
+
+
+START, END = datetime(2024, 2, 20), datetime(2024, 3, 10)
+
+
+@pytest.fixture
+def compact(monkeypatch):
+    monkeypatch.setattr(settings, 'PRICE_LAYOUT', 'compact')
+
+
+def two_markets(node_ids) -> pd.DataFrame:
+    return pd.concat([
+        synthetic_prices(node_ids, START, END),
+        synthetic_prices(node_ids[:2], START, END, seed=9, market='DAM'),
+    ], ignore_index=True)
+
+
+def test_prices_round_trip_through_price_hours(db, node_ids, compact):
+    prices = two_markets(node_ids)
+    write(db, prices)
+
+    assert db.query(func.count()).select_from(CompactPriceRecord.__table__).scalar() == len(prices)
+    assert db.query(func.count()).select_from(PriceRecord.__table__).scalar() == 0
+    assert sorted(name for name, in db.execute(select(Market.name))) == ['DAM', 'ERCOT']
+    pd.testing.assert_frame_equal(stored_prices(db), sorted_frame(prices), check_dtype=False)
+
+
+@pytest.mark.parametrize('start, end', [
+    (datetime(2024, 2, 25, 6), datetime(2024, 2, 25, 6)),
+    (datetime(2024, 2, 28, 22, 30), datetime(2024, 3, 2, 1, 15)),
+    (datetime(2024, 1, 1), datetime(2024, 2, 21)),
+])
+def test_range_reads_match_pandas(db, node_ids, compact, start, end):
+    prices = two_markets(node_ids)
+    write(db, prices)
+
+    source = price_source(db, start, end)
+    rows = db.execute(select(source.c.node_id, source.c.timestamp, source.c.market, source.c.price)
+                      .where(source.c.timestamp.between(start, end))).fetchall()
+    expected = prices[prices['timestamp'].between(start, end)]
+    assert sorted((n, pd.Timestamp(t), m) for n, t, m, _ in rows) == \
+        sorted(zip(expected['node_id'], expected['timestamp'], expected['market']))
+    assert sum(price for *_, price in rows) == pytest.approx(expected['price'].sum())
+
+    stats = range_stats(db, node_ids, start, end, market='ERCOT')
+    expected_avg = expected[expected['market'] == 'ERCOT'].groupby('node_id')['price'].mean()
+    assert {node_id: s['avg'] for node_id, s in stats.items()} == pytest.approx(expected_avg.to_dict())
+
+
+def test_upsert_keeps_existing_values_for_nulls(db, node_ids, compact):
+    prices = synthetic_prices(node_ids, START, END)
+    write(db, prices)
+    update = prices.sample(frac=0.3, random_state=2).copy()
+    update['price'] -= 3
+    update['solar_capture'] = None
+    write(db, update)
+
+    expected = prices.set_index(['node_id', 'timestamp', 'market'])
+    expected.loc[update.set_index(['node_id', 'timestamp', 'market']).index, 'price'] -= 3
+    pd.testing.assert_frame_equal(stored_prices(db), sorted_frame(expected.reset_index()), check_dtype=False)
+
+
+def test_migration_moves_standard_rows(db, node_ids, monkeypatch):
+    prices = two_markets(node_ids)
+    write(db, prices)
+    db.close()
+
+    monkeypatch.setattr(settings, 'PRICE_LAYOUT', 'compact')
+    run_migration()
+
+    assert db.query(func.count()).select_from(PriceRecord.__table__).scalar() == 0
+    pd.testing.assert_frame_equal(stored_prices(db), sorted_frame(prices), check_dtype=False)
@@ -0,0 +1,100 @@
+"""Congestión y matriz de diferenciales: acotadas al rango, un precio de 0 es válido, iguales a pandas."""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints import prices as endpoints
+from conftest import synthetic_prices, write
+
+
+START, END = datetime(2024, 3, 1), datetime(2024, 3, 15)
+RANGE = (datetime(2024, 3, 4, 6, 30), datetime(2024, 3, 9, 17))
+
+
+@pytest.fixture
+def prices(db, node_ids) -> pd.DataFrame:
+    """Precios con horas a 0 (en ambos nodos a la vez en algunas) y algunas horas sin precio."""
+    prices = synthetic_prices(node_ids, START, END)
+    rng = np.random.default_rng(3)
+    hours = prices['timestamp'].drop_duplicates().to_numpy()
+    zero_hours = rng.choice(hours, 40, replace=False)
+    prices.loc[prices['timestamp'].isin(zero_hours[:20]) & (prices['node_id'] == node_ids[0]), 'price'] = 0.0
+    prices.loc[prices['timestamp'].isin(zero_hours[10:]) & (prices['node_id'] == node_ids[1]), 'price'] = 0.0
+    prices.loc[rng.choice(prices.index, 30, replace=False), 'price'] = np.nan
+    write(db, prices)
+    return prices
+
+
+def price_pivot(prices: pd.DataFrame, start: datetime, end: datetime) -> pd.DataFrame:
+    rows = prices[prices['timestamp'].between(start, end)]
+    return rows.pivot_table(index='timestamp', columns='node_id', values='price', dropna=False)
+
+
+def test_congestion_is_bounded_to_the_range_and_keeps_zero_prices(db, node_ids, prices):
+    node1, node2 = node_ids[:2]
+    rows = endpoints.get_congestion_pricing(
+        node1_id=node1, node2_id=node2, start_date=RANGE[0], end_date=RANGE[1], db=db, current_user=None
+    )
+    pivot = price_pivot(prices, *RANGE)
+
+    assert [row['timestamp'] for row in rows] == list(pivot.index)
+    assert all(RANGE[0] <= row['timestamp'] <= RANGE[1] for row in rows)
+    spread = pivot[node1] - pivot[node2]
+    for row, expected in zip(rows, spread):
+        if np.isnan(expected):
+            assert row['spread'] is None and row['congestion_price'] is None
+        else:
+            assert row['spread'] == pytest.approx(expected)
+            assert row['congestion_price'] == pytest.approx(abs(expected))
+    assert any(row['node1_price'] == 0.0 and row['node2_price'] == 0.0 for row in rows)
+    assert any(row['node1_price'] == 0.0 and row['spread'] not in (None, 0.0) for row in rows)
+
+    summary = endpoints.get_congestion_summary(
+        node1_id=node1, node2_id=node2, start_date=RANGE[0], end_date=RANGE[1], threshold=5.0,
+        db=db, current_user=None
+    )
+    valid = spread.dropna().to_numpy()
+    assert summary.hours == len(valid)
+    assert summary.mean_spread == pytest.approx(valid.mean())
+    assert summary.hours_above_threshold == int((np.abs(valid) > 5.0).sum())
+    assert summary.abs_spread_percentiles['p95'] == pytest.approx(np.percentile(np.abs(valid), 95))
+
+
+@pytest.mark.parametrize('start, end, market', [
+    (*RANGE, None),
+    (START, END, 'ERCOT'),
+    (datetime(2024, 3, 5, 14), datetime(2024, 3, 5, 14), 'ERCOT'),  # Una hora: matriz horaria
+])
+def test_spread_matrix_matches_pandas(db, node_ids, prices, start, end, market):
+    matrix = endpoints.get_spread_matrix(
+        start_date=start, end_date=end, node_ids=node_ids, market=market, percentile=90.0,
+        db=db, current_user=None
+    )
+    pivot = price_pivot(prices, start, end)
+
+    assert matrix.node_ids == node_ids
+    for i, row_node in enumerate(node_ids):
+        for j, column_node in enumerate(node_ids):
+            spread = (pivot[row_node] - pivot[column_node]).dropna().to_numpy()
+            assert matrix.hours[i][j] == len(spread)
+            if not len(spread):
+                assert matrix.mean_spread[i][j] is None
+                continue
+            assert matrix.mean_spread[i][j] == pytest.approx(spread.mean(), abs=1e-9)
+            assert matrix.mean_abs_spread[i][j] == pytest.approx(np.abs(spread).mean())
+            assert matrix.max_abs_spread[i][j] == pytest.approx(np.abs(spread).max())
+            assert matrix.percentile_abs_spread[i][j] == pytest.approx(np.percentile(np.abs(spread), 90))
+
+
+def test_spread_matrix_refuses_too_many_cells(db, node_ids, prices, monkeypatch):
+    hours = int((END - START).total_seconds() // 3600) + 1
+    monkeypatch.setattr(endpoints, 'MATRIX_MAX_CELLS', hours * len(node_ids) ** 2 - 1)
+    with pytest.raises(HTTPException) as error:
+        endpoints.get_spread_matrix(
+            start_date=START, end_date=END, node_ids=node_ids, market=None, percentile=95.0,
+            db=db, current_user=None
+        )
+    assert error.value.status_code == 400
@@ -0,0 +1,84 @@
+"""Distribución de precios: curva de duración e histograma iguales a np.quantile y np.histogram."""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.api.v1.endpoints import prices as endpoints
+from app.core.config import settings
+from app.models import DataType
+from app.schemas import DistributionMode
+from app.utils.distribution import AUTO_HISTOGRAM_BINS
+from conftest import synthetic_prices, write
+
+
+START, END = datetime(2024, 8, 1), datetime(2024, 9, 1)
+RANGE = (datetime(2024, 8, 3, 7, 30), datetime(2024, 8, 27, 12))
+BACKENDS = ['sql', 'duckdb', 'parquet']
+
+
+@pytest.fixture(params=BACKENDS)
+def prices(request, db, node_ids, monkeypatch) -> pd.DataFrame:
+    """Un mes en ERCOT, un segundo mercado para el primer nodo y un nodo con precio constante."""
+    if request.param != 'sql':
+        pytest.importorskip('duckdb')
+    monkeypatch.setattr(settings, 'ANALYTICS_BACKEND', request.param)
+    prices = pd.concat([
+        synthetic_prices(node_ids, START, END),
+        synthetic_prices(node_ids[:1], START, END, seed=9, market='DAM'),
+    ], ignore_index=True)
+    prices.loc[prices['node_id'] == node_ids[3], 'price'] = 25.0
+    write(db, prices)
+    return prices
+
+
+def node_values(prices: pd.DataFrame, node_id: int, start: datetime, end: datetime) -> np.ndarray:
+    rows = prices[(prices['node_id'] == node_id) & prices['timestamp'].between(start, end)]
+    return rows['price'].dropna().to_numpy(dtype=float)
+
+
+def distribution(db, node_id: int, mode: DistributionMode, start=RANGE[0], end=RANGE[1], points=200, bins=None):
+    return endpoints.get_price_distribution(
+        node_id=node_id, start_date=start, end_date=end, data_type=DataType.PRICE, mode=mode,
+        points=points, bins=bins, db=db, current_user=None
+    )
+
+
+@pytest.mark.parametrize('points', [2, 37, 500])
+def test_duration_curve_matches_numpy_quantiles(db, node_ids, prices, points):
+    for node_id in node_ids[:2]:
+        values = node_values(prices, node_id, *RANGE)
+        result = distribution(db, node_id, DistributionMode.DURATION, points=points)
+
+        levels = np.linspace(0.0, 100.0, points)
+        assert result.count == len(values)
+        assert result.exceedance == pytest.approx(levels.tolist())
+        assert result.prices == pytest.approx(np.quantile(values, 1.0 - levels / 100.0).tolist())
+        assert result.prices[0] == pytest.approx(values.max()) and result.prices[-1] == pytest.approx(values.min())
+
+
+@pytest.mark.parametrize('bins', [None, 1, 24])
+def test_histogram_matches_numpy(db, node_ids, prices, bins):
+    for node_id in node_ids[:2]:
+        values = node_values(prices, node_id, *RANGE)
+        result = distribution(db, node_id, DistributionMode.HISTOGRAM, bins=bins)
+
+        expected_counts, expected_edges = np.histogram(values, bins='auto' if bins is None else bins)
+        assert len(expected_counts) <= AUTO_HISTOGRAM_BINS
+        assert result.count == len(values)
+        assert result.bin_edges == pytest.approx(expected_edges.tolist())
+        assert result.bin_counts == expected_counts.tolist()
+
+
+def test_constant_and_empty_distributions(db, node_ids, prices):
+    constant = distribution(db, node_ids[3], DistributionMode.HISTOGRAM)
+    counts, edges = np.histogram(node_values(prices, node_ids[3], *RANGE), bins='auto')
+    assert constant.bin_edges == pytest.approx(edges.tolist()) and constant.bin_counts == counts.tolist()
+    assert set(distribution(db, node_ids[3], DistributionMode.DURATION).prices) == {25.0}
+
+    empty = (datetime(2025, 1, 1), datetime(2025, 1, 2))
+    for mode in [DistributionMode.DURATION, DistributionMode.HISTOGRAM]:
+        result = distribution(db, node_ids[0], mode, *empty)
+        assert result.count == 0
+        assert not result.prices and not result.bin_counts
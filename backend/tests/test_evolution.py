@@ -0,0 +1,133 @@
+"""Evolución de un nodo: agregación por intervalo y reducción LTTB."""
+import math
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints import prices as endpoints
+from app.models import DataType
+from app.schemas import EvolutionInterval
+from app.utils.resampling import lttb
+from conftest import synthetic_prices, write
+
+
+START, END = datetime(2024, 4, 1), datetime(2024, 6, 1)
+
+# Reglas de pandas equivalentes a cada intervalo (las semanas empiezan en lunes)
+RESAMPLE_RULES = {
+    EvolutionInterval.HOUR: 'h',
+    EvolutionInterval.DAY: 'D',
+    EvolutionInterval.WEEK: 'W-MON',
+    EvolutionInterval.MONTH: 'MS',
+}
+
+
+@pytest.fixture
+def prices(db, node_ids) -> pd.DataFrame:
+    prices = synthetic_prices(node_ids, START, END)
+    write(db, prices)
+    return prices
+
+
+def evolution(db, node_id, start, end, interval=None, max_points=None, data_type=DataType.PRICE) -> pd.DataFrame:
+    """Respuesta del endpoint como DataFrame."""
+    response = endpoints.get_price_evolution(
+        node_id=node_id, start_date=start, end_date=end, data_type=data_type,
+        interval=interval, max_points=max_points, db=db, current_user=None,
+    )
+    return pd.DataFrame([point.model_dump() for point in response.data])
+
+
+def reference_lttb(points, threshold):
+    """LTTB tal como se describe habitualmente, punto a punto."""
+    size = len(points)
+    if threshold >= size or threshold < 3:
+        return list(range(size))
+    every = (size - 2) / (threshold - 2)
+    selected, a = [0], 0
+    for i in range(threshold - 2):
+        next_start = int(math.floor((i + 1) * every)) + 1
+        next_end = min(int(math.floor((i + 2) * every)) + 1, size)
+        avg_x = sum(p[0] for p in points[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(p[1] for p in points[next_start:next_end]) / (next_end - next_start)
+        best, best_area = None, -1
+        for j in range(int(math.floor(i * every)) + 1, next_start):
+            area = abs((points[a][0] - avg_x) * (points[j][1] - points[a][1])
+                       - (points[a][0] - points[j][0]) * (avg_y - points[a][1]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    return selected + [size - 1]
+
+
+@pytest.mark.parametrize('size, threshold', [(10, 3), (100, 7), (1000, 150), (1441, 400), (50, 50), (20, 200)])
+def test_lttb_matches_the_reference_algorithm(size, threshold):
+    rng = np.random.default_rng(size)
+    x = np.cumsum(rng.random(size) + 0.1)
+    y = rng.normal(size=size).cumsum()
+    assert lttb(x, y, threshold).tolist() == reference_lttb(list(zip(x, y)), threshold)
+
+
+def test_lttb_keeps_an_isolated_spike():
+    y = np.zeros(500)
+    y[321] = 4000.0
+    assert 321 in lttb(np.arange(500, dtype=float), y, 20)
+
+
+@pytest.mark.parametrize('interval', list(RESAMPLE_RULES))
+def test_interval_buckets_match_pandas_resample(db, node_ids, prices, interval):
+    node_id = node_ids[1]
+    start, end = datetime(2024, 4, 3, 17), datetime(2024, 5, 20, 6)
+    actual = evolution(db, node_id, start, end, interval)
+
+    rows = prices[(prices['node_id'] == node_id) & prices['timestamp'].between(start, end)]
+    rule = RESAMPLE_RULES[interval]
+    resampled = rows.set_index('timestamp')['price'].resample(rule, label='left', closed='left')
+    expected = pd.DataFrame({
+        'value': resampled.mean(), 'min_value': resampled.min(),
+        'max_value': resampled.max(), 'count': resampled.count(),
+    }).dropna()
+
+    assert actual['timestamp'].tolist() == list(expected.index)
+    for column in ['value', 'min_value', 'max_value']:
+        assert actual[column].tolist() == pytest.approx(expected[column].tolist())
+    assert actual['count'].tolist() == expected['count'].astype(int).tolist()
+
+
+@pytest.mark.parametrize('max_points', [3, 50, 500])
+def test_max_points_bounds_the_series_and_keeps_its_ends(db, node_ids, prices, max_points):
+    node_id = node_ids[2]
+    full = evolution(db, node_id, START, END)
+    reduced = evolution(db, node_id, START, END, max_points=max_points)
+
+    assert len(reduced) == min(max_points, len(full))
+    assert reduced['timestamp'].iloc[0] == full['timestamp'].iloc[0]
+    assert reduced['timestamp'].iloc[-1] == full['timestamp'].iloc[-1]
+    assert reduced['timestamp'].is_monotonic_increasing
+    merged = reduced.merge(full, on='timestamp', suffixes=('', '_full'))
+    assert len(merged) == len(reduced)
+    assert (merged['value'] == merged['value_full']).all()
+
+
+def test_max_points_applies_to_buckets(db, node_ids, prices):
+    node_id = node_ids[0]
+    days = evolution(db, node_id, START, END, EvolutionInterval.DAY)
+    reduced = evolution(db, node_id, START, END, EvolutionInterval.DAY, max_points=10)
+    expected = days.iloc[lttb(days['timestamp'].to_numpy().astype('datetime64[s]').astype(float),
+                              days['value'].to_numpy(), 10)]
+    pd.testing.assert_frame_equal(reduced, expected.reset_index(drop=True))
+
+
+def test_short_series_are_returned_whole(db, node_ids, prices):
+    start, end = datetime(2024, 4, 10), datetime(2024, 4, 10, 5)
+    assert len(evolution(db, node_ids[0], start, end, max_points=100)) == 6
+
+
+def test_unknown_node_is_404(db, prices):
+    with pytest.raises(HTTPException) as error:
+        evolution(db, 999, START, END)
+    assert error.value.status_code == 404
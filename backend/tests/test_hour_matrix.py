@@ -0,0 +1,110 @@
+"""Matriz horaria: codificación del vector por nodo y fotogramas iguales a un pivot de pandas."""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from app.api.v1.endpoints import prices as endpoints
+from app.core.config import settings
+from app.models import DataType, HourMatrix, Node
+from app.utils.hour_matrix import (
+    MATRIX_COLUMNS, LEGACY_DTYPE, VALUE_DTYPE, pack, unpack, read_frame, frame_values, rebuild_hour_matrix
+)
+from app.utils.synthetic_data import generate_nodes
+from conftest import synthetic_prices, write
+
+
+START, END = datetime(2024, 7, 1), datetime(2024, 7, 4)
+HOURS = [datetime(2024, 7, 1, 0), datetime(2024, 7, 2, 13), datetime(2024, 7, 3, 23)]
+
+
+@pytest.fixture
+def prices(db, node_ids) -> pd.DataFrame:
+    prices = pd.concat([
+        synthetic_prices(node_ids, START, END),
+        synthetic_prices(node_ids[1:3], START, END, seed=11, market='DAM'),
+    ], ignore_index=True)
+    write(db, prices)
+    return prices
+
+
+def pivot(prices: pd.DataFrame, market: str, hour: datetime, column: str) -> dict:
+    """{node_id: valor} de una hora con pandas."""
+    rows = prices[(prices['market'] == market) & (prices['timestamp'] == hour)].dropna(subset=[column])
+    return rows.pivot_table(index='timestamp', columns='node_id', values=column).iloc[0].to_dict() if len(rows) else {}
+
+
+def test_pack_round_trips_float64_exactly():
+    values = np.array([4999.99, -250.123456789, np.nan, 0.1, 1e-9, 9999.999999], dtype=VALUE_DTYPE)
+    blob = pack(values)
+    assert len(blob) == len(values) * 8
+    np.testing.assert_array_equal(unpack(blob, len(values)), values)
+
+
+def test_legacy_float32_rows_are_still_read():
+    # Como antes de float64: valores de float32 redondeados a 4 decimales
+    values = np.array([4999.99, 12.3456, np.nan], dtype=VALUE_DTYPE)
+    legacy = values.astype(LEGACY_DTYPE).tobytes()
+    np.testing.assert_array_equal(unpack(legacy, len(values)), np.array([4999.9902, 12.3456, np.nan]))
+
+
+@pytest.mark.parametrize('data_type', list(MATRIX_COLUMNS))
+def test_frames_match_a_pandas_pivot(db, prices, data_type):
+    column = MATRIX_COLUMNS[data_type]
+    for market in ['ERCOT', 'DAM']:
+        for hour in HOURS:
+            expected = pivot(prices, market, hour, column)
+            assert frame_values(db, market, hour, data_type) == pytest.approx(expected)
+            assert frame_values(db, market, hour, data_type).keys() == expected.keys()
+
+
+def test_missing_hours_and_disabled_matrix_give_no_frame(db, prices, monkeypatch):
+    assert read_frame(db, 'ERCOT', datetime(2024, 8, 1), DataType.PRICE) is None
+    monkeypatch.setattr(settings, 'HOUR_MATRIX_ENABLED', False)
+    assert read_frame(db, 'ERCOT', HOURS[0], DataType.PRICE) is None
+
+
+def test_upserts_patch_frames_without_erasing_values(db, node_ids, prices):
+    update = prices[(prices['market'] == 'ERCOT') & (prices['timestamp'] == HOURS[1])].copy()
+    update['price'] = [5000.01, None, -12.5, None][:len(update)]
+    write(db, update)
+
+    expected = pivot(prices, 'ERCOT', HOURS[1], 'price')
+    for node_id, price in zip(update['node_id'], update['price']):
+        if not pd.isna(price):
+            expected[node_id] = price
+    assert frame_values(db, 'ERCOT', HOURS[1], DataType.PRICE) == expected
+
+
+def test_new_nodes_widen_the_vector(db, node_ids, prices):
+    db.add_all(Node(**record) for record in generate_nodes(6).to_dict('records')[4:])
+    db.commit()
+    new_ids = [node_id for node_id, in db.execute(select(Node.id).where(Node.id > max(node_ids)))]
+    added = synthetic_prices(new_ids, START, END, seed=2)
+    write(db, added)
+
+    both = pd.concat([prices, added], ignore_index=True)
+    assert frame_values(db, 'ERCOT', HOURS[2], DataType.PRICE) == pivot(both, 'ERCOT', HOURS[2], 'price')
+
+
+def test_rebuild_rewrites_legacy_rows_as_float64(db, prices):
+    row = db.query(HourMatrix).filter(HourMatrix.market == 'ERCOT', HourMatrix.hour == HOURS[0],
+                                      HourMatrix.data_type == DataType.PRICE).one()
+    row.node_values = unpack(row.node_values, row.node_count).astype(LEGACY_DTYPE).tobytes()
+    db.commit()
+
+    rebuild_hour_matrix(db)
+    row = db.query(HourMatrix).filter(HourMatrix.market == 'ERCOT', HourMatrix.hour == HOURS[0],
+                                      HourMatrix.data_type == DataType.PRICE).one()
+    assert len(row.node_values) == row.node_count * VALUE_DTYPE.itemsize
+    for data_type, column in MATRIX_COLUMNS.items():
+        assert frame_values(db, 'ERCOT', HOURS[0], data_type) == pivot(prices, 'ERCOT', HOURS[0], column)
+
+
+def test_hourly_snapshot_reads_the_frame(db, prices):
+    hour = HOURS[1]
+    snapshot = endpoints.get_hourly_snapshot(timestamp=hour.replace(minute=42), market='DAM', db=db, current_user=None)
+    assert {row['node_id']: row['price'] for row in snapshot} == pivot(prices, 'DAM', hour, 'price')
+    assert {row['timestamp'] for row in snapshot} == {hour}
@@ -0,0 +1,48 @@
+"""Carga masiva: se suspenden y reconstruyen los índices de las tablas que reciben los registros."""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import inspect
+
+from app.core.config import settings
+from app.db.database import engine
+from app.utils.index_management import bulk_load_indexes, price_tables, secondary_price_indexes
+from conftest import synthetic_prices, write, stored_prices, sorted_frame
+
+
+START, MIDDLE, END = datetime(2024, 1, 20), datetime(2024, 2, 10), datetime(2024, 3, 5)
+
+
+def index_names(table_name: str) -> set:
+    return {ix['name'] for ix in inspect(engine).get_indexes(table_name)}
+
+
+def secondary_names(tables) -> set:
+    return {index.name for table in tables for index in secondary_price_indexes(table)}
+
+
+@pytest.mark.parametrize('layout, partitioning, expected', [
+    ('standard', False, ['price_records']),
+    ('standard', True, ['price_records_202401', 'price_records_202402']),
+    ('compact', False, ['price_hours']),
+])
+def test_bulk_load_suspends_the_indexes_of_the_receiving_tables(db, node_ids, monkeypatch, layout, partitioning,
+                                                                 expected):
+    monkeypatch.setattr(settings, 'PRICE_LAYOUT', layout)
+    monkeypatch.setattr(settings, 'PRICE_PARTITIONING', partitioning)
+    first = synthetic_prices(node_ids, START, MIDDLE)
+    write(db, first)
+    tables = price_tables(engine)
+    assert [table.name for table in tables] == expected
+
+    with bulk_load_indexes(engine=engine) as timings:
+        assert set(timings['indexes']) == secondary_names(tables) and timings['indexes']
+        assert all(not index_names(table.name) & secondary_names([table]) for table in tables)
+        # Incluye un mes nuevo (otra tabla mensual con particionado)
+        second = synthetic_prices(node_ids, MIDDLE, END, seed=7)
+        write(db, second)
+
+    for table in price_tables(engine):
+        assert secondary_names([table]) <= index_names(table.name)
+    pd.testing.assert_frame_equal(stored_prices(db), sorted_frame(pd.concat([first, second])), check_dtype=False)
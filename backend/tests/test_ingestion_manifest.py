@@ -0,0 +1,96 @@
+"""Manifiesto de ingesta: salto de archivos ya cargados y reanudación desde el checkpoint."""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+import import_real_data
+from app.models import IngestionManifest, IngestionStatus, Node
+from app.utils.ingestion_manifest import manifest_key
+from conftest import synthetic_prices, stored_prices, sorted_frame
+
+
+BATCH = 40
+
+
+@pytest.fixture
+def prices(node_ids) -> pd.DataFrame:
+    return synthetic_prices(node_ids, datetime(2024, 3, 1), datetime(2024, 3, 3))
+
+
+@pytest.fixture
+def price_file(db, prices, tmp_path) -> str:
+    codes = dict(db.execute(select(Node.id, Node.code)).all())
+    path = tmp_path / 'prices.csv'
+    prices.assign(node_code=prices['node_id'].map(codes)).drop(columns='node_id').to_csv(path, index=False)
+    return str(path)
+
+
+def manifest_entry(db, path: str) -> IngestionManifest:
+    db.expire_all()
+    return db.query(IngestionManifest).filter(IngestionManifest.file_path == manifest_key(path)).one()
+
+
+def failing_writer(monkeypatch, fail_on_call: int) -> list:
+    """Sustituye write_prices por uno que falla en la llamada indicada; devuelve el registro de llamadas."""
+    calls = []
+    real = import_real_data.write_prices
+
+    def write_prices(conn, df, mode):
+        calls.append(len(df))
+        if len(calls) == fail_on_call:
+            raise RuntimeError("fallo simulado")
+        return real(conn, df, mode)
+
+    monkeypatch.setattr(import_real_data, 'write_prices', write_prices)
+    return calls
+
+
+def test_failed_load_resumes_from_the_last_checkpoint(db, prices, price_file, monkeypatch):
+    failing_writer(monkeypatch, fail_on_call=3)
+    with pytest.raises(RuntimeError):
+        import_real_data.import_prices(price_file, db, batch_size=BATCH)
+
+    entry = manifest_entry(db, price_file)
+    assert entry.status == IngestionStatus.FAILED
+    assert entry.row_end == 2 * BATCH
+    assert 'fallo simulado' in entry.error
+    # Solo los bloques confirmados antes del fallo
+    assert len(stored_prices(db)) == 2 * BATCH
+
+    calls = failing_writer(monkeypatch, fail_on_call=0)
+    imported = import_real_data.import_prices(price_file, db, batch_size=BATCH)
+
+    assert imported == len(prices) - 2 * BATCH
+    assert sum(calls) == len(prices) - 2 * BATCH
+    entry = manifest_entry(db, price_file)
+    assert entry.status == IngestionStatus.COMPLETED
+    assert (entry.row_end, entry.rows_loaded) == (len(prices), len(prices))
+    pd.testing.assert_frame_equal(stored_prices(db), sorted_frame(prices), check_dtype=False)
+
+
+def test_unchanged_file_is_skipped(db, price_file, monkeypatch):
+    import_real_data.import_prices(price_file, db, batch_size=BATCH)
+    calls = failing_writer(monkeypatch, fail_on_call=0)
+
+    assert import_real_data.import_prices(price_file, db, batch_size=BATCH) == 0
+    assert calls == []
+
+
+def test_changed_file_is_reloaded_from_the_start(db, prices, price_file, monkeypatch):
+    import_real_data.import_prices(price_file, db, batch_size=BATCH)
+    changed = pd.read_csv(price_file)
+    changed['price'] += 1
+    changed.to_csv(price_file, index=False)
+
+    calls = failing_writer(monkeypatch, fail_on_call=0)
+    assert import_real_data.import_prices(price_file, db, batch_size=BATCH) == len(prices)
+    assert sum(calls) == len(prices)
+    assert stored_prices(db)['price'].tolist() == pytest.approx(sorted_frame(prices)['price'].add(1).tolist())
+
+
+def test_force_reloads_a_completed_file(db, prices, price_file):
+    import_real_data.import_prices(price_file, db, batch_size=BATCH)
+    assert import_real_data.import_prices(price_file, db, batch_size=BATCH, force=True) == len(prices)
+    assert len(stored_prices(db)) == len(prices)
@@ -0,0 +1,90 @@
+"""Último valor por nodo: mantenimiento incremental y reconstrucción iguales al último valor no nulo de pandas."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from app.models import NodeLatestValue, DataType
+from app.utils.latest_values import LATEST_COLUMNS, latest_query, rebuild_latest_values
+from app.utils.partitions import price_source
+from conftest import synthetic_prices, write
+
+
+START, END = datetime(2024, 4, 1), datetime(2024, 4, 20)
+
+
+@pytest.fixture
+def prices(db, node_ids) -> pd.DataFrame:
+    """Dos mercados, con las últimas horas sin precio en un nodo y valores nulos dispersos."""
+    prices = pd.concat([
+        synthetic_prices(node_ids, START, END),
+        synthetic_prices(node_ids[:2], START, END - timedelta(days=3), seed=6, market='DAM'),
+    ], ignore_index=True)
+    prices.loc[(prices['node_id'] == node_ids[0]) & (prices['timestamp'] >= END - timedelta(hours=30)), 'price'] = np.nan
+    for column in LATEST_COLUMNS.values():
+        prices.loc[np.random.default_rng(8).choice(prices.index, 200, replace=False), column] = np.nan
+    write(db, prices)
+    return prices
+
+
+def stored(db) -> dict:
+    """node_latest_values como {(nodo, mercado, tipo de dato): (timestamp, valor)}."""
+    table = NodeLatestValue.__table__
+    rows = db.execute(select(table.c.node_id, table.c.market, table.c.data_type, table.c.timestamp, table.c.value))
+    return {(node_id, market, DataType(data_type)): (timestamp, value)
+            for node_id, market, data_type, timestamp, value in rows}
+
+
+def expected(prices: pd.DataFrame) -> dict:
+    """Último valor no nulo de cada nodo, mercado y tipo de dato con pandas."""
+    latest = {}
+    for data_type, column in LATEST_COLUMNS.items():
+        rows = prices[prices[column].notna()].sort_values('timestamp')
+        for (node_id, market), row in rows.groupby(['node_id', 'market']).last().iterrows():
+            latest[(node_id, market, data_type)] = (row['timestamp'].to_pydatetime(), row[column])
+    return latest
+
+
+def test_incremental_and_rebuilt_values_match_pandas(db, node_ids, prices):
+    latest = expected(prices)
+    assert latest[(node_ids[0], 'ERCOT', DataType.PRICE)][0] < END - timedelta(hours=30)
+    assert stored(db) == latest
+
+    assert rebuild_latest_values(db) == len(latest)
+    assert stored(db) == latest
+
+
+def test_window_query_matches_the_table(db, node_ids, prices):
+    source = price_source(db)
+    for data_type, column in LATEST_COLUMNS.items():
+        window = {(node_id, market, data_type): (timestamp, value)
+                  for node_id, market, timestamp, value in db.execute(latest_query(source, column))}
+        table = {key: entry for key, entry in stored(db).items() if key[2] == data_type}
+        assert window == table
+
+
+def test_refresh_skips_older_and_null_values(db, node_ids, prices):
+    before = stored(db)
+    node_id = node_ids[1]
+
+    # Un bloque atrasado (relleno de huecos) no retrocede el último valor
+    backfill = synthetic_prices([node_id], START - timedelta(days=5), START, seed=9)
+    write(db, backfill)
+    assert stored(db) == before
+
+    # Horas nuevas sin precio: el precio no avanza, la captura solar sí
+    newer = synthetic_prices([node_id], END, END + timedelta(hours=6), seed=10).assign(price=np.nan)
+    write(db, newer)
+    after = stored(db)
+    assert after[(node_id, 'ERCOT', DataType.PRICE)] == before[(node_id, 'ERCOT', DataType.PRICE)]
+    assert after[(node_id, 'ERCOT', DataType.SOLAR_CAPTURE)] == (
+        newer['timestamp'].max().to_pydatetime(), pytest.approx(newer['solar_capture'].iloc[-1])
+    )
+
+    # La misma última hora corregida por el upsert sí actualiza el valor
+    last = prices[(prices['node_id'] == node_id) & (prices['market'] == 'DAM') & prices['price'].notna()]
+    correction = last.sort_values('timestamp').tail(1).assign(price=-12.5)
+    write(db, correction)
+    assert stored(db)[(node_id, 'DAM', DataType.PRICE)] == (correction['timestamp'].iloc[0].to_pydatetime(), -12.5)
@@ -0,0 +1,82 @@
+"""Baja de un nodo con datos ingeridos, con las claves foráneas comprobadas (como SQL Server)."""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import text, func
+
+from app.api.v1.endpoints import nodes as node_endpoints
+from app.core.config import settings
+from app.models import Node, NodeLatestValue, PriceRollup, CompactPriceRecord, DataType
+from app.utils.hour_matrix import frame_values
+from app.utils.partitions import existing_partitions
+from conftest import synthetic_prices, write, stored_prices, sorted_frame
+
+
+START, END = datetime(2024, 5, 20), datetime(2024, 6, 10)
+
+
+@pytest.fixture
+def foreign_keys(db):
+    """SQLite solo comprueba las claves foráneas con el PRAGMA (fuera de una transacción)."""
+    db.execute(text("PRAGMA foreign_keys = ON"))
+    assert db.execute(text("PRAGMA foreign_keys")).scalar() == 1
+
+
+def ingest(db, node_ids) -> pd.DataFrame:
+    prices = pd.concat([
+        synthetic_prices(node_ids, START, END),
+        synthetic_prices(node_ids[:2], START, END, seed=3, market='DAM'),
+    ], ignore_index=True)
+    write(db, prices)
+    return prices
+
+
+def count(db, model, node_id: int) -> int:
+    return db.query(func.count()).select_from(model).filter(model.node_id == node_id).scalar()
+
+
+DERIVED = [PriceRollup, NodeLatestValue]
+
+
+@pytest.mark.parametrize('layout, partitioning', [('standard', False), ('standard', True), ('compact', False)])
+def test_node_with_data_can_be_deleted(db, node_ids, foreign_keys, monkeypatch, layout, partitioning):
+    monkeypatch.setattr(settings, 'PRICE_LAYOUT', layout)
+    monkeypatch.setattr(settings, 'PRICE_PARTITIONING', partitioning)
+    prices = ingest(db, node_ids)
+    assert bool(existing_partitions(db.connection())) == partitioning
+    node_id = node_ids[0]
+    derived = DERIVED + ([CompactPriceRecord] if layout == 'compact' else [])
+    assert all(count(db, model, node_id) > 0 for model in derived)
+    assert node_id in frame_values(db, 'ERCOT', START, DataType.PRICE)
+
+    node_endpoints.delete_node(node_id=node_id, db=db, current_user=None)
+
+    assert db.get(Node, node_id) is None
+    assert all(count(db, model, node_id) == 0 for model in derived)
+    for market in ['ERCOT', 'DAM']:
+        values = frame_values(db, market, START, DataType.PRICE)
+        assert node_id not in values and len(values) > 0
+    kept = prices[prices['node_id'] != node_id]
+    pd.testing.assert_frame_equal(stored_prices(db), sorted_frame(kept), check_dtype=False)
+    assert db.query(func.count()).select_from(PriceRollup).scalar() > 0
+
+
+@pytest.mark.parametrize('backend', ['duckdb', 'parquet'])
+def test_deleted_node_leaves_the_analytics_copy(db, node_ids, foreign_keys, monkeypatch, backend):
+    pytest.importorskip('duckdb')
+    from app.utils.analytics import DuckDBAnalytics, VALUE_COLUMNS, stale_reason
+
+    monkeypatch.setattr(settings, 'ANALYTICS_BACKEND', backend)
+    prices = ingest(db, node_ids)
+    write(db, prices.sample(frac=0.1, random_state=1))  # Deltas en la copia Parquet
+    node_id = node_ids[1]
+
+    node_endpoints.delete_node(node_id=node_id, db=db, current_user=None)
+
+    assert stale_reason(backend) is None
+    rows = DuckDBAnalytics(backend).rows(None, START, END, VALUE_COLUMNS)
+    kept = prices[prices['node_id'] != node_id]
+    assert sorted(rows['node_id'].unique()) == sorted(kept['node_id'].unique())
+    assert len(rows) == len(kept)
+    assert rows['price'].sum() == pytest.approx(kept['price'].sum())
@@ -0,0 +1,120 @@
+"""Particionado por tablas mensuales en SQLite: escritura enrutada y lectura con price_source."""
+import re
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import select, func
+
+from app.api.v1.endpoints import prices as endpoints
+from app.core.config import settings
+from app.models import DataType, PriceRecord, PriceRollup, NodeLatestValue
+from app.utils.partitions import existing_partitions, price_source, drop_before
+from app.utils.rollups import range_stats
+from conftest import synthetic_prices, write, stored_prices, sorted_frame
+
+
+START, END = datetime(2024, 1, 20), datetime(2024, 4, 10)
+
+
+@pytest.fixture
+def partitioned(monkeypatch):
+    monkeypatch.setattr(settings, 'PRICE_PARTITIONING', True)
+
+
+@pytest.fixture
+def prices(db, node_ids, partitioned) -> pd.DataFrame:
+    prices = synthetic_prices(node_ids, START, END)
+    write(db, prices)
+    return prices
+
+
+def in_range(prices: pd.DataFrame, start: datetime, end: datetime) -> pd.DataFrame:
+    return prices[prices['timestamp'].between(start, end)]
+
+
+def test_rows_are_routed_to_monthly_tables(db, prices):
+    assert existing_partitions(db.connection()) == [datetime(2024, m, 1) for m in range(1, 5)]
+    assert db.query(func.count()).select_from(PriceRecord.__table__).scalar() == 0
+    pd.testing.assert_frame_equal(stored_prices(db), sorted_frame(prices), check_dtype=False)
+
+
+@pytest.mark.parametrize('start, end, months', [
+    (datetime(2024, 2, 10, 5), datetime(2024, 2, 20, 17), ['202402']),
+    (datetime(2024, 1, 31, 23), datetime(2024, 3, 1), ['202401', '202402', '202403']),
+    (datetime(2024, 3, 15), datetime(2024, 6, 1), ['202403', '202404']),
+])
+def test_range_reads_only_the_months_it_needs(db, prices, start, end, months):
+    source = price_source(db, start, end)
+    sql = str(select(source.c.node_id).compile())
+    assert sorted(set(re.findall(r'FROM price_records_(\d{6})', sql))) == months
+
+    rows = db.execute(
+        select(source.c.node_id, source.c.timestamp, source.c.market, source.c.price)
+        .where(source.c.timestamp.between(start, end))
+    ).fetchall()
+    expected = in_range(prices, start, end)
+    assert len(rows) == len(expected)
+    assert sum(price for *_, price in rows) == pytest.approx(expected['price'].sum())
+
+
+def test_upsert_updates_rows_inside_their_partition(db, prices):
+    update = prices.sample(frac=0.2, random_state=1).copy()
+    update['price'] += 10
+    update['wind_capture'] = None
+    write(db, update)
+
+    expected = prices.set_index(['node_id', 'timestamp', 'market'])
+    expected.loc[update.set_index(['node_id', 'timestamp', 'market']).index, 'price'] += 10
+    pd.testing.assert_frame_equal(stored_prices(db), sorted_frame(expected.reset_index()), check_dtype=False)
+
+
+def test_rows_in_the_base_table_stay_visible(db, node_ids, monkeypatch):
+    before = synthetic_prices(node_ids, datetime(2023, 12, 1), datetime(2023, 12, 10))
+    write(db, before)
+    monkeypatch.setattr(settings, 'PRICE_PARTITIONING', True)
+    after = synthetic_prices(node_ids, datetime(2024, 1, 1), datetime(2024, 1, 10))
+    write(db, after)
+
+    both = pd.concat([before, after], ignore_index=True)
+    pd.testing.assert_frame_equal(stored_prices(db), sorted_frame(both), check_dtype=False)
+    stats = range_stats(db, node_ids, datetime(2023, 12, 5), datetime(2024, 1, 5, 12))
+    expected = in_range(both, datetime(2023, 12, 5), datetime(2024, 1, 5, 12)).groupby('node_id')['price'].mean()
+    assert {node_id: s['avg'] for node_id, s in stats.items()} == pytest.approx(expected.to_dict())
+
+
+def test_drop_before_removes_whole_months(db, prices):
+    drop_before(db.connection(), datetime(2024, 3, 1))
+    db.commit()
+
+    assert existing_partitions(db.connection()) == [datetime(2024, 3, 1), datetime(2024, 4, 1)]
+    kept = prices[prices['timestamp'] >= datetime(2024, 3, 1)]
+    pd.testing.assert_frame_equal(stored_prices(db), sorted_frame(kept), check_dtype=False)
+    assert db.query(func.min(PriceRollup.bucket_start)).scalar() >= datetime(2024, 3, 1)
+
+
+@pytest.mark.parametrize('backend', ['sql', 'duckdb', 'parquet'])
+def test_drop_before_reaches_caches_and_the_analytics_copy(db, node_ids, partitioned, monkeypatch, backend):
+    if backend != 'sql':
+        pytest.importorskip('duckdb')
+    monkeypatch.setattr(settings, 'ANALYTICS_BACKEND', backend)
+    prices = synthetic_prices(node_ids, START, END)
+    write(db, prices)
+    node_id = node_ids[0]
+
+    def stats():
+        return endpoints.get_aggregated_stats(
+            node_id=node_id, start_date=START, end_date=END, data_type=DataType.PRICE,
+            detailed=True, percentiles=[50.0], top_n=1, db=db, current_user=None,
+        )
+
+    stats()  # En caché
+    drop_before(db.connection(), datetime(2024, 3, 1))
+    db.commit()
+
+    kept = prices[(prices['node_id'] == node_id) & (prices['timestamp'] >= datetime(2024, 3, 1))]
+    after = stats()
+    assert after.count == len(kept)
+    assert after.avg == pytest.approx(kept['price'].mean())
+    assert after.percentiles['p50'] == pytest.approx(kept['price'].median())
+    assert db.query(func.min(NodeLatestValue.timestamp)).scalar() >= datetime(2024, 3, 1)
@@ -0,0 +1,110 @@
+"""Validación de la ingesta: motivo de cuarentena de cada fila rechazada."""
+import os
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy import select
+
+import import_real_data
+from app.models import Node, QuarantineRecord, QuarantineReason
+from app.utils.archive import ARCHIVE_SCHEMA, archive_path
+from app.utils.bulk_loader import prepare_price_chunk
+from app.utils.validation import FIRST_DATA_ROW, reason_counts
+from conftest import synthetic_prices, stored_prices, sorted_frame
+
+
+@pytest.fixture
+def codes(db, node_ids) -> dict:
+    """Código de cada node_id."""
+    return dict(db.execute(select(Node.id, Node.code)).all())
+
+
+@pytest.fixture
+def archived_2020():
+    """Archivo histórico con el año 2020 (vacío: solo cuenta su existencia)."""
+    path = archive_path(2020, 'ERCOT')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(ARCHIVE_SCHEMA.empty_table(), path)
+
+
+def file_rows(prices: pd.DataFrame, codes: dict) -> pd.DataFrame:
+    """Registros con el formato del archivo de precios, todo como texto."""
+    rows = prices.assign(node_code=prices['node_id'].map(codes)).drop(columns='node_id')
+    rows['timestamp'] = rows['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return rows.astype(object)
+
+
+def with_bad_rows(clean: pd.DataFrame, codes: dict):
+    """
+    Añade al final filas inválidas y devuelve (filas, {fila del archivo: motivo}).
+    Las filas repetidas copian una válida del mismo bloque.
+    """
+    good = clean.iloc[0].to_dict()
+    code = next(iter(codes.values()))
+    fall_back = dict(good, node_code=code, timestamp='2024-11-03 01:00:00')
+    bad = [
+        (dict(good, node_code='NO_EXISTE'), QuarantineReason.UNKNOWN_NODE),
+        (dict(good, timestamp='no es fecha'), QuarantineReason.BAD_TIMESTAMP),
+        (dict(good, price='abc'), QuarantineReason.NON_NUMERIC),
+        (dict(good, wind_capture='n/d'), QuarantineReason.NON_NUMERIC),
+        (dict(good, price=99_999.0), QuarantineReason.PRICE_OUT_OF_RANGE),
+        (dict(good, price=-5_000.0), QuarantineReason.PRICE_OUT_OF_RANGE),
+        (dict(good, timestamp='2020-06-01 10:00:00'), QuarantineReason.ARCHIVED_PERIOD),
+        (dict(good), QuarantineReason.DUPLICATE_HOUR),
+        (fall_back, None),
+        (fall_back, QuarantineReason.DST_DUPLICATE_HOUR),
+        # Falla varias comprobaciones: gana la primera (nodo desconocido)
+        (dict(good, node_code='NO_EXISTE', timestamp='mal', price='abc'), QuarantineReason.UNKNOWN_NODE),
+    ]
+    rows = pd.concat([clean, pd.DataFrame([row for row, _ in bad])], ignore_index=True)
+    expected = {
+        FIRST_DATA_ROW + len(clean) + i: reason
+        for i, (_, reason) in enumerate(bad) if reason is not None
+    }
+    return rows, expected
+
+
+def test_each_rejected_row_gets_its_reason(db, node_ids, codes, archived_2020):
+    clean = file_rows(synthetic_prices(node_ids, datetime(2024, 3, 1), datetime(2024, 3, 2)), codes)
+    rows, expected = with_bad_rows(clean, codes)
+
+    prepared, rejected = prepare_price_chunk(rows, {code: node_id for node_id, code in codes.items()})
+
+    assert dict(zip(rejected['source_row'], rejected['reason'])) == expected
+    assert len(prepared) == len(rows) - len(expected)
+    assert reason_counts(rejected) == pd.Series([r.value for r in expected.values()]).value_counts().to_dict()
+
+
+def test_source_rows_continue_across_chunks(db, node_ids, codes):
+    clean = file_rows(synthetic_prices(node_ids, datetime(2024, 3, 1), datetime(2024, 3, 2)), codes)
+    clean.loc[[5, 80], 'node_code'] = 'NO_EXISTE'
+    node_map = {code: node_id for node_id, code in codes.items()}
+
+    _, first = prepare_price_chunk(clean.iloc[:50], node_map)
+    _, second = prepare_price_chunk(clean.iloc[50:], node_map, first_row=FIRST_DATA_ROW + 50)
+
+    assert first['source_row'].tolist() == [FIRST_DATA_ROW + 5]
+    assert second['source_row'].tolist() == [FIRST_DATA_ROW + 80]
+
+
+def test_import_stores_valid_rows_and_quarantines_the_rest(db, node_ids, codes, archived_2020, tmp_path):
+    prices = synthetic_prices(node_ids, datetime(2024, 3, 1), datetime(2024, 3, 2))
+    rows, expected = with_bad_rows(file_rows(prices, codes), codes)
+    path = tmp_path / 'prices.csv'
+    rows.to_csv(path, index=False)
+
+    import_real_data.import_prices(str(path), db, batch_size=len(rows))
+
+    quarantined = db.execute(select(QuarantineRecord.source_row, QuarantineRecord.reason)).all()
+    assert dict(quarantined) == expected
+
+    # Se guardan las filas limpias y la primera aparición de la hora repetida del cambio de horario
+    fall_back = pd.DataFrame([{
+        'node_id': next(iter(codes)), 'timestamp': datetime(2024, 11, 3, 1),
+        **prices.iloc[0][['price', 'solar_capture', 'wind_capture', 'negative_hours', 'market']].to_dict(),
+    }])
+    expected_prices = sorted_frame(pd.concat([prices, fall_back], ignore_index=True))
+    pd.testing.assert_frame_equal(stored_prices(db), expected_prices, check_dtype=False)
@@ -0,0 +1,113 @@
+"""Estadísticas por rango desde rollups: mismo resultado que agregar las filas horarias."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from app.models import DataType
+from app.utils.rollups import ROLLUP_COLUMNS, plan_segments, range_stats, monthly_series
+from conftest import synthetic_prices, write
+
+
+START, END = datetime(2024, 1, 10), datetime(2024, 4, 20)
+
+
+@pytest.fixture
+def prices(db, node_ids) -> pd.DataFrame:
+    """Tres meses y medio en ERCOT y un mes en un segundo mercado para dos nodos."""
+    prices = pd.concat([
+        synthetic_prices(node_ids, START, END),
+        synthetic_prices(node_ids[:2], datetime(2024, 2, 1), datetime(2024, 3, 1), seed=5, market='DAM'),
+    ], ignore_index=True)
+    write(db, prices)
+    return prices
+
+
+def random_ranges(count: int, seed: int = 0):
+    """Rangos [start, end] con bordes en horas y minutos arbitrarios dentro de los datos (y fuera)."""
+    rng = np.random.default_rng(seed)
+    span = int((END - START).total_seconds() // 60)
+    for _ in range(count):
+        a, b = sorted(rng.integers(-3 * 24 * 60, span + 3 * 24 * 60, size=2))
+        yield START + timedelta(minutes=int(a)), START + timedelta(minutes=int(b))
+
+
+def expected_stats(prices: pd.DataFrame, node_ids, start, end, column: str, market=None) -> dict:
+    """Las mismas estadísticas con pandas sobre las filas horarias."""
+    rows = prices[
+        prices['node_id'].isin(node_ids) & prices['timestamp'].between(start, end) & prices[column].notna()
+    ]
+    if market:
+        rows = rows[rows['market'] == market]
+    grouped = rows.assign(negative=rows[column] < 0).groupby('node_id').agg(
+        sum=(column, 'sum'), count=(column, 'count'), min=(column, 'min'),
+        max=(column, 'max'), negative_count=('negative', 'sum'), avg=(column, 'mean'),
+    )
+    return {int(node_id): row for node_id, row in grouped.to_dict('index').items()}
+
+
+def assert_same_stats(actual: dict, expected: dict):
+    assert set(actual) == set(expected)
+    for node_id, stats in expected.items():
+        for key in ['count', 'negative_count']:
+            assert actual[node_id][key] == stats[key]
+        for key in ['sum', 'min', 'max', 'avg']:
+            assert actual[node_id][key] == pytest.approx(stats[key], rel=1e-9, abs=1e-6)
+
+
+@pytest.mark.parametrize('start, end', list(random_ranges(12)))
+def test_plan_segments_cover_the_range_exactly(start, end):
+    segments = sorted(segment for grain in plan_segments(start, end).values() for segment in grain)
+    assert segments[0][0] == start
+    assert segments[-1][1] == end + timedelta(microseconds=1)
+    assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+
+
+def test_segments_use_the_coarsest_grain_that_fits():
+    segments = plan_segments(datetime(2024, 1, 10, 5), datetime(2024, 4, 20, 7, 59))
+    assert segments['month'] == [(datetime(2024, 2, 1), datetime(2024, 4, 1))]
+    assert segments['day'] == [(datetime(2024, 1, 11), datetime(2024, 2, 1)),
+                               (datetime(2024, 4, 1), datetime(2024, 4, 20))]
+    assert [s for s, _ in segments['raw']] == [datetime(2024, 1, 10, 5), datetime(2024, 4, 20)]
+
+
+@pytest.mark.parametrize('data_type', list(ROLLUP_COLUMNS))
+def test_range_stats_match_raw_aggregation(db, node_ids, prices, data_type):
+    column = ROLLUP_COLUMNS[data_type]
+    for start, end in random_ranges(8, seed=1):
+        actual = range_stats(db, node_ids, start, end, data_type)
+        assert_same_stats(actual, expected_stats(prices, node_ids, start, end, column))
+
+
+def test_range_stats_by_market_and_node_subset(db, node_ids, prices):
+    subset = node_ids[1:3]
+    for market in ['ERCOT', 'DAM']:
+        for start, end in random_ranges(5, seed=2):
+            actual = range_stats(db, subset, start, end, DataType.PRICE, market)
+            assert_same_stats(actual, expected_stats(prices, subset, start, end, 'price', market))
+
+
+def test_rollups_follow_upserts(db, node_ids, prices):
+    update = prices[prices['timestamp'].dt.month == 3].sample(frac=0.3, random_state=4).copy()
+    update['price'] = update['price'] * 2 - 50
+    write(db, update)
+    current = prices.set_index(['node_id', 'timestamp', 'market'])
+    current.update(update.set_index(['node_id', 'timestamp', 'market']))
+    current = current.reset_index()
+
+    start, end = datetime(2024, 2, 15, 3), datetime(2024, 4, 2, 22)
+    assert_same_stats(range_stats(db, node_ids, start, end), expected_stats(current, node_ids, start, end, 'price'))
+
+
+def test_monthly_series_matches_resample(db, node_ids, prices, monkeypatch):
+    node = node_ids[0]
+    rows = prices[(prices['node_id'] == node) & (prices['market'] == 'ERCOT')]
+    expected = rows.set_index('timestamp')['price'].resample('MS').mean()
+
+    for enabled in [True, False]:
+        monkeypatch.setattr(settings, 'ROLLUPS_ENABLED', enabled)
+        series = monthly_series(db, node, START, END, market='ERCOT')
+        assert [month for month, _ in series] == list(expected.index.to_pydatetime())
+        assert [avg for _, avg in series] == pytest.approx(expected.tolist())
@@ -0,0 +1,93 @@
+"""Estadísticas por nodo: percentiles, N horas mayores y valores a 0, iguales a pandas/NumPy."""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.api.v1.endpoints import prices as endpoints
+from app.core.config import settings
+from app.models import DataType
+from conftest import synthetic_prices, write
+
+
+START, END = datetime(2024, 10, 1), datetime(2024, 11, 10)
+RANGE = (datetime(2024, 10, 2, 5, 30), datetime(2024, 11, 6, 20))
+PERCENTILES = [0.0, 5.0, 50.0, 87.5, 99.9, 100.0]
+PEAK = 999.0
+
+
+@pytest.fixture(params=['sql', 'duckdb', 'parquet'])
+def prices(request, db, node_ids, monkeypatch) -> pd.DataFrame:
+    """
+    Precios con 8 horas empatadas en el máximo del primer nodo (más que las N
+    pedidas), un segundo mercado para el segundo nodo y el último nodo siempre a 0.
+    """
+    if request.param != 'sql':
+        pytest.importorskip('duckdb')
+    monkeypatch.setattr(settings, 'ANALYTICS_BACKEND', request.param)
+    prices = pd.concat([
+        synthetic_prices(node_ids, START, END),
+        synthetic_prices(node_ids[1:2], START, END, seed=4, market='DAM'),
+    ], ignore_index=True)
+    first = prices.index[(prices['node_id'] == node_ids[0]) & prices['timestamp'].between(*RANGE)]
+    prices.loc[np.random.default_rng(2).choice(first, 8, replace=False), 'price'] = PEAK
+    prices.loc[prices['node_id'] == node_ids[3], 'price'] = 0.0
+    write(db, prices)
+    return prices
+
+
+def node_rows(prices: pd.DataFrame, node_id: int) -> pd.DataFrame:
+    rows = prices[(prices['node_id'] == node_id) & prices['timestamp'].between(*RANGE)]
+    return rows[rows['price'].notna()]
+
+
+def batch_stats(db, node_ids, detailed: bool, top_n: int = 5):
+    return endpoints.get_batch_stats(
+        node_ids=node_ids, start_date=RANGE[0], end_date=RANGE[1], data_type=DataType.PRICE,
+        detailed=detailed, percentiles=PERCENTILES, top_n=top_n, db=db, current_user=None
+    )
+
+
+@pytest.mark.parametrize('top_n', [1, 5, 20])
+def test_detailed_stats_match_numpy(db, node_ids, prices, top_n):
+    for stats in batch_stats(db, node_ids, detailed=True, top_n=top_n):
+        rows = node_rows(prices, stats.node_id)
+        values = rows['price'].to_numpy(dtype=float)
+
+        assert stats.count == len(values)
+        assert stats.avg == pytest.approx(values.mean())
+        assert stats.min == values.min() and stats.max == values.max()
+        assert stats.std == pytest.approx(values.std(), abs=1e-9)
+        assert stats.negative_count == int((values < 0).sum())
+        expected = np.percentile(values, PERCENTILES)
+        assert list(stats.percentiles) == ['p0', 'p5', 'p50', 'p87.5', 'p99.9', 'p100']
+        assert list(stats.percentiles.values()) == pytest.approx(expected.tolist())
+        # Mayor valor primero; en los empates, la hora más antigua
+        top = rows.sort_values(['price', 'timestamp'], ascending=[False, True], kind='stable').head(top_n)
+        assert [(hour.timestamp, hour.value) for hour in stats.top_hours] == list(
+            zip([timestamp.to_pydatetime() for timestamp in top['timestamp']], top['price'])
+        )
+
+
+@pytest.mark.parametrize('detailed', [False, True])
+def test_zero_values_are_values(db, node_ids, prices, detailed):
+    stats = batch_stats(db, node_ids[3:], detailed)[0]
+    rows = node_rows(prices, node_ids[3])
+
+    assert stats.count == len(rows) > 0
+    assert (stats.avg, stats.min, stats.max) == (0.0, 0.0, 0.0)
+    assert stats.negative_count == 0 and stats.negative_share == 0.0
+    if detailed:
+        assert stats.std == 0.0
+        assert set(stats.percentiles.values()) == {0.0}
+        assert [hour.timestamp for hour in stats.top_hours] == list(rows['timestamp'].sort_values()[:5])
+        assert all(hour.value == 0.0 for hour in stats.top_hours)
+
+
+def test_nodes_without_data_have_count_zero(db, node_ids, prices):
+    empty = endpoints.get_aggregated_stats(
+        node_id=node_ids[0], start_date=datetime(2025, 1, 1), end_date=datetime(2025, 2, 1),
+        data_type=DataType.PRICE, detailed=True, percentiles=PERCENTILES, top_n=5, db=db, current_user=None
+    )
+    assert empty.count == 0 and empty.avg is None and not empty.top_hours
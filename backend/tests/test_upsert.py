@@ -0,0 +1,56 @@
+"""Upsert por clave natural: idempotente y sin sobrescribir con nulos (COALESCE)."""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils.bulk_loader import VALUE_COLUMNS, PRICE_KEY
+from conftest import synthetic_prices, write, stored_prices, sorted_frame
+
+
+START, END = datetime(2024, 1, 1), datetime(2024, 1, 4)
+
+
+def test_reloading_the_same_block_is_idempotent(db, node_ids):
+    prices = synthetic_prices(node_ids, START, END)
+    write(db, prices)
+    write(db, prices)
+
+    stored = stored_prices(db)
+    assert len(stored) == len(prices)
+    pd.testing.assert_frame_equal(stored, sorted_frame(prices), check_dtype=False)
+
+
+def test_null_values_do_not_overwrite_existing_ones(db, node_ids):
+    original = synthetic_prices(node_ids, START, END)
+    write(db, original)
+
+    # Segunda carga de un subconjunto: valores nuevos con huecos aleatorios
+    update = synthetic_prices(node_ids, START, END, seed=7).sample(frac=0.5, random_state=1)
+    holes = np.random.default_rng(3).random((len(update), len(VALUE_COLUMNS))) < 0.4
+    update[VALUE_COLUMNS] = update[VALUE_COLUMNS].mask(holes)
+    write(db, update)
+
+    # Lo esperado, con pandas: el valor nuevo si no es nulo; si no, el anterior
+    expected = (
+        update.set_index(PRICE_KEY)[VALUE_COLUMNS]
+        .combine_first(original.set_index(PRICE_KEY)[VALUE_COLUMNS])
+        .reset_index()
+    )
+    pd.testing.assert_frame_equal(stored_prices(db), sorted_frame(expected), check_dtype=False)
+
+
+def test_repeated_keys_in_a_block_keep_the_last_row(db, node_ids):
+    prices = synthetic_prices(node_ids, START, START.replace(hour=2))
+    later = prices.assign(price=prices['price'] + 100)
+    write(db, pd.concat([prices, later], ignore_index=True))
+
+    assert stored_prices(db)['price'].tolist() == pytest.approx(sorted_frame(later)['price'].tolist())
+
+
+def test_insert_mode_rejects_existing_keys(db, node_ids):
+    prices = synthetic_prices(node_ids, START, START.replace(hour=3))
+    write(db, prices, mode='insert')
+    with pytest.raises(Exception):
+        write(db, prices, mode='insert')
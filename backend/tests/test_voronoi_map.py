@@ -0,0 +1,92 @@
+"""Mapa de Voronoi: plantilla serializada con los mismos bytes que el GeoJSON de antes."""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+from app.api.v1.endpoints import prices as endpoints
+from app.db.database import SessionLocal
+from app.models import Node
+from app.schemas import DataType
+from app.utils.node_geometry import VORONOI_ZONE
+from app.utils.synthetic_data import generate_nodes
+from app.utils.voronoi_generator import generate_voronoi_polygons, create_texas_boundary
+from conftest import synthetic_prices, write
+
+
+HOUR = datetime(2024, 8, 5, 17)
+
+
+@pytest.fixture
+def central_ids(db) -> list:
+    """Ocho nodos de la zona del mapa (uno con nombre no ASCII) y dos que no se dibujan."""
+    records = generate_nodes(10).to_dict('records')
+    for record in records:
+        record['zone'] = VORONOI_ZONE
+    records[0]['name'] = 'Nodo Añil "Sur" – é'
+    records[8]['zone'] = 'Coast'
+    records[9]['is_active'] = False
+    db.add_all(Node(**record) for record in records)
+    db.commit()
+    return [node_id for node_id, in db.execute(select(Node.id).order_by(Node.id))][:8]
+
+
+@pytest.fixture
+def prices(db, central_ids) -> pd.DataFrame:
+    # Los dos últimos nodos no tienen datos: su valor es null
+    prices = synthetic_prices(central_ids[:-2], datetime(2024, 8, 5), datetime(2024, 8, 6))
+    write(db, prices)
+    return prices
+
+
+def old_response(db, prices: pd.DataFrame, datatype: DataType) -> bytes:
+    """GeoJSON construido como lo hacía el endpoint antes de la plantilla, codificado por JSONResponse."""
+    nodes = db.query(Node).filter(Node.is_active == True).filter(Node.zone == VORONOI_ZONE).all()
+    geojson = generate_voronoi_polygons([
+        {'code': n.code, 'name': n.name, 'latitude': float(n.latitude), 'longitude': float(n.longitude),
+         'market': n.market, 'zone': n.zone}
+        for n in nodes
+    ], create_texas_boundary())
+    if datatype == DataType.NODES:
+        values_by_code = {}
+    else:
+        # Los tipos de dato con valores se llaman como su columna
+        column = datatype.value
+        codes = {n.id: n.code for n in nodes}
+        rows = prices[(prices['timestamp'] == HOUR) & (prices['market'] == 'ERCOT') & prices['node_id'].isin(codes)]
+        rows = rows.dropna(subset=[column])
+        values_by_code = {codes[node_id]: float(v) for node_id, v in rows.groupby('node_id')[column].mean().items()}
+    for feature in geojson['features']:
+        feature['properties']['value'] = values_by_code.get(feature['properties']['code'])
+        if datatype == DataType.PRICE:
+            feature['properties']['price'] = values_by_code.get(feature['properties']['code'])
+    return JSONResponse(jsonable_encoder(geojson)).body
+
+
+def voronoi(db, datatype: DataType, timestamp: datetime = HOUR) -> bytes:
+    return endpoints.get_voronoi_map(timestamp=timestamp, market='ERCOT', datatype=datatype,
+                                     db=db, current_user=None).body
+
+
+@pytest.mark.parametrize('datatype', [DataType.PRICE, DataType.SOLAR_CAPTURE, DataType.NEGATIVE_HOURS, DataType.NODES])
+def test_response_bytes_match_the_old_serialization(db, prices, datatype):
+    assert voronoi(db, datatype, HOUR.replace(minute=30)) == old_response(db, prices, datatype)
+
+
+def test_catalog_changes_from_another_session_are_drawn(db, central_ids, prices):
+    voronoi(db, DataType.PRICE)
+
+    # Otra sesión (otro proceso en producción): la caché de plantillas no se entera por el commit
+    other = SessionLocal()
+    node = other.get(Node, central_ids[1])
+    node.name = 'Renombrado'
+    other.add(Node(**dict(generate_nodes(11).to_dict('records')[10], zone=VORONOI_ZONE)))
+    other.get(Node, central_ids[2]).is_active = False
+    other.commit()
+    other.close()
+    db.expire_all()
+
+    assert voronoi(db, DataType.PRICE) == old_response(db, prices, DataType.PRICE)
@@ -1,13 +1,19 @@
 import { apiClient } from './api';
 import {
   NodePriceEvolution,
+  BatchEvolution,
   PriceDistribution,
   CongestionData,
+  CongestionSummary,
+  SpreadMatrix,
   AggregatedStats,
+  NodeStats,
   AvailableYears,
   AvailableMonths,
   HourlySnapshot,
   DataType,
+  DistributionMode,
+  EvolutionInterval,
 } from '../types';
 
 export const priceService = {
@@ -25,17 +31,47 @@ export const priceService = {
     nodeId: number,
     startDate: string,
     endDate: string,
-    dataType: DataType = DataType.PRICE
+    dataType: DataType = DataType.PRICE,
+    interval?: EvolutionInterval,
+    maxPoints?: number
   ): Promise<NodePriceEvolution> {
     const response = await apiClient.get<NodePriceEvolution>(
       `/prices/evolution/${nodeId}`,
       {
-        params: { start_date: startDate, end_date: endDate, data_type: dataType },
+        params: {
+          start_date: startDate,
+          end_date: endDate,
+          data_type: dataType,
+          interval,
+          max_points: maxPoints,
+        },
       }
     );
     return response.data;
   },
 
+  async getBatchEvolution(
+    nodeIds: number[],
+    startDate: string,
+    endDate: string,
+    dataTypes: DataType[] = [DataType.PRICE],
+    interval?: EvolutionInterval,
+    maxPoints?: number
+  ): Promise<BatchEvolution> {
+    const response = await apiClient.get<BatchEvolution>('/prices/evolution', {
+      params: {
+        node_ids: nodeIds,
+        start_date: startDate,
+        end_date: endDate,
+        data_types: dataTypes,
+        interval,
+        max_points: maxPoints,
+      },
+      paramsSerializer: { indexes: null },
+    });
+    return response.data;
+  },
+
   async getYearlyComparison(
     nodeId: number,
     month: number,
@@ -72,12 +108,15 @@ export const priceService = {
     nodeId: number,
     startDate: string,
     endDate: string,
-    dataType: DataType = DataType.PRICE
+    dataType: DataType = DataType.PRICE,
+    mode: DistributionMode = DistributionMode.RAW,
+    points?: number,
+    bins?: number
   ): Promise<PriceDistribution> {
     const response = await apiClient.get<PriceDistribution>(
       `/prices/distribution/${nodeId}`,
       {
-        params: { start_date: startDate, end_date: endDate, data_type: dataType },
+        params: { start_date: startDate, end_date: endDate, data_type: dataType, mode, points, bins },
       }
     );
     return response.data;
@@ -116,21 +155,95 @@ export const priceService = {
     return response.data;
   },
 
+  async getCongestionSummary(
+    node1Id: number,
+    node2Id: number,
+    startDate: string,
+    endDate: string,
+    threshold: number = 0
+  ): Promise<CongestionSummary> {
+    const response = await apiClient.get<CongestionSummary>('/prices/congestion/summary', {
+      params: {
+        node1_id: node1Id,
+        node2_id: node2Id,
+        start_date: startDate,
+        end_date: endDate,
+        threshold,
+      },
+    });
+    return response.data;
+  },
+
+  async getSpreadMatrix(
+    startDate: string,
+    endDate: string,
+    nodeIds?: number[],
+    market?: string,
+    percentile: number = 95
+  ): Promise<SpreadMatrix> {
+    const response = await apiClient.get<SpreadMatrix>('/prices/congestion/matrix', {
+      params: {
+        node_ids: nodeIds,
+        start_date: startDate,
+        end_date: endDate,
+        market,
+        percentile,
+      },
+      paramsSerializer: { indexes: null },
+    });
+    return response.data;
+  },
+
   async getAggregatedStats(
     nodeId: number,
     startDate: string,
     endDate: string,
-    dataType: DataType = DataType.PRICE
+    dataType: DataType = DataType.PRICE,
+    detailed: boolean = false,
+    percentiles?: number[],
+    topN?: number
   ): Promise<AggregatedStats> {
     const response = await apiClient.get<AggregatedStats>(
       `/prices/stats/${nodeId}`,
       {
-        params: { start_date: startDate, end_date: endDate, data_type: dataType },
+        params: {
+          start_date: startDate,
+          end_date: endDate,
+          data_type: dataType,
+          detailed,
+          percentiles,
+          top_n: topN,
+        },
+        paramsSerializer: { indexes: null },
       }
     );
     return response.data;
   },
 
+  async getBatchStats(
+    nodeIds: number[],
+    startDate: string,
+    endDate: string,
+    dataType: DataType = DataType.PRICE,
+    detailed: boolean = false,
+    percentiles?: number[],
+    topN?: number
+  ): Promise<NodeStats[]> {
+    const response = await apiClient.get<NodeStats[]>('/prices/stats', {
+      params: {
+        node_ids: nodeIds,
+        start_date: startDate,
+        end_date: endDate,
+        data_type: dataType,
+        detailed,
+        percentiles,
+        top_n: topN,
+      },
+      paramsSerializer: { indexes: null },
+    });
+    return response.data;
+  },
+
   async getHourlySnapshot(
     timestamp: string,
     market: string = 'ERCOT'
@@ -59,6 +59,19 @@ export enum DataType {
   NODES = 'nodes',
 }
 
+export enum EvolutionInterval {
+  HOUR = 'hour',
+  DAY = 'day',
+  WEEK = 'week',
+  MONTH = 'month',
+}
+
+export enum DistributionMode {
+  RAW = 'raw',
+  DURATION = 'duration',
+  HISTOGRAM = 'histogram',
+}
+
 export enum AggregationType {
   AVG = 'avg',
   MAX = 'max',
@@ -80,6 +93,9 @@ export interface PriceRecord {
 export interface TimeSeriesData {
   timestamp: string;
   value: number;
+  min_value?: number;
+  max_value?: number;
+  count?: number;
 }
 
 export interface NodePriceEvolution {
@@ -89,10 +105,33 @@ export interface NodePriceEvolution {
   data: TimeSeriesData[];
 }
 
+export interface EvolutionSeries {
+  node_id: number;
+  node_code: string;
+  node_name: string;
+  data_type: DataType;
+  values: (number | null)[];
+  min_values?: (number | null)[];
+  max_values?: (number | null)[];
+}
+
+export interface BatchEvolution {
+  start_date: string;
+  end_date: string;
+  interval?: EvolutionInterval;
+  timestamps: string[];
+  series: EvolutionSeries[];
+}
+
 export interface PriceDistribution {
   node_id: number;
   node_code: string;
   prices: number[];
+  mode: DistributionMode;
+  count?: number;
+  exceedance?: number[];
+  bin_edges?: number[];
+  bin_counts?: number[];
 }
 
 export interface CongestionData {
@@ -103,14 +142,64 @@ export interface CongestionData {
   timestamp: string;
   node1_price?: number;
   node2_price?: number;
+  spread?: number;
   congestion_price?: number;
 }
 
+export interface CongestionSummary {
+  node1_id: number;
+  node2_id: number;
+  node1_code: string;
+  node2_code: string;
+  start_date: string;
+  end_date: string;
+  hours: number;
+  threshold: number;
+  hours_above_threshold: number;
+  share_above_threshold?: number;
+  mean_spread?: number;
+  std_spread?: number;
+  min_spread?: number;
+  max_spread?: number;
+  mean_abs_spread?: number;
+  max_abs_spread?: number;
+  abs_spread_percentiles: Record<string, number>;
+}
+
+export interface SpreadMatrix {
+  start_date: string;
+  end_date: string;
+  market?: string;
+  percentile: number;
+  node_ids: number[];
+  node_codes: string[];
+  hours: number[][];
+  mean_spread: (number | null)[][];
+  mean_abs_spread: (number | null)[][];
+  max_abs_spread: (number | null)[][];
+  percentile_abs_spread: (number | null)[][];
+}
+
+export interface StatsHour {
+  timestamp: string;
+  value: number;
+}
+
 export interface AggregatedStats {
   avg?: number;
   max?: number;
   min?: number;
   count: number;
+  negative_count?: number;
+  negative_share?: number;
+  std?: number;
+  percentiles: Record<string, number>;
+  top_hours: StatsHour[];
+}
+
+export interface NodeStats extends AggregatedStats {
+  node_id: number;
+  node_code: string;
 }
 
 export interface AvailableYears {